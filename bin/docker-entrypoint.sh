@@ -7,6 +7,9 @@ set -e
 
 PROCS=${PROCS:-"4"}
 THREADS=${THREADS:-"1"}
+# uwsgi processes share prometheus_client metric values through files
+# in this dir
+PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-"/tmp/depobs-metrics"}
 
 
 DB_REVISION=${DB_REVISION:-"head"}
@@ -27,6 +30,13 @@ if [ "$1" = 'init-gcloud-creds' ]; then
     shift
 fi
 
+if [ "$1" = 'web' ] || [ "$1" = 'worker' ]; then
+    # drop values from previous runs
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+    export PROMETHEUS_MULTIPROC_DIR
+fi
+
 if [ "$1" = 'web' ]; then
     PROCS="$PROCS" THREADS="$THREADS" uwsgi --ini /app/web-uwsgi.ini
 elif [ "$1" = 'web-dev' ]; then
@@ -37,7 +47,12 @@ elif [ "$1" = 'worker-dev' ]; then
     python depobs/worker/main.py run \
 	   --task-name save_pubsub \
 	   --task-name start_next_scan \
-	   --task-name finish_next_scan
+	   --task-name finish_next_scan \
+	   --task-name save_next_graph_stats \
+	   --task-name watch_scan_jobs \
+	   --task-name backfill_missing_npm_data \
+	   --task-name refresh_npm_package_data \
+	   --task-name sync_github_advisories
 elif [ "$1" = 'e2e-test' ]; then
     # e.g. e2e_test API_URL tests/fixtures/
     shift
@@ -1,13 +1,30 @@
 import logging
+import time
 from typing import Any, Dict, TypedDict, Optional
+from urllib.parse import urlsplit
 
 import aiohttp
+import prometheus_client
 
+from depobs.clients.rate_limit import rate_limit_trace_config
+from depobs.util import metrics_util
 from depobs.util.type_util import Result
 
 
 log = logging.getLogger(__name__)
 
+UPSTREAM_REQUEST_SECONDS = prometheus_client.Histogram(
+    "depobs_upstream_request_duration_seconds",
+    "Seconds to request and read JSON from an upstream API by host.",
+    ["upstream"],
+    buckets=metrics_util.DEFAULT_BUCKETS,
+)
+UPSTREAM_RESPONSES = prometheus_client.Counter(
+    "depobs_upstream_responses_total",
+    "Upstream API responses by host and status code (error for no response).",
+    ["upstream", "status"],
+)
+
 
 class AIOHTTPClientConfig(TypedDict, total=True):  # require all keys defined below
     """
@@ -19,7 +36,8 @@ class AIOHTTPClientConfig(TypedDict, total=True):  # require all keys defined be
     # should not include basic auth/userinfo
     base_url: str
 
-    # time to sleep between requests in seconds
+    # minimum time between requests to the same host in seconds (the
+    # host's rate limiter adapts it from rate limit response headers)
     delay: int
 
     # number of simultaneous connections to open
@@ -45,6 +63,10 @@ class AIOHTTPClientConfig(TypedDict, total=True):  # require all keys defined be
 
 
 def aiohttp_session(config: AIOHTTPClientConfig) -> aiohttp.ClientSession:
+    """
+    Returns a client session with config headers that paces requests
+    through the shared rate limiter for each host
+    """
     headers = {
         "Accept": "application/json",
         "User-Agent": config["user_agent"],
@@ -62,6 +84,9 @@ def aiohttp_session(config: AIOHTTPClientConfig) -> aiohttp.ClientSession:
         timeout=aiohttp.ClientTimeout(total=config["total_timeout"]),
         connector=aiohttp.TCPConnector(limit=config["max_connections"]),
         raise_for_status=True,
+        trace_configs=[
+            rate_limit_trace_config(config["delay"], config["max_connections"])
+        ],
     )
 
 
@@ -74,15 +99,30 @@ async def request_json(
     session: aiohttp.ClientSession, method: str, url: str, **kwargs: Any
 ) -> Result[Dict]:
     log.debug(f"{method} {url}")
+    upstream = urlsplit(url).hostname or "unknown"
+    start_time = time.perf_counter()
     try:
         response = await session.request(method, url, **kwargs)
         response.raise_for_status()
         response_json = await response.json()
     except Exception as err:
+        UPSTREAM_REQUEST_SECONDS.labels(upstream=upstream).observe(
+            time.perf_counter() - start_time
+        )
+        UPSTREAM_RESPONSES.labels(
+            upstream=upstream,
+            status=err.status
+            if isinstance(err, aiohttp.ClientResponseError)
+            else "error",
+        ).inc()
         if is_not_found_exception(err):
             log.info(f"got 404 for {url}")
             log.debug(f"{url} not found: {err}")
             return err
         raise err
+    UPSTREAM_REQUEST_SECONDS.labels(upstream=upstream).observe(
+        time.perf_counter() - start_time
+    )
+    UPSTREAM_RESPONSES.labels(upstream=upstream, status=response.status).inc()
     log.debug(f"got response json {response_json!r}")
     return response_json
@@ -26,7 +26,6 @@ metadata into memory.
 async def async_query(
     config: AIOHTTPClientConfig, session: aiohttp.ClientSession, url: str
 ) -> Result[Optional[Dict]]:
-    await asyncio.sleep(config["delay"])
     try:
         log.debug(f"fetching crates-io-metadata for {url}")
         async with session.get(url) as resp:
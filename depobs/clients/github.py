@@ -1,10 +1,18 @@
 import asyncio
 import backoff
-from collections import ChainMap
-from contextlib import contextmanager
+from collections import ChainMap, defaultdict
+from dataclasses import dataclass
+import itertools
+import json
 import logging
+import math
+import os
+import tempfile
+import time
 from typing import (
+    Any,
     AsyncGenerator,
+    Awaitable,
     Callable,
     Dict,
     Generator,
@@ -14,22 +22,29 @@ from typing import (
     Tuple,
     TypedDict,
 )
+from urllib.parse import urlsplit
+from uuid import UUID
 
 import aiohttp
 import snug
 import quiz
 
+from depobs.clients.rate_limit import get_rate_limiter, rate_limit_trace_config
 from depobs.models.org_repo import OrgRepo
 from depobs.models.github import (
     ResourceKind,
     Request,
     Response,
     RequestResponseExchange,
+    deserialize_request,
     get_next_requests,
+    serialize_request,
     MISSING,
 )
 from depobs.util.quiz_util import raw_result_to_dict
+from depobs.util.serialize_util import grouper
 from depobs.util.traceback_util import exc_to_str
+from depobs.util.type_util import Result
 
 log = logging.getLogger(__name__)
 
@@ -49,6 +64,10 @@ class GithubClientConfig(TypedDict, total=True):  # require all keys
     # number of simultaneous connections to open
     max_connections: int
 
+    # minimum time between requests in seconds (the rate limiter adapts
+    # it from X-RateLimit-Remaining and X-RateLimit-Reset headers)
+    delay: float
+
     # A github personal access token. Defaults GITHUB_PAT env var. It should
     # have most of the scopes from
     # https://developer.github.com/v4/guides/forming-calls/#authenticating-with-graphql
@@ -57,15 +76,27 @@ class GithubClientConfig(TypedDict, total=True):  # require all keys
     # accept headers to add (e.g. to opt into preview APIs)
     github_accept_headers: List[str]
 
-    # the number of concurrent workers to run github requests
+    # the number of concurrent workers to start running github requests with
     github_workers: int
 
+    # the max number of workers to scale up to with rate limit headroom
+    github_max_workers: int
+
+    # the max number of repos from the source to run requests for at once
+    github_max_repos_in_flight: int
+
+    # the max number of responses to queue for writing before workers wait
+    github_write_queue_size: int
+
     # github query types to fetch. When empty defaults to all query types.
     github_query_type: Iterable[str]
 
     # number of github repo langs to fetch with each request
     github_repo_langs_page_size: int
 
+    # number of packages to fetch security vulnerabilities for with each request
+    github_advisory_package_batch_size: int
+
     # number of github repo dep manifests to fetch with each request (defaults to 1)
     github_repo_dep_manifests_page_size: int
 
@@ -78,12 +109,27 @@ class GithubClientConfig(TypedDict, total=True):  # require all keys
     # number of github repo vulns per alerts to fetch with each request (defaults to 25)
     github_repo_vuln_alert_vulns_page_size: int
 
-    # frequency in seconds to check whether worker queues are empty and quit (defaults to 3)
+    # frequency in seconds to scale workers and log throughput (defaults to 3)
     github_poll_seconds: int
 
+    # optional path to checkpoint crawls to and resume them from
+    github_checkpoint_path: Optional[str]
+
+    # frequency in seconds to write crawl checkpoints
+    github_checkpoint_seconds: int
+
+    # seconds since a repo's crawl finished to skip recrawling it for
+    github_repo_freshness_seconds: int
+
     # max times to retry a query with jitter and exponential backoff (defaults to 12). Ignores 404s and graphql not found errors
     github_max_retries: int
 
+    # path to cache the github graphql introspection schema at
+    github_schema_cache_path: str
+
+    # seconds to use the cached github graphql schema for before refetching it
+    github_schema_cache_ttl_seconds: int
+
 
 def is_not_found_exception(err: Exception) -> bool:
     is_quiz_not_found_err_response = (
@@ -122,14 +168,6 @@ async def run_graphql(
         # elif err.response.status_code in {403, 503}:
 
 
-@contextmanager
-def event_in_progress(event: asyncio.Event):
-    "sets an asyncio.Event to true for the duration of the yield"
-    event.set()
-    yield
-    event.clear()
-
-
 def aiohttp_session(config: GithubClientConfig) -> aiohttp.ClientSession:
     return aiohttp.ClientSession(
         headers={
@@ -139,11 +177,313 @@ def aiohttp_session(config: GithubClientConfig) -> aiohttp.ClientSession:
         timeout=aiohttp.ClientTimeout(total=config["total_timeout"]),
         connector=aiohttp.TCPConnector(limit=config["max_connections"]),
         raise_for_status=True,
+        trace_configs=[
+            rate_limit_trace_config(config["delay"], config["max_connections"])
+        ],
     )
 
 
+class GraphQLError(Exception):
+    """
+    A GitHub GraphQL API response with errors
+    """
+
+    def __init__(self, errors: List[Dict]):
+        super().__init__(f"GitHub GraphQL errors: {errors!r}")
+        self.errors = errors
+
+
+async def post_graphql(
+    config: GithubClientConfig,
+    session: aiohttp.ClientSession,
+    query: str,
+    variables: Dict,
+) -> Dict:
+    """
+    Posts a GraphQL query with variables to the GitHub API and returns
+    the response data. Raises GraphQLError for responses with errors.
+    """
+    async with session.post(
+        config["base_url"],
+        json=dict(query=query, variables=variables),
+        headers={"Authorization": f"Bearer {config['github_auth_token']}"},
+    ) as response:
+        response_json = await response.json()
+    if response_json.get("errors", None):
+        raise GraphQLError(response_json["errors"])
+    return response_json["data"]
+
+
+NPM_SECURITY_VULNERABILITIES_QUERY = """
+query($first: Int!, $after: String) {
+  securityVulnerabilities(ecosystem: NPM, first: $first, after: $after, orderBy: {field: UPDATED_AT, direction: DESC}) {
+    nodes {
+      updatedAt
+      advisory {
+        id, description, permalink, publishedAt, severity, summary, updatedAt, withdrawnAt
+      }
+      package {
+        name
+      }
+    }
+    pageInfo {
+      endCursor, hasNextPage
+    }
+  }
+}
+"""
+
+
+async def fetch_npm_security_vulnerabilities(
+    config: GithubClientConfig,
+    updated_after: Optional[str] = None,
+    page_size: int = 100,
+) -> AsyncGenerator[List[Dict], None]:
+    """
+    Yields pages of NPM securityVulnerabilities nodes most recently
+    updated first. Stops at the first node updated at or before
+    updated_after (an ISO 8601 UTC timestamp from a node updatedAt)
+    when it's not None.
+
+    Retries failed requests with backoff up to
+    config['github_max_retries'] times.
+    """
+    async with aiohttp_session(config) as session:
+        post_graphql_with_backoff = backoff.on_exception(
+            backoff.expo,
+            (aiohttp.ClientError, asyncio.TimeoutError, GraphQLError),
+            max_tries=config["github_max_retries"],
+            logger=log,
+        )(post_graphql)
+
+        after: Optional[str] = None
+        for page in itertools.count(1):
+            data = await post_graphql_with_backoff(
+                config,
+                session,
+                NPM_SECURITY_VULNERABILITIES_QUERY,
+                dict(first=page_size, after=after),
+            )
+            vulnerabilities = data["securityVulnerabilities"]
+            nodes = vulnerabilities["nodes"]
+            new_nodes = [
+                node
+                for node in nodes
+                if updated_after is None or node["updatedAt"] > updated_after
+            ]
+            log.debug(
+                f"fetched {len(new_nodes)} new NPM security vulnerabilities on page {page}"
+            )
+            if new_nodes:
+                yield new_nodes
+            if (
+                len(new_nodes) < len(nodes)
+                or not vulnerabilities["pageInfo"]["hasNextPage"]
+            ):
+                break
+            after = vulnerabilities["pageInfo"]["endCursor"]
+
+
+def package_security_vulnerabilities_query(package_count: int) -> str:
+    """
+    Returns a query for a page of NPM securityVulnerabilities for
+    package_count packages aliased p0, p1, ... with package name
+    variables $p0, $p1, ... and after cursor variables $a0, $a1, ...
+
+    >>> package_security_vulnerabilities_query(2).splitlines()[0]
+    'query($p0: String!, $a0: String, $p1: String!, $a1: String) {'
+    """
+    variables = ", ".join(
+        f"$p{i}: String!, $a{i}: String" for i in range(package_count)
+    )
+    aliases = "\n".join(
+        f"""  p{i}: securityVulnerabilities(ecosystem: NPM, package: $p{i}, first: 100, after: $a{i}, orderBy: {{field: UPDATED_AT, direction: DESC}}) {{
+    nodes {{
+      advisory {{
+        id, description, permalink, publishedAt, severity, summary, updatedAt, withdrawnAt
+      }}
+      package {{
+        name
+      }}
+    }}
+    pageInfo {{
+      endCursor, hasNextPage
+    }}
+  }}"""
+        for i in range(package_count)
+    )
+    return f"query({variables}) {{\n{aliases}\n}}"
+
+
+async def fetch_package_security_vulnerabilities(
+    config: GithubClientConfig,
+    package_names: Iterable[str],
+) -> AsyncGenerator[Result[Tuple[str, List[Dict]]], None]:
+    """
+    Yields each NPM package name with all of its securityVulnerabilities
+    nodes (most recently updated first).
+
+    Queries config['github_advisory_package_batch_size'] packages per
+    request with aliases and requests further pages only for packages
+    with more. Runs up to config['github_workers'] batches
+    concurrently through the GitHub rate limiter and yields packages
+    as their batch completes. Yields an exception for each batch that
+    failed after retrying with backoff.
+    """
+    async with aiohttp_session(config) as session:
+        semaphore = asyncio.Semaphore(config["github_workers"])
+        post_graphql_with_backoff = backoff.on_exception(
+            backoff.expo,
+            (aiohttp.ClientError, asyncio.TimeoutError, GraphQLError),
+            max_tries=config["github_max_retries"],
+            logger=log,
+        )(post_graphql)
+
+        async def fetch_batch(batch: List[str]) -> Result[Dict[str, List[Dict]]]:
+            nodes_by_package_name: Dict[str, List[Dict]] = {name: [] for name in batch}
+            # the next page cursors for packages with more pages
+            cursors: Dict[str, Optional[str]] = {name: None for name in batch}
+            async with semaphore:
+                try:
+                    while cursors:
+                        names = list(cursors.keys())
+                        variables: Dict[str, Optional[str]] = {}
+                        for i, name in enumerate(names):
+                            variables[f"p{i}"], variables[f"a{i}"] = name, cursors[name]
+                        data = await post_graphql_with_backoff(
+                            config,
+                            session,
+                            package_security_vulnerabilities_query(len(names)),
+                            variables,
+                        )
+                        for i, name in enumerate(names):
+                            vulnerabilities = data[f"p{i}"]
+                            nodes_by_package_name[name].extend(vulnerabilities["nodes"])
+                            if vulnerabilities["pageInfo"]["hasNextPage"]:
+                                cursors[name] = vulnerabilities["pageInfo"]["endCursor"]
+                            else:
+                                del cursors[name]
+                except Exception as err:
+                    log.error(
+                        f"error fetching security vulnerabilities for package names {batch}: {err}:\n{exc_to_str()}"
+                    )
+                    return err
+            return nodes_by_package_name
+
+        batches = [
+            [name for name in group if name is not None]
+            for group in grouper(
+                package_names, config["github_advisory_package_batch_size"]
+            )
+        ]
+        for batch_result in asyncio.as_completed(
+            [fetch_batch(batch) for batch in batches]
+        ):
+            nodes_by_package_name = await batch_result
+            if isinstance(nodes_by_package_name, Exception):
+                yield nodes_by_package_name
+                continue
+            for item in nodes_by_package_name.items():
+                yield item
+
+
+# bump to invalidate on-disk schema caches (e.g. when the cache format
+# or quiz schema parsing changes)
+SCHEMA_CACHE_VERSION = 1
+
+# (cache path, base URL) to the time the schema was fetched and the parsed schema
+_schemas: Dict[Tuple[str, str], Tuple[float, quiz.Schema]] = {}
+
+
+def load_cached_raw_schema(config: GithubClientConfig) -> Optional[Dict]:
+    """
+    Returns the raw introspection __schema from the on-disk cache at
+    config['github_schema_cache_path'] or None when it's missing,
+    unreadable, from another cache version or base URL, or older than
+    config['github_schema_cache_ttl_seconds']
+    """
+    path = config["github_schema_cache_path"]
+    try:
+        with open(path, "r") as fin:
+            cached = json.load(fin)
+    except (OSError, ValueError) as err:
+        log.debug(f"no usable github graphql schema cache at {path}: {err}")
+        return None
+    if (
+        not isinstance(cached, dict)
+        or cached.get("version", None) != SCHEMA_CACHE_VERSION
+        or cached.get("base_url", None) != config["base_url"]
+        or cached.get("accept_headers", None) != config["github_accept_headers"]
+    ):
+        log.info(f"ignoring github graphql schema cache {path} for another version")
+        return None
+    if time.time() - cached["fetched_at"] > config["github_schema_cache_ttl_seconds"]:
+        log.info(f"github graphql schema cache {path} expired")
+        return None
+    return cached["schema"]
+
+
+def write_json_atomically(path: str, data: Any) -> None:
+    """
+    Writes data as JSON to a temp file in path's directory then
+    replaces path with it, so concurrent readers and crashes leave the
+    old or new file
+    """
+    dirname = os.path.dirname(os.path.abspath(path))
+    os.makedirs(dirname, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", dir=dirname, delete=False) as fout:
+        json.dump(data, fout)
+    os.replace(fout.name, path)
+
+
+def save_cached_raw_schema(config: GithubClientConfig, raw_schema: Dict) -> None:
+    """
+    Writes the raw introspection __schema to the on-disk cache at
+    config['github_schema_cache_path']
+    """
+    path = config["github_schema_cache_path"]
+    write_json_atomically(
+        path,
+        dict(
+            version=SCHEMA_CACHE_VERSION,
+            base_url=config["base_url"],
+            accept_headers=config["github_accept_headers"],
+            fetched_at=time.time(),
+            schema=raw_schema,
+        ),
+    )
+    log.info(f"saved github graphql schema cache to {path}")
+
+
+async def get_schema(
+    config: GithubClientConfig,
+    executor: quiz.execution.async_executor,
+    refresh: bool = False,
+) -> quiz.Schema:
+    """
+    Returns the GitHub GraphQL schema parsed once per process from the
+    on-disk cache or, when the cache isn't fresh or refresh is True,
+    from an introspection query that refreshes the cache
+    """
+    key = (config["github_schema_cache_path"], config["base_url"])
+    if not refresh and key in _schemas:
+        loaded_at, schema = _schemas[key]
+        if time.time() - loaded_at <= config["github_schema_cache_ttl_seconds"]:
+            return schema
+
+    raw_schema = None if refresh else load_cached_raw_schema(config)
+    if raw_schema is None:
+        result = await executor(quiz.INTROSPECTION_QUERY)
+        raw_schema = result["__schema"]
+        log.debug("fetched github graphql schema")
+        save_cached_raw_schema(config, raw_schema)
+    schema = quiz.Schema.from_raw(raw_schema, scalars=(), module=None)
+    _schemas[key] = (time.time(), schema)
+    return schema
+
+
 async def quiz_executor_and_schema(
-    config: GithubClientConfig, session: aiohttp.ClientSession
+    config: GithubClientConfig, session: aiohttp.ClientSession, refresh: bool = False
 ) -> Tuple[quiz.execution.async_executor, quiz.Schema]:
     async_executor = quiz.async_executor(
         url=config["base_url"],
@@ -152,94 +492,284 @@ async def quiz_executor_and_schema(
         ),
         client=session,
     )
-    result = await async_executor(quiz.INTROSPECTION_QUERY)
-    schema: quiz.Schema = quiz.Schema.from_raw(
-        result["__schema"], scalars=(), module=None
-    )
-    log.debug("fetched github graphql schema")
+    schema = await get_schema(config, async_executor, refresh)
     return async_executor, schema
 
 
-async def worker(
-    name: str,
-    to_run: asyncio.Queue,
-    to_write: asyncio.Queue,
-    schema: quiz.Schema,
-    executor: quiz.execution.async_executor,
-    shutdown: asyncio.Event,
-    request_pending: asyncio.Event,
-    run_graphql_with_backoff: Callable[
-        [quiz.execution.async_executor, str, str], quiz.execution.RawResult
-    ],
-):
-    """worker runs Github metadata requests until shutdown
+async def refresh_schema(config: GithubClientConfig) -> None:
+    "fetches the GitHub GraphQL schema and replaces the cached schema"
+    async with aiohttp_session(config) as session:
+        await quiz_executor_and_schema(config, session, refresh=True)
+
 
-    More specifically until the shutdown event fires it repeatedly:
+@dataclass
+class ResourceKindMetrics:
+    "request counts and total request seconds for one resource kind"
+    requests: int = 0
+    errors: int = 0
+    seconds: float = 0.0
 
-    1. pulls a request from the to_run queue
-    2. sets request pending
-    3. runs the request
-    4. clears request pending
-    5. pushes successful request response exchanges to the to_write queue
+
+class PipelineMetrics:
+    """
+    Per resource kind request throughput, errors, and latency for a
+    run_pipeline run
     """
-    queue_wait_timeout_seconds = 2
 
-    while True:
-        if shutdown.is_set():
-            log.debug(f"{name} shutting down")
-            break
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.started_at = clock()
+        self.by_kind: Dict[ResourceKind, ResourceKindMetrics] = defaultdict(
+            ResourceKindMetrics
+        )
 
-        try:
-            request: Request = await asyncio.wait_for(
-                to_run.get(), queue_wait_timeout_seconds
+    def record(self, kind: ResourceKind, seconds: float, error: bool) -> None:
+        metrics = self.by_kind[kind]
+        metrics.requests += 1
+        metrics.errors += int(error)
+        metrics.seconds += seconds
+
+    def throughput(self) -> Dict[str, float]:
+        "returns requests per second since the run started by resource kind name"
+        elapsed = max(self.clock() - self.started_at, 1e-9)
+        return {
+            kind.name: metrics.requests / elapsed
+            for kind, metrics in self.by_kind.items()
+        }
+
+    def summary(self) -> str:
+        throughput = self.throughput()
+        return "; ".join(
+            f"{kind.name}: {metrics.requests} requests ({throughput[kind.name]:.2f}/s)"
+            f" {metrics.errors} errors {metrics.seconds / metrics.requests:.3f}s avg"
+            for kind, metrics in sorted(
+                self.by_kind.items(), key=lambda item: item[0].value
             )
-        except asyncio.TimeoutError:
-            log.debug(f"{name} no new requests after {queue_wait_timeout_seconds}s")
-            continue
+        )
 
-        with event_in_progress(request_pending):
-            # TODO: retry if request fails due to rate limit or intermittant error
-            try:
-                gql_query = str(schema.query[request.graphql])
-                assert str(MISSING) not in gql_query
-                log.info(f"{name} running {request.log_str}")
-                log.debug(f"{name} {request.log_id} gql_query is: {gql_query}")
-                result: quiz.execution.RawResult = await run_graphql_with_backoff(
-                    executor, name, gql_query
-                )
-                response: Response = Response(resource=request.resource, json=result)
-                log.debug(
-                    f"{name} for {request.log_id} queued response {response.log_str} to write"
-                )
-                # write non-empty responses to stdout
-                assert response
-                to_write.put_nowait(RequestResponseExchange(request, response))
-            except Exception:
-                log.error(f"{name} error running {request.log_id}\n:{exc_to_str()}")
 
-            # Notify the queue that the "work item" has been processed.
-            to_run.task_done()
+# bump to ignore crawl checkpoints (e.g. when their format changes)
+CHECKPOINT_VERSION = 1
+
 
+class RepoRequestTracker:
+    """
+    Tracks the requests queued, running, or waiting to be written for
+    each repo to limit the number of repos in flight (so the source
+    isn't read into the run queue all at once) and when repos
+    finished, so crawls can checkpoint and resume
+    """
+
+    def __init__(self, max_repos: int, clock: Callable[[], float] = time.time):
+        self.slots = asyncio.Semaphore(max_repos)
+        self.clock = clock
+        self.pending: Dict[str, Dict[UUID, Request]] = {}
+        self.repo_by_request_guid: Dict[UUID, str] = {}
+        # repo to the time its last request finished
+        self.finished_at: Dict[str, float] = {}
+
+    async def start(self, repo: str, requests: List[Request]) -> None:
+        """
+        waits for a slot for repo then tracks its initial requests
+
+        Tracks the requests in the repo's existing slot when it's
+        already pending, since done releases one slot per repo.
+        """
+        if repo not in self.pending:
+            await self.slots.acquire()
+            self.pending[repo] = {}
+        for request in requests:
+            self.repo_by_request_guid[request.guid] = repo
+            self.pending[repo][request.guid] = request
+
+    def add(self, request: Request, next_requests: List[Request]) -> None:
+        "tracks the next requests for a request's response with its repo"
+        repo = self.repo_by_request_guid[request.guid]
+        for next_request in next_requests:
+            self.repo_by_request_guid[next_request.guid] = repo
+            self.pending[repo][next_request.guid] = next_request
+
+    def done(self, request: Request) -> None:
+        """
+        stops tracking a request that failed or had its response
+        written and frees its repo slot when the repo has no more
+        requests
+        """
+        repo = self.repo_by_request_guid.pop(request.guid)
+        del self.pending[repo][request.guid]
+        if not self.pending[repo]:
+            del self.pending[repo]
+            self.finished_at[repo] = self.clock()
+            self.slots.release()
+
+    def is_fresh(self, repo: str, freshness_seconds: float) -> bool:
+        "returns whether repo finished within freshness_seconds"
+        return self.clock() - self.finished_at.get(repo, -math.inf) <= freshness_seconds
+
+    def to_checkpoint(self, freshness_seconds: float) -> Dict[str, Any]:
+        """
+        returns a JSON serializable checkpoint of pending requests by
+        repo and repos finished within freshness_seconds
+        """
+        return dict(
+            version=CHECKPOINT_VERSION,
+            pending={
+                repo: [serialize_request(request) for request in requests.values()]
+                for repo, requests in self.pending.items()
+            },
+            finished_at={
+                repo: finished_at
+                for repo, finished_at in self.finished_at.items()
+                if self.is_fresh(repo, freshness_seconds)
+            },
+        )
+
+    def load_checkpoint(self, checkpoint: Dict[str, Any]) -> Dict[str, List[Request]]:
+        """
+        loads finished repos from a checkpoint and returns its pending
+        requests by repo to start
+        """
+        self.finished_at.update(checkpoint["finished_at"])
+        return {
+            repo: [deserialize_request(request) for request in requests]
+            for repo, requests in checkpoint["pending"].items()
+        }
 
-def get_response(task):
-    assert task.done()
-    assert isinstance(task, asyncio.Task)
 
-    if task.cancelled():
-        log.warn("task fetching {} was cancelled".format(None))
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the crawl checkpoint at path or None when it's missing,
+    unreadable, or from another checkpoint version
+    """
+    try:
+        with open(path, "r") as fin:
+            checkpoint = json.load(fin)
+    except (OSError, ValueError) as err:
+        log.info(f"not resuming from github crawl checkpoint {path}: {err}")
+        return None
+    if (
+        not isinstance(checkpoint, dict)
+        or checkpoint.get("version", None) != CHECKPOINT_VERSION
+    ):
+        log.info(f"ignoring github crawl checkpoint {path} for another version")
+        return None
+    return checkpoint
+
+
+class WorkerScale:
+    """
+    Tracks the number of running pipeline workers and the number the
+    autoscaler wants, so workers can stop to scale down without
+    waiting for a stop signal behind queued requests
+    """
 
-    if task.exception():
-        log.error("task fetching {} errored".format(None))
-        task.print_stack()
+    def __init__(self, target: int):
+        self.target = target
+        self.running = 0
 
-    yield task.result()
+    def should_stop(self) -> bool:
+        "returns whether a worker should stop and if so counts it stopped"
+        if self.running > self.target:
+            self.running -= 1
+            return True
+        return False
+
+
+async def worker(
+    name: str,
+    to_run: asyncio.Queue,
+    to_write: asyncio.Queue,
+    schema: quiz.Schema,
+    executor: quiz.execution.async_executor,
+    run_graphql_with_backoff: Callable[
+        [quiz.execution.async_executor, str, str],
+        Awaitable[quiz.execution.RawResult],
+    ],
+    context: ChainMap,
+    tracker: RepoRequestTracker,
+    metrics: PipelineMetrics,
+    scale: WorkerScale,
+) -> None:
+    """worker runs Github metadata requests until there are more
+    workers than the scale target
+
+    More specifically for each request from the to_run queue it:
+
+    1. runs the request
+    2. queues the next requests for the response to run
+    3. waits to queue the request response exchange to write (when
+       to_write is full)
+    4. marks the request done in to_run (and in the tracker if it
+       failed, otherwise the coordinator does after writing it)
+    """
+    while not scale.should_stop():
+        request: Request = await to_run.get()
+        started_at = time.monotonic()
+        try:
+            gql_query = str(schema.query[request.graphql])
+            assert str(MISSING) not in gql_query
+            log.info(f"{name} running {request.log_str}")
+            log.debug(f"{name} {request.log_id} gql_query is: {gql_query}")
+            result: quiz.execution.RawResult = await run_graphql_with_backoff(
+                executor, name, gql_query
+            )
+            metrics.record(
+                request.resource.kind, time.monotonic() - started_at, error=False
+            )
+            response: Response = Response(resource=request.resource, json=result)
+            # write non-empty responses to stdout
+            assert response
+            exchange = RequestResponseExchange(request, response)
+            next_requests = list(get_next_requests(log, context, exchange))
+            tracker.add(request, next_requests)
+            for next_request in next_requests:
+                log.debug(f"queued {next_request.log_id} from {request.log_id}")
+                to_run.put_nowait(next_request)
+            await to_write.put(exchange)
+            log.debug(
+                f"{name} for {request.log_id} queued response {response.log_str} to write"
+            )
+        except Exception:
+            metrics.record(
+                request.resource.kind, time.monotonic() - started_at, error=True
+            )
+            log.error(f"{name} error running {request.log_id}\n:{exc_to_str()}")
+            tracker.done(request)
+        finally:
+            # Notify the queue that the "work item" has been processed.
+            to_run.task_done()
+    log.debug(f"{name} shutting down")
 
 
 async def run_pipeline(
     source: Generator[Dict[str, str], None, None], config: GithubClientConfig
 ) -> AsyncGenerator[Dict, None]:
+    """
+    Runs GitHub metadata requests for repos from source and yields
+    response JSON as requests finish.
+
+    Reads repos from source as fewer than github_max_repos_in_flight
+    have requests queued or running, and workers wait to queue
+    responses while github_write_queue_size are waiting to be yielded.
+    Stops when the run queue is joined (all requests and the requests
+    queued for their responses are done).
+
+    Starts github_workers workers and every github_poll_seconds adds
+    one (up to github_max_workers) while the GitHub rate limiter is
+    running at its base rate and requests are waiting, or stops one
+    (down to one, after its current request) while it's slowed to
+    under half its base rate or paused.
+
+    When github_checkpoint_path is set, writes pending requests by
+    repo and recently finished repos to it every
+    github_checkpoint_seconds and when the pipeline stops. Resumes the
+    pending requests from it on start and skips source repos that
+    finished within github_repo_freshness_seconds. Requests are
+    pending until their response is yielded, so a resumed crawl can
+    yield a page again but doesn't skip any.
+    """
     log.info("pipeline github_metadata started")
-    if config["github_query_type"]:
+    if not config["github_query_type"]:
         config["github_query_type"] = [k.name for k in ResourceKind]
         log.info(f"defaulting to all github query types {config['github_query_type']}")
 
@@ -254,90 +784,146 @@ async def run_pipeline(
         )(run_graphql)
 
         to_run: asyncio.Queue = asyncio.Queue()
-        to_write: asyncio.Queue = asyncio.Queue()
-        stop_workers = asyncio.Event()
-
-        # start workers that run queries from to_run and write responses to
-        # to_write until the stop_workers event is set
-        pending_tasks: Dict[str, asyncio.Event] = {
-            f"worker-{i}": asyncio.Event() for i in range(config["github_workers"])
-        }
-        worker_tasks: Dict[str, asyncio.Task] = {
-            name: asyncio.create_task(
-                worker(
-                    name,
-                    to_run,
-                    to_write,
-                    schema,
-                    executor,
-                    stop_workers,
-                    request_pending,
-                    run_graphql_with_backoff,
+        to_write: asyncio.Queue = asyncio.Queue(
+            maxsize=config["github_write_queue_size"]
+        )
+        tracker = RepoRequestTracker(config["github_max_repos_in_flight"])
+        checkpoint_path = config["github_checkpoint_path"]
+        freshness_seconds = config["github_repo_freshness_seconds"]
+        resumed_requests: Dict[str, List[Request]] = {}
+        if checkpoint_path:
+            checkpoint = load_checkpoint(checkpoint_path)
+            if checkpoint is not None:
+                resumed_requests = tracker.load_checkpoint(checkpoint)
+                log.info(
+                    f"resuming {sum(len(requests) for requests in resumed_requests.values())}"
+                    f" requests for {len(resumed_requests)} repos from {checkpoint_path}"
                 )
-            )
-            for (name, request_pending) in pending_tasks.items()
-        }
-        log.info(f"started {len(worker_tasks)} GH workers")
+        metrics = PipelineMetrics()
+        limiter = get_rate_limiter(
+            urlsplit(config["base_url"]).hostname or "",
+            config["delay"],
+            config["max_connections"],
+        )
 
-        # add initial items to the queue
-        for item in source:
-            org_repo: OrgRepo = OrgRepo.from_github_repo_url(item["repo_url"])
-            context = ChainMap(config, dict(owner=org_repo.org, name=org_repo.repo))
-            for request in get_next_requests(log, context, last_exchange=None):
-                log.debug(f"initial request: {request.log_id}")
-                assert len(request.selection_updates) == len(
-                    request.resource.first_page_diffs
+        worker_tasks: List[asyncio.Task] = []
+        scale = WorkerScale(config["github_workers"])
+
+        def start_worker() -> None:
+            scale.running += 1
+            worker_tasks.append(
+                asyncio.create_task(
+                    worker(
+                        f"worker-{len(worker_tasks)}",
+                        to_run,
+                        to_write,
+                        schema,
+                        executor,
+                        run_graphql_with_backoff,
+                        ChainMap(config),
+                        tracker,
+                        metrics,
+                        scale,
+                    )
                 )
-                to_run.put_nowait(request)
-        log.info(f"queued {to_run.qsize()} initial requests")
+            )
 
-        while True:
+        async def queue_source_requests() -> None:
             try:
-                exchange: RequestResponseExchange = to_write.get_nowait()
-
-                next_requests = list(get_next_requests(log, ChainMap(config), exchange))
-                for request in next_requests:
-                    assert (
-                        len(request.selection_updates)
-                        <= len(request.resource.first_page_diffs) + 1
+                for repo, requests in resumed_requests.items():
+                    await tracker.start(repo, requests)
+                    for request in requests:
+                        log.debug(f"resumed request: {request.log_id}")
+                        to_run.put_nowait(request)
+
+                for item in source:
+                    if item["repo_url"] in tracker.pending or tracker.is_fresh(
+                        item["repo_url"], freshness_seconds
+                    ):
+                        log.info(
+                            f"skipping in progress or fresh repo {item['repo_url']}"
+                        )
+                        continue
+                    org_repo: OrgRepo = OrgRepo.from_github_repo_url(item["repo_url"])
+                    context = ChainMap(
+                        config, dict(owner=org_repo.org, name=org_repo.repo)
                     )
-                    log.debug(f"queued {request.log_id} from {exchange.request.log_id}")
-                    to_run.put_nowait(request)
+                    requests = list(get_next_requests(log, context, last_exchange=None))
+                    if not requests:
+                        continue
+                    await tracker.start(item["repo_url"], requests)
+                    for request in requests:
+                        log.debug(f"initial request: {request.log_id}")
+                        assert len(request.selection_updates) == len(
+                            request.resource.first_page_diffs
+                        )
+                        to_run.put_nowait(request)
+            except Exception:
+                log.error(f"error queuing initial requests:\n{exc_to_str()}")
+            await to_run.join()
+            log.info("run queue is empty")
+            await to_write.put(None)
 
-                log.debug(
-                    f"queued {len(next_requests)} more requests from {exchange.request.log_id}"
+        async def autoscale_workers() -> None:
+            while True:
+                await asyncio.sleep(config["github_poll_seconds"])
+                headroom = limiter.headroom()
+                if (
+                    headroom >= 1.0
+                    and to_run.qsize() > scale.target
+                    and scale.target < config["github_max_workers"]
+                ):
+                    scale.target += 1
+                    # reuse workers that haven't stopped for a lower target
+                    while scale.running < scale.target:
+                        start_worker()
+                elif headroom < 0.5 and scale.target > 1:
+                    # a worker stops when it finishes its current request
+                    scale.target -= 1
+                log.info(
+                    f"{scale.running} workers (target {scale.target}); "
+                    f"{headroom:.2f} rate limit headroom; "
+                    f"{to_run.qsize()} to run; {to_write.qsize()} to write; {metrics.summary()}"
                 )
 
+        def save_checkpoint() -> None:
+            assert checkpoint_path is not None
+            write_json_atomically(
+                checkpoint_path, tracker.to_checkpoint(freshness_seconds)
+            )
+            log.debug(f"saved github crawl checkpoint to {checkpoint_path}")
+
+        async def save_checkpoints() -> None:
+            while True:
+                await asyncio.sleep(config["github_checkpoint_seconds"])
+                save_checkpoint()
+
+        for _ in range(config["github_workers"]):
+            start_worker()
+        log.info(f"started {len(worker_tasks)} GH workers")
+        producer_task = asyncio.create_task(queue_source_requests())
+        autoscaler_task = asyncio.create_task(autoscale_workers())
+        background_tasks = [producer_task, autoscaler_task]
+        if checkpoint_path:
+            background_tasks.append(asyncio.create_task(save_checkpoints()))
+        try:
+            while True:
+                exchange: Optional[RequestResponseExchange] = await to_write.get()
+                if exchange is None:
+                    break
                 # yield results to sink to write to stdout
                 yield raw_result_to_dict(exchange.response.json)
                 log.debug(
                     f"writing {exchange.response.log_str} for {exchange.request.log_id}"
                 )
+                tracker.done(exchange.request)
                 to_write.task_done()
-            except asyncio.QueueEmpty:
-                log.debug(
-                    f"no responses to write. sleeping for {config['github_poll_seconds']}s"
-                )
-                await asyncio.sleep(config["github_poll_seconds"])
-
-            log.debug(
-                f"{to_run.qsize()} to run; "
-                f"{len([pending for pending in pending_tasks.values() if pending.is_set()])} pending; "
-                f"{to_write.qsize()} to write"
+        finally:
+            for task in background_tasks + worker_tasks:
+                task.cancel()
+            await asyncio.gather(
+                *background_tasks, *worker_tasks, return_exceptions=True
             )
-            if (
-                to_run.empty()
-                and to_write.empty()
-                and not any(pending.is_set() for pending in pending_tasks.values())
-            ):
-                log.info(f"queues are empty stopping workers")
-                stop_workers.set()
-                for worker_task in worker_tasks.values():
-                    try:
-                        await asyncio.wait_for(worker_task, timeout=5)
-                    except asyncio.TimeoutError:
-                        log.error(f"cancelling worker {worker_task} after 5s timeout")
-                        worker_task.cancel()
-                break
-
-        assert all(get_response(task) for task in worker_tasks.values())
+            if checkpoint_path:
+                save_checkpoint()
+            log.info(f"pipeline github_metadata finished: {metrics.summary()}")
@@ -3,7 +3,7 @@ import asyncio
 import aiohttp
 import backoff
 import logging
-from typing import AsyncGenerator, Dict, Iterable
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Iterable, List, Tuple
 
 from depobs.clients.aiohttp_client import (
     AIOHTTPClientConfig,
@@ -11,61 +11,89 @@ from depobs.clients.aiohttp_client import (
     is_not_found_exception,
     request_json,
 )
+from depobs.util.traceback_util import exc_to_str
 from depobs.util.type_util import Result
 
 log = logging.getLogger(__name__)
 
 
-async def fetch_hibp_breach_data(
-    config: AIOHTTPClientConfig,
-    emails: Iterable[str],
-) -> AsyncGenerator[Result[Dict[str, Dict]], None]:
+class HIBPAccountError(Exception):
     """
-    Fetches breach information for one or more email accounts
-
-    Uses: https://haveibeenpwned.com/API/v3#BreachesForAccount
+    A breachedaccount request for an email failed after retries
     """
 
-    async_query_with_backoff = backoff.on_exception(
-        backoff.constant,
+    def __init__(self, email: str, err: Exception):
+        super().__init__(f"error fetching HIBP breaches for an account: {err!r}")
+        self.email = email
+        self.err = err
+
+
+def _request_json_with_backoff(
+    config: AIOHTTPClientConfig,
+) -> Callable[..., Awaitable[Result[Any]]]:
+    return backoff.on_exception(
+        backoff.expo,
         (aiohttp.ClientResponseError, aiohttp.ClientError, asyncio.TimeoutError),
         max_tries=config["max_retries"],
         giveup=is_not_found_exception,
         logger=log,
-        interval=2,
     )(request_json)
 
+
+async def fetch_hibp_breaches(config: AIOHTTPClientConfig) -> List[Dict]:
+    """
+    Fetches the catalog of all breaches in HIBP
+
+    Uses: https://haveibeenpwned.com/API/v3#AllBreaches
+    """
     async with aiohttp_session(config) as s:
-        results = await asyncio.gather(
-            *[
-                async_query_with_backoff(
-                    s,
-                    "GET",
-                    f"{config['base_url']}breachedaccount/{email}",
-                )
-                for email in emails
-            ]
+        breaches = await _request_json_with_backoff(config)(
+            s, "GET", f"{config['base_url']}breaches"
         )
+    if isinstance(breaches, Exception):
+        raise breaches
+    log.info(f"fetched {len(breaches)} HIBP breaches")
+    return breaches
 
-        for result in results:
-            if result is None:
-                log.warn(f"got None HIBP results for emails {emails}")
-                continue
-
-            breach_details = await asyncio.gather(
-                *[
-                    async_query_with_backoff(
-                        s,
-                        "GET",
-                        f"{config['base_url']}breach/{breach['Name']}",
-                    )
-                    for breach in result
-                ]
-            )
 
-            breach_dates = [detail["BreachDate"] for detail in breach_details]
+async def fetch_hibp_account_breach_names(
+    config: AIOHTTPClientConfig,
+    emails: Iterable[str],
+) -> AsyncGenerator[Result[Tuple[str, List[str]]], None]:
+    """
+    Fetches breach names for one or more email accounts requesting
+    each distinct email once
+
+    Uses: https://haveibeenpwned.com/API/v3#BreachesForAccount
 
-            for dict, date in zip(result, breach_dates):
-                dict["Date"] = date
+    Requests go through the HIBP host rate limiter, which waits for
+    the Retry-After of 429 responses before retries, with at most
+    config['max_connections'] requests in flight. Yields (email,
+    breach names) as each request completes with no breach names for
+    accounts HIBP returns 404 for and an HIBPAccountError for each
+    email that failed (so callers can retry it). Breach details are
+    in the all breaches catalog (see fetch_hibp_breaches).
+    """
+    async_query_with_backoff = _request_json_with_backoff(config)
+
+    async with aiohttp_session(config) as s:
+        semaphore = asyncio.Semaphore(config["max_connections"])
+
+        async def fetch_account(email: str) -> Result[Tuple[str, List[str]]]:
+            try:
+                async with semaphore:
+                    result = await async_query_with_backoff(
+                        s, "GET", f"{config['base_url']}breachedaccount/{email}"
+                    )
+            except Exception as err:
+                log.error(f"error fetching HIBP breaches: {err}:\n{exc_to_str()}")
+                return HIBPAccountError(email, err)
+            if result is None or isinstance(result, Exception):
+                # request_json returns 404 errors for accounts without breaches
+                return email, []
+            return email, [breach["Name"] for breach in result]
 
-            yield result
+        for account_result in asyncio.as_completed(
+            [fetch_account(email) for email in sorted(set(emails))]
+        ):
+            yield await account_result
@@ -3,7 +3,7 @@ import asyncio
 import aiohttp
 import backoff
 import math
-from typing import AsyncGenerator, Dict, Iterable, Optional
+from typing import AsyncGenerator, Dict, Iterable, List, Mapping, Optional, Tuple
 import logging
 
 from depobs.clients.aiohttp_client import (
@@ -41,6 +41,20 @@ https://replicate.npmjs.com/ (flattened scopes) seems to be busted
 """
 
 
+class NPMRegistryFetchError(Exception):
+    """
+    Fetching registry metadata for package names failed after
+    retries with an error other than 404 Not Found
+    """
+
+    def __init__(self, package_names: List[str], err: Exception):
+        super().__init__(
+            f"error fetching npm registry metadata for {len(package_names)} package names: {err!r}"
+        )
+        self.package_names = package_names
+        self.err = err
+
+
 async def fetch_npm_registry_metadata(
     config: AIOHTTPClientConfig,
     package_names: Iterable[str],
@@ -51,6 +65,10 @@ async def fetch_npm_registry_metadata(
     config['auth_token'] is an optional npm registry access token to
     use a higher rate limit. Run 'npm token create --read-only' to
     create it.
+
+    Yields not found exceptions and an NPMRegistryFetchError for each
+    package name that failed for another reason, so one bad name
+    doesn't fail the rest of its group.
     """
     total_groups: Optional[int] = None
     if total_packages:
@@ -74,6 +92,9 @@ async def fetch_npm_registry_metadata(
             grouper(package_names, config["package_batch_size"]), start=1
         ):
             log.info(f"fetching group {i} of {total_groups}")
+            group_names = [
+                package_name for package_name in group if package_name is not None
+            ]
             try:
                 # NB: scoped packages OK e.g. https://registry.npmjs.com/@babel/core
                 group_results = await asyncio.gather(
@@ -83,15 +104,95 @@ async def fetch_npm_registry_metadata(
                             "GET",
                             f"{config['base_url']}{package_name}",
                         )
-                        for package_name in group
-                        if package_name is not None
-                    ]
+                        for package_name in group_names
+                    ],
+                    return_exceptions=True,
                 )
-                for result in group_results:
-                    if result is not None:
+                for package_name, result in zip(group_names, group_results):
+                    if isinstance(result, asyncio.CancelledError):
+                        raise result
+                    if isinstance(result, Exception) and not is_not_found_exception(
+                        result
+                    ):
+                        log.error(
+                            f"error fetching npm registry metadata for {package_name}: {result!r}"
+                        )
+                        yield NPMRegistryFetchError([package_name], result)
+                    elif result is not None:
                         yield result
             except Exception as err:
                 log.error(
                     f"error fetching group {i} for package names {group}: {err}:\n{exc_to_str()}"
                 )
                 yield err
+
+
+# package name, response ETag, and metadata (None when not modified
+# or not found)
+ConditionalMetadataResult = Tuple[str, Optional[str], Optional[Dict]]
+
+
+async def fetch_npm_registry_metadata_if_modified(
+    config: AIOHTTPClientConfig,
+    etags_by_package_name: Mapping[str, Optional[str]],
+) -> AsyncGenerator[Result[ConditionalMetadataResult], None]:
+    """
+    Fetches npm registry metadata for package names with an
+    If-None-Match header for names with an ETag from a previous fetch.
+
+    Yields the package name, response ETag, and metadata or None when
+    the registry responds 304 Not Modified (with the previous ETag) or
+    404 Not Found (with a None ETag). Yields exceptions for other
+    errors.
+    """
+    async with aiohttp_session(config) as s:
+
+        @backoff.on_exception(
+            backoff.expo,
+            (
+                aiohttp.ClientError,
+                aiohttp.ClientResponseError,
+                aiohttp.ContentTypeError,
+                asyncio.TimeoutError,
+            ),
+            max_tries=config["max_retries"],
+            giveup=is_not_found_exception,
+            logger=log,
+        )
+        async def fetch(
+            package_name: str, etag: Optional[str]
+        ) -> ConditionalMetadataResult:
+            url = f"{config['base_url']}{package_name}"
+            headers = {"If-None-Match": etag} if etag else {}
+            log.debug(f"GET {url} {headers}")
+            try:
+                response = await s.get(url, headers=headers)
+            except aiohttp.ClientResponseError as err:
+                if is_not_found_exception(err):
+                    log.info(f"got 404 for {url}")
+                    return package_name, None, None
+                raise err
+            if response.status == 304:
+                response.release()
+                return package_name, etag, None
+            return (
+                package_name,
+                response.headers.get("ETag", None),
+                await response.json(),
+            )
+
+        for i, group in enumerate(
+            grouper(etags_by_package_name.items(), config["package_batch_size"]),
+            start=1,
+        ):
+            log.debug(f"fetching group {i} of registry metadata if modified")
+            group_results = await asyncio.gather(
+                *[fetch(*item) for item in group if item is not None],
+                return_exceptions=True,
+            )
+            for result in group_results:
+                if isinstance(result, Exception):
+                    log.error(f"error fetching registry metadata: {result}")
+                elif isinstance(result, BaseException):
+                    raise result
+                yield result
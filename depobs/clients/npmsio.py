@@ -1,6 +1,9 @@
 import asyncio
 import logging
-from typing import AsyncGenerator, Dict, Iterable, Optional
+from typing import AsyncGenerator, Dict, Iterable, List, Optional
+
+import aiohttp
+import backoff
 
 from depobs.clients.aiohttp_client import (
     AIOHTTPClientConfig,
@@ -8,11 +11,26 @@ from depobs.clients.aiohttp_client import (
     request_json,
 )
 from depobs.util.serialize_util import grouper
+from depobs.util.traceback_util import exc_to_str
 from depobs.util.type_util import Result
 
 log = logging.getLogger(__name__)
 
 
+class NPMSIOBatchError(Exception):
+    """
+    A package/mget request for a batch of package names failed after
+    retries
+    """
+
+    def __init__(self, package_names: List[str], err: Exception):
+        super().__init__(
+            f"error fetching npms.io scores for {len(package_names)} package names: {err!r}"
+        )
+        self.package_names = package_names
+        self.err = err
+
+
 async def fetch_npmsio_scores(
     config: AIOHTTPClientConfig,
     package_names: Iterable[str],
@@ -22,31 +40,58 @@ async def fetch_npmsio_scores(
     Fetches npms.io score and analysis for one or more node package names
 
     Uses: https://api-docs.npms.io/#api-Package-GetMultiPackageInfo
+
+    Requests batches of config['package_batch_size'] names with at
+    most config['max_connections'] requests in flight and retries
+    failed requests with backoff. Yields results as each batch
+    completes and an NPMSIOBatchError for each batch that failed (so
+    callers can retry those names).
     """
     async with aiohttp_session(config) as s:
-        group_results = await asyncio.gather(
-            *[
-                request_json(
-                    s,
-                    "POST",
-                    f"{config['base_url']}package/mget",
-                    json=[
-                        package_name
-                        for package_name in group
-                        if package_name is not None
-                    ],
-                )
-                for group in grouper(package_names, config["package_batch_size"])
-                if group is not None
-            ]
-        )
-        # NB: org/scope e.g. "@babel" in @babel/babel is flattened into the scope field.
-        # pull {data1}, {data2} from {package_name_1: {data1}, package_name_2: {data2}}
-        for group_result in group_results:
+        semaphore = asyncio.Semaphore(config["max_connections"])
+        async_query_with_backoff = backoff.on_exception(
+            backoff.expo,
+            (
+                aiohttp.ClientError,
+                aiohttp.ClientResponseError,
+                aiohttp.ContentTypeError,
+                asyncio.TimeoutError,
+            ),
+            max_tries=config["max_retries"],
+            logger=log,
+        )(request_json)
+
+        async def fetch_batch(batch: List[str]) -> Result[Dict[str, Dict]]:
+            async with semaphore:
+                try:
+                    return await async_query_with_backoff(
+                        s, "POST", f"{config['base_url']}package/mget", json=batch
+                    )
+                except Exception as err:
+                    log.error(
+                        f"error fetching npms.io scores for package names {batch}: {err}:\n{exc_to_str()}"
+                    )
+                    return NPMSIOBatchError(batch, err)
+
+        batches = [
+            [package_name for package_name in group if package_name is not None]
+            for group in grouper(package_names, config["package_batch_size"])
+        ]
+        for i, batch_result in enumerate(
+            asyncio.as_completed([fetch_batch(batch) for batch in batches if batch]),
+            start=1,
+        ):
+            group_result = await batch_result
+            log.debug(f"fetched npms.io batch {i} of {len(batches)}")
+            if isinstance(group_result, Exception):
+                yield group_result
+                continue
             if group_result is None:
                 log.warn(f"got None npms.io group for package_names {package_names}")
                 continue
 
+            # NB: org/scope e.g. "@babel" in @babel/babel is flattened into the scope field.
+            # pull {data1}, {data2} from {package_name_1: {data1}, package_name_2: {data2}}
             for result in group_result.values():
                 if result is None:
                     log.warn(
@@ -0,0 +1,291 @@
+"""
+Token bucket rate limiters for upstream API clients keyed by host.
+
+Client aiohttp sessions share one limiter per upstream host in the
+process through a trace config, so concurrent scans and tasks in a
+worker pace requests to the same host together. Limiters start at the
+client config delay and adapt their rate from Retry-After and
+rate-limit response headers.
+
+A coordinator set with set_coordinator additionally runs before each
+request (e.g. to serialize requests to a host across worker replicas
+with Postgres advisory locks).
+"""
+import asyncio
+import datetime
+import email.utils
+import logging
+import math
+import time
+from typing import Awaitable, Callable, Dict, Mapping, Optional, Tuple
+import zlib
+
+import aiohttp
+
+
+log = logging.getLogger(__name__)
+
+
+# takes a host and seconds to hold its request slot
+Coordinator = Callable[[str, float], Awaitable[None]]
+
+# RateLimit-Reset and X-RateLimit-Reset values greater than this are
+# epoch seconds (GitHub) rather than seconds from now (IETF draft)
+EPOCH_RESET_THRESHOLD_SECONDS = 1_000_000_000
+
+
+def parse_retry_after(value: Optional[str], now: float) -> Optional[float]:
+    """
+    Returns the seconds to wait from a Retry-After header value of
+    delay seconds or an HTTP date or None when it's missing or invalid
+
+    >>> parse_retry_after("120", 0)
+    120.0
+    >>> parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", 1445412470.0)
+    10.0
+    >>> parse_retry_after("soon", 0) is None
+    True
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, retry_at.timestamp() - now)
+
+
+def parse_rate_limit_headers(
+    headers: Mapping[str, str], now: float
+) -> Tuple[Optional[int], Optional[float]]:
+    """
+    Returns the requests remaining and seconds until the rate limit
+    window resets from X-RateLimit-* (e.g. GitHub) or RateLimit-*
+    headers or Nones when they're missing or invalid
+
+    >>> parse_rate_limit_headers({"X-RateLimit-Remaining": "10", "X-RateLimit-Reset": "1600000060"}, 1600000000.0)
+    (10, 60.0)
+    >>> parse_rate_limit_headers({"RateLimit-Remaining": "0", "RateLimit-Reset": "30"}, 0)
+    (0, 30.0)
+    >>> parse_rate_limit_headers({}, 0)
+    (None, None)
+    """
+    for prefix in ("X-RateLimit-", "RateLimit-"):
+        remaining, reset = headers.get(f"{prefix}Remaining"), headers.get(
+            f"{prefix}Reset"
+        )
+        if remaining is None or reset is None:
+            continue
+        try:
+            remaining_count, reset_seconds = int(remaining), float(reset)
+        except ValueError:
+            continue
+        if reset_seconds > EPOCH_RESET_THRESHOLD_SECONDS:
+            reset_seconds -= now
+        return remaining_count, max(0.0, reset_seconds)
+    return None, None
+
+
+class RateLimiter:
+    """
+    A token bucket of burst requests refilled at rate requests per
+    second. Reserves tokens without awaiting so coroutines on any
+    event loop can share it.
+
+    Adapts its rate from responses:
+
+    * pauses for Retry-After or until the rate limit window resets
+      when no requests remain
+    * spreads remaining requests over the rest of the rate limit
+      window (up to the base rate)
+    * halves its rate on 429 responses without Retry-After or rate
+      limit headers and recovers by a tenth of the base rate per
+      successful response
+    """
+
+    def __init__(
+        self,
+        host: str,
+        rate: float,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.host = host
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.clock = clock
+        # time tokens were last refilled (in the future while paused)
+        self.updated_at = clock()
+
+    def __repr__(self) -> str:
+        return f"<RateLimiter {self.host} rate={self.rate:.3f}/s burst={self.burst}>"
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(float(self.burst), self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def reserve(self) -> float:
+        """
+        Takes a token and returns the seconds to wait until it's
+        available
+        """
+        now = self.clock()
+        self._refill(now)
+        self.tokens -= 1
+        wait = max(0.0, self.updated_at - now)
+        if self.tokens < 0:
+            wait += -self.tokens / self.rate
+        return wait
+
+    async def acquire(self) -> None:
+        "waits for a token then runs the coordinator if one is set"
+        wait = self.reserve()
+        if wait > 0:
+            log.debug(f"{self} waiting {wait:.3f}s")
+            await asyncio.sleep(wait)
+        if _coordinator is not None and math.isfinite(self.rate):
+            await _coordinator(self.host, 1 / self.rate)
+
+    def restrict(self, rate: float, burst: int) -> None:
+        """
+        Lowers the base rate and burst to rate and burst when they're
+        lower, so a host limiter shared by clients configured with
+        different settings respects the strictest ones
+        """
+        burst = max(1, burst)
+        if rate >= self.base_rate and burst >= self.burst:
+            return
+        self.base_rate = min(self.base_rate, rate)
+        self.rate = min(self.rate, self.base_rate)
+        self.burst = min(self.burst, burst)
+        self.tokens = min(self.tokens, float(self.burst))
+        log.info(f"restricted {self} for a client with a lower rate or burst")
+
+    def headroom(self) -> float:
+        """
+        Returns the fraction of the base rate the limiter is running at
+        (0 while paused)
+        """
+        if self.updated_at > self.clock():
+            return 0.0
+        if math.isinf(self.rate):
+            return 1.0
+        return min(1.0, self.rate / self.base_rate)
+
+    def pause(self, seconds: float) -> None:
+        "stops refilling tokens for seconds then allows one request"
+        now = self.clock()
+        self._refill(now)
+        self.tokens = min(self.tokens, 1.0)
+        self.updated_at = max(self.updated_at, now + seconds)
+        log.info(f"{self} paused for {seconds:.3f}s")
+
+    def update_from_response(self, status: int, headers: Mapping[str, str]) -> None:
+        "adapts the rate from a response status and headers"
+        now = time.time()
+        retry_after = parse_retry_after(headers.get("Retry-After"), now)
+        if retry_after is not None:
+            self.pause(retry_after)
+
+        remaining, reset_seconds = parse_rate_limit_headers(headers, now)
+        if remaining is not None and reset_seconds is not None:
+            if remaining <= 0:
+                self.pause(reset_seconds)
+            else:
+                self.rate = min(self.base_rate, remaining / max(reset_seconds, 1.0))
+        elif status == 429 and retry_after is None:
+            self.rate = self.rate / 2 if math.isfinite(self.rate) else float(self.burst)
+            log.info(f"{self} slowed down after 429 response")
+        elif status < 400 and self.rate < self.base_rate:
+            if math.isfinite(self.base_rate):
+                self.rate = min(self.base_rate, self.rate + self.base_rate / 10)
+            else:
+                self.rate = self.rate * 1.1
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+
+_coordinator: Optional[Coordinator] = None
+
+
+def get_rate_limiter(host: str, delay: float, burst: int) -> RateLimiter:
+    """
+    Returns the process rate limiter for host creating it with a rate
+    of one request per delay seconds (unlimited for zero delay) and
+    burst tokens when it doesn't exist. Restricts an existing limiter
+    to a lower rate or burst.
+    """
+    rate = 1 / delay if delay > 0 else math.inf
+    if host not in _rate_limiters:
+        _rate_limiters[host] = RateLimiter(host, rate, burst)
+        log.debug(f"created {_rate_limiters[host]}")
+    else:
+        _rate_limiters[host].restrict(rate, burst)
+    return _rate_limiters[host]
+
+
+def set_coordinator(coordinator: Optional[Coordinator]) -> None:
+    "sets or clears (with None) the coordinator for all rate limiters"
+    global _coordinator
+    _coordinator = coordinator
+
+
+def advisory_lock_key(host: str) -> int:
+    """
+    Returns a stable Postgres advisory lock key for a host's request slot
+
+    >>> advisory_lock_key("registry.npmjs.com") == advisory_lock_key("registry.npmjs.com")
+    True
+    """
+    return zlib.crc32(f"depobs:rate_limit:{host}".encode("utf-8"))
+
+
+def rate_limit_trace_config(delay: float, burst: int) -> aiohttp.TraceConfig:
+    """
+    Returns an aiohttp trace config that waits on the rate limiter
+    for each request host and updates it from responses and response
+    errors (for sessions that raise for status)
+    """
+
+    async def on_request_start(
+        session: aiohttp.ClientSession,
+        context: object,
+        params: aiohttp.TraceRequestStartParams,
+    ) -> None:
+        await get_rate_limiter(params.url.host or "", delay, burst).acquire()
+
+    async def on_request_end(
+        session: aiohttp.ClientSession,
+        context: object,
+        params: aiohttp.TraceRequestEndParams,
+    ) -> None:
+        get_rate_limiter(params.url.host or "", delay, burst).update_from_response(
+            params.response.status, params.response.headers
+        )
+
+    async def on_request_exception(
+        session: aiohttp.ClientSession,
+        context: object,
+        params: aiohttp.TraceRequestExceptionParams,
+    ) -> None:
+        err = params.exception
+        if isinstance(err, aiohttp.ClientResponseError):
+            get_rate_limiter(params.url.host or "", delay, burst).update_from_response(
+                err.status, err.headers or {}
+            )
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
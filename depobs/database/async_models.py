@@ -0,0 +1,214 @@
+"""
+Async versions of the models functions worker tasks call most often.
+
+Runs the existing session-bound models functions on a bounded thread
+pool so DB queries and writes don't block the worker event loop and
+can overlap with HTTP fetches. Each pool thread pushes a depobs flask
+app context when it starts, so Flask-SQLAlchemy gives it its own
+scoped session (and DB connection).
+
+Model instances a function returns are expunged from the pool
+thread session with their loaded attributes and merged into the
+calling thread's session without querying the DB. Unloaded (e.g.
+deferred) attributes then load on the calling thread's session.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import logging
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    TypeVar,
+)
+
+import flask
+from flask import current_app
+import sqlalchemy
+
+from depobs.clients.rate_limit import advisory_lock_key
+import depobs.database.models as models
+
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _push_app_context(app: flask.Flask) -> None:
+    "pushes an app context for the lifetime of a pool thread"
+    app.app_context().push()
+
+
+@functools.lru_cache(maxsize=None)
+def get_db_executor(app: flask.Flask) -> ThreadPoolExecutor:
+    """
+    Returns a shared thread pool of DB_THREADS threads with app
+    contexts for the app
+    """
+    log.info(f"starting DB thread pool with {app.config['DB_THREADS']} threads")
+    return ThreadPoolExecutor(
+        max_workers=app.config["DB_THREADS"],
+        thread_name_prefix="depobs-db",
+        initializer=_push_app_context,
+        initargs=(app,),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_rate_limit_lock_executor(app: flask.Flask, host: str) -> ThreadPoolExecutor:
+    """
+    Returns a thread pool of RATE_LIMIT_ADVISORY_LOCK_THREADS threads
+    with app contexts for the app to hold the rate limit locks of one
+    upstream host
+
+    Separate from the DB pool so threads waiting on rate limit locks
+    don't block queries, and per host so a long hold for a slow host
+    (e.g. HIBP) doesn't delay requests to other hosts.
+    """
+    return ThreadPoolExecutor(
+        max_workers=app.config["RATE_LIMIT_ADVISORY_LOCK_THREADS"],
+        thread_name_prefix=f"depobs-rate-limit-{host}",
+        initializer=_push_app_context,
+        initargs=(app,),
+    )
+
+
+async def hold_rate_limit_advisory_lock(
+    app: flask.Flask, host: str, seconds: float
+) -> None:
+    """
+    Waits for and holds the Postgres advisory lock for a host's
+    request slot for seconds, so requests to the host from all worker
+    replicas are at least seconds apart.
+
+    A rate_limit coordinator (bind app with functools.partial).
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        get_rate_limit_lock_executor(app, host),
+        models.hold_advisory_xact_lock,
+        advisory_lock_key(host),
+        seconds,
+    )
+
+
+def _call_with_thread_session(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Calls fn in a pool thread and detaches the session and any
+    instances it loaded. Rolls back on error.
+    """
+    session = models.db.session()
+    # keep attributes loaded after commits for the calling thread
+    session.expire_on_commit = False
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.expunge_all()
+        models.db.session.remove()
+
+
+def _merge(result: Any) -> Any:
+    "merges persistent detached model instances into the current session"
+    if isinstance(result, models.db.Model):
+        if sqlalchemy.inspect(result).has_identity:
+            return models.db.session.merge(result, load=False)
+        return result
+    if isinstance(result, list):
+        return [_merge(item) for item in result]
+    return result
+
+
+async def run_in_db_thread(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Runs a models function with args in a DB pool thread and returns
+    its result with model instances attached to the current session.
+
+    Don't pass instances attached to the current session as args (the
+    pool thread session can't add them).
+
+    Requires depobs flask app context.
+    """
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        get_db_executor(current_app._get_current_object()),  # type: ignore
+        functools.partial(_call_with_thread_session, fn, *args, **kwargs),
+    )
+    return _merge(result)
+
+
+def _first_scan_with_status(status: models.ScanStatusEnum) -> Optional[models.Scan]:
+    return models.get_next_scan_with_status_query(status).first()
+
+
+async def get_next_scan_with_status(
+    status: models.ScanStatusEnum,
+) -> Optional[models.Scan]:
+    return await run_in_db_thread(_first_scan_with_status, status)
+
+
+def _count_scan_completed_jobs(scan_id: int) -> int:
+    return models.get_scan_completed_jobs_query(scan_id).count()
+
+
+async def get_scan_completed_jobs_count(scan_id: int) -> int:
+    return await run_in_db_thread(_count_scan_completed_jobs, scan_id)
+
+
+def _save_scan_id_with_status(
+    scan_id: int, status: models.ScanStatusEnum
+) -> models.Scan:
+    return models.save_scan_with_status(models.get_scan_by_id(scan_id).one(), status)
+
+
+async def save_scan_with_status(
+    scan: models.Scan, status: models.ScanStatusEnum
+) -> models.Scan:
+    """
+    Saves the scan's status and returns the scan (updated in the
+    current session).
+    """
+    return await run_in_db_thread(_save_scan_id_with_status, scan.id, status)
+
+
+async def save_deserialized(deserialized: Any, graph_stats: bool = False) -> None:
+    """
+    Saves a model from serializers.deserialize_scan_job_results. Sets
+    IDs on saved PackageGraphs.
+
+    Bounds graph stats work by the GRAPH_STATS_MAX_WORK config like
+    save_next_graph_stats.
+    """
+    await run_in_db_thread(
+        models.save_deserialized,
+        deserialized,
+        graph_stats,
+        current_app.config["GRAPH_STATS_MAX_WORK"],
+    )
+
+
+async def save_json_results(json_results: List[Dict]) -> None:
+    await run_in_db_thread(models.save_json_results, json_results)
+
+
+async def insert_npmsio_scores(npmsio_scores: Iterable[models.NPMSIOScore]) -> None:
+    await run_in_db_thread(models.insert_npmsio_scores, list(npmsio_scores))
+
+
+async def insert_npm_registry_entries(
+    entries: Iterable[models.NPMRegistryEntry],
+) -> None:
+    await run_in_db_thread(models.insert_npm_registry_entries, list(entries))
+
+
+async def save_package_report_records(
+    records: List[models.PackageReportRecord],
+) -> Dict[models.PackageVersionID, int]:
+    return await run_in_db_thread(models.save_package_report_records, records)
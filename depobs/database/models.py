@@ -1,5 +1,6 @@
 import datetime
 from functools import cached_property
+import io
 import logging
 from typing import (
     AbstractSet,
@@ -8,6 +9,7 @@ from typing import (
     Generator,
     Iterable,
     List,
+    Mapping,
     Optional,
     Set,
     Tuple,
@@ -18,6 +20,7 @@ from urllib.parse import urlsplit, urlunsplit
 
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+import prometheus_client
 import sqlalchemy
 from sqlalchemy import (
     Boolean,
@@ -37,13 +40,19 @@ from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import case, expression, func
 from sqlalchemy.ext.declarative import declared_attr
-from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, insert as pg_insert
 from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.types import DateTime
 from sqlalchemy import func
 
 from depobs.database.enums import LanguageEnum, PackageManagerEnum, ScanStatusEnum
 from depobs.database.schemas import PackageReportSchema
+from depobs.util.compact_graph import (
+    CompactCondensation,
+    CompactGraph,
+    get_graph_stats,
+)
+from depobs.util.serialize_util import parse_npm_humans
 from depobs.website.schemas import JobParamsSchema
 
 
@@ -53,6 +62,15 @@ log = logging.getLogger(__name__)
 db: SQLAlchemy = SQLAlchemy()
 migrate = Migrate()
 
+SCAN_STATUS_CHANGES = prometheus_client.Counter(
+    "depobs_scan_status_changes_total",
+    "Scans saved with a new status by status.",
+    ["status"],
+)
+JSON_RESULTS_SAVED = prometheus_client.Counter(
+    "depobs_json_results_saved_total", "JSONResults saved."
+)
+
 # define type aliases to make ints distinguishable in type annotations
 PackageLinkID = int
 PackageVersionID = int
@@ -107,6 +125,10 @@ class PackageReport(db.Model):
     immediate_deps = Column(Integer)
     all_deps = Column(Integer)
     graph_id = Column(Integer, nullable=True)
+    maintainer_breaches = Column(Integer)
+    breached_maintainers = Column(Integer)
+    all_maintainer_breaches = Column(Integer)
+    all_breached_maintainers = Column(Integer)
 
     @staticmethod
     def score_vulns(
@@ -269,6 +291,62 @@ class PackageReport(db.Model):
         return PackageReportSchema().dump(self)
 
 
+# PackageReport columns to insert (the DB assigns report IDs)
+PACKAGE_REPORT_COLUMN_NAMES: Tuple[str, ...] = tuple(
+    column.key for column in PackageReport.__table__.columns if column.key != "id"
+)
+
+
+class PackageReportRecord:
+    """
+    A PackageReport row without SQLAlchemy instrumentation for bulk
+    inserts with save_package_report_records. Unset columns are None.
+
+    Also has the ID of the package version it reports on and the
+    package version IDs of its direct dependencies (to save as
+    Dependency rows).
+
+    >>> record = PackageReportRecord(package_version_id=2, dependency_package_version_ids=[3], package="foo", all_deps=1)
+    >>> record.package, record.version, record.to_row()["all_deps"]
+    ('foo', None, 1)
+    >>> PackageReportRecord(package_version_id=2, not_a_column=1)
+    Traceback (most recent call last):
+    ...
+    TypeError: unexpected PackageReport columns ['not_a_column']
+    """
+
+    __slots__ = PACKAGE_REPORT_COLUMN_NAMES + (
+        "package_version_id",
+        "dependency_package_version_ids",
+    )
+
+    # PackageReport columns read outside the class
+    package: Optional[str]
+    version: Optional[str]
+
+    def __init__(
+        self,
+        package_version_id: Optional[PackageVersionID],
+        dependency_package_version_ids: Iterable[PackageVersionID] = (),
+        **column_values: Any,
+    ):
+        self.package_version_id = package_version_id
+        self.dependency_package_version_ids: List[PackageVersionID] = list(
+            dependency_package_version_ids
+        )
+        for name in PACKAGE_REPORT_COLUMN_NAMES:
+            setattr(self, name, column_values.pop(name, None))
+        if column_values:
+            raise TypeError(f"unexpected PackageReport columns {list(column_values)}")
+
+    def to_row(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in PACKAGE_REPORT_COLUMN_NAMES}
+
+    def to_package_report(self) -> PackageReport:
+        "Returns a PackageReport without dependencies"
+        return PackageReport(**self.to_row())
+
+
 class PackageVersion(db.Model):
     __tablename__ = "package_versions"
 
@@ -378,19 +456,37 @@ class PackageGraph(db.Model):
     # track when it was inserted
     inserted_at = deferred(Column(DateTime(timezone=False), server_default=utcnow()))
 
+    # SCC condensation and stats computed when the graph was saved (if any)
+    condensation = relationship(
+        "PackageGraphCondensation",
+        primaryjoin="PackageGraph.id == foreign(PackageGraphCondensation.graph_id)",
+        uselist=False,
+        viewonly=True,
+    )
+
     @cached_property
     def package_links_by_id(
         self,
     ) -> Dict[PackageLinkID, Tuple[PackageVersionID, PackageVersionID]]:
+        if self.id is None:
+            # unsaved graphs can't be unnested in the DB so look up
+            # their link_ids
+            links_query = db.session.query(
+                PackageLink.id,
+                PackageLink.parent_package_id,
+                PackageLink.child_package_id,
+            ).filter(PackageLink.id.in_(self.link_ids))
+        else:
+            links_query = get_graph_links_query(self.id)
         return {
-            link.id: (link.parent_package_id, link.child_package_id)
-            for link in db.session.query(PackageLink).filter(
-                PackageLink.id.in_(self.link_ids)
-            )
+            link_id: (parent_package_id, child_package_id)
+            for link_id, parent_package_id, child_package_id in links_query
         }
 
     @cached_property
     def distinct_package_ids(self) -> Set[PackageVersionID]:
+        # NB: uses the (id, parent, child) tuples from package_links_by_id
+        # so it doesn't load PackageLinks
         return set(
             [
                 package_id
@@ -465,6 +561,55 @@ class PackageGraph(db.Model):
             for package_version in self.distinct_package_versions_by_id.values()
         }
 
+    def get_maintainer_emails_by_package_version_id(
+        self,
+    ) -> Dict[PackageVersionID, List[str]]:
+        """
+        Returns the maintainer emails of the latest npm registry entry
+        for each package version with maintainers with emails
+        """
+        ids_by_name_and_version = {
+            (package_version.name, package_version.version): package_version.id
+            for package_version in self.distinct_package_versions_by_id.values()
+        }
+        if not ids_by_name_and_version:
+            return {}
+        emails_by_package_version_id: Dict[PackageVersionID, List[str]] = {}
+        for name, version, email in get_npm_registry_maintainer_emails_query(
+            ids_by_name_and_version.keys()
+        ):
+            emails_by_package_version_id.setdefault(
+                ids_by_name_and_version[(name, version)], []
+            ).append(email)
+        return emails_by_package_version_id
+
+    def get_maintainer_breaches_by_package_version_id(
+        self,
+    ) -> Dict[PackageVersionID, Dict[str, int]]:
+        """
+        Returns HIBP breach counts by maintainer email for each package
+        version with at least one maintainer email in the HIBP account
+        cache
+        """
+        # not cached since it can change as accounts are fetched
+        emails_by_package_version_id = (
+            self.get_maintainer_emails_by_package_version_id()
+        )
+        breach_counts_by_email = get_hibp_account_breach_counts(
+            email
+            for emails in emails_by_package_version_id.values()
+            for email in emails
+        )
+        return {
+            package_version_id: {
+                email: breach_counts_by_email[email]
+                for email in emails
+                if email in breach_counts_by_email
+            }
+            for package_version_id, emails in emails_by_package_version_id.items()
+            if any(email in breach_counts_by_email for email in emails)
+        }
+
     def get_advisories_by_package_version_id(
         self,
     ) -> Dict[PackageVersionID, List["Advisory"]]:
@@ -498,6 +643,92 @@ class PackageGraph(db.Model):
         )
 
 
+class PackageGraphCondensation(db.Model):
+    """
+    The SCCs and basic stats of a PackageGraph.
+
+    Computed once when the graph is saved since graphs don't change
+    after insert. Array columns are by CompactGraph node index i.e.
+    package version IDs sorted ascending.
+
+    Levels and descendants are recomputed from the saved SCCs in one
+    pass when loading the condensation for scoring, so they aren't
+    saved.
+    """
+
+    __tablename__ = "package_graph_condensations"
+
+    graph_id = Column(Integer, primary_key=True)  # ForeignKey("package_graphs.id")
+
+    # package version IDs by node index
+    node_ids = deferred(Column(ARRAY(Integer)))
+    # SCC index by node index with SCCs in reverse topological order
+    scc_ids = deferred(Column(ARRAY(Integer)))
+
+    node_count = Column(Integer, nullable=False)
+    edge_count = Column(Integer, nullable=False)
+    scc_count = Column(Integer, nullable=False)
+    # number of topological levels of the condensation
+    depth = Column(Integer, nullable=False)
+
+    # stats from compact_graph.get_graph_stats (NULL until computed)
+    stats = Column(JSONB)
+
+    # track when it was inserted
+    inserted_at = deferred(Column(DateTime(timezone=False), server_default=utcnow()))
+
+    @classmethod
+    def from_compact_graph(
+        cls,
+        graph_id: int,
+        g: CompactGraph,
+        c: Optional[CompactCondensation] = None,
+        with_stats: bool = True,
+        max_work: Optional[int] = None,
+    ) -> "PackageGraphCondensation":
+        if c is None:
+            c = g.condensation()
+        return cls(
+            graph_id=graph_id,
+            node_ids=list(g.node_ids),
+            scc_ids=list(c.scc_by_index),
+            node_count=g.number_of_nodes(),
+            edge_count=g.number_of_edges(),
+            scc_count=c.scc_count,
+            depth=c.depth(),
+            stats=get_graph_stats(g, c, max_work) if with_stats else None,
+        )
+
+    def get_scc_ids(self, g: CompactGraph) -> Optional[List[int]]:
+        """
+        Returns the saved SCC indices by node index of g or None when
+        g has different nodes
+        """
+        if list(g.node_ids) != list(self.node_ids or []):
+            log.warning(
+                f"graph {self.graph_id} nodes do not match its saved condensation"
+            )
+            return None
+        return list(self.scc_ids)
+
+    def to_compact_condensation(self, g: CompactGraph) -> Optional[CompactCondensation]:
+        """
+        Returns the CompactCondensation of g using the saved SCC
+        indices or None when g has different nodes
+        """
+        scc_ids = self.get_scc_ids(g)
+        if scc_ids is None:
+            return None
+        return CompactCondensation(g, scc_by_index=scc_ids)
+
+    @declared_attr
+    def __table_args__(cls) -> Iterable[Index]:
+        return (
+            Index(f"{cls.__tablename__}_node_count_idx", "node_count"),
+            Index(f"{cls.__tablename__}_depth_idx", "depth"),
+        )
+
+
 class Advisory(db.Model):
     __tablename__ = "advisories"
 
@@ -746,6 +977,12 @@ class NPMRegistryEntry(db.Model):
     # array of human objects
     contributors = deferred(Column(JSONB, nullable=True))
 
+    # number of distinct maintainer and contributor people (see
+    # NPMPerson) for scoring without loading the JSON (None when the
+    # field is missing)
+    maintainers_count = Column(Integer, nullable=True)
+    contributors_count = Column(Integer, nullable=True)
+
     # publication info
     # _npmUser: the author object for the npm user who published this version
     # e.g. {'name': 'mathieu', 'email': 'turcotte.mat@gmail.com'}
@@ -844,6 +1081,140 @@ class NPMRegistryEntry(db.Model):
         )
 
 
+class NPMPerson(db.Model):
+    """
+    A distinct person from npm registry entry maintainers and
+    contributors identified by their lowercased email or name when
+    they have no email (see serialize_util.parse_npm_human)
+    """
+
+    __tablename__ = "npm_people"
+
+    id = Column(Integer, Sequence("npm_person_id_seq"), primary_key=True)
+    key = Column(String, nullable=False, unique=True)
+    # name, email, and url when first saved
+    name = Column(String, nullable=True)
+    email = Column(String, nullable=True)
+    url = Column(String, nullable=True)
+
+    inserted_at = deferred(Column(DateTime(timezone=False), server_default=utcnow()))
+
+    @declared_attr
+    def __table_args__(cls) -> Iterable[Index]:
+        return (Index(f"{cls.__tablename__}_email_idx", "email"),)
+
+
+class NPMRegistryEntryPerson(db.Model):
+    """
+    Links an npm registry entry (i.e. package version) to the people
+    in its maintainers and contributors
+    """
+
+    __tablename__ = "npm_registry_entry_people"
+
+    entry_id = Column(
+        Integer, primary_key=True
+    )  # ForeignKey("npm_registry_entries.id")
+    person_id = Column(Integer, primary_key=True)  # ForeignKey("npm_people.id")
+    # 'maintainer' or 'contributor'
+    role = Column(String, primary_key=True)
+
+    @declared_attr
+    def __table_args__(cls) -> Iterable[Index]:
+        return (Index(f"{cls.__tablename__}_person_id_idx", "person_id", "role"),)
+
+
+class NPMPackageNotFound(db.Model):
+    """
+    Package names an upstream API returned no data for, to skip
+    refetching them until checked_at is older than NPM_NOT_FOUND_TTL_SECONDS
+    """
+
+    __tablename__ = "npm_package_not_found"
+
+    package_name = Column(String, primary_key=True)
+    # upstream API e.g. 'npm_registry' or 'npmsio'
+    source = Column(String, primary_key=True)
+    # when the upstream API last returned no data for the package name
+    checked_at = Column(
+        DateTime(timezone=False), server_default=utcnow(), nullable=False
+    )
+
+
+class NPMPackageFetch(db.Model):
+    """
+    When npm data for a package name was last fetched from an upstream
+    API and the response ETag for conditional requests
+    """
+
+    __tablename__ = "npm_package_fetches"
+
+    package_name = Column(String, primary_key=True)
+    # upstream API e.g. 'npm_registry' or 'npmsio'
+    source = Column(String, primary_key=True)
+    fetched_at = Column(
+        DateTime(timezone=False), server_default=utcnow(), nullable=False
+    )
+    # ETag response header from the last fetch (if the upstream returned one)
+    etag = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("npm_package_fetches_source_fetched_at_idx", source, fetched_at),
+    )
+
+
+class TaskCheckpoint(db.Model):
+    """
+    Progress of an incremental or resumable background task (e.g. the
+    latest upstream updatedAt it synced) so the next run continues
+    from it
+    """
+
+    __tablename__ = "task_checkpoints"
+
+    name = Column(String, primary_key=True)
+    state = Column(JSONB, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=False), server_default=utcnow(), nullable=False
+    )
+
+
+class HIBPBreach(db.Model):
+    """
+    The HIBP breach catalog from the all breaches endpoint, so breach
+    details for account breach names are local lookups until fetched_at
+    is older than HIBP_BREACH_CATALOG_TTL_SECONDS
+    """
+
+    __tablename__ = "hibp_breaches"
+
+    # HIBP breach Name e.g. 'Adobe'
+    name = Column(String, primary_key=True)
+    # HIBP BreachDate e.g. '2013-10-04'
+    breach_date = Column(String, nullable=True)
+    # the full HIBP breach model
+    data = Column(JSONB, nullable=False)
+    fetched_at = Column(
+        DateTime(timezone=False), server_default=utcnow(), nullable=False
+    )
+
+
+class HIBPAccountBreaches(db.Model):
+    """
+    HIBP breach names for an email account, to skip refetching them
+    until fetched_at is older than HIBP_ACCOUNT_CACHE_TTL_SECONDS
+    """
+
+    __tablename__ = "hibp_account_breaches"
+
+    email = Column(String, primary_key=True)
+    # empty for accounts HIBP has no breaches for
+    breach_names = Column(ARRAY(String), nullable=False)
+    fetched_at = Column(
+        DateTime(timezone=False), server_default=utcnow(), nullable=False
+    )
+
+
 class JSONResult(db.Model):
     """
     A table to cache or sample results from HTTP clients and scan jobs
@@ -860,6 +1231,11 @@ class JSONResult(db.Model):
 
     url = Column(String)
 
+    __table_args__ = (
+        # GitHub advisory IDs to mark saved advisories withdrawn
+        Index("json_results_data_id_idx", data["id"].astext),
+    )
+
 
 class Scan(db.Model):
     """
@@ -889,6 +1265,10 @@ class Scan(db.Model):
     # resulting scan graph ids
     graph_ids = Column(ARRAY(Integer), nullable=True)
 
+    # terminal k8s job states by job name from the scan job watcher
+    # e.g. {"scan-1-pkg-a": {"status": "failed", "reason": "BackoffLimitExceeded", ...}}
+    job_statuses = Column(JSONB, nullable=True)
+
     @cached_property
     def name(
         self,
@@ -965,11 +1345,11 @@ class Scan(db.Model):
         ...     non_latest_version = str(Scan(params={"name": "scan_score_npm_package", "args": ["test-pkg-name", "0.0.0"]}).get_npm_registry_entries())
 
         >>> name_only
-        'SELECT npm_registry_entries.id AS npm_registry_entries_id, npm_registry_entries.package_name AS npm_registry_entries_package_name, npm_registry_entries.package_version AS npm_registry_entries_package_version, npm_registry_entries.shasum AS npm_registry_entries_shasum, npm_registry_entries.tarball AS npm_registry_entries_tarball, npm_registry_entries.has_shrinkwrap AS npm_registry_entries_has_shrinkwrap, npm_registry_entries.published_at AS npm_registry_entries_published_at, npm_registry_entries.package_modified_at AS npm_registry_entries_package_modified_at, npm_registry_entries.source_url AS npm_registry_entries_source_url \\nFROM npm_registry_entries \\nWHERE npm_registry_entries.package_name = %(package_name_1)s ORDER BY npm_registry_entries.published_at DESC'
+        'SELECT npm_registry_entries.id AS npm_registry_entries_id, npm_registry_entries.package_name AS npm_registry_entries_package_name, npm_registry_entries.package_version AS npm_registry_entries_package_version, npm_registry_entries.shasum AS npm_registry_entries_shasum, npm_registry_entries.tarball AS npm_registry_entries_tarball, npm_registry_entries.has_shrinkwrap AS npm_registry_entries_has_shrinkwrap, npm_registry_entries.maintainers_count AS npm_registry_entries_maintainers_count, npm_registry_entries.contributors_count AS npm_registry_entries_contributors_count, npm_registry_entries.published_at AS npm_registry_entries_published_at, npm_registry_entries.package_modified_at AS npm_registry_entries_package_modified_at, npm_registry_entries.source_url AS npm_registry_entries_source_url \\nFROM npm_registry_entries \\nWHERE npm_registry_entries.package_name = %(package_name_1)s ORDER BY npm_registry_entries.published_at DESC'
         >>> name_only == latest_version
         True
         >>> non_latest_version
-        'SELECT npm_registry_entries.id AS npm_registry_entries_id, npm_registry_entries.package_name AS npm_registry_entries_package_name, npm_registry_entries.package_version AS npm_registry_entries_package_version, npm_registry_entries.shasum AS npm_registry_entries_shasum, npm_registry_entries.tarball AS npm_registry_entries_tarball, npm_registry_entries.has_shrinkwrap AS npm_registry_entries_has_shrinkwrap, npm_registry_entries.published_at AS npm_registry_entries_published_at, npm_registry_entries.package_modified_at AS npm_registry_entries_package_modified_at, npm_registry_entries.source_url AS npm_registry_entries_source_url \\nFROM npm_registry_entries \\nWHERE npm_registry_entries.package_name = %(package_name_1)s AND npm_registry_entries.package_version = %(package_version_1)s ORDER BY npm_registry_entries.published_at DESC'
+        'SELECT npm_registry_entries.id AS npm_registry_entries_id, npm_registry_entries.package_name AS npm_registry_entries_package_name, npm_registry_entries.package_version AS npm_registry_entries_package_version, npm_registry_entries.shasum AS npm_registry_entries_shasum, npm_registry_entries.tarball AS npm_registry_entries_tarball, npm_registry_entries.has_shrinkwrap AS npm_registry_entries_has_shrinkwrap, npm_registry_entries.maintainers_count AS npm_registry_entries_maintainers_count, npm_registry_entries.contributors_count AS npm_registry_entries_contributors_count, npm_registry_entries.published_at AS npm_registry_entries_published_at, npm_registry_entries.package_modified_at AS npm_registry_entries_package_modified_at, npm_registry_entries.source_url AS npm_registry_entries_source_url \\nFROM npm_registry_entries \\nWHERE npm_registry_entries.package_name = %(package_name_1)s AND npm_registry_entries.package_version = %(package_version_1)s ORDER BY npm_registry_entries.published_at DESC'
         """
         package_name: str = self.package_name
         package_version: Optional[str] = self.package_version
@@ -1023,6 +1403,33 @@ class Scan(db.Model):
         """
         return datetime.datetime.utcnow() - self.updated_at
 
+    def get_failed_job_statuses(
+        self, grace_period: datetime.timedelta
+    ) -> Dict[str, Dict[str, str]]:
+        """
+        Returns failed job statuses for the scan jobs by job name
+        recorded more than grace_period ago (to give results
+        published before the job failed time to arrive)
+
+        >>> from depobs.website.do import create_app
+        >>> with create_app().app_context():
+        ...     Scan(job_names=["a", "b", "c"], job_statuses={
+        ...         "a": {"status": "failed", "reason": "BackoffLimitExceeded", "message": "", "recorded_at": "2020-01-01T00:00:00"},
+        ...         "b": {"status": "succeeded", "reason": "Complete", "message": "", "recorded_at": "2020-01-01T00:00:00"},
+        ...         "c": {"status": "failed", "reason": "ErrImagePull", "message": "", "recorded_at": datetime.datetime.utcnow().isoformat()},
+        ...         "other": {"status": "failed", "reason": "ErrImagePull", "message": "", "recorded_at": "2020-01-01T00:00:00"},
+        ...     }).get_failed_job_statuses(datetime.timedelta(seconds=30))
+        {'a': {'status': 'failed', 'reason': 'BackoffLimitExceeded', 'message': '', 'recorded_at': '2020-01-01T00:00:00'}}
+        """
+        cutoff = datetime.datetime.utcnow() - grace_period
+        return {
+            job_name: job_status
+            for job_name, job_status in (self.job_statuses or {}).items()
+            if job_name in (self.job_names or [])
+            and job_status["status"] == "failed"
+            and datetime.datetime.fromisoformat(job_status["recorded_at"]) <= cutoff
+        }
+
 
 def get_package_report(
     package: str, version: Optional[str] = None
@@ -1050,7 +1457,7 @@ def get_package_score_reports(
     >>> from depobs.website.do import create_app
     >>> with create_app().app_context():
     ...     str(get_package_score_reports([PackageVersion(name="foo", version="0.0.1"), PackageVersion(name="bar", version="0.1.1"),]))
-    'SELECT reports.id AS reports_id, reports.package AS reports_package, reports.version AS reports_version, reports.release_date AS reports_release_date, reports.scoring_date AS reports_scoring_date, reports.npmsio_score AS reports_npmsio_score, reports.npmsio_scored_package_version AS reports_npmsio_scored_package_version, reports."directVulnsCritical_score" AS "reports_directVulnsCritical_score", reports."directVulnsHigh_score" AS "reports_directVulnsHigh_score", reports."directVulnsMedium_score" AS "reports_directVulnsMedium_score", reports."directVulnsLow_score" AS "reports_directVulnsLow_score", reports."indirectVulnsCritical_score" AS "reports_indirectVulnsCritical_score", reports."indirectVulnsHigh_score" AS "reports_indirectVulnsHigh_score", reports."indirectVulnsMedium_score" AS "reports_indirectVulnsMedium_score", reports."indirectVulnsLow_score" AS "reports_indirectVulnsLow_score", reports.authors AS reports_authors, reports.contributors AS reports_contributors, reports.immediate_deps AS reports_immediate_deps, reports.all_deps AS reports_all_deps, reports.graph_id AS reports_graph_id \\nFROM reports \\nWHERE (reports.package, reports.version) IN ((%(param_1)s, %(param_2)s), (%(param_3)s, %(param_4)s))'
+    'SELECT reports.id AS reports_id, reports.package AS reports_package, reports.version AS reports_version, reports.release_date AS reports_release_date, reports.scoring_date AS reports_scoring_date, reports.npmsio_score AS reports_npmsio_score, reports.npmsio_scored_package_version AS reports_npmsio_scored_package_version, reports."directVulnsCritical_score" AS "reports_directVulnsCritical_score", reports."directVulnsHigh_score" AS "reports_directVulnsHigh_score", reports."directVulnsMedium_score" AS "reports_directVulnsMedium_score", reports."directVulnsLow_score" AS "reports_directVulnsLow_score", reports."indirectVulnsCritical_score" AS "reports_indirectVulnsCritical_score", reports."indirectVulnsHigh_score" AS "reports_indirectVulnsHigh_score", reports."indirectVulnsMedium_score" AS "reports_indirectVulnsMedium_score", reports."indirectVulnsLow_score" AS "reports_indirectVulnsLow_score", reports.authors AS reports_authors, reports.contributors AS reports_contributors, reports.immediate_deps AS reports_immediate_deps, reports.all_deps AS reports_all_deps, reports.graph_id AS reports_graph_id, reports.maintainer_breaches AS reports_maintainer_breaches, reports.breached_maintainers AS reports_breached_maintainers, reports.all_maintainer_breaches AS reports_all_maintainer_breaches, reports.all_breached_maintainers AS reports_all_breached_maintainers \\nFROM reports \\nWHERE (reports.package, reports.version) IN ((%(param_1)s, %(param_2)s), (%(param_3)s, %(param_4)s))'
     """
     return db.session.query(PackageReport).filter(
         sqlalchemy.sql.expression.tuple_(
@@ -1070,7 +1477,7 @@ def get_most_recently_scored_package_report_query(
     >>> from depobs.website.do import create_app
     >>> with create_app().app_context():
     ...     str(get_most_recently_scored_package_report_query("foo", "0.0.1"))
-    'SELECT reports.id AS reports_id, reports.package AS reports_package, reports.version AS reports_version, reports.release_date AS reports_release_date, reports.scoring_date AS reports_scoring_date, reports.npmsio_score AS reports_npmsio_score, reports.npmsio_scored_package_version AS reports_npmsio_scored_package_version, reports."directVulnsCritical_score" AS "reports_directVulnsCritical_score", reports."directVulnsHigh_score" AS "reports_directVulnsHigh_score", reports."directVulnsMedium_score" AS "reports_directVulnsMedium_score", reports."directVulnsLow_score" AS "reports_directVulnsLow_score", reports."indirectVulnsCritical_score" AS "reports_indirectVulnsCritical_score", reports."indirectVulnsHigh_score" AS "reports_indirectVulnsHigh_score", reports."indirectVulnsMedium_score" AS "reports_indirectVulnsMedium_score", reports."indirectVulnsLow_score" AS "reports_indirectVulnsLow_score", reports.authors AS reports_authors, reports.contributors AS reports_contributors, reports.immediate_deps AS reports_immediate_deps, reports.all_deps AS reports_all_deps, reports.graph_id AS reports_graph_id \\nFROM reports \\nWHERE reports.package = %(package_1)s AND reports.version = %(version_1)s ORDER BY reports.scoring_date DESC \\n LIMIT %(param_1)s'
+    'SELECT reports.id AS reports_id, reports.package AS reports_package, reports.version AS reports_version, reports.release_date AS reports_release_date, reports.scoring_date AS reports_scoring_date, reports.npmsio_score AS reports_npmsio_score, reports.npmsio_scored_package_version AS reports_npmsio_scored_package_version, reports."directVulnsCritical_score" AS "reports_directVulnsCritical_score", reports."directVulnsHigh_score" AS "reports_directVulnsHigh_score", reports."directVulnsMedium_score" AS "reports_directVulnsMedium_score", reports."directVulnsLow_score" AS "reports_directVulnsLow_score", reports."indirectVulnsCritical_score" AS "reports_indirectVulnsCritical_score", reports."indirectVulnsHigh_score" AS "reports_indirectVulnsHigh_score", reports."indirectVulnsMedium_score" AS "reports_indirectVulnsMedium_score", reports."indirectVulnsLow_score" AS "reports_indirectVulnsLow_score", reports.authors AS reports_authors, reports.contributors AS reports_contributors, reports.immediate_deps AS reports_immediate_deps, reports.all_deps AS reports_all_deps, reports.graph_id AS reports_graph_id, reports.maintainer_breaches AS reports_maintainer_breaches, reports.breached_maintainers AS reports_breached_maintainers, reports.all_maintainer_breaches AS reports_all_maintainer_breaches, reports.all_breached_maintainers AS reports_all_breached_maintainers \\nFROM reports \\nWHERE reports.package = %(package_1)s AND reports.version = %(version_1)s ORDER BY reports.scoring_date DESC \\n LIMIT %(param_1)s'
 
     """
     query = db.session.query(PackageReport).filter_by(package=package_name)
@@ -1107,6 +1514,89 @@ def get_graph_by_id(graph_id: int) -> PackageGraph:
     return db.session.query(PackageGraph).filter_by(id=graph_id).one()
 
 
+def get_graph_condensation(graph_id: int) -> Optional[PackageGraphCondensation]:
+    return (
+        db.session.query(PackageGraphCondensation)
+        .filter_by(graph_id=graph_id)
+        .one_or_none()
+    )
+
+
+def save_graph_condensation(
+    graph_id: int,
+    g: CompactGraph,
+    with_stats: bool = False,
+    max_work: Optional[int] = None,
+) -> PackageGraphCondensation:
+    """
+    Computes and adds the condensation of a saved PackageGraph to the
+    session. Only computes stats when with_stats is True (otherwise
+    save_next_graph_stats fills them in later).
+    """
+    condensation = PackageGraphCondensation.from_compact_graph(
+        graph_id, g, with_stats=with_stats, max_work=max_work
+    )
+    db.session.add(condensation)
+    log.info(
+        f"graph {graph_id} has {condensation.node_count} nodes, {condensation.edge_count} edges, {condensation.scc_count} SCCs, and depth {condensation.depth}"
+    )
+    return condensation
+
+
+def get_graph_ids_missing_stats_query(
+    exclude_graph_ids: Iterable[int] = (),
+) -> sqlalchemy.orm.query.Query:
+    """
+    Returns a query for the IDs of graphs without a saved condensation
+    or condensation stats from most to least recently inserted
+    skipping graph IDs to exclude (e.g. ones that failed recently):
+
+    >>> from depobs.website.do import create_app
+    >>> with create_app().app_context():
+    ...     str(get_graph_ids_missing_stats_query())
+    'SELECT package_graphs.id AS package_graphs_id \\nFROM package_graphs LEFT OUTER JOIN package_graph_condensations ON package_graphs.id = package_graph_condensations.graph_id \\nWHERE package_graph_condensations.graph_id IS NULL OR package_graph_condensations.stats IS NULL ORDER BY package_graphs.id DESC'
+
+    >>> with create_app().app_context():
+    ...     str(get_graph_ids_missing_stats_query([2, 3]))
+    'SELECT package_graphs.id AS package_graphs_id \\nFROM package_graphs LEFT OUTER JOIN package_graph_condensations ON package_graphs.id = package_graph_condensations.graph_id \\nWHERE (package_graph_condensations.graph_id IS NULL OR package_graph_condensations.stats IS NULL) AND package_graphs.id NOT IN (%(id_1)s, %(id_2)s) ORDER BY package_graphs.id DESC'
+    """
+    query = db.session.query(PackageGraph.id).outerjoin(
+        PackageGraphCondensation,
+        PackageGraph.id == PackageGraphCondensation.graph_id,
+    )
+    query = query.filter(
+        (PackageGraphCondensation.graph_id == None)
+        | (PackageGraphCondensation.stats == None)
+    )
+    exclude_graph_ids = list(exclude_graph_ids)
+    if exclude_graph_ids:
+        query = query.filter(PackageGraph.id.notin_(exclude_graph_ids))
+    return query.order_by(PackageGraph.id.desc())
+
+
+def get_graph_links_query(graph_id: int) -> sqlalchemy.orm.query.Query:
+    """
+    Returns a query for (link id, parent package version id, child
+    package version id) tuples of the links in a PackageGraph.
+
+    Unnests the graph link_ids in the DB instead of sending them as
+    bound params and selects columns instead of PackageLink models.
+
+    >>> from depobs.website.do import create_app
+    >>> with create_app().app_context():
+    ...     str(get_graph_links_query(5))
+    'SELECT package_links.id AS package_links_id, package_links.parent_package_id AS package_links_parent_package_id, package_links.child_package_id AS package_links_child_package_id \\nFROM package_links JOIN (SELECT unnest(package_graphs.link_ids) AS link_id \\nFROM package_graphs \\nWHERE package_graphs.id = %(id_1)s) AS anon_1 ON package_links.id = anon_1.link_id'
+    """
+    graph_link_ids = (
+        db.session.query(func.unnest(PackageGraph.link_ids).label("link_id"))
+        .filter(PackageGraph.id == graph_id)
+        .subquery()
+    )
+    return db.session.query(
+        PackageLink.id, PackageLink.parent_package_id, PackageLink.child_package_id
+    ).join(graph_link_ids, PackageLink.id == graph_link_ids.c.link_id)
+
+
 def get_latest_graph_including_package_as_parent(
     package: PackageVersion,
 ) -> Optional[PackageGraph]:
@@ -1190,21 +1680,56 @@ def get_npmsio_score_query(
     return query
 
 
-def get_package_names_with_missing_npmsio_scores() -> sqlalchemy.orm.query.Query:
+def _filter_not_found_package_names(
+    query: sqlalchemy.orm.query.Query,
+    source: str,
+    not_found_ttl: Optional[datetime.timedelta],
+) -> sqlalchemy.orm.query.Query:
+    "filters out package names source returned no data for within not_found_ttl"
+    if not_found_ttl is None:
+        return query
+    return query.filter(
+        ~sqlalchemy.exists().where(
+            sqlalchemy.and_(
+                NPMPackageNotFound.package_name == PackageVersion.name,
+                NPMPackageNotFound.source == source,
+                NPMPackageNotFound.checked_at
+                > datetime.datetime.utcnow() - not_found_ttl,
+            )
+        )
+    )
+
+
+def get_package_names_with_missing_npmsio_scores(
+    not_found_ttl: Optional[datetime.timedelta] = None,
+    exclude_names: Iterable[str] = (),
+) -> sqlalchemy.orm.query.Query:
     """
-    Returns PackageVersion names not in npmsio_scores.
+    Returns PackageVersion names not in npmsio_scores. Excludes names
+    npms.io returned no data for within not_found_ttl when it's set
+    and exclude_names (e.g. names that failed to fetch).
 
     >>> from depobs.website.do import create_app
     >>> with create_app().app_context():
     ...     str(get_package_names_with_missing_npmsio_scores())
     ...
     'SELECT DISTINCT package_versions.name AS anon_1 \\nFROM package_versions LEFT OUTER JOIN npmsio_scores ON package_versions.name = npmsio_scores.package_name \\nWHERE npmsio_scores.id IS NULL ORDER BY package_versions.name ASC'
+
+    >>> with create_app().app_context():
+    ...     str(get_package_names_with_missing_npmsio_scores(exclude_names=["foo"]))
+    ...
+    'SELECT DISTINCT package_versions.name AS anon_1 \\nFROM package_versions LEFT OUTER JOIN npmsio_scores ON package_versions.name = npmsio_scores.package_name \\nWHERE npmsio_scores.id IS NULL AND package_versions.name NOT IN (%(name_1)s) ORDER BY package_versions.name ASC'
     """
-    return (
+    query = (
         db.session.query(sqlalchemy.distinct(PackageVersion.name))
         .outerjoin(NPMSIOScore, PackageVersion.name == NPMSIOScore.package_name)
         .filter(NPMSIOScore.id == None)
-        .order_by(PackageVersion.name.asc())
+    )
+    exclude_names = list(exclude_names)
+    if exclude_names:
+        query = query.filter(PackageVersion.name.notin_(exclude_names))
+    return _filter_not_found_package_names(query, "npmsio", not_found_ttl).order_by(
+        PackageVersion.name.asc()
     )
 
 
@@ -1222,10 +1747,10 @@ def get_NPMRegistryEntry(
     ...     name_and_version_query = str(get_NPMRegistryEntry("package_foo", "version_1"))
 
     >>> just_name_query
-    'SELECT npm_registry_entries.id AS npm_registry_entries_id, npm_registry_entries.package_name AS npm_registry_entries_package_name, npm_registry_entries.package_version AS npm_registry_entries_package_version, npm_registry_entries.shasum AS npm_registry_entries_shasum, npm_registry_entries.tarball AS npm_registry_entries_tarball, npm_registry_entries.has_shrinkwrap AS npm_registry_entries_has_shrinkwrap, npm_registry_entries.published_at AS npm_registry_entries_published_at, npm_registry_entries.package_modified_at AS npm_registry_entries_package_modified_at, npm_registry_entries.source_url AS npm_registry_entries_source_url \\nFROM npm_registry_entries \\nWHERE npm_registry_entries.package_name = %(package_name_1)s ORDER BY npm_registry_entries.published_at DESC'
+    'SELECT npm_registry_entries.id AS npm_registry_entries_id, npm_registry_entries.package_name AS npm_registry_entries_package_name, npm_registry_entries.package_version AS npm_registry_entries_package_version, npm_registry_entries.shasum AS npm_registry_entries_shasum, npm_registry_entries.tarball AS npm_registry_entries_tarball, npm_registry_entries.has_shrinkwrap AS npm_registry_entries_has_shrinkwrap, npm_registry_entries.maintainers_count AS npm_registry_entries_maintainers_count, npm_registry_entries.contributors_count AS npm_registry_entries_contributors_count, npm_registry_entries.published_at AS npm_registry_entries_published_at, npm_registry_entries.package_modified_at AS npm_registry_entries_package_modified_at, npm_registry_entries.source_url AS npm_registry_entries_source_url \\nFROM npm_registry_entries \\nWHERE npm_registry_entries.package_name = %(package_name_1)s ORDER BY npm_registry_entries.published_at DESC'
 
     >>> name_and_version_query
-    'SELECT npm_registry_entries.id AS npm_registry_entries_id, npm_registry_entries.package_name AS npm_registry_entries_package_name, npm_registry_entries.package_version AS npm_registry_entries_package_version, npm_registry_entries.shasum AS npm_registry_entries_shasum, npm_registry_entries.tarball AS npm_registry_entries_tarball, npm_registry_entries.has_shrinkwrap AS npm_registry_entries_has_shrinkwrap, npm_registry_entries.published_at AS npm_registry_entries_published_at, npm_registry_entries.package_modified_at AS npm_registry_entries_package_modified_at, npm_registry_entries.source_url AS npm_registry_entries_source_url \\nFROM npm_registry_entries \\nWHERE npm_registry_entries.package_name = %(package_name_1)s AND npm_registry_entries.package_version = %(package_version_1)s ORDER BY npm_registry_entries.published_at DESC'
+    'SELECT npm_registry_entries.id AS npm_registry_entries_id, npm_registry_entries.package_name AS npm_registry_entries_package_name, npm_registry_entries.package_version AS npm_registry_entries_package_version, npm_registry_entries.shasum AS npm_registry_entries_shasum, npm_registry_entries.tarball AS npm_registry_entries_tarball, npm_registry_entries.has_shrinkwrap AS npm_registry_entries_has_shrinkwrap, npm_registry_entries.maintainers_count AS npm_registry_entries_maintainers_count, npm_registry_entries.contributors_count AS npm_registry_entries_contributors_count, npm_registry_entries.published_at AS npm_registry_entries_published_at, npm_registry_entries.package_modified_at AS npm_registry_entries_package_modified_at, npm_registry_entries.source_url AS npm_registry_entries_source_url \\nFROM npm_registry_entries \\nWHERE npm_registry_entries.package_name = %(package_name_1)s AND npm_registry_entries.package_version = %(package_version_1)s ORDER BY npm_registry_entries.published_at DESC'
 
     """
     query = db.session.query(NPMRegistryEntry).order_by(
@@ -1248,9 +1773,14 @@ def get_package_name_in_npm_registry_data(package_name: str) -> Optional[int]:
     )
 
 
-def get_package_names_with_missing_npm_entries() -> sqlalchemy.orm.query.Query:
+def get_package_names_with_missing_npm_entries(
+    not_found_ttl: Optional[datetime.timedelta] = None,
+    exclude_names: Iterable[str] = (),
+) -> sqlalchemy.orm.query.Query:
     """
-    Returns PackageVersion names not in npmsio_scores.
+    Returns PackageVersion names not in npm_registry_entries. Excludes
+    names the npm registry returned no data for within not_found_ttl
+    when it's set and exclude_names (e.g. names that failed to fetch).
 
     >>> from depobs.website.do import create_app
     >>> with create_app().app_context():
@@ -1258,13 +1788,425 @@ def get_package_names_with_missing_npm_entries() -> sqlalchemy.orm.query.Query:
     ...
     'SELECT DISTINCT package_versions.name AS anon_1 \\nFROM package_versions LEFT OUTER JOIN npm_registry_entries ON package_versions.name = npm_registry_entries.package_name \\nWHERE npm_registry_entries.id IS NULL ORDER BY package_versions.name ASC'
     """
-    return (
+    query = (
         db.session.query(sqlalchemy.distinct(PackageVersion.name))
         .outerjoin(
             NPMRegistryEntry, PackageVersion.name == NPMRegistryEntry.package_name
         )
         .filter(NPMRegistryEntry.id == None)
-        .order_by(PackageVersion.name.asc())
+    )
+    exclude_names = list(exclude_names)
+    if exclude_names:
+        query = query.filter(PackageVersion.name.notin_(exclude_names))
+    return _filter_not_found_package_names(
+        query, "npm_registry", not_found_ttl
+    ).order_by(PackageVersion.name.asc())
+
+
+def get_package_names_with_npm_data_query(
+    source: str, package_names: Iterable[str]
+) -> sqlalchemy.orm.query.Query:
+    """
+    Returns a query for the package names with npms.io scores
+    (source 'npmsio') or npm registry entries (source 'npm_registry')
+    from the given package names.
+
+    >>> from depobs.website.do import create_app
+    >>> with create_app().app_context():
+    ...     str(get_package_names_with_npm_data_query("npmsio", ["package_foo"]))
+    'SELECT DISTINCT npmsio_scores.package_name AS npmsio_scores_package_name \\nFROM npmsio_scores \\nWHERE npmsio_scores.package_name IN (%(package_name_1)s)'
+    """
+    name_column = {
+        "npmsio": NPMSIOScore.package_name,
+        "npm_registry": NPMRegistryEntry.package_name,
+    }[source]
+    return (
+        db.session.query(name_column)
+        .filter(name_column.in_(list(package_names)))
+        .distinct()
+    )
+
+
+def get_not_found_package_names_query(
+    source: str, package_names: Iterable[str], not_found_ttl: datetime.timedelta
+) -> sqlalchemy.orm.query.Query:
+    """
+    Returns a query for the package names source returned no data for
+    within not_found_ttl from the given package names.
+
+    >>> from depobs.website.do import create_app
+    >>> with create_app().app_context():
+    ...     str(get_not_found_package_names_query("npmsio", ["package_foo"], datetime.timedelta(days=1)))
+    'SELECT npm_package_not_found.package_name AS npm_package_not_found_package_name \\nFROM npm_package_not_found \\nWHERE npm_package_not_found.source = %(source_1)s AND npm_package_not_found.package_name IN (%(package_name_1)s) AND npm_package_not_found.checked_at > %(checked_at_1)s'
+    """
+    return db.session.query(NPMPackageNotFound.package_name).filter(
+        NPMPackageNotFound.source == source,
+        NPMPackageNotFound.package_name.in_(list(package_names)),
+        NPMPackageNotFound.checked_at > datetime.datetime.utcnow() - not_found_ttl,
+    )
+
+
+def save_not_found_package_names(source: str, package_names: Iterable[str]) -> None:
+    """
+    Records that source returned no data for the package names
+    (updating checked_at for names already recorded)
+    """
+    package_names = sorted(set(package_names))
+    if not package_names:
+        return
+    statement = pg_insert(NPMPackageNotFound).values(
+        [dict(package_name=name, source=source) for name in package_names]
+    )
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[NPMPackageNotFound.package_name, NPMPackageNotFound.source],
+            set_=dict(checked_at=utcnow()),
+        )
+    )
+    db.session.commit()
+
+
+def save_package_fetches(
+    source: str, etags_by_package_name: Mapping[str, Optional[str]]
+) -> None:
+    """
+    Records fetching package names from source now with their
+    response ETags in one statement
+    """
+    if not etags_by_package_name:
+        return
+    statement = pg_insert(NPMPackageFetch).values(
+        [
+            dict(package_name=name, source=source, etag=etag)
+            for name, etag in sorted(etags_by_package_name.items())
+        ]
+    )
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[NPMPackageFetch.package_name, NPMPackageFetch.source],
+            # keep the previous ETag for fetches without one (a stale
+            # ETag just doesn't match)
+            set_=dict(
+                fetched_at=utcnow(),
+                etag=func.coalesce(statement.excluded.etag, NPMPackageFetch.etag),
+            ),
+        )
+    )
+    db.session.commit()
+
+
+def get_package_fetch_etags(
+    source: str, package_names: Iterable[str]
+) -> Dict[str, Optional[str]]:
+    "Returns the last fetch ETag by package name for fetched package names"
+    return dict(
+        db.session.query(NPMPackageFetch.package_name, NPMPackageFetch.etag).filter(
+            NPMPackageFetch.source == source,
+            NPMPackageFetch.package_name.in_(list(package_names)),
+        )
+    )
+
+
+def get_recent_scan_stale_package_names_query(
+    source: str, fetched_before: datetime.datetime, recent_scan_count: int
+) -> sqlalchemy.orm.query.Query:
+    """
+    Returns a query for package names in the graphs of the
+    recent_scan_count most recent scans not fetched from source since
+    fetched_before. Orders names in the most graphs and then least
+    recently fetched first.
+
+    >>> from depobs.website.do import create_app
+    >>> with create_app().app_context():
+    ...     str(get_recent_scan_stale_package_names_query("npmsio", datetime.datetime(2020, 1, 1), 100))
+    'SELECT anon_1.name AS anon_1_name \\nFROM (SELECT package_versions.name AS name, count(DISTINCT anon_2.graph_id) AS graph_count \\nFROM (SELECT package_graphs.id AS graph_id, unnest(package_graphs.link_ids) AS link_id \\nFROM package_graphs JOIN (SELECT unnest(anon_4.graph_ids) AS graph_id \\nFROM (SELECT scans.graph_ids AS graph_ids \\nFROM scans \\nWHERE scans.graph_ids IS NOT NULL ORDER BY scans.id DESC \\n LIMIT %(param_1)s) AS anon_4) AS anon_3 ON package_graphs.id = anon_3.graph_id) AS anon_2 JOIN package_links ON package_links.id = anon_2.link_id JOIN package_versions ON package_versions.id = package_links.parent_package_id OR package_versions.id = package_links.child_package_id GROUP BY package_versions.name) AS anon_1 LEFT OUTER JOIN npm_package_fetches ON npm_package_fetches.package_name = anon_1.name AND npm_package_fetches.source = %(source_1)s \\nWHERE npm_package_fetches.fetched_at IS NULL OR npm_package_fetches.fetched_at < %(fetched_at_1)s ORDER BY anon_1.graph_count DESC, npm_package_fetches.fetched_at ASC NULLS FIRST'
+    """
+    recent_scans = (
+        db.session.query(Scan.graph_ids)
+        .filter(Scan.graph_ids != None)
+        .order_by(Scan.id.desc())
+        .limit(recent_scan_count)
+        .subquery()
+    )
+    recent_graph_ids = db.session.query(
+        func.unnest(recent_scans.c.graph_ids).label("graph_id")
+    ).subquery()
+    graph_link_ids = (
+        db.session.query(
+            PackageGraph.id.label("graph_id"),
+            func.unnest(PackageGraph.link_ids).label("link_id"),
+        )
+        .join(recent_graph_ids, PackageGraph.id == recent_graph_ids.c.graph_id)
+        .subquery()
+    )
+    graph_counts = (
+        db.session.query(
+            PackageVersion.name.label("name"),
+            func.count(sqlalchemy.distinct(graph_link_ids.c.graph_id)).label(
+                "graph_count"
+            ),
+        )
+        .select_from(graph_link_ids)
+        .join(PackageLink, PackageLink.id == graph_link_ids.c.link_id)
+        .join(
+            PackageVersion,
+            (PackageVersion.id == PackageLink.parent_package_id)
+            | (PackageVersion.id == PackageLink.child_package_id),
+        )
+        .group_by(PackageVersion.name)
+        .subquery()
+    )
+    return (
+        db.session.query(graph_counts.c.name)
+        .outerjoin(
+            NPMPackageFetch,
+            (NPMPackageFetch.package_name == graph_counts.c.name)
+            & (NPMPackageFetch.source == source),
+        )
+        .filter(
+            (NPMPackageFetch.fetched_at == None)
+            | (NPMPackageFetch.fetched_at < fetched_before)
+        )
+        .order_by(
+            graph_counts.c.graph_count.desc(),
+            NPMPackageFetch.fetched_at.asc().nullsfirst(),
+        )
+    )
+
+
+def get_stale_package_names_query(
+    source: str, fetched_before: datetime.datetime
+) -> sqlalchemy.orm.query.Query:
+    """
+    Returns a query for package names last fetched from source before
+    fetched_before from least to most recently fetched. Names with
+    npms.io scores (source 'npmsio') or npm registry entries (source
+    'npm_registry') saved without a fetch record (e.g. before fetches
+    were recorded) come first.
+
+    >>> from depobs.website.do import create_app
+    >>> with create_app().app_context():
+    ...     str(get_stale_package_names_query("npmsio", datetime.datetime(2020, 1, 1)))
+    'SELECT anon_1.package_name AS anon_1_package_name \\nFROM (SELECT npm_package_fetches.package_name AS package_name, npm_package_fetches.fetched_at AS fetched_at \\nFROM npm_package_fetches \\nWHERE npm_package_fetches.source = %(source_1)s AND npm_package_fetches.fetched_at < %(fetched_at_1)s UNION ALL SELECT DISTINCT npmsio_scores.package_name AS package_name, NULL AS fetched_at \\nFROM npmsio_scores \\nWHERE NOT (EXISTS (SELECT * \\nFROM npm_package_fetches \\nWHERE npm_package_fetches.package_name = npmsio_scores.package_name AND npm_package_fetches.source = %(source_2)s))) AS anon_1 ORDER BY anon_1.fetched_at ASC NULLS FIRST'
+    """
+    data_name_column = {
+        "npmsio": NPMSIOScore.package_name,
+        "npm_registry": NPMRegistryEntry.package_name,
+    }[source]
+    stale_fetched_names = db.session.query(
+        NPMPackageFetch.package_name.label("package_name"),
+        NPMPackageFetch.fetched_at.label("fetched_at"),
+    ).filter(
+        NPMPackageFetch.source == source,
+        NPMPackageFetch.fetched_at < fetched_before,
+    )
+    unfetched_names = (
+        db.session.query(
+            data_name_column.label("package_name"),
+            sqlalchemy.null().label("fetched_at"),
+        )
+        .filter(
+            ~sqlalchemy.exists().where(
+                sqlalchemy.and_(
+                    NPMPackageFetch.package_name == data_name_column,
+                    NPMPackageFetch.source == source,
+                )
+            )
+        )
+        .distinct()
+    )
+    names = sqlalchemy.union_all(
+        stale_fetched_names.statement, unfetched_names.statement
+    ).alias()
+    return db.session.query(names.c.package_name).order_by(
+        names.c.fetched_at.asc().nullsfirst()
+    )
+
+
+def get_task_checkpoint(name: str) -> Optional[Dict]:
+    "returns the saved state for the task checkpoint name or None"
+    checkpoint = db.session.query(TaskCheckpoint.state).filter_by(name=name).first()
+    return checkpoint[0] if checkpoint else None
+
+
+def save_task_checkpoint(name: str, state: Dict) -> None:
+    "saves or replaces the state for the task checkpoint name"
+    statement = pg_insert(TaskCheckpoint).values(name=name, state=state)
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[TaskCheckpoint.name],
+            set_=dict(state=statement.excluded.state, updated_at=utcnow()),
+        )
+    )
+    db.session.commit()
+
+
+def get_hibp_breach_catalog_fetched_at() -> Optional[datetime.datetime]:
+    """
+    returns when the HIBP breach catalog was last fetched or None when
+    it's empty
+
+    Uses the latest fetched_at since each fetch upserts every breach
+    in the catalog and breaches removed upstream are never refetched.
+    """
+    return db.session.query(func.max(HIBPBreach.fetched_at)).scalar()
+
+
+def get_hibp_breaches(breach_names: Iterable[str]) -> Dict[str, Dict]:
+    "returns HIBP breach catalog models by name for the breach names in the catalog"
+    return {
+        name: data
+        for name, data in db.session.query(HIBPBreach.name, HIBPBreach.data).filter(
+            HIBPBreach.name.in_(sorted(set(breach_names)))
+        )
+    }
+
+
+def save_hibp_breaches(breaches: Iterable[Dict]) -> None:
+    """
+    Upserts HIBP breach models into the breach catalog (updating
+    fetched_at for breaches already in it)
+    """
+    rows = [
+        dict(name=breach["Name"], breach_date=breach.get("BreachDate"), data=breach)
+        for breach in breaches
+    ]
+    if not rows:
+        return
+    statement = pg_insert(HIBPBreach).values(rows)
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[HIBPBreach.name],
+            set_=dict(
+                breach_date=statement.excluded.breach_date,
+                data=statement.excluded.data,
+                fetched_at=utcnow(),
+            ),
+        )
+    )
+    db.session.commit()
+
+
+def get_cached_hibp_account_breach_names(
+    emails: Iterable[str], fetched_after: datetime.datetime
+) -> Dict[str, List[str]]:
+    "returns HIBP breach names by email for emails fetched after fetched_after"
+    return {
+        email: list(breach_names)
+        for email, breach_names in db.session.query(
+            HIBPAccountBreaches.email, HIBPAccountBreaches.breach_names
+        ).filter(
+            HIBPAccountBreaches.email.in_(sorted(set(emails))),
+            HIBPAccountBreaches.fetched_at > fetched_after,
+        )
+    }
+
+
+def save_hibp_account_breach_names(
+    breach_names_by_email: Mapping[str, Iterable[str]]
+) -> None:
+    "saves or replaces the HIBP breach names for emails"
+    if not breach_names_by_email:
+        return
+    statement = pg_insert(HIBPAccountBreaches).values(
+        [
+            dict(email=email, breach_names=sorted(breach_names))
+            for email, breach_names in sorted(breach_names_by_email.items())
+        ]
+    )
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[HIBPAccountBreaches.email],
+            set_=dict(
+                breach_names=statement.excluded.breach_names, fetched_at=utcnow()
+            ),
+        )
+    )
+    db.session.commit()
+
+
+def get_hibp_account_breach_counts(emails: Iterable[str]) -> Dict[str, int]:
+    "returns the number of HIBP breaches by email for cached emails regardless of age"
+    return {
+        email: breach_count
+        for email, breach_count in db.session.query(
+            HIBPAccountBreaches.email,
+            func.cardinality(HIBPAccountBreaches.breach_names),
+        ).filter(HIBPAccountBreaches.email.in_(sorted(set(emails))))
+    }
+
+
+def get_maintainer_emails(maintainers: Optional[List[Dict[str, str]]]) -> List[str]:
+    """
+    Returns the distinct emails of npm registry entry maintainers in
+    order
+
+    >>> get_maintainer_emails([{"name": "a", "email": "a@example.com"}, {"name": "b"}, {"email": "a@example.com"}])
+    ['a@example.com']
+    >>> get_maintainer_emails(None)
+    []
+    """
+    emails: Dict[str, None] = {}
+    for maintainer in maintainers or []:
+        email = maintainer.get("email", None) if isinstance(maintainer, dict) else None
+        if email:
+            emails[email] = None
+    return list(emails)
+
+
+def get_npm_registry_maintainer_emails_query(
+    package_names_and_versions: Iterable[Tuple[str, str]],
+) -> sqlalchemy.orm.query.Query:
+    """
+    Returns a query for the package name, version, and maintainer
+    emails of the latest npm registry entry for each package name and
+    version through the npm_registry_entry_people links
+
+    >>> from depobs.website.do import create_app
+    >>> with create_app().app_context():
+    ...     str(get_npm_registry_maintainer_emails_query([("foo", "0.0.1")]))
+    'SELECT anon_1.package_name AS anon_1_package_name, anon_1.package_version AS anon_1_package_version, npm_people.email AS npm_people_email \\nFROM (SELECT DISTINCT ON (npm_registry_entries.package_name, npm_registry_entries.package_version) npm_registry_entries.id AS id, npm_registry_entries.package_name AS package_name, npm_registry_entries.package_version AS package_version \\nFROM npm_registry_entries \\nWHERE (npm_registry_entries.package_name, npm_registry_entries.package_version) IN ((%(param_1)s, %(param_2)s)) ORDER BY npm_registry_entries.package_name, npm_registry_entries.package_version, npm_registry_entries.inserted_at DESC) AS anon_1 JOIN npm_registry_entry_people ON npm_registry_entry_people.entry_id = anon_1.id JOIN npm_people ON npm_people.id = npm_registry_entry_people.person_id \\nWHERE npm_registry_entry_people.role = %(role_1)s AND npm_people.email IS NOT NULL ORDER BY anon_1.package_name, anon_1.package_version, npm_people.email'
+    """
+    latest_entries = (
+        db.session.query(
+            NPMRegistryEntry.id,
+            NPMRegistryEntry.package_name,
+            NPMRegistryEntry.package_version,
+        )
+        .filter(
+            sqlalchemy.sql.expression.tuple_(
+                NPMRegistryEntry.package_name, NPMRegistryEntry.package_version
+            ).in_(list(package_names_and_versions))
+        )
+        .distinct(NPMRegistryEntry.package_name, NPMRegistryEntry.package_version)
+        .order_by(
+            NPMRegistryEntry.package_name,
+            NPMRegistryEntry.package_version,
+            NPMRegistryEntry.inserted_at.desc(),
+        )
+        .subquery()
+    )
+    return (
+        db.session.query(
+            latest_entries.c.package_name,
+            latest_entries.c.package_version,
+            NPMPerson.email,
+        )
+        .select_from(latest_entries)
+        .join(
+            NPMRegistryEntryPerson,
+            NPMRegistryEntryPerson.entry_id == latest_entries.c.id,
+        )
+        .join(NPMPerson, NPMPerson.id == NPMRegistryEntryPerson.person_id)
+        .filter(
+            NPMRegistryEntryPerson.role == "maintainer",
+            NPMPerson.email.isnot(None),
+        )
+        .order_by(
+            latest_entries.c.package_name,
+            latest_entries.c.package_version,
+            NPMPerson.email,
+        )
     )
 
 
@@ -1272,14 +2214,39 @@ def get_npm_registry_data(package: str, version: str) -> sqlalchemy.orm.query.Qu
     return (
         db.session.query(
             NPMRegistryEntry.published_at,
-            NPMRegistryEntry.maintainers,
-            NPMRegistryEntry.contributors,
+            NPMRegistryEntry.maintainers_count,
+            NPMRegistryEntry.contributors_count,
         )
         .filter_by(package_name=package, package_version=version)
         .order_by(NPMRegistryEntry.inserted_at.desc())
     )
 
 
+def get_npm_registry_entry_constraints_query(
+    package_names: Iterable[str],
+) -> sqlalchemy.orm.query.Query:
+    """
+    Returns a query for the name, version, tarball, and dependency
+    constraints of registry entries for the given package names
+    ordered by most recently inserted.
+
+    >>> from depobs.website.do import create_app
+    >>> with create_app().app_context():
+    ...     str(get_npm_registry_entry_constraints_query(["package_foo", "package_bar"]))
+    'SELECT npm_registry_entries.package_name AS npm_registry_entries_package_name, npm_registry_entries.package_version AS npm_registry_entries_package_version, npm_registry_entries.tarball AS npm_registry_entries_tarball, npm_registry_entries.constraints AS npm_registry_entries_constraints \\nFROM npm_registry_entries \\nWHERE npm_registry_entries.package_name IN (%(package_name_1)s, %(package_name_2)s) ORDER BY npm_registry_entries.inserted_at DESC'
+    """
+    return (
+        db.session.query(
+            NPMRegistryEntry.package_name,
+            NPMRegistryEntry.package_version,
+            NPMRegistryEntry.tarball,
+            NPMRegistryEntry.constraints,
+        )
+        .filter(NPMRegistryEntry.package_name.in_(list(package_names)))
+        .order_by(NPMRegistryEntry.inserted_at.desc())
+    )
+
+
 def get_score_code_counts() -> sqlalchemy.orm.query.Query:
     """
     Returns a query returning score codes to their counts from the
@@ -1330,54 +2297,269 @@ def store_package_reports(prs: List[PackageReport]) -> None:
     db.session.commit()
 
 
+def save_package_report_records(
+    records: List[PackageReportRecord], batch_size: int = 1000
+) -> Dict[PackageVersionID, int]:
+    """
+    Saves the reports for one scored graph and the Dependency rows
+    between them in one transaction. Inserts reports with multi-row
+    INSERT ... RETURNING statements and dependencies with a COPY.
+
+    Returns saved report IDs by package version ID. Rolls back and
+    raises on error.
+    """
+    report_ids_by_package_version_id: Dict[PackageVersionID, int] = {}
+    if not records:
+        return report_ids_by_package_version_id
+
+    reports_table = PackageReport.__table__
+    try:
+        for start in range(0, len(records), batch_size):
+            batch = records[start : start + batch_size]
+            inserted = db.session.execute(
+                reports_table.insert()
+                .values([record.to_row() for record in batch])
+                .returning(
+                    reports_table.c.id,
+                    reports_table.c.package,
+                    reports_table.c.version,
+                )
+            ).fetchall()
+            if len(inserted) != len(batch):
+                raise Exception(
+                    f"inserted {len(inserted)} reports for a batch of {len(batch)}"
+                )
+            for record, (report_id, package, version) in zip(batch, inserted):
+                if (package, version) != (record.package, record.version):
+                    raise Exception(
+                        f"inserted report {report_id} for {package}@{version} out of order"
+                    )
+                if record.package_version_id is not None:
+                    report_ids_by_package_version_id[
+                        record.package_version_id
+                    ] = report_id
+
+        # NB: depends_on_id is the dependent report and used_by_id
+        # its dependency like PackageReport.dependencies
+        rows = io.StringIO()
+        row_count = 0
+        for record in records:
+            if record.package_version_id is None:
+                continue
+            report_id = report_ids_by_package_version_id[record.package_version_id]
+            for dep_package_version_id in record.dependency_package_version_ids:
+                rows.write(
+                    f"{report_id}\t{report_ids_by_package_version_id[dep_package_version_id]}\n"
+                )
+                row_count += 1
+        rows.seek(0)
+        if row_count:
+            # run on the session connection to use the same transaction
+            cursor = db.session.connection().connection.cursor()
+            cursor.copy_expert(
+                f"COPY {Dependency.__tablename__} (depends_on_id, used_by_id) FROM STDIN",
+                rows,
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    log.info(f"saved {len(records)} package reports with {row_count} dependencies")
+    return report_ids_by_package_version_id
+
+
 def insert_npmsio_scores(npmsio_scores: Iterable[NPMSIOScore]) -> None:
+    """
+    Inserts npms.io scores not already saved for their package
+    version and analyzed_at time in one commit
+    """
+    npmsio_scores = list(npmsio_scores)
+    if not npmsio_scores:
+        return
+    saved_keys = set(
+        db.session.query(
+            NPMSIOScore.package_name,
+            NPMSIOScore.package_version,
+            NPMSIOScore.analyzed_at,
+        ).filter(
+            NPMSIOScore.package_name.in_(
+                {score.package_name for score in npmsio_scores}
+            )
+        )
+    )
     for score in npmsio_scores:
         # only insert new rows
-        if (
-            db.session.query(NPMSIOScore.id)
-            .filter_by(
-                package_name=score.package_name,
-                package_version=score.package_version,
-                analyzed_at=score.analyzed_at,
-            )
-            .one_or_none()
-        ):
+        key = (score.package_name, score.package_version, score.analyzed_at)
+        if key in saved_keys:
             log.debug(
                 f"skipping inserting npms.io score for {score.package_name}@{score.package_version}"
                 f" analyzed at {score.analyzed_at}"
             )
         else:
+            saved_keys.add(key)
             db.session.add(score)
-            db.session.commit()
             log.info(
                 f"added npms.io score for {score.package_name}@{score.package_version}"
                 f" analyzed at {score.analyzed_at}"
             )
+    db.session.commit()
+
+
+def _get_npm_registry_entry_ids_by_key(
+    entries: List[NPMRegistryEntry],
+) -> Dict[Tuple[str, str, str, str], int]:
+    "returns saved entry IDs by name, version, shasum, and tarball"
+    return {
+        (package_name, package_version, shasum, tarball): entry_id
+        for entry_id, package_name, package_version, shasum, tarball in db.session.query(
+            NPMRegistryEntry.id,
+            NPMRegistryEntry.package_name,
+            NPMRegistryEntry.package_version,
+            NPMRegistryEntry.shasum,
+            NPMRegistryEntry.tarball,
+        ).filter(
+            NPMRegistryEntry.package_name.in_({entry.package_name for entry in entries})
+        )
+    }
+
+
+def _npm_registry_entry_key(entry: NPMRegistryEntry) -> Tuple[str, str, str, str]:
+    return (entry.package_name, entry.package_version, entry.shasum, entry.tarball)
+
+
+# NPMRegistryEntry people fields by NPMRegistryEntryPerson role
+NPM_REGISTRY_ENTRY_PEOPLE_ROLES = {
+    "maintainers": "maintainer",
+    "contributors": "contributor",
+}
+
+
+def save_npm_registry_entry_people(
+    entries_by_id: Mapping[int, NPMRegistryEntry]
+) -> None:
+    """
+    Saves the distinct people in the maintainers and contributors of
+    saved npm registry entries by entry ID and replaces the entries'
+    links to them. Doesn't commit.
+    """
+    if not entries_by_id:
+        return
+    people_by_key: Dict[str, Dict[str, Optional[str]]] = {}
+    links: Set[Tuple[int, str, str]] = set()
+    for entry_id, entry in entries_by_id.items():
+        for field, role in NPM_REGISTRY_ENTRY_PEOPLE_ROLES.items():
+            for person in parse_npm_humans(getattr(entry, field)):
+                key = str(person["key"])
+                people_by_key.setdefault(key, person)
+                links.add((entry_id, key, role))
+
+    db.session.query(NPMRegistryEntryPerson).filter(
+        NPMRegistryEntryPerson.entry_id.in_(list(entries_by_id))
+    ).delete(synchronize_session=False)
+    if not people_by_key:
+        return
+    # insert in key order so concurrent saves lock rows in the same order
+    db.session.execute(
+        pg_insert(NPMPerson)
+        .values([people_by_key[key] for key in sorted(people_by_key)])
+        .on_conflict_do_nothing(index_elements=[NPMPerson.key])
+    )
+    person_ids_by_key: Dict[str, int] = dict(
+        db.session.query(NPMPerson.key, NPMPerson.id).filter(
+            NPMPerson.key.in_(list(people_by_key))
+        )
+    )
+    db.session.execute(
+        pg_insert(NPMRegistryEntryPerson).values(
+            [
+                dict(entry_id=entry_id, person_id=person_ids_by_key[key], role=role)
+                for entry_id, key, role in sorted(links)
+            ]
+        )
+    )
 
 
 def insert_npm_registry_entries(entries: Iterable[NPMRegistryEntry]) -> None:
+    """
+    Inserts npm registry entries not already saved and links to their
+    people in one commit
+    """
+    entries = list(entries)
+    if not entries:
+        return
+    saved_keys = set(_get_npm_registry_entry_ids_by_key(entries))
+    inserted_entries: List[NPMRegistryEntry] = []
     for entry in entries:
-        if (
-            db.session.query(NPMRegistryEntry.id)
-            .filter_by(
-                package_name=entry.package_name,
-                package_version=entry.package_version,
-                shasum=entry.shasum,
-                tarball=entry.tarball,
-            )
-            .one_or_none()
-        ):
+        key = _npm_registry_entry_key(entry)
+        if key in saved_keys:
             log.debug(
                 f"skipping inserting npm registry entry for {entry.package_name}@{entry.package_version}"
                 f" from {entry.tarball} with sha {entry.shasum}"
             )
         else:
+            saved_keys.add(key)
             db.session.add(entry)
-            db.session.commit()
+            inserted_entries.append(entry)
             log.info(
                 f"added npm registry entry for {entry.package_name}@{entry.package_version}"
                 f" from {entry.tarball} with sha {entry.shasum}"
             )
+    db.session.flush()
+    save_npm_registry_entry_people({entry.id: entry for entry in inserted_entries})
+    db.session.commit()
+
+
+# NPMRegistryEntry columns not to overwrite when updating saved entries
+NPM_REGISTRY_ENTRY_UNUPDATED_COLUMNS = {"id", "inserted_at", "updated_at"}
+
+
+def upsert_npm_registry_entries(entries: Iterable[NPMRegistryEntry]) -> None:
+    """
+    Inserts new npm registry entries and updates the fields of saved
+    entries (e.g. package_modified_at and maintainers) and links to
+    their people with one bulk update and one commit
+    """
+    entries = list(entries)
+    if not entries:
+        return
+    saved_ids = _get_npm_registry_entry_ids_by_key(entries)
+    column_keys = [
+        column.key
+        for column in sqlalchemy.inspect(NPMRegistryEntry).column_attrs
+        if column.key not in NPM_REGISTRY_ENTRY_UNUPDATED_COLUMNS
+    ]
+    updated_at = datetime.datetime.utcnow()
+    updates: Dict[Tuple[str, str, str, str], Dict[str, Any]] = {}
+    inserted_keys: Set[Tuple[str, str, str, str]] = set()
+    updated_entries_by_id: Dict[int, NPMRegistryEntry] = {}
+    inserted_entries: List[NPMRegistryEntry] = []
+    for entry in entries:
+        key = _npm_registry_entry_key(entry)
+        if key in saved_ids:
+            updates[key] = {
+                **{
+                    column_key: getattr(entry, column_key) for column_key in column_keys
+                },
+                "id": saved_ids[key],
+                "updated_at": updated_at,
+            }
+            updated_entries_by_id[saved_ids[key]] = entry
+        elif key not in inserted_keys:
+            inserted_keys.add(key)
+            db.session.add(entry)
+            inserted_entries.append(entry)
+    db.session.bulk_update_mappings(NPMRegistryEntry, list(updates.values()))
+    db.session.flush()
+    save_npm_registry_entry_people(
+        {
+            **updated_entries_by_id,
+            **{entry.id: entry for entry in inserted_entries},
+        }
+    )
+    db.session.commit()
+    log.info(
+        f"inserted {len(inserted_keys)} and updated {len(updates)} npm registry entries"
+    )
 
 
 def get_advisories_by_package_version_ids_query(
@@ -1518,6 +2700,45 @@ def update_advisory_vulnerable_package_versions(
 def save_json_results(json_results: List[Dict]) -> None:
     db.session.add_all(JSONResult(data=json_result) for json_result in json_results)
     db.session.commit()
+    JSON_RESULTS_SAVED.inc(len(json_results))
+
+
+def mark_github_advisories_withdrawn(withdrawn_at_by_id: Mapping[str, str]) -> int:
+    """
+    Sets withdrawnAt on saved GitHub advisory JSON results by advisory
+    ID that aren't already withdrawn in one update and commits
+
+    Returns the number of JSON results updated.
+    """
+    if not withdrawn_at_by_id:
+        return 0
+    updated_count = (
+        db.session.query(JSONResult)
+        .filter(
+            # uses json_results_data_id_idx
+            JSONResult.data["id"].astext
+            == sqlalchemy.any_(
+                sqlalchemy.cast(sorted(withdrawn_at_by_id), ARRAY(String))
+            ),
+            JSONResult.data.has_key("withdrawnAt"),
+            JSONResult.data["withdrawnAt"].astext.is_(None),
+        )
+        .update(
+            {
+                JSONResult.data: JSONResult.data.op("||")(
+                    func.jsonb_build_object(
+                        "withdrawnAt",
+                        sqlalchemy.cast(dict(withdrawn_at_by_id), JSONB).op("->")(
+                            JSONResult.data["id"].astext
+                        ),
+                    )
+                )
+            },
+            synchronize_session=False,
+        )
+    )
+    db.session.commit()
+    return updated_count
 
 
 def get_next_scan_with_status_query(
@@ -1530,7 +2751,7 @@ def get_next_scan_with_status_query(
     >>> from depobs.website.do import create_app
     >>> with create_app().app_context():
     ...     str(get_next_scan_with_status_query(status=ScanStatusEnum["queued"]).limit(1))
-    'SELECT scans.id AS scans_id, scans.params AS scans_params, scans.status AS scans_status, scans.graph_id AS scans_graph_id, scans.job_names AS scans_job_names, scans.graph_ids AS scans_graph_ids \\nFROM scans \\nWHERE scans.status = %(status_1)s ORDER BY scans.inserted_at DESC \\n LIMIT %(param_1)s'
+    'SELECT scans.id AS scans_id, scans.params AS scans_params, scans.status AS scans_status, scans.graph_id AS scans_graph_id, scans.job_names AS scans_job_names, scans.graph_ids AS scans_graph_ids, scans.job_statuses AS scans_job_statuses \\nFROM scans \\nWHERE scans.status = %(status_1)s ORDER BY scans.inserted_at DESC \\n LIMIT %(param_1)s'
     """
     return (
         db.session.query(Scan)
@@ -1652,6 +2873,27 @@ def dependency_files_to_scan(
     )
 
 
+def get_scan_counts_by_status_query() -> sqlalchemy.orm.query.Query:
+    """
+    >>> from depobs.website.do import create_app
+    >>> with create_app().app_context():
+    ...     str(get_scan_counts_by_status_query())
+    'SELECT scans.status AS scans_status, count(scans.id) AS count_1 \\nFROM scans GROUP BY scans.status'
+    """
+    return db.session.query(Scan.status, func.count(Scan.id)).group_by(Scan.status)
+
+
+def get_scan_counts_by_status() -> Dict[str, int]:
+    """
+    Returns the number of scans by status name including statuses
+    without scans e.g. to report the scan queue depth
+    """
+    counts = {status.name: 0 for status in ScanStatusEnum}
+    for status, count in get_scan_counts_by_status_query():
+        counts[status.name] = count
+    return counts
+
+
 def save_scan_with_job_names(scan: Scan, job_names: List[str]) -> Scan:
     scan.job_names = job_names
     db.session.add(scan)
@@ -1663,9 +2905,46 @@ def save_scan_with_status(scan: Scan, status: ScanStatusEnum) -> Scan:
     scan.status = status.name
     db.session.add(scan)
     db.session.commit()
+    SCAN_STATUS_CHANGES.labels(status=status.name).inc()
     return scan
 
 
+def save_scan_job_status(
+    scan_id: int, job_name: str, job_status: Mapping[str, object]
+) -> bool:
+    """
+    Records the first terminal status seen for a job of a started
+    scan without changing the scan updated_at timeout clock. Returns
+    whether a status was recorded.
+    """
+    recorded_status = {
+        **job_status,
+        "recorded_at": datetime.datetime.utcnow().isoformat(),
+    }
+    updated_count = (
+        db.session.query(Scan)
+        .filter(
+            Scan.id == scan_id,
+            Scan.status == ScanStatusEnum["started"],
+            sqlalchemy.or_(
+                Scan.job_statuses == None,
+                sqlalchemy.not_(Scan.job_statuses.has_key(job_name)),
+            ),
+        )
+        .update(
+            {
+                Scan.job_statuses: func.coalesce(
+                    Scan.job_statuses, sqlalchemy.cast({}, JSONB)
+                ).op("||")(sqlalchemy.cast({job_name: recorded_status}, JSONB)),
+                Scan.updated_at: Scan.updated_at,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.session.commit()
+    return bool(updated_count)
+
+
 def save_scan_with_graph_ids(scan: Scan, graph_ids: List[int]) -> Scan:
     scan.graph_ids = graph_ids
     db.session.add(scan)
@@ -1682,8 +2961,17 @@ def save_deserialized(
             List[Tuple[PackageVersion, PackageVersion]],
         ],
         Tuple[Advisory, AbstractSet[str]],
-    ]
+    ],
+    graph_stats: bool = False,
+    graph_stats_max_work: Optional[int] = None,
 ) -> None:
+    """
+    Saves a model from serializers.deserialize_scan_job_results.
+
+    Only computes graph stats for a PackageGraph when graph_stats is
+    True and approximates them after graph_stats_max_work (see
+    compact_graph.get_graph_stats).
+    """
     if isinstance(deserialized, PackageVersion):
         upsert_package_version(deserialized)
     elif isinstance(deserialized, tuple) and isinstance(deserialized[0], PackageGraph):
@@ -1706,6 +2994,8 @@ def save_deserialized(
 
         # TODO: combine into one query
         link_ids = []
+        node_ids: Set[PackageVersionID] = set()
+        edges: List[Tuple[PackageVersionID, PackageVersionID]] = []
         for parent, child in links:
             log.debug(
                 f"resolving link package version ids for {child.name}@{child.version}->{parent.name}@{parent.version}"
@@ -1722,9 +3012,20 @@ def save_deserialized(
             log.debug(f"upserted link {link} w/ id {link.id}")
             link_ids.append(get_package_version_link_id_query(link).first().id)
             log.debug(f"added link id to graph {link_ids[-1]}")
+            # NB: match graph_util.package_graph_to_compact_graph nodes and edges
+            node_ids.update((link.parent_package_id, link.child_package_id))
+            if link.parent_package_id != link.child_package_id:
+                edges.append((link.parent_package_id, link.child_package_id))
 
         graph.link_ids = link_ids
         db.session.add(graph)
+        db.session.flush()  # assign graph.id
+        save_graph_condensation(
+            graph.id,
+            CompactGraph(node_ids, edges),
+            with_stats=graph_stats,
+            max_work=graph_stats_max_work,
+        )
     elif isinstance(deserialized, tuple) and isinstance(deserialized[0], Advisory):
         advisory, impacted_versions = deserialized  # type: ignore
         insert_advisories([advisory])
@@ -1741,7 +3042,7 @@ def get_scan_by_id(scan_id: int) -> Scan:
     ...     query = str(get_scan_by_id(20))
 
     >>> query
-    'SELECT scans.id AS scans_id, scans.params AS scans_params, scans.status AS scans_status, scans.graph_id AS scans_graph_id, scans.job_names AS scans_job_names, scans.graph_ids AS scans_graph_ids \\nFROM scans \\nWHERE scans.id = %(id_1)s'
+    'SELECT scans.id AS scans_id, scans.params AS scans_params, scans.status AS scans_status, scans.graph_id AS scans_graph_id, scans.job_names AS scans_job_names, scans.graph_ids AS scans_graph_ids, scans.job_statuses AS scans_job_statuses \\nFROM scans \\nWHERE scans.id = %(id_1)s'
     """
     return db.session.query(Scan).filter_by(id=scan_id)
 
@@ -1754,7 +3055,7 @@ def get_recent_package_reports_query(
     >>> from depobs.website.do import create_app
     >>> with create_app().app_context():
     ...     str(get_recent_package_reports_query())
-    'SELECT reports.id AS reports_id, reports.package AS reports_package, reports.version AS reports_version, reports.release_date AS reports_release_date, reports.scoring_date AS reports_scoring_date, reports.npmsio_score AS reports_npmsio_score, reports.npmsio_scored_package_version AS reports_npmsio_scored_package_version, reports."directVulnsCritical_score" AS "reports_directVulnsCritical_score", reports."directVulnsHigh_score" AS "reports_directVulnsHigh_score", reports."directVulnsMedium_score" AS "reports_directVulnsMedium_score", reports."directVulnsLow_score" AS "reports_directVulnsLow_score", reports."indirectVulnsCritical_score" AS "reports_indirectVulnsCritical_score", reports."indirectVulnsHigh_score" AS "reports_indirectVulnsHigh_score", reports."indirectVulnsMedium_score" AS "reports_indirectVulnsMedium_score", reports."indirectVulnsLow_score" AS "reports_indirectVulnsLow_score", reports.authors AS reports_authors, reports.contributors AS reports_contributors, reports.immediate_deps AS reports_immediate_deps, reports.all_deps AS reports_all_deps, reports.graph_id AS reports_graph_id \\nFROM reports ORDER BY reports.scoring_date DESC \\n LIMIT %(param_1)s'
+    'SELECT reports.id AS reports_id, reports.package AS reports_package, reports.version AS reports_version, reports.release_date AS reports_release_date, reports.scoring_date AS reports_scoring_date, reports.npmsio_score AS reports_npmsio_score, reports.npmsio_scored_package_version AS reports_npmsio_scored_package_version, reports."directVulnsCritical_score" AS "reports_directVulnsCritical_score", reports."directVulnsHigh_score" AS "reports_directVulnsHigh_score", reports."directVulnsMedium_score" AS "reports_directVulnsMedium_score", reports."directVulnsLow_score" AS "reports_directVulnsLow_score", reports."indirectVulnsCritical_score" AS "reports_indirectVulnsCritical_score", reports."indirectVulnsHigh_score" AS "reports_indirectVulnsHigh_score", reports."indirectVulnsMedium_score" AS "reports_indirectVulnsMedium_score", reports."indirectVulnsLow_score" AS "reports_indirectVulnsLow_score", reports.authors AS reports_authors, reports.contributors AS reports_contributors, reports.immediate_deps AS reports_immediate_deps, reports.all_deps AS reports_all_deps, reports.graph_id AS reports_graph_id, reports.maintainer_breaches AS reports_maintainer_breaches, reports.breached_maintainers AS reports_breached_maintainers, reports.all_maintainer_breaches AS reports_all_maintainer_breaches, reports.all_breached_maintainers AS reports_all_breached_maintainers \\nFROM reports ORDER BY reports.scoring_date DESC \\n LIMIT %(param_1)s'
 
     """
     return (
@@ -1762,3 +3063,21 @@ def get_recent_package_reports_query(
         .order_by(PackageReport.scoring_date.desc())
         .limit(limit)
     )
+
+
+def hold_advisory_xact_lock(key: int, seconds: float) -> None:
+    """
+    Takes the transaction level Postgres advisory lock for key
+    (waiting for other holders), holds it for seconds, then releases
+    it by committing.
+
+    Uses its own connection so it doesn't commit the session.
+    """
+    with db.engine.connect() as connection:
+        with connection.begin():
+            connection.execute(
+                sqlalchemy.text("SELECT pg_advisory_xact_lock(:key)"), key=key
+            )
+            connection.execute(
+                sqlalchemy.text("SELECT pg_sleep(:seconds)"), seconds=seconds
+            )
@@ -31,6 +31,10 @@ class PackageReportDataclass:
     immediate_deps = Optional[int]
     all_deps = Optional[int]
     graph_id = Optional[int]
+    maintainer_breaches = Optional[int]
+    breached_maintainers = Optional[int]
+    all_maintainer_breaches = Optional[int]
+    all_breached_maintainers = Optional[int]
 
     score = Optional[float]
     score_code = Optional[str]
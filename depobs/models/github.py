@@ -584,6 +584,41 @@ _resource_edges: Sequence[ResourceEdge] = [
 ]
 
 
+def get_resource(kind: ResourceKind) -> Resource:
+    "returns the Resource for a ResourceKind"
+    for resource in _resources:
+        if resource.kind == kind:
+            return resource
+    raise ValueError(f"no resource for kind {kind.name}")
+
+
+def serialize_request(request: Request) -> Dict[str, Any]:
+    """
+    Returns a JSON serializable dict for a Request (e.g. to checkpoint
+    a crawl)
+    """
+    return dict(
+        resource_kind=request.resource.kind.name,
+        selection_updates=[
+            [list(path), dict(kwargs)] for (path, kwargs) in request.selection_updates
+        ],
+        page_number=request.page_number,
+        guid=str(request.guid),
+    )
+
+
+def deserialize_request(serialized: Dict[str, Any]) -> Request:
+    "returns a Request from serialize_request output"
+    return Request(
+        resource=get_resource(ResourceKind[serialized["resource_kind"]]),
+        selection_updates=[
+            (path, kwargs) for (path, kwargs) in serialized["selection_updates"]
+        ],
+        page_number=serialized["page_number"],
+        guid=UUID(serialized["guid"]),
+    )
+
+
 def get_diff_kwargs(diff: SelectionUpdate, context: ChainMap) -> SelectionUpdate:
     path, kwargs = diff
     return (
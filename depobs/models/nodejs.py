@@ -1,8 +1,9 @@
 import bisect
 import itertools
 import logging
+import shlex
 from dataclasses import dataclass, field
-from typing import Dict, Generator, List, Optional, Union
+from typing import Any, Dict, Generator, Iterable, List, Optional, Tuple, Union
 
 from depobs.util.serialize_util import (
     get_in,
@@ -192,3 +193,315 @@ def flatten_deps(
         yield pkg
         pkgs.append(pkg)
         paths.append(path)
+
+
+# package.json dependency fields npm installs for the root package
+ROOT_DEPENDENCY_FIELDS = (
+    "dependencies",
+    "devDependencies",
+    "optionalDependencies",
+)
+
+# dependency fields npm installs for non-root packages
+DEPENDENCY_FIELDS = (
+    "dependencies",
+    "optionalDependencies",
+    "peerDependencies",
+)
+
+
+def _merge_pkg(pkgs: Dict[NPMPackageID, NPMPackage], pkg: NPMPackage) -> NPMPackage:
+    """
+    Adds pkg to pkgs by ID or adds its deps to the existing pkg with
+    the same ID (for packages installed at more than one path)
+    """
+    existing = pkgs.setdefault(pkg.package_id, pkg)
+    for dep_id in pkg.dependencies:
+        if dep_id not in existing.dependencies:
+            bisect.insort(existing.dependencies, dep_id)
+    return existing
+
+
+def _root_pkg(
+    lockfile: Dict[str, Any], manifest: Optional[Dict[str, Any]]
+) -> NPMPackage:
+    root_fields = manifest or lockfile
+    return NPMPackage(
+        name=root_fields.get("name", lockfile.get("name", None)),
+        version=root_fields.get("version", lockfile.get("version", None)),
+    )
+
+
+def _flatten_package_lock_v1(
+    lockfile: Dict[str, Any], manifest: Optional[Dict[str, Any]]
+) -> Tuple[List[NPMPackage], NPMPackage]:
+    """
+    Resolves the .requires of each entry in the nested v1
+    .dependencies tree using node_modules lookup (the entry's own
+    .dependencies then its ancestors' up to the top level)
+    """
+    pkgs: Dict[NPMPackageID, NPMPackage] = {}
+
+    def resolve(scopes: List[Dict[str, Any]], dep_name: str) -> Optional[NPMPackageID]:
+        for scope in reversed(scopes):
+            if dep_name in scope:
+                return f"{dep_name}@{scope[dep_name].get('version', None)}"
+        return None
+
+    top_level = lockfile.get("dependencies", None) or {}
+    stack: List[Tuple[List[Dict[str, Any]], str, Dict[str, Any]]] = [
+        ([top_level], name, entry) for name, entry in top_level.items()
+    ]
+    while stack:
+        scopes, name, entry = stack.pop()
+        entry_scopes = scopes + [entry.get("dependencies", None) or {}]
+        dep_ids = [
+            resolve(entry_scopes, dep_name)
+            for dep_name in entry.get("requires", None) or {}
+        ]
+        _merge_pkg(
+            pkgs,
+            NPMPackage(
+                name=name,
+                version=entry.get("version", None),
+                resolved=entry.get("resolved", None),
+                dependencies=sorted(dep_id for dep_id in dep_ids if dep_id),
+            ),
+        )
+        stack.extend(
+            (entry_scopes, child_name, child_entry)
+            for child_name, child_entry in entry_scopes[-1].items()
+        )
+
+    root = _root_pkg(lockfile, manifest)
+    if manifest is None:
+        # v1 lockfiles don't list the root deps so guess they're the
+        # top level packages no other package depends on
+        required_ids = {dep_id for pkg in pkgs.values() for dep_id in pkg.dependencies}
+        root_dep_ids = [
+            f"{dep_name}@{entry.get('version', None)}"
+            for dep_name, entry in top_level.items()
+        ]
+        root.dependencies = sorted(
+            dep_id for dep_id in root_dep_ids if dep_id not in required_ids
+        )
+    else:
+        resolved_root_dep_ids = [
+            resolve([top_level], dep_name)
+            for dep_field in ROOT_DEPENDENCY_FIELDS
+            for dep_name in manifest.get(dep_field, None) or {}
+        ]
+        root.dependencies = sorted(
+            {dep_id for dep_id in resolved_root_dep_ids if dep_id}
+        )
+    return list(pkgs.values()), root
+
+
+def _resolve_package_lock_path(
+    packages: Dict[str, Dict[str, Any]], path: str, dep_name: str
+) -> Optional[str]:
+    """
+    Returns the packages key a package at path loads dep_name from
+
+    >>> packages = {"": {}, "node_modules/a": {}, "node_modules/b": {}, "node_modules/a/node_modules/b": {}, "node_modules/a/node_modules/@s/c": {}}
+    >>> _resolve_package_lock_path(packages, "node_modules/a/node_modules/@s/c", "b")
+    'node_modules/a/node_modules/b'
+    >>> _resolve_package_lock_path(packages, "node_modules/b", "a")
+    'node_modules/a'
+    >>> _resolve_package_lock_path(packages, "", "d") is None
+    True
+    """
+    base = path
+    while True:
+        candidate = (
+            f"{base}/node_modules/{dep_name}" if base else f"node_modules/{dep_name}"
+        )
+        if candidate in packages:
+            return candidate
+        if not base:
+            return None
+        parent_end = base.rfind("/node_modules/")
+        base = base[:parent_end] if parent_end != -1 else ""
+
+
+def _flatten_package_lock_v2(
+    lockfile: Dict[str, Any], manifest: Optional[Dict[str, Any]]
+) -> Tuple[List[NPMPackage], NPMPackage]:
+    """
+    Resolves the dependencies of each entry in the flat v2 and v3
+    .packages map keyed by install path
+    """
+    packages: Dict[str, Dict[str, Any]] = lockfile["packages"]
+
+    def follow_links(path: str) -> str:
+        seen = set()
+        while packages[path].get("link", False) and path not in seen:
+            seen.add(path)
+            path = packages[path].get("resolved", "")
+            if path not in packages:
+                break
+        return path
+
+    def pkg_name(path: str) -> Optional[str]:
+        name = packages[path].get("name", None)
+        if name is None and "node_modules/" in path:
+            name = path.rsplit("node_modules/", 1)[1]
+        return name
+
+    def dep_ids(path: str, dep_fields: Iterable[str]) -> List[NPMPackageID]:
+        ids = set()
+        for dep_field in dep_fields:
+            for dep_name in packages[path].get(dep_field, None) or {}:
+                dep_path = _resolve_package_lock_path(packages, path, dep_name)
+                if dep_path is None:  # e.g. an optional dep for another platform
+                    continue
+                dep_path = follow_links(dep_path)
+                if dep_path in packages:
+                    ids.add(f"{dep_name}@{packages[dep_path].get('version', None)}")
+        return sorted(ids)
+
+    pkgs: Dict[NPMPackageID, NPMPackage] = {}
+    for path, entry in packages.items():
+        if path == "" or entry.get("link", False):
+            continue
+        # non-node_modules paths are workspace packages installing dev deps
+        is_workspace = (
+            not path.startswith("node_modules/") and "/node_modules/" not in path
+        )
+        _merge_pkg(
+            pkgs,
+            NPMPackage(
+                name=pkg_name(path),
+                version=entry.get("version", None),
+                resolved=None if is_workspace else entry.get("resolved", None),
+                dependencies=dep_ids(
+                    path,
+                    ROOT_DEPENDENCY_FIELDS + ("peerDependencies",)
+                    if is_workspace
+                    else DEPENDENCY_FIELDS,
+                ),
+            ),
+        )
+
+    root = _root_pkg({**lockfile, **packages.get("", {})}, manifest)
+    if "" in packages:
+        root.dependencies = dep_ids("", ROOT_DEPENDENCY_FIELDS)
+    return list(pkgs.values()), root
+
+
+def flatten_package_lock(
+    lockfile: Dict[str, Any], manifest: Optional[Dict[str, Any]] = None
+) -> Tuple[List[NPMPackage], Optional[NPMPackage]]:
+    """
+    Returns NPMPackages with resolved deps like flatten_deps for
+    npm list output and the root package (when it has a name) from a
+    parsed package-lock.json or npm-shrinkwrap.json lockfile (v1, v2,
+    or v3) and optional parsed package.json manifest.
+
+    Raises a ValueError for other lockfile versions.
+    """
+    lockfile_version = lockfile.get("lockfileVersion", 1)
+    if lockfile_version >= 2 and "packages" in lockfile:
+        pkgs, root = _flatten_package_lock_v2(lockfile, manifest)
+    elif lockfile_version <= 2:
+        pkgs, root = _flatten_package_lock_v1(lockfile, manifest)
+    else:
+        raise ValueError(f"unsupported lockfileVersion {lockfile_version}")
+    return pkgs, root if root.name else None
+
+
+def _split_yarn_lock_spec(spec: str) -> Tuple[str, str]:
+    """
+    Splits a yarn.lock entry key into a package name and range
+
+    >>> _split_yarn_lock_spec("@babel/code-frame@^7.0.0")
+    ('@babel/code-frame', '^7.0.0')
+    >>> _split_yarn_lock_spec("js-tokens@^3.0.0 || ^4.0.0")
+    ('js-tokens', '^3.0.0 || ^4.0.0')
+    """
+    name_end = spec.index("@", 1)
+    return spec[:name_end], spec[name_end + 1 :]
+
+
+def parse_yarn_lock(yarn_lock: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Parses a yarn v1 yarn.lock file into a dict of entries keyed by
+    each name@range spec that resolves to the entry
+
+    >>> entries = parse_yarn_lock('''# yarn lockfile v1
+    ...
+    ...
+    ... "@babel/highlight@^7.8.3", "@babel/highlight@^7.9.0":
+    ...   version "7.9.0"
+    ...   resolved "https://registry.yarnpkg.com/@babel/highlight/-/highlight-7.9.0.tgz#4e9b45ccb82b79607271b2979ad82c7b68163079"
+    ...   dependencies:
+    ...     js-tokens "^4.0.0"
+    ... ''')
+    >>> entries["@babel/highlight@^7.8.3"] is entries["@babel/highlight@^7.9.0"]
+    True
+    >>> entries["@babel/highlight@^7.8.3"]["dependencies"]
+    {'js-tokens': '^4.0.0'}
+    """
+    entries: Dict[str, Dict[str, Any]] = {}
+    entry: Dict[str, Any] = {}
+    section: Optional[str] = None
+    for line in yarn_lock.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        indent = len(line) - len(line.lstrip(" "))
+        if indent == 0:
+            entry, section = {}, None
+            for spec in stripped.rstrip(":").split(", "):
+                entries[spec.strip('"')] = entry
+        elif indent == 2 and stripped.endswith(":"):
+            section = stripped[:-1].strip('"')
+            entry[section] = {}
+        else:
+            key, value = shlex.split(stripped)
+            if indent == 2:
+                entry[key] = value
+            elif section is not None:
+                entry[section][key] = value
+    return entries
+
+
+def flatten_yarn_lock(
+    yarn_lock: str, manifest: Optional[Dict[str, Any]] = None
+) -> Tuple[List[NPMPackage], Optional[NPMPackage]]:
+    """
+    Returns NPMPackages with resolved deps like flatten_deps for
+    npm list output and the root package (when it has a name) from a
+    yarn v1 yarn.lock file and optional parsed package.json manifest.
+    """
+    entries = parse_yarn_lock(yarn_lock)
+
+    def dep_ids(
+        deps_by_field: Dict[str, Any], dep_fields: Iterable[str]
+    ) -> List[NPMPackageID]:
+        ids = set()
+        for dep_field in dep_fields:
+            for dep_name, dep_range in (
+                deps_by_field.get(dep_field, None) or {}
+            ).items():
+                dep_entry = entries.get(f"{dep_name}@{dep_range}", None)
+                if dep_entry is not None:
+                    ids.add(f"{dep_name}@{dep_entry.get('version', None)}")
+        return sorted(ids)
+
+    pkgs: Dict[NPMPackageID, NPMPackage] = {}
+    for spec, entry in entries.items():
+        name, _ = _split_yarn_lock_spec(spec)
+        _merge_pkg(
+            pkgs,
+            NPMPackage(
+                name=name,
+                version=entry.get("version", None),
+                resolved=entry.get("resolved", None),
+                dependencies=dep_ids(entry, DEPENDENCY_FIELDS),
+            ),
+        )
+
+    root = _root_pkg({}, manifest)
+    root.dependencies = dep_ids(manifest or {}, ROOT_DEPENDENCY_FIELDS)
+    return list(pkgs.values()), root if root.name else None
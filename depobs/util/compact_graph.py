@@ -0,0 +1,682 @@
+"""
+A compact directed graph for scoring large package graphs.
+
+Nodes are remapped to dense indices 0..n-1 in ascending node ID
+order, out edges are stored as CSR (compressed sparse row) adjacency
+in typed arrays, and node data is stored column-wise with one list
+per attribute name instead of a dict per node.
+"""
+from array import array
+from collections import Counter
+from typing import (
+    AbstractSet,
+    Any,
+    Dict,
+    FrozenSet,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import networkx as nx
+
+# type alias to not confuse ints as nxGraphNodeIDs with other ints
+nxGraphNodeID = int
+
+T = TypeVar("T")
+
+
+class _Missing:
+    "marks a node without a value for an attribute column"
+
+    def __reduce__(self) -> str:
+        # unpickle as the module singleton
+        return "_MISSING"
+
+
+_MISSING = _Missing()
+
+
+class CompactNodeAttrs(Mapping[Any, Any]):
+    """
+    A read-only dict-like view of the attributes of one node in a
+    CompactGraph. Raises KeyError for unset attributes like the
+    networkx node attr dict.
+    """
+
+    __slots__ = ("_graph", "_index")
+
+    def __init__(self, graph: "CompactGraph", index: int):
+        self._graph = graph
+        self._index = index
+
+    def __getitem__(self, attr_name: Any) -> Any:
+        value = self._graph.node_attr_columns[attr_name][self._index]
+        if value is _MISSING:
+            raise KeyError(attr_name)
+        return value
+
+    def __iter__(self) -> Iterator[Any]:
+        return (
+            attr_name
+            for attr_name, column in self._graph.node_attr_columns.items()
+            if column[self._index] is not _MISSING
+        )
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class CompactNodeView(Mapping[nxGraphNodeID, CompactNodeAttrs]):
+    """
+    A read-only dict-like view from node ID to node attributes for a
+    CompactGraph. Supports g.nodes[node_id].get(attr_name) like
+    networkx.
+    """
+
+    __slots__ = ("_graph",)
+
+    def __init__(self, graph: "CompactGraph"):
+        self._graph = graph
+
+    def __getitem__(self, node_id: nxGraphNodeID) -> CompactNodeAttrs:
+        return CompactNodeAttrs(self._graph, self._graph.node_index[node_id])
+
+    def __iter__(self) -> Iterator[nxGraphNodeID]:
+        return iter(self._graph.node_ids)
+
+    def __len__(self) -> int:
+        return len(self._graph.node_ids)
+
+    def __contains__(self, node_id: object) -> bool:
+        return node_id in self._graph.node_index
+
+
+class CompactGraph:
+    """
+    An immutable directed graph with unique int node IDs (e.g.
+    PackageVersion IDs) stored as:
+
+    * node_ids: array of node IDs sorted ascending (dense index -> node ID)
+    * node_index: dict of node ID -> dense index
+    * indptr and indices: CSR adjacency where the successor indices of
+      the node at index i are indices[indptr[i]:indptr[i+1]]
+    * node_attr_columns: attr name -> list of values by dense index
+
+    Drops duplicate edges like nx.DiGraph and pickles to plain arrays
+    and lists.
+
+    >>> g = CompactGraph([3, 1, 2], [(1, 2), (2, 3), (1, 2)])
+    >>> list(g.node_ids), list(g.indptr), list(g.indices)
+    ([1, 2, 3], [0, 1, 2, 2], [1, 2])
+    >>> g.number_of_nodes(), g.number_of_edges(), g.successors(1)
+    (3, 2, [2])
+    """
+
+    def __init__(
+        self,
+        node_ids: Iterable[nxGraphNodeID],
+        edges: Iterable[Tuple[nxGraphNodeID, nxGraphNodeID]],
+        graph_id: Optional[int] = None,
+    ):
+        self.graph_id = graph_id
+
+        edge_set: Set[Tuple[nxGraphNodeID, nxGraphNodeID]] = set(edges)
+        all_node_ids: Set[nxGraphNodeID] = set(node_ids)
+        for src, dst in edge_set:
+            all_node_ids.add(src)
+            all_node_ids.add(dst)
+
+        self.node_ids: "array[int]" = array("q", sorted(all_node_ids))
+        self.node_index: Dict[nxGraphNodeID, int] = {
+            node_id: index for index, node_id in enumerate(self.node_ids)
+        }
+
+        out_degrees = [0] * len(self.node_ids)
+        index_edges = sorted(
+            (self.node_index[src], self.node_index[dst]) for src, dst in edge_set
+        )
+        for src_index, _ in index_edges:
+            out_degrees[src_index] += 1
+
+        self.indptr: "array[int]" = array("l", [0] * (len(self.node_ids) + 1))
+        for index, out_degree in enumerate(out_degrees):
+            self.indptr[index + 1] = self.indptr[index] + out_degree
+        self.indices: "array[int]" = array("l", (dst for _, dst in index_edges))
+
+        self.node_attr_columns: Dict[str, List[Any]] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # node_index is derived from node_ids so don't ship it
+        return {
+            "graph_id": self.graph_id,
+            "node_ids": self.node_ids,
+            "indptr": self.indptr,
+            "indices": self.indices,
+            "node_attr_columns": self.node_attr_columns,
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.node_index = {
+            node_id: index for index, node_id in enumerate(self.node_ids)
+        }
+
+    @property
+    def nodes(self) -> CompactNodeView:
+        return CompactNodeView(self)
+
+    def number_of_nodes(self) -> int:
+        return len(self.node_ids)
+
+    def number_of_edges(self) -> int:
+        return len(self.indices)
+
+    def successor_indices(self, index: int) -> "array[int]":
+        return self.indices[self.indptr[index] : self.indptr[index + 1]]
+
+    def successors(self, node_id: nxGraphNodeID) -> List[nxGraphNodeID]:
+        return [
+            self.node_ids[dst_index]
+            for dst_index in self.successor_indices(self.node_index[node_id])
+        ]
+
+    def edges(self) -> Generator[Tuple[nxGraphNodeID, nxGraphNodeID], None, None]:
+        for src_index, src_id in enumerate(self.node_ids):
+            for dst_index in self.successor_indices(src_index):
+                yield src_id, self.node_ids[dst_index]
+
+    def set_node_attr_column(
+        self, attr_name: str, values_by_node_id: Mapping[nxGraphNodeID, Any]
+    ) -> None:
+        """
+        Sets or replaces the node attribute column attr_name from a
+        map of node ID to value. Ignores node IDs not in the graph.
+
+        >>> g = CompactGraph([0, 1], [(0, 1)])
+        >>> g.set_node_attr_column('label', {0: 'node 0', 2: 'not in graph'})
+        >>> g.nodes[0]['label'], g.nodes[1].get('label')
+        ('node 0', None)
+        """
+        column: List[Any] = [_MISSING] * len(self.node_ids)
+        for node_id, value in values_by_node_id.items():
+            index = self.node_index.get(node_id, None)
+            if index is not None:
+                column[index] = value
+        self.node_attr_columns[attr_name] = column
+
+    @classmethod
+    def from_networkx(cls, g: nx.DiGraph) -> "CompactGraph":
+        """
+        Returns a CompactGraph with the nodes, edges, and node attrs of
+        a networkx DiGraph. Reads the graph ID from graph attr "id".
+        """
+        compact = cls(g.nodes, g.edges, graph_id=g.graph.get("id", None))
+        attr_names: Set[str] = set()
+        for _, node_data in g.nodes(data=True):
+            attr_names.update(node_data.keys())
+        for attr_name in attr_names:
+            compact.set_node_attr_column(
+                attr_name,
+                {
+                    node_id: node_data[attr_name]
+                    for node_id, node_data in g.nodes(data=True)
+                    if attr_name in node_data
+                },
+            )
+        return compact
+
+    def to_networkx(self) -> nx.DiGraph:
+        """
+        Returns a networkx DiGraph with the nodes, edges, and node
+        attrs of the graph e.g. for rendering.
+
+        >>> g = CompactGraph([0, 1], [(0, 1)], graph_id=5)
+        >>> g.set_node_attr_column('label', {0: 'node 0'})
+        >>> nx_g = g.to_networkx()
+        >>> nx_g.graph, list(nx_g.nodes(data=True)), list(nx_g.edges)
+        ({'id': 5}, [(0, {'label': 'node 0'}), (1, {})], [(0, 1)])
+        """
+        g = nx.DiGraph(incoming_graph_data=None, id=self.graph_id)
+        g.add_nodes_from(
+            (node_id, dict(self.nodes[node_id])) for node_id in self.node_ids
+        )
+        g.add_edges_from(self.edges())
+        return g
+
+    def strongly_connected_components(self) -> Tuple["array[int]", int]:
+        """
+        Returns an array of SCC index by node index and the number of
+        SCCs using an iterative Tarjan's algorithm.
+
+        SCC indices are in reverse topological order of the
+        condensation i.e. an SCC only points to SCCs with lower
+        indices.
+
+        >>> scc_by_index, scc_count = CompactGraph([], [(0, 1), (1, 0), (1, 2)]).strongly_connected_components()
+        >>> list(scc_by_index), scc_count
+        ([1, 1, 0], 2)
+        """
+        n = len(self.node_ids)
+        unvisited = -1
+        order: List[int] = [unvisited] * n
+        low: List[int] = [0] * n
+        on_stack: List[bool] = [False] * n
+        scc_by_index: "array[int]" = array("l", [unvisited] * n)
+        stack: List[int] = []
+        counter = 0
+        scc_count = 0
+        indptr, indices = self.indptr, self.indices
+
+        for root in range(n):
+            if order[root] != unvisited:
+                continue
+            # call stack of (node index, position in its successors)
+            call_stack: List[Tuple[int, int]] = [(root, indptr[root])]
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+
+            while call_stack:
+                v, edge_pos = call_stack[-1]
+                if edge_pos < indptr[v + 1]:
+                    call_stack[-1] = (v, edge_pos + 1)
+                    w = indices[edge_pos]
+                    if order[w] == unvisited:
+                        order[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = True
+                        call_stack.append((w, indptr[w]))
+                    elif on_stack[w] and order[w] < low[v]:
+                        low[v] = order[w]
+                    continue
+
+                call_stack.pop()
+                if call_stack:
+                    parent = call_stack[-1][0]
+                    if low[v] < low[parent]:
+                        low[parent] = low[v]
+                if low[v] == order[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        scc_by_index[w] = scc_count
+                        if w == v:
+                            break
+                    scc_count += 1
+
+        return scc_by_index, scc_count
+
+    def condensation(self) -> "CompactCondensation":
+        return CompactCondensation(self)
+
+    def node_dep_ids_iter(
+        self, c: Optional["CompactCondensation"] = None
+    ) -> Generator[
+        Tuple[nxGraphNodeID, Set[nxGraphNodeID], Set[nxGraphNodeID]], None, None
+    ]:
+        """
+        Native graph_traversal.node_dep_ids_iter for a CompactGraph
+        and optional precomputed condensation.
+
+        Visits SCCs by increasing topological level (leaf SCCs first)
+        and yields each node by decreasing ID with its sets of direct
+        and indirect dependency node IDs.
+
+        Like the networkx traversal, indirect deps are the other
+        members of the node's SCC and the descendants of every SCC on
+        the node's level (i.e. including sibling SCC descendants).
+
+        >>> list(CompactGraph([], [(0, 1), (1, 2)]).node_dep_ids_iter())
+        [(2, set(), set()), (1, {2}, set()), (0, {1}, {2})]
+        """
+        if c is None:
+            c = self.condensation()
+        node_ids = self.node_ids
+
+        for scc_ids in c.scc_ids_by_level():
+            level_descendants: FrozenSet[int] = frozenset().union(
+                *(c.descendants[scc] for scc in scc_ids)
+            )
+            level_node_indices = [index for scc in scc_ids for index in c.members[scc]]
+            for index in sorted(
+                level_node_indices, key=lambda index: node_ids[index], reverse=True
+            ):
+                scc = c.scc_by_index[index]
+                direct_dep_indices = set(self.successor_indices(index))
+                indirect_dep_indices = (
+                    (c.members[scc] | level_descendants) - direct_dep_indices - {index}
+                )
+                yield (
+                    node_ids[index],
+                    {node_ids[i] for i in direct_dep_indices},
+                    {node_ids[i] for i in indirect_dep_indices},
+                )
+
+
+class CompactCondensation:
+    """
+    The SCC condensation of a CompactGraph with:
+
+    * scc_by_index: SCC index by node index (reverse topological order)
+    * members: frozenset of member node indices by SCC index
+    * levels: topological level by SCC index where leaf SCCs are at
+      level zero and other SCCs are one more than their highest successor
+    * descendants: frozenset of node indices reachable from each SCC
+      excluding its own members
+
+    Descendants are computed bottom up by merging the member and
+    descendant sets of successor SCCs.
+
+    Takes optional precomputed SCC indices by node index (e.g. loaded
+    from the DB) in reverse topological order to skip finding SCCs.
+    """
+
+    def __init__(self, g: CompactGraph, scc_by_index: Optional[Iterable[int]] = None):
+        if scc_by_index is None:
+            self.scc_by_index, self.scc_count = g.strongly_connected_components()
+        else:
+            self.scc_by_index = array("l", scc_by_index)
+            if len(self.scc_by_index) != g.number_of_nodes():
+                raise ValueError(
+                    f"got {len(self.scc_by_index)} SCC indices for {g.number_of_nodes()} nodes"
+                )
+            self.scc_count = max(self.scc_by_index, default=-1) + 1
+
+        member_lists: List[List[int]] = [[] for _ in range(self.scc_count)]
+        for index, scc in enumerate(self.scc_by_index):
+            member_lists[scc].append(index)
+        self.members: List[FrozenSet[int]] = [
+            frozenset(member_list) for member_list in member_lists
+        ]
+
+        self.levels: "array[int]" = array("l", [0] * self.scc_count)
+        self.successors: List[FrozenSet[int]] = []
+        self.descendants: List[FrozenSet[int]] = []
+        # Tarjan's algorithm numbers successor SCCs first
+        for scc in range(self.scc_count):
+            successor_sccs = frozenset(
+                self.scc_by_index[dst_index]
+                for index in self.members[scc]
+                for dst_index in g.successor_indices(index)
+            ) - {scc}
+            if any(succ > scc for succ in successor_sccs):
+                raise ValueError(
+                    f"SCC {scc} points to later SCCs; not in reverse topological order"
+                )
+            self.successors.append(successor_sccs)
+            self.levels[scc] = (
+                1 + max(self.levels[succ] for succ in successor_sccs)
+                if successor_sccs
+                else 0
+            )
+            self.descendants.append(
+                frozenset().union(
+                    *(
+                        self.members[succ] | self.descendants[succ]
+                        for succ in successor_sccs
+                    )
+                )
+            )
+
+    def scc_ids_by_level(self) -> List[List[int]]:
+        "Returns SCC indices grouped by level from leaf SCCs to root SCCs"
+        by_level: List[List[int]] = [[] for _ in range(self.depth())]
+        for scc, level in enumerate(self.levels):
+            by_level[level].append(scc)
+        return by_level
+
+    def node_indices_by_level(self) -> List[List[int]]:
+        "Returns node indices grouped by the level of their SCC"
+        return [
+            [index for scc in scc_ids for index in self.members[scc]]
+            for scc_ids in self.scc_ids_by_level()
+        ]
+
+    def closure_sizes(self) -> "array[int]":
+        """
+        Returns the number of distinct nodes reachable from each node
+        by node index (i.e. its all_deps count)
+        """
+        # NB: a node's SCC members include itself
+        return array(
+            "l",
+            (
+                len(self.members[scc] | self.descendants[scc]) - 1
+                for scc in self.scc_by_index
+            ),
+        )
+
+    def closure_unions(
+        self, values_by_index: Sequence[AbstractSet[T]]
+    ) -> List[FrozenSet[T]]:
+        """
+        Returns the union of the value sets of each node and the nodes
+        reachable from it by node index (e.g. the distinct maintainers
+        of a package version and its dependencies)
+
+        Merges the value sets of SCC members and successor SCCs bottom
+        up like descendants, so each SCC is visited once.
+
+        >>> g = CompactGraph([], [(0, 1), (1, 2), (2, 1), (3, 2)])
+        >>> [sorted(values) for values in g.condensation().closure_unions([{"a"}, {"b"}, set(), {"b", "c"}])]
+        [['a', 'b'], ['b'], ['b'], ['b', 'c']]
+        """
+        merged: List[FrozenSet[T]] = []
+        for scc in range(self.scc_count):
+            merged.append(
+                frozenset().union(
+                    *(values_by_index[index] for index in self.members[scc]),
+                    *(merged[succ] for succ in self.successors[scc]),
+                )
+            )
+        return [merged[scc] for scc in self.scc_by_index]
+
+    def depth(self) -> int:
+        "Returns the number of topological levels"
+        return max(self.levels, default=-1) + 1
+
+    def to_networkx(self, g: CompactGraph) -> nx.DiGraph:
+        """
+        Returns a networkx DiGraph of the condensation like
+        networkx.algorithms.components.condensation with node attr
+        "members" and graph attr "mapping" using node IDs from g
+
+        >>> g = CompactGraph([], [(0, 1), (1, 0), (1, 2)])
+        >>> c = g.condensation().to_networkx(g)
+        >>> list(c.nodes(data=True)), list(c.edges), c.graph['mapping']
+        ([(0, {'members': {2}}), (1, {'members': {0, 1}})], [(1, 0)], {0: 1, 1: 1, 2: 0})
+        """
+        c = nx.DiGraph()
+        for scc, members in enumerate(self.members):
+            c.add_node(scc, members={g.node_ids[index] for index in members})
+        c.add_edges_from(
+            (scc, succ)
+            for scc, successors in enumerate(self.successors)
+            for succ in successors
+        )
+        c.graph["mapping"] = {
+            g.node_ids[index]: scc for index, scc in enumerate(self.scc_by_index)
+        }
+        return c
+
+    def get_stats(self, g: CompactGraph) -> Dict[str, Union[int, float, bool]]:
+        """
+        Returns basic stats from graph_util.get_graph_stats for the graph
+        without the degree histogram, longest path, or cycle
+
+        >>> g = CompactGraph([], [(0, 1), (1, 2)])
+        >>> g.condensation().get_stats(g)
+        {'node_count': 3, 'edge_count': 2, 'density': 0.3333333333333333, 'is_dag': True, 'longest_path_length': 3, 'average_in_degree': 0.6666666666666666, 'average_out_degree': 0.6666666666666666}
+        """
+        node_count, edge_count = g.number_of_nodes(), g.number_of_edges()
+        average_degree = edge_count / float(node_count) if node_count else 0.0
+        return dict(
+            node_count=node_count,
+            edge_count=edge_count,
+            density=(
+                edge_count / float(node_count * (node_count - 1))
+                if node_count > 1
+                else 0.0
+            ),
+            is_dag=self.scc_count == node_count
+            and not any(
+                index in g.successor_indices(index) for index in range(node_count)
+            ),
+            # the number of nodes on the longest path through the condensation
+            longest_path_length=self.depth(),
+            average_in_degree=average_degree,
+            average_out_degree=average_degree,
+        )
+
+
+def _degree_histogram(g: CompactGraph, step: int = 1) -> List[int]:
+    """
+    Returns a list of node counts by degree (in plus out degree) like
+    networkx.classes.function.degree_histogram counting every step-th
+    node step times
+
+    >>> _degree_histogram(CompactGraph([], [(0, 1), (1, 2), (3, 1)]))
+    [0, 3, 0, 1]
+    """
+    in_degrees = Counter(g.indices)
+    histogram: List[int] = []
+    for index in range(0, g.number_of_nodes(), step):
+        degree = g.indptr[index + 1] - g.indptr[index] + in_degrees[index]
+        if degree >= len(histogram):
+            histogram.extend([0] * (degree + 1 - len(histogram)))
+        histogram[degree] += step
+    return histogram
+
+
+def _bounded_longest_path_length(
+    g: CompactGraph, max_work: Optional[int] = None
+) -> Tuple[int, bool, bool]:
+    """
+    Runs an iterative DFS that stops after following max_work edges
+    and returns:
+
+    * the number of nodes on the longest path found from a finished node
+    * whether a cycle was found
+    * whether the search finished
+
+    When the search finishes without finding a cycle the longest path
+    length is exact. Otherwise it's a lower bound.
+
+    >>> _bounded_longest_path_length(CompactGraph([], [(0, 1), (1, 2), (0, 2)]))
+    (3, False, True)
+    >>> _bounded_longest_path_length(CompactGraph([], [(0, 1), (1, 2), (0, 2)]), max_work=1)
+    (0, False, False)
+    >>> _bounded_longest_path_length(CompactGraph([], [(0, 1), (1, 0)]))[1:]
+    (True, True)
+    """
+    node_count = g.number_of_nodes()
+    indptr, indices = g.indptr, g.indices
+    # nodes on the longest path starting at a finished node index
+    longest = array("l", [0] * node_count)
+    # 0 unvisited, 1 on the DFS stack, 2 finished
+    state = bytearray(node_count)
+    work, found_cycle = 0, False
+
+    for root in range(node_count):
+        if state[root]:
+            continue
+        state[root] = 1
+        # node index and position of its next successor to visit
+        stack: List[List[int]] = [[root, indptr[root]]]
+        while stack:
+            frame = stack[-1]
+            index, position = frame
+            if position < indptr[index + 1]:
+                if max_work is not None and work >= max_work:
+                    return max(longest, default=0), found_cycle, False
+                work += 1
+                frame[1] += 1
+                succ = indices[position]
+                if state[succ] == 0:
+                    state[succ] = 1
+                    stack.append([succ, indptr[succ]])
+                elif state[succ] == 1:
+                    found_cycle = True
+            else:
+                stack.pop()
+                state[index] = 2
+                longest[index] = 1 + max(
+                    (longest[succ] for succ in g.successor_indices(index)), default=0
+                )
+    return max(longest, default=0), found_cycle, True
+
+
+def get_graph_stats(
+    g: CompactGraph,
+    c: Optional[CompactCondensation] = None,
+    max_work: Optional[int] = None,
+) -> Dict[str, Union[None, int, float, bool, List[int]]]:
+    """
+    Returns graph_util.get_graph_stats stats for a CompactGraph without
+    the longest path or cycle node lists.
+
+    Uses the condensation c for is_dag and longest_path_length when
+    provided. Otherwise runs a DFS that follows at most max_work edges.
+
+    When the graph has more than max_work nodes the degree histogram is
+    estimated from a sample of max_work evenly spaced nodes.
+
+    Sets approximate to True when a histogram was sampled or the DFS
+    stopped early. In that case is_dag is None unless a cycle was
+    found and longest_path_length is a lower bound.
+
+    >>> g = CompactGraph([], [(0, 1), (1, 2), (0, 2)])
+    >>> get_graph_stats(g)
+    {'node_count': 3, 'edge_count': 3, 'density': 0.5, 'average_in_degree': 1.0, 'average_out_degree': 1.0, 'degree_histograph': [0, 0, 3], 'approximate': False, 'is_dag': True, 'longest_path_length': 3}
+    >>> stats = get_graph_stats(g, max_work=1)
+    >>> stats['approximate'], stats['is_dag'], stats['degree_histograph']
+    (True, None, [0, 0, 3])
+    """
+    node_count, edge_count = g.number_of_nodes(), g.number_of_edges()
+    average_degree = edge_count / float(node_count) if node_count else 0.0
+    step = (
+        1
+        if max_work is None or node_count <= max_work
+        else -(-node_count // max(max_work, 1))
+    )
+    stats: Dict[str, Union[None, int, float, bool, List[int]]] = dict(
+        node_count=node_count,
+        edge_count=edge_count,
+        # zero (no edges) to one (all nodes directly linked to each other)
+        density=(
+            edge_count / float(node_count * (node_count - 1)) if node_count > 1 else 0.0
+        ),
+        average_in_degree=average_degree,
+        average_out_degree=average_degree,
+        degree_histograph=_degree_histogram(g, step),
+        approximate=step > 1,
+    )
+
+    if c is not None:
+        condensation_stats = c.get_stats(g)
+        stats["is_dag"] = condensation_stats["is_dag"]
+        stats["longest_path_length"] = condensation_stats["longest_path_length"]
+        return stats
+
+    longest_path_length, found_cycle, finished = _bounded_longest_path_length(
+        g, max_work
+    )
+    if finished:
+        stats["is_dag"] = not found_cycle
+    else:
+        stats["approximate"] = True
+        stats["is_dag"] = False if found_cycle else None
+    if not found_cycle:
+        stats["longest_path_length"] = longest_path_length
+    return stats
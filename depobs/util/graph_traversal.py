@@ -4,6 +4,7 @@ from typing import (
     Optional,
     Set,
     Tuple,
+    Union,
 )
 
 import networkx as nx
@@ -11,8 +12,7 @@ from networkx.algorithms.components import condensation
 from networkx.algorithms.dag import descendants, is_directed_acyclic_graph
 from networkx.algorithms.shortest_paths.generic import has_path
 
-# type alias to not confuse ints as nxGraphNodeIDs with other ints
-nxGraphNodeID = int
+from depobs.util.compact_graph import CompactCondensation, CompactGraph, nxGraphNodeID
 
 
 def outer_in_graph_iter(
@@ -97,7 +97,8 @@ def scc_ids_to_graph_node_ids(
 
 
 def node_dep_ids_iter(
-    g: nx.DiGraph, c: Optional[nx.DiGraph] = None
+    g: Union[nx.DiGraph, CompactGraph],
+    c: Union[None, nx.DiGraph, CompactCondensation] = None,
 ) -> Generator[
     Tuple[nxGraphNodeID, Set[nxGraphNodeID], Set[nxGraphNodeID]], None, None
 ]:
@@ -116,7 +117,17 @@ def node_dep_ids_iter(
     * yields each node ID once
     * successive node IDs only depend on/point to previously visited
     nodes or other nodes within their set?
+
+    Runs natively on a CompactGraph with an optional precomputed
+    CompactCondensation without building a networkx graph.
     """
+    if isinstance(g, CompactGraph):
+        yield from g.node_dep_ids_iter(
+            c if isinstance(c, CompactCondensation) else None
+        )
+        return
+    assert not isinstance(c, CompactCondensation)
+
     if not c:
         c = condensation(g)
 
@@ -17,6 +17,7 @@ import networkx as nx
 
 from depobs.database import models
 from depobs.models.nodejs import NPMPackage
+from depobs.util.compact_graph import CompactCondensation, CompactGraph
 from depobs.models.rust import RustCrate, RustPackageID, RustPackage
 
 T = TypeVar("T")
@@ -182,22 +183,57 @@ def package_graph_to_networkx_graph(db_graph: models.PackageGraph) -> nx.DiGraph
     return g
 
 
+def package_graph_to_compact_graph(db_graph: models.PackageGraph) -> CompactGraph:
+    """
+    Converts a DB PackageGraph model into a CompactGraph
+    """
+    edges: List[Tuple[int, int]] = []
+    for parent_package_id, child_package_id in db_graph.package_links_by_id.values():
+        if parent_package_id == child_package_id:
+            log.warning(f"skipping self loop for package version ID {child_package_id}")
+            continue
+        edges.append((parent_package_id, child_package_id))
+    return CompactGraph(db_graph.distinct_package_ids, edges, graph_id=db_graph.id)
+
+
+def package_graph_to_compact_condensation(
+    db_graph: models.PackageGraph, g: CompactGraph
+) -> CompactCondensation:
+    """
+    Returns the condensation of the CompactGraph g of a DB PackageGraph
+    using SCCs saved with the PackageGraph when available
+    """
+    saved: Optional[models.PackageGraphCondensation] = db_graph.condensation
+    c = saved.to_compact_condensation(g) if saved is not None else None
+    return c if c is not None else g.condensation()
+
+
 def update_node_attrs(
-    g: nx.DiGraph, **updates_by_package_version_id: Dict[int, Any]
-) -> None:
+    g: Union[nx.DiGraph, CompactGraph],
+    **updates_by_package_version_id: Dict[int, Any],
+) -> Union[nx.DiGraph, CompactGraph]:
     """
     Updates or replaces node attributes for nodes in a nx.DiGraph.
 
     Takes a dict of updates
     using the node id.
 
+    For a CompactGraph replaces the attribute column for all nodes.
+
     e.g.
 
     >>> update_node_attrs(nx.DiGraph([(0, 1)]), label={0: 'node 0'}).nodes[0]['label']
     'node 0'
     >>> update_node_attrs(nx.DiGraph([(0, 1)]), label={0: 'node 0'}, foo={0: 'bar'}).nodes[0]
     {'label': 'node 0', 'foo': 'bar'}
+    >>> update_node_attrs(CompactGraph([0], []), label={0: 'node 0'}).nodes[0]['label']
+    'node 0'
     """
+    if isinstance(g, CompactGraph):
+        for attr_name, node_id_to_value in updates_by_package_version_id.items():
+            g.set_node_attr_column(attr_name, node_id_to_value)
+        return g
+
     for attr_name, node_id_to_value in updates_by_package_version_id.items():
         for node_id, attr_value in node_id_to_value.items():
             g.nodes[node_id][attr_name] = attr_value
@@ -0,0 +1,80 @@
+"""
+Helpers for serving prometheus_client metrics from the website and
+worker /__metrics__ endpoints.
+
+Metric values are per process unless the PROMETHEUS_MULTIPROC_DIR
+environment variable names a directory for processes (e.g. uwsgi
+processes sharing a port) to write their values to. prometheus_client
+reads it on import, so set it and clear the directory before starting
+the processes. Whichever process answers a scrape then renders the
+totals over every process.
+"""
+import errno
+import logging
+import os
+from typing import Optional, Tuple
+
+import prometheus_client
+from prometheus_client import multiprocess
+from prometheus_client.exposition import choose_encoder
+
+
+log = logging.getLogger(__name__)
+
+METRICS_PATH = "/__metrics__"
+
+# request latency bucket upper bounds in seconds
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+
+
+def get_registry() -> prometheus_client.CollectorRegistry:
+    """
+    Returns a registry collecting every process's values in multiprocess
+    mode and the default per process registry otherwise
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return prometheus_client.REGISTRY
+    registry = prometheus_client.CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render(accept: Optional[str] = None) -> Tuple[bytes, str]:
+    """
+    Returns metrics and their content type in the format an Accept
+    header asks for (the Prometheus text format by default)
+    """
+    encoder, content_type = choose_encoder(accept)
+    return encoder(get_registry()), content_type
+
+
+def start_http_server(port: int, host: str = "0.0.0.0") -> None:
+    """
+    Serves metrics from a daemon thread e.g. for worker processes that
+    don't serve HTTP otherwise
+
+    Doesn't serve when another process already serves the port, which
+    renders this process's values too in multiprocess mode.
+    """
+    try:
+        prometheus_client.start_http_server(port, addr=host, registry=get_registry())
+    except OSError as err:
+        if err.errno != errno.EADDRINUSE:
+            raise
+        log.info(f"not serving metrics: port {port} is already in use")
+        return
+    log.info(f"serving metrics at http://{host}:{port}{METRICS_PATH}")
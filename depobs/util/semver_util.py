@@ -0,0 +1,290 @@
+"""
+npm (node-semver) compatible version parsing and range matching
+
+https://github.com/npm/node-semver#ranges
+"""
+import functools
+import re
+from typing import Iterable, List, NamedTuple, Optional, Tuple, Union
+
+
+PrereleaseIdentifier = Union[int, str]
+
+VERSION_RE = re.compile(
+    r"""^\s*[v=]*\s*
+(?P<major>0|[1-9]\d*)\.(?P<minor>0|[1-9]\d*)\.(?P<patch>0|[1-9]\d*)
+(?:-(?P<prerelease>[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?
+(?:\+[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*)?
+\s*$""",
+    re.VERBOSE,
+)
+
+# a possibly partial version with x, X, or * wildcards e.g. 1.x or 1.2
+PARTIAL_VERSION_RE = re.compile(
+    r"""^[v=]*\s*
+(?P<major>0|[1-9]\d*|[xX*])
+(?:\.(?P<minor>0|[1-9]\d*|[xX*])
+(?:\.(?P<patch>0|[1-9]\d*|[xX*])
+(?:-?(?P<prerelease>[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?
+(?:\+[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*)?
+)?)?$""",
+    re.VERBOSE,
+)
+
+COMPARATOR_RE = re.compile(r"^(?P<operator><=|>=|<|>|=|~>|~|\^)?(?P<version>.*)$")
+
+
+class Version(NamedTuple):
+    major: int
+    minor: int
+    patch: int
+    prerelease: Tuple[PrereleaseIdentifier, ...] = ()
+
+    @property
+    def sort_key(self) -> Tuple:
+        """
+        Key sorting versions by semver precedence (release versions
+        after their prereleases and numeric prerelease identifiers
+        before alphanumeric ones)
+
+        >>> sorted(["1.0.0", "1.0.0-rc.1", "1.0.0-beta.11", "1.0.0-beta.2", "1.0.0-alpha"], key=lambda v: parse_version(v).sort_key)
+        ['1.0.0-alpha', '1.0.0-beta.2', '1.0.0-beta.11', '1.0.0-rc.1', '1.0.0']
+        """
+        if not self.prerelease:
+            prerelease_key: Tuple = (1,)
+        else:
+            prerelease_key = (
+                0,
+                tuple(
+                    (0, identifier, "")
+                    if isinstance(identifier, int)
+                    else (1, 0, identifier)
+                    for identifier in self.prerelease
+                ),
+            )
+        return (self.major, self.minor, self.patch, prerelease_key)
+
+    def __str__(self) -> str:
+        version = f"{self.major}.{self.minor}.{self.patch}"
+        if self.prerelease:
+            version += "-" + ".".join(str(identifier) for identifier in self.prerelease)
+        return version
+
+
+# (operator, version) with operator one of <, <=, >, >=, =
+Comparator = Tuple[str, Version]
+
+# comparators that must all match
+ComparatorSet = List[Comparator]
+
+
+def _parse_prerelease(prerelease: Optional[str]) -> Tuple[PrereleaseIdentifier, ...]:
+    if not prerelease:
+        return ()
+    return tuple(
+        int(identifier) if identifier.isdigit() else identifier
+        for identifier in prerelease.split(".")
+    )
+
+
+@functools.lru_cache(maxsize=8192)
+def parse_version(version: str) -> Version:
+    """
+    Parses a full semver version or raises a ValueError
+
+    >>> parse_version("v1.2.3-beta.4+build.5")
+    Version(major=1, minor=2, patch=3, prerelease=('beta', 4))
+    >>> parse_version("1.2")
+    Traceback (most recent call last):
+    ...
+    ValueError: invalid semver version '1.2'
+    """
+    match = VERSION_RE.match(version)
+    if match is None:
+        raise ValueError(f"invalid semver version {version!r}")
+    return Version(
+        int(match["major"]),
+        int(match["minor"]),
+        int(match["patch"]),
+        _parse_prerelease(match["prerelease"]),
+    )
+
+
+def _is_wildcard(part: Optional[str]) -> bool:
+    return part is None or part in {"x", "X", "*"}
+
+
+def _lowest_prerelease(major: int, minor: int, patch: int) -> Version:
+    "returns the version before all prereleases of major.minor.patch"
+    return Version(major, minor, patch, (0,))
+
+
+def _desugar_comparator(operator: str, version: str) -> ComparatorSet:
+    """
+    Returns primitive comparators for a comparator with an optional
+    tilde, caret, or comparison operator and possibly partial version
+    """
+    match = PARTIAL_VERSION_RE.match(version)
+    if match is None:
+        raise ValueError(f"invalid semver comparator {operator}{version}")
+
+    major_part, minor_part, patch_part = match["major"], match["minor"], match["patch"]
+    prerelease = _parse_prerelease(match["prerelease"])
+    if _is_wildcard(major_part):
+        # * or x matches any version (but only some for < and >)
+        if operator in {"<", ">"}:
+            return [("<", _lowest_prerelease(0, 0, 0))]
+        return []
+    major = int(major_part)
+    if _is_wildcard(minor_part):
+        minor, patch, wildcard = 0, 0, "minor"
+    elif _is_wildcard(patch_part):
+        minor, patch, wildcard = int(minor_part), 0, "patch"
+    else:
+        minor, patch, wildcard = int(minor_part), int(patch_part), ""
+    lower = Version(major, minor, patch, prerelease)
+
+    if operator in {"~", "~>"}:
+        if wildcard == "minor":
+            return [(">=", lower), ("<", _lowest_prerelease(major + 1, 0, 0))]
+        return [(">=", lower), ("<", _lowest_prerelease(major, minor + 1, 0))]
+    elif operator == "^":
+        if major != 0 or wildcard == "minor":
+            upper = _lowest_prerelease(major + 1, 0, 0)
+        elif minor != 0 or wildcard == "patch":
+            upper = _lowest_prerelease(0, minor + 1, 0)
+        else:
+            upper = _lowest_prerelease(0, 0, patch + 1)
+        return [(">=", lower), ("<", upper)]
+    elif wildcard:
+        next_version = (
+            _lowest_prerelease(major + 1, 0, 0)
+            if wildcard == "minor"
+            else _lowest_prerelease(major, minor + 1, 0)
+        )
+        if operator in {"", "="}:
+            return [(">=", lower), ("<", next_version)]
+        elif operator == ">":
+            return [(">=", next_version._replace(prerelease=()))]
+        elif operator == ">=":
+            return [(">=", lower)]
+        elif operator == "<":
+            return [("<", lower._replace(prerelease=(0,)))]
+        else:  # <=
+            return [("<", next_version)]
+    return [(operator or "=", lower)]
+
+
+def _parse_comparator_set(comparator_set: str) -> ComparatorSet:
+    comparator_set = comparator_set.strip()
+    # hyphen ranges e.g. 1.2 - 2.3.4
+    hyphen_match = re.match(r"^(\S+)\s+-\s+(\S+)$", comparator_set)
+    if hyphen_match:
+        lower, upper = hyphen_match.groups()
+        return _desugar_comparator(">=", lower) + _desugar_comparator("<=", upper)
+
+    # remove spaces between operators and versions e.g. >= 1.2.3
+    comparator_set = re.sub(r"(<=|>=|<|>|=|~>|~|\^)\s+", r"\1", comparator_set)
+    comparators: ComparatorSet = []
+    for comparator in comparator_set.split():
+        match = COMPARATOR_RE.match(comparator)
+        assert match is not None
+        comparators.extend(
+            _desugar_comparator(match["operator"] or "", match["version"])
+        )
+    return comparators
+
+
+@functools.lru_cache(maxsize=8192)
+def parse_range(version_range: str) -> Tuple[Tuple[Comparator, ...], ...]:
+    """
+    Parses a node-semver range into comparator sets (any of which
+    can match) or raises a ValueError (e.g. for URL, git, tag, and
+    alias dependency specs)
+
+    >>> [[f"{op}{bound}" for op, bound in comparator_set] for comparator_set in parse_range("^1.2.3 || 2.x || >= 3.1 <3.2.0-beta")]
+    [['>=1.2.3', '<2.0.0-0'], ['>=2.0.0', '<3.0.0-0'], ['>=3.1.0', '<3.2.0-beta']]
+    >>> parse_range("git+https://github.com/mozilla-services/dependency-observatory.git")
+    Traceback (most recent call last):
+    ...
+    ValueError: invalid semver comparator git+https://github.com/mozilla-services/dependency-observatory.git
+    """
+    return tuple(
+        tuple(_parse_comparator_set(comparator_set))
+        for comparator_set in version_range.split("||")
+    )
+
+
+def _compare(operator: str, left: Version, right: Version) -> bool:
+    left_key, right_key = left.sort_key, right.sort_key
+    if operator == "<":
+        return left_key < right_key
+    elif operator == "<=":
+        return left_key <= right_key
+    elif operator == ">":
+        return left_key > right_key
+    elif operator == ">=":
+        return left_key >= right_key
+    return left_key == right_key
+
+
+def _comparator_set_matches(
+    comparator_set: Iterable[Comparator], version: Version
+) -> bool:
+    comparator_set = list(comparator_set)
+    if not all(_compare(op, version, bound) for op, bound in comparator_set):
+        return False
+    if not version.prerelease:
+        return True
+    # prereleases only match comparators with a prerelease of the
+    # same major.minor.patch (excluding our lowest prerelease bounds)
+    return any(
+        bound.prerelease and bound.prerelease != (0,) and bound[:3] == version[:3]
+        for _, bound in comparator_set
+    )
+
+
+def satisfies(version: str, version_range: str) -> bool:
+    """
+    Returns whether a version satisfies a node-semver range. Raises
+    ValueError for invalid versions or ranges.
+
+    >>> satisfies("1.9.0", "^1.2.3")
+    True
+    >>> satisfies("2.0.0-beta.1", "^1.2.3")
+    False
+    >>> satisfies("1.2.4-beta.1", ">=1.2.4-beta.0 <2")
+    True
+    """
+    parsed_version = parse_version(version)
+    return any(
+        _comparator_set_matches(comparator_set, parsed_version)
+        for comparator_set in parse_range(version_range)
+    )
+
+
+def max_satisfying(versions: Iterable[str], version_range: str) -> Optional[str]:
+    """
+    Returns the highest version satisfying a range or None. Skips
+    invalid versions and raises ValueError for invalid ranges.
+
+    >>> max_satisfying(["1.2.3", "1.10.0", "2.0.0", "not-semver"], "^1.0.0")
+    '1.10.0'
+    >>> max_satisfying(["1.2.3"], "^2.0.0") is None
+    True
+    """
+    comparator_sets = parse_range(version_range)
+    best: Optional[Tuple[Tuple, str]] = None
+    for version in versions:
+        try:
+            parsed_version = parse_version(version)
+        except ValueError:
+            continue
+        if not any(
+            _comparator_set_matches(comparator_set, parsed_version)
+            for comparator_set in comparator_sets
+        ):
+            continue
+        if best is None or parsed_version.sort_key > best[0]:
+            best = (parsed_version.sort_key, version)
+    return best[1] if best else None
@@ -1,11 +1,13 @@
 import itertools
 import json
 import logging
+import re
 from typing import (
     Any,
     Dict,
     Generator,
     Iterable,
+    List,
     Optional,
     Sequence,
     Union,
@@ -91,3 +93,67 @@ def parse_stdout_as_jsonlines(stdout: Optional[str]) -> Optional[Sequence[Dict]]
         log.warning(f"error parsing stdout as JSON: {e}")
 
     return None
+
+
+def _strip_or_none(value: Any) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    return value.strip() or None
+
+
+def parse_npm_human(human: Any) -> Optional[Dict[str, Optional[str]]]:
+    """
+    Returns the name, email, url, and identity key (the lowercased
+    email or name) of an npm package.json human object or string or
+    None when it has neither a name nor an email
+
+    https://docs.npmjs.com/cli/v6/configuring-npm/package-json#people-fields-author-contributors
+
+    >>> parse_npm_human({"name": "Barney Rubble", "email": "B@rubble.com"})
+    {'name': 'Barney Rubble', 'email': 'B@rubble.com', 'url': None, 'key': 'b@rubble.com'}
+    >>> parse_npm_human("Barney Rubble <b@rubble.com> (http://barnyrubble.tumblr.com/)")
+    {'name': 'Barney Rubble', 'email': 'b@rubble.com', 'url': 'http://barnyrubble.tumblr.com/', 'key': 'b@rubble.com'}
+    >>> parse_npm_human("Barney Rubble")["key"]
+    'barney rubble'
+    >>> parse_npm_human({"url": "http://example.com/"}) is None
+    True
+    """
+    if isinstance(human, dict):
+        name, email, url = (
+            _strip_or_none(human.get("name", None)),
+            _strip_or_none(human.get("email", None)),
+            _strip_or_none(human.get("url", None)),
+        )
+    elif isinstance(human, str):
+        email_match, url_match = re.search(r"<([^>]*)>", human), re.search(
+            r"\(([^)]*)\)", human
+        )
+        name = _strip_or_none(re.sub(r"\s*[<(].*$", "", human, flags=re.DOTALL))
+        email = _strip_or_none(email_match.group(1)) if email_match else None
+        url = _strip_or_none(url_match.group(1)) if url_match else None
+    else:
+        return None
+    key = email or name
+    if key is None:
+        return None
+    return dict(name=name, email=email, url=url, key=key.lower())
+
+
+def parse_npm_humans(humans: Any) -> List[Dict[str, Optional[str]]]:
+    """
+    Returns the distinct parsed humans by identity key in order from
+    an npm package.json people field
+
+    >>> [human["key"] for human in parse_npm_humans(["a <a@example.com>", {"email": "A@example.com"}, "b", 1])]
+    ['a@example.com', 'b']
+    >>> parse_npm_humans(None)
+    []
+    """
+    if not isinstance(humans, list):
+        return []
+    parsed_by_key: Dict[str, Dict[str, Optional[str]]] = {}
+    for human in humans:
+        parsed = parse_npm_human(human)
+        if parsed is not None and parsed["key"] not in parsed_by_key:
+            parsed_by_key[str(parsed["key"])] = parsed
+    return list(parsed_by_key.values())
@@ -1,6 +1,7 @@
 import os
 import secrets
 import sys
+import tempfile
 from typing import Any, Dict, List, Union
 
 LOGGING = {
@@ -31,6 +32,8 @@ LOGGING = {
             "level": "INFO",
         },
         "depobs.clients.npmsio": {"handlers": ["console"], "level": "INFO"},
+        "depobs.clients.rate_limit": {"handlers": ["console"], "level": "INFO"},
+        "depobs.database.async_models": {"handlers": ["console"], "level": "INFO"},
         "depobs.database.models": {"handlers": ["console"], "level": "INFO"},
         "depobs.database.serializers": {"handlers": ["console"], "level": "INFO"},
         "depobs.util.serialize_util": {"handlers": ["console"], "level": "INFO"},
@@ -48,10 +51,18 @@ LOGGING = {
             "handlers": ["console"],
             "level": "INFO",
         },
+        "depobs.worker.npm_resolver": {
+            "handlers": ["console"],
+            "level": "INFO",
+        },
         "depobs.worker.scoring": {
             "handlers": ["console"],
             "level": "INFO",
         },
+        "depobs.worker.scoring_executor": {
+            "handlers": ["console"],
+            "level": "INFO",
+        },
         "depobs.worker.background_task_runner": {
             "handlers": ["console"],
             "level": "INFO",
@@ -82,10 +93,22 @@ LOGGING = {
         },
         "depobs.worker.tasks.start_scan": {"handlers": ["console"], "level": "INFO"},
         "depobs.worker.tasks.finish_scan": {"handlers": ["console"], "level": "INFO"},
+        "depobs.worker.tasks.refresh_npm_package_data": {
+            "handlers": ["console"],
+            "level": "INFO",
+        },
+        "depobs.worker.tasks.save_graph_stats": {
+            "handlers": ["console"],
+            "level": "INFO",
+        },
         "depobs.worker.tasks.save_pubsub_messages": {
             "handlers": ["console"],
             "level": "INFO",
         },
+        "depobs.worker.tasks.watch_scan_jobs": {
+            "handlers": ["console"],
+            "level": "INFO",
+        },
         "depobs.util.dataviz_util": {"handlers": ["console"], "level": "INFO"},
     },
 }
@@ -98,8 +121,37 @@ SQLALCHEMY_TRACK_MODIFICATIONS = bool(
 # print debug queries
 # SQLALCHEMY_ECHO = True
 
+# number of threads for worker DB queries (each holds a DB connection
+# so keep it below the SQLAlchemy connection pool size)
+DB_THREADS = int(os.environ.get("DB_THREADS", 4))
+
 DEFAULT_SCORED_AFTER_DAYS = 365 * 10
 
+# port for background task workers to serve /__metrics__ on (zero
+# doesn't serve them; the website serves them on its own port)
+WORKER_METRICS_PORT = int(os.environ.get("WORKER_METRICS_PORT", 0))
+
+# compute package graph stats when saving scan results instead of in
+# the save_next_graph_stats background task
+GRAPH_STATS_ON_INGEST = bool(os.environ.get("GRAPH_STATS_ON_INGEST", False))
+
+# max number of edges to follow (and nodes to sample for the degree
+# histogram) when computing stats for one graph before approximating
+GRAPH_STATS_MAX_WORK = int(os.environ.get("GRAPH_STATS_MAX_WORK", 1_000_000))
+
+# number of times save_next_graph_stats tries to save stats for a graph
+# and seconds to wait before the first retry (doubling each attempt)
+GRAPH_STATS_MAX_ATTEMPTS = int(os.environ.get("GRAPH_STATS_MAX_ATTEMPTS", 3))
+GRAPH_STATS_RETRY_SECONDS = int(os.environ.get("GRAPH_STATS_RETRY_SECONDS", 3600))
+
+# number of processes to score package graphs in (zero scores graphs on
+# a thread in the worker process instead)
+SCORING_PROCESSES = int(os.environ.get("SCORING_PROCESSES", os.cpu_count() or 1))
+
+# max total package versions to send to a scoring process in one task
+# (graphs with more get a task to themselves)
+SCORING_TASK_MAX_NODES = int(os.environ.get("SCORING_TASK_MAX_NODES", 10_000))
+
 # GCP project id
 GCP_PROJECT_ID = os.environ.get("GCP_PROJECT_ID", None)
 
@@ -130,6 +182,7 @@ _job_config_defaults: Dict[
     service_account_name=os.environ.get("UNTRUSTED_JOB_SERVICE_ACCOUNT_NAME", ""),
     volume_mounts=[],
     secrets=[],
+    labels={},
 )
 
 SCAN_JOB_CONFIGS = {
@@ -164,6 +217,120 @@ SCAN_JOB_CONFIGS = {
 }
 WEB_JOB_NAMES = frozenset(SCAN_JOB_CONFIGS.keys())
 
+# max number of k8s jobs to create at once when starting a scan
+K8S_MAX_CONCURRENT_JOB_CREATES = int(
+    os.environ.get("K8S_MAX_CONCURRENT_JOB_CREATES", 10)
+)
+
+# read dependency graphs from lockfiles in the worker instead of
+# installing them in a k8s job for dep files scans with a lockfile
+SCAN_DEP_FILES_IN_WORKER = bool(int(os.environ.get("SCAN_DEP_FILES_IN_WORKER", 0)))
+
+# comma separated URL schemes and hosts the worker fetches user
+# provided dep files from (the untrusted k8s jobs fetch any URL), and
+# the max size in bytes of each dep file it reads
+DEP_FILES_ALLOWED_URL_SCHEMES: List[str] = os.environ.get(
+    "DEP_FILES_ALLOWED_URL_SCHEMES", "https"
+).split(",")
+DEP_FILES_ALLOWED_URL_HOSTS: List[str] = os.environ.get(
+    "DEP_FILES_ALLOWED_URL_HOSTS",
+    "raw.githubusercontent.com,gist.githubusercontent.com",
+).split(",")
+DEP_FILES_MAX_BYTES = int(os.environ.get("DEP_FILES_MAX_BYTES", 10 * 1024 * 1024))
+
+# max number of package versions to scan in one k8s job for package
+# scans (1 runs a job per version with the PACKAGE_VERSION env var)
+SCAN_JOB_PACKAGE_BATCH_SIZE = int(os.environ.get("SCAN_JOB_PACKAGE_BATCH_SIZE", 30))
+
+# resolve package scan dependency graphs from stored npm registry
+# entry constraints in the worker instead of installing them in k8s jobs
+SCAN_PACKAGES_WITH_RESOLVER = bool(
+    int(os.environ.get("SCAN_PACKAGES_WITH_RESOLVER", 0))
+)
+
+# resolve package versions scanned in k8s jobs from registry entry
+# constraints too and log differences from the installed graphs
+RESOLVER_CROSS_CHECK = bool(int(os.environ.get("RESOLVER_CROSS_CHECK", 0)))
+
+# max number of (package name, version range) to resolved version
+# choices to cache and seconds to cache them for (new versions
+# published to the registry can change a choice)
+RESOLVER_CACHE_SIZE = int(os.environ.get("RESOLVER_CACHE_SIZE", 100000))
+RESOLVER_CACHE_TTL_SECONDS = int(os.environ.get("RESOLVER_CACHE_TTL_SECONDS", 3600))
+
+# seconds to skip refetching package names the npm registry or npms.io
+# returned no data for
+NPM_NOT_FOUND_TTL_SECONDS = int(os.environ.get("NPM_NOT_FOUND_TTL_SECONDS", 86400))
+
+# max number of package names missing npms.io scores and npm registry
+# entries each to fetch per backfill_missing_npm_data run and seconds
+# to wait between runs
+NPM_DATA_BACKFILL_BATCH_SIZE = int(os.environ.get("NPM_DATA_BACKFILL_BATCH_SIZE", 50))
+NPM_DATA_BACKFILL_INTERVAL_SECONDS = int(
+    os.environ.get("NPM_DATA_BACKFILL_INTERVAL_SECONDS", 60)
+)
+
+# number of times backfill_missing_npm_data tries to fetch a package
+# name from a source and seconds to wait before the first retry
+# (doubling each attempt)
+NPM_DATA_BACKFILL_MAX_ATTEMPTS = int(
+    os.environ.get("NPM_DATA_BACKFILL_MAX_ATTEMPTS", 3)
+)
+NPM_DATA_BACKFILL_RETRY_SECONDS = int(
+    os.environ.get("NPM_DATA_BACKFILL_RETRY_SECONDS", 3600)
+)
+
+# seconds until npm registry entries and npms.io scores for a package
+# name are stale and refresh_npm_package_data refetches them
+NPM_REFRESH_TTL_SECONDS = {
+    "npm_registry": int(os.environ.get("NPM_REGISTRY_REFRESH_TTL_SECONDS", 86400)),
+    "npmsio": int(os.environ.get("NPMSIO_REFRESH_TTL_SECONDS", 7 * 86400)),
+}
+
+# max number of requests to each upstream per refresh_npm_package_data
+# run and seconds to wait between runs
+NPM_REFRESH_REQUEST_BUDGETS = {
+    "npm_registry": int(os.environ.get("NPM_REGISTRY_REFRESH_REQUEST_BUDGET", 100)),
+    "npmsio": int(os.environ.get("NPMSIO_REFRESH_REQUEST_BUDGET", 2)),
+}
+NPM_REFRESH_INTERVAL_SECONDS = int(os.environ.get("NPM_REFRESH_INTERVAL_SECONDS", 300))
+
+# number of most recent scans to refresh the graph package names of first
+NPM_REFRESH_RECENT_SCAN_COUNT = int(
+    os.environ.get("NPM_REFRESH_RECENT_SCAN_COUNT", 100)
+)
+
+# seconds to wait between syncs of GitHub NPM advisories updated since
+# the last sync
+GITHUB_ADVISORIES_SYNC_INTERVAL_SECONDS = int(
+    os.environ.get("GITHUB_ADVISORIES_SYNC_INTERVAL_SECONDS", 86400)
+)
+
+# seconds to use the local HIBP breach catalog and cached breach names
+# for an email account before refetching them
+HIBP_BREACH_CATALOG_TTL_SECONDS = int(
+    os.environ.get("HIBP_BREACH_CATALOG_TTL_SECONDS", 86400)
+)
+HIBP_ACCOUNT_CACHE_TTL_SECONDS = int(
+    os.environ.get("HIBP_ACCOUNT_CACHE_TTL_SECONDS", 7 * 86400)
+)
+
+# score package reports with cached HIBP maintainer breaches on scans
+# (loads graph maintainers and their cached HIBP accounts per graph, so
+# enable it when running get_maintainer_hibp_breaches)
+SCORE_MAINTAINER_BREACHES = bool(int(os.environ.get("SCORE_MAINTAINER_BREACHES", 0)))
+
+# seconds to watch scan k8s jobs and pods for before restarting the watch
+SCAN_JOB_WATCH_TIMEOUT_SECONDS = int(
+    os.environ.get("SCAN_JOB_WATCH_TIMEOUT_SECONDS", 60)
+)
+
+# seconds to wait for results after a scan job fails before failing
+# the scan (results published before the job failed can arrive late)
+SCAN_JOB_FAILURE_GRACE_SECONDS = int(
+    os.environ.get("SCAN_JOB_FAILURE_GRACE_SECONDS", 30)
+)
+
 # for local dev override set job creds
 if (
     os.environ.get("FLASK_ENV", "") == "development"
@@ -189,7 +356,7 @@ if (
 # depobs http client config
 
 _aiohttp_args = dict(
-    # time to sleep between requests in seconds
+    # minimum time between requests to the same host in seconds
     delay=0.5,
     # number of simultaneous connections to open
     max_connections=10,
@@ -211,6 +378,10 @@ HIBP_CLIENT = {
         base_url=os.environ.get("HIBP_BASE_URL", "https://haveibeenpwned.com/api/v3/"),
         additional_headers={"hibp-api-key": os.environ.get("HIBP_AUTH_TOKEN", None)},
         max_connections=1,
+        # HIBP limits requests per API key (10 per minute for the lowest tier)
+        delay=float(os.environ.get("HIBP_DELAY_SECONDS", 6)),
+        # retry 429s after the Retry-After delay
+        max_retries=3,
         user_agent="dependency_observatory",  # HIBP doesn't accept the default user agent from _aiohttp_args (reason unknown)
     ),
 }
@@ -254,12 +425,20 @@ GITHUB_CLIENT = {
             # https://developer.github.com/v4/previews/#github-packages
             "application/vnd.github.packages-preview+json",
         ],
-        # the number of concurrent workers to run github requests
+        # the number of concurrent workers to start running github requests with
         github_workers=3,
+        # the max number of workers to scale up to with rate limit headroom
+        github_max_workers=10,
+        # the max number of repos from the source to run requests for at once
+        github_max_repos_in_flight=10,
+        # the max number of responses to queue for writing before workers wait
+        github_write_queue_size=100,
         # github query types to fetch. When empty defaults to all query types.
         github_query_type=[],
         # number of github repo langs to fetch with each request
         github_repo_langs_page_size=25,
+        # number of packages to fetch security vulnerabilities for with each request
+        github_advisory_package_batch_size=25,
         # number of github repo dep manifests to fetch with each request (defaults to 1)
         github_repo_dep_manifests_page_size=1,
         # number of github repo deps for a manifest to fetch with each request (defaults to 100)
@@ -268,13 +447,52 @@ GITHUB_CLIENT = {
         github_repo_vuln_alerts_page_size=25,
         # number of github repo vulns per alerts to fetch with each request (defaults to 25)
         github_repo_vuln_alert_vulns_page_size=25,
-        # frequency in seconds to check whether worker queues are empty and quit (defaults to 3)
+        # frequency in seconds to scale workers and log throughput (defaults to 3)
         github_poll_seconds=3,
+        # optional path to checkpoint crawls to and resume them from
+        github_checkpoint_path=os.environ.get("GITHUB_CHECKPOINT_PATH", None),
+        # frequency in seconds to write crawl checkpoints
+        github_checkpoint_seconds=60,
+        # seconds since a repo's crawl finished to skip recrawling it for
+        github_repo_freshness_seconds=int(
+            os.environ.get("GITHUB_REPO_FRESHNESS_SECONDS", 86400)
+        ),
         # max times to retry a query with jitter and exponential backoff (defaults to 12). Ignores 404s and graphql not found errors
         github_max_retries=12,
+        # path to cache the github graphql introspection schema at
+        github_schema_cache_path=os.environ.get(
+            "GITHUB_SCHEMA_CACHE_PATH",
+            os.path.join(tempfile.gettempdir(), "depobs", "github_schema.json"),
+        ),
+        # seconds to use the cached github graphql schema for before refetching it
+        github_schema_cache_ttl_seconds=int(
+            os.environ.get("GITHUB_SCHEMA_CACHE_TTL_SECONDS", 7 * 86400)
+        ),
     ),
 }
 
+DEP_FILES_CLIENT = {
+    **_aiohttp_args,
+    **dict(
+        # dep file URLs are absolute
+        base_url="",
+        additional_headers={"Accept": "*/*"},
+        max_connections=4,
+        total_timeout=60,
+    ),
+}
+
+# serialize requests to each upstream host across worker replicas with
+# Postgres advisory locks held for the host's request interval
+RATE_LIMIT_ADVISORY_LOCKS = bool(int(os.environ.get("RATE_LIMIT_ADVISORY_LOCKS", 0)))
+
+# number of threads (and DB connections) to hold rate limit advisory
+# locks for each upstream host (a host's lock is held by one thread
+# across replicas at a time)
+RATE_LIMIT_ADVISORY_LOCK_THREADS = int(
+    os.environ.get("RATE_LIMIT_ADVISORY_LOCK_THREADS", 1)
+)
+
 API_TOKENS = {
     os.environ.get("ADMIN_TOKEN", secrets.token_hex(16)): "admin",
 }
@@ -1,12 +1,16 @@
 import os
 import logging
 import logging.config
+import time
 
-from flask import Flask, request
+from flask import Flask, Response, g, request
+import prometheus_client
 from dockerflow.flask import Dockerflow
+from sqlalchemy.exc import SQLAlchemyError
 
 # enable mozlog request logging
 from depobs.website.config import LOGGING
+from depobs.util import metrics_util
 
 logging.config.dictConfig(LOGGING)
 log = logging.getLogger(__name__)
@@ -26,6 +30,59 @@ class Customflow(Dockerflow):
         return out
 
 
+REQUEST_SECONDS = prometheus_client.Histogram(
+    "depobs_http_request_duration_seconds",
+    "Seconds to handle an HTTP request by route and method.",
+    ["route", "method"],
+    buckets=metrics_util.DEFAULT_BUCKETS,
+)
+RESPONSES = prometheus_client.Counter(
+    "depobs_http_responses_total",
+    "HTTP responses by route, method, and status code.",
+    ["route", "method", "status"],
+)
+# counts include zeros, so the most recently scraped process's values
+# are the current ones for every status
+SCANS = prometheus_client.Gauge(
+    "depobs_scans",
+    "Scans by status counted from the database when scraped.",
+    ["status"],
+    multiprocess_mode="mostrecent",
+)
+
+
+def start_request_timer() -> None:
+    g.request_start_time = time.perf_counter()
+
+
+def record_request_metrics(response: Response) -> Response:
+    # label by route rule instead of path to keep label values bounded
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    start_time = g.get("request_start_time", None)
+    if start_time is not None:
+        REQUEST_SECONDS.labels(route=route, method=request.method).observe(
+            time.perf_counter() - start_time
+        )
+    RESPONSES.labels(
+        route=route, method=request.method, status=response.status_code
+    ).inc()
+    return response
+
+
+def show_metrics() -> Response:
+    import depobs.database.models as models
+
+    # count from the DB since per process counters can't tell how
+    # many scans are waiting in the queue
+    try:
+        for status, count in models.get_scan_counts_by_status().items():
+            SCANS.labels(status=status).set(count)
+    except SQLAlchemyError as err:
+        log.warning(f"error counting scans by status for metrics: {err}")
+    body, content_type = metrics_util.render(request.headers.get("Accept"))
+    return Response(body, content_type=content_type)
+
+
 def create_app(test_config=None):
     # reimport to pick up changes for testing and autoreload
     import depobs.database.models as models
@@ -46,6 +103,9 @@ def create_app(test_config=None):
 
     dockerflow = Customflow(app, db=models.db, version_path="/app")
     dockerflow.init_app(app)
+    app.add_url_rule(metrics_util.METRICS_PATH, "metrics", show_metrics)
+    app.before_request(start_request_timer)
+    app.after_request(record_request_metrics)
     app.register_blueprint(views_blueprint)
 
     return app
@@ -29,8 +29,8 @@ from depobs.website.schemas import (
     ScanScoreNPMPackageRequestParamsSchema,
 )
 from depobs.database import models
-from depobs.util import graph_traversal
 from depobs.util import graph_util
+from depobs.util.compact_graph import CompactCondensation, CompactGraph
 from depobs.util.datavis_util import (
     package_score_reports_to_scores_histogram,
     package_score_reports_to_score_grades_histogram,
@@ -130,6 +130,9 @@ def show_package_report() -> Any:
         "package_report.html",
         package_report=package_report,
         package_report_fields=scoring.all_score_component_fields,
+        graph_condensation=models.get_graph_condensation(package_report.graph_id)
+        if package_report.graph_id
+        else None,
         direct_vulnerabilities=models.get_advisories_by_package_version_ids_query(
             package_version
         )
@@ -203,6 +206,9 @@ def show_dep_files_report(scan_id: int) -> Any:
         name=f"scan {scan_id}",
         scan=scan,
         package_report_fields=scoring.all_score_component_fields,
+        graph_condensation=models.get_graph_condensation(scan.graph_id)
+        if scan.graph_id
+        else None,
         advisories=models.get_advisories_by_package_version_ids_query(
             scan.package_graph.distinct_package_ids
         ).all(),
@@ -455,20 +461,20 @@ def get_condensate_graph(graph_id):
     graph result for the given graph_id
     """
     db_graph: models.PackageGraph = models.get_graph_by_id(graph_id)
-    g: nx.DiGraph = graph_util.package_graph_to_networkx_graph(db_graph)
-    c: nx.DiGraph = graph_traversal.condensation(g)
-
-    graph_util.update_node_attrs(
-        g,
-        label={
-            pv.id: f"{pv.name}@{pv.version}"
-            for pv in db_graph.distinct_package_versions_by_id.values()
-        },
+    g: CompactGraph = graph_util.package_graph_to_compact_graph(db_graph)
+    condensation: CompactCondensation = (
+        graph_util.package_graph_to_compact_condensation(db_graph, g)
     )
+    c: nx.DiGraph = condensation.to_networkx(g)
+
+    labels: Dict[models.PackageVersionID, str] = {
+        pv.id: f"{pv.name}@{pv.version}"
+        for pv in db_graph.distinct_package_versions_by_id.values()
+    }
     dot_graph: graphviz.Digraph = graph_util.nx_digraph_to_graphviz_digraph(c)
     dot_graph.attr(rankdir="LR")
 
-    for scc_node_ids in graph_traversal.outer_in_dag_iter(c):
+    for scc_node_ids in condensation.scc_ids_by_level():
         with dot_graph.subgraph() as s:
             s.attr(rank="same")
             for scc_node_id in scc_node_ids:
@@ -476,7 +482,8 @@ def get_condensate_graph(graph_id):
                     f"scc_node_id {scc_node_id} members {c.nodes[scc_node_id]['members']}"
                 )
                 component_pkgs = "\n".join(
-                    g.nodes[m_id]["label"] for m_id in c.nodes[scc_node_id]["members"]
+                    labels.get(m_id, str(m_id))
+                    for m_id in c.nodes[scc_node_id]["members"]
                 )
                 s.node(
                     str(scc_node_id),
@@ -506,12 +513,11 @@ def get_scoring_graph(graph_id: int, package_report_field: str):
 
     # find graph and score it with that component
     db_graph: models.PackageGraph = models.get_graph_by_id(graph_id)
-    g: nx.DiGraph = graph_util.package_graph_to_networkx_graph(db_graph)
-
     reports_by_package_version_id: Dict[
         models.PackageVersionID, models.PackageReport
-    ] = scoring.score_package_graph(db_graph, [component], g)
+    ] = scoring.score_package_graph(db_graph, [component])
 
+    g: nx.DiGraph = graph_util.package_graph_to_compact_graph(db_graph).to_networkx()
     graph_util.update_node_attrs(
         g,
         report=reports_by_package_version_id,
@@ -1,11 +1,45 @@
+import asyncio
+import datetime
+import functools
 import logging
-from typing import Dict, List, Optional, TypedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypedDict,
+)
 
 import kubernetes
 
+from depobs.util.type_util import Result
+
 
 log = logging.getLogger(__name__)
 
+# label on scan jobs and their pods with the scan ID
+SCAN_ID_LABEL = "depobs-scan-id"
+
+# pod container waiting reasons that won't resolve by waiting
+FATAL_POD_WAITING_REASONS = frozenset(
+    {
+        "CreateContainerConfigError",
+        "CreateContainerError",
+        "InvalidImageName",
+    }
+)
+
+# pod container waiting reasons the kubelet retries (e.g. registry
+# errors or rate limits) that are only fatal after IMAGE_PULL_GRACE_PERIOD
+IMAGE_PULL_WAITING_REASONS = frozenset({"ErrImagePull", "ImagePullBackOff"})
+
+# time from pod creation to keep waiting on image pull retries
+IMAGE_PULL_GRACE_PERIOD = datetime.timedelta(minutes=5)
+
 
 class KubeSecretVolume(TypedDict):
 
@@ -61,24 +95,63 @@ class KubeJobConfig(TypedDict):
     # volumes with secret sources
     secrets: List[KubeSecretVolume]
 
+    # labels to add to the Job and its pods
+    labels: Dict[str, str]
+
+
+class KubeJobStatus(TypedDict):
+    """
+    A terminal job state from a Job condition or pod container status
+    """
+
+    # "succeeded" or "failed"
+    status: str
+
+    # e.g. "BackoffLimitExceeded" or "ImagePullBackOff"
+    reason: str
+
+    message: str
 
+
+@functools.lru_cache(maxsize=None)
 def get_api_client(context_name: Optional[str] = None) -> kubernetes.client.ApiClient:
     """
     Returns the k8s ApiClient using the provided context name
 
     Defaults to the in cluster config when context_name is None.
+
+    Loads the config once per context name into a client specific
+    Configuration and caches the client.
     """
+    configuration = kubernetes.client.Configuration()
     if context_name is None:
-        kubernetes.config.load_incluster_config()
+        kubernetes.config.load_incluster_config(client_configuration=configuration)
     else:
-        kubernetes.config.load_kube_config(context=context_name)
-    return kubernetes.client.ApiClient(configuration=kubernetes.client.Configuration())
+        kubernetes.config.load_kube_config(
+            context=context_name, client_configuration=configuration
+        )
+    return kubernetes.client.ApiClient(configuration=configuration)
+
+
+@functools.lru_cache(maxsize=None)
+def get_core_api(context_name: Optional[str] = None) -> kubernetes.client.CoreV1Api:
+    """
+    Returns a cached k8s CoreV1Api for the provided context name
+    """
+    return kubernetes.client.CoreV1Api(api_client=get_api_client(context_name))
+
+
+@functools.lru_cache(maxsize=None)
+def get_batch_api(context_name: Optional[str] = None) -> kubernetes.client.BatchV1Api:
+    """
+    Returns a cached k8s BatchV1Api for the provided context name
+    """
+    return kubernetes.client.BatchV1Api(api_client=get_api_client(context_name))
 
 
 def create_job(
     job_config: KubeJobConfig,
 ) -> kubernetes.client.V1Job:
-    api_client = get_api_client(job_config["context_name"])
     # Configureate Pod template container
     container = kubernetes.client.V1Container(
         name=job_config["name"],
@@ -114,7 +187,7 @@ def create_job(
 
     # Create and configurate a spec section
     template = kubernetes.client.V1PodTemplateSpec(
-        metadata=kubernetes.client.V1ObjectMeta(labels={}),
+        metadata=kubernetes.client.V1ObjectMeta(labels=job_config["labels"]),
         spec=kubernetes.client.V1PodSpec(**pod_spec_kwargs),
     )
 
@@ -128,11 +201,122 @@ def create_job(
     job_obj = kubernetes.client.V1Job(
         api_version="batch/v1",
         kind="Job",
-        metadata=kubernetes.client.V1ObjectMeta(name=job_config["name"]),
+        metadata=kubernetes.client.V1ObjectMeta(
+            name=job_config["name"], labels=job_config["labels"]
+        ),
         spec=spec,
     )
-    job = kubernetes.client.BatchV1Api(api_client=api_client).create_namespaced_job(
+    job = get_batch_api(job_config["context_name"]).create_namespaced_job(
         namespace=job_config["namespace"],
         body=job_obj,
     )
     return job
+
+
+async def create_jobs(
+    job_configs: Iterable[KubeJobConfig],
+    max_concurrent: int,
+) -> Dict[str, Result[kubernetes.client.V1Job]]:
+    """
+    Creates k8s jobs on threads with at most max_concurrent create
+    requests at a time.
+
+    Returns the created job or the exception creating it by job name.
+    """
+    semaphore = asyncio.Semaphore(max_concurrent)
+    loop = asyncio.get_running_loop()
+
+    async def create(job_config: KubeJobConfig) -> kubernetes.client.V1Job:
+        async with semaphore:
+            return await loop.run_in_executor(None, create_job, job_config)
+
+    job_configs = list(job_configs)
+    results = await asyncio.gather(
+        *(create(job_config) for job_config in job_configs), return_exceptions=True
+    )
+    return {
+        job_config["name"]: result for job_config, result in zip(job_configs, results)
+    }
+
+
+def get_job_status(job: kubernetes.client.V1Job) -> Optional[KubeJobStatus]:
+    """
+    Returns the terminal status of a Job from its Complete or Failed
+    condition (e.g. after exceeding its backoff limit) or None
+    """
+    for condition in (job.status.conditions if job.status else None) or []:
+        if condition.status == "True" and condition.type in {"Complete", "Failed"}:
+            return KubeJobStatus(
+                status="succeeded" if condition.type == "Complete" else "failed",
+                reason=condition.reason or condition.type,
+                message=condition.message or "",
+            )
+    return None
+
+
+def get_pod_status(
+    pod: kubernetes.client.V1Pod, now: Optional[datetime.datetime] = None
+) -> Optional[KubeJobStatus]:
+    """
+    Returns a failed status for a Job pod stuck waiting with a
+    container error its Job won't retry (e.g. an invalid image name)
+    or failing to pull its image for longer than
+    IMAGE_PULL_GRACE_PERIOD after pod creation or None
+    """
+    if now is None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+    created_at = pod.metadata.creation_timestamp if pod.metadata else None
+    past_image_pull_grace_period = (
+        created_at is not None and now - created_at > IMAGE_PULL_GRACE_PERIOD
+    )
+    for container_status in (
+        pod.status.container_statuses if pod.status else None
+    ) or []:
+        waiting = container_status.state.waiting if container_status.state else None
+        if waiting is None:
+            continue
+        if waiting.reason in FATAL_POD_WAITING_REASONS or (
+            waiting.reason in IMAGE_PULL_WAITING_REASONS
+            and past_image_pull_grace_period
+        ):
+            return KubeJobStatus(
+                status="failed", reason=waiting.reason, message=waiting.message or ""
+            )
+    return None
+
+
+def watch_scan_job_statuses(
+    list_fn: Callable[..., Any],
+    namespace: str,
+    timeout_seconds: int,
+    watch: Optional[kubernetes.watch.Watch] = None,
+) -> Generator[Tuple[int, str, KubeJobStatus], None, None]:
+    """
+    Watches scan Jobs or pods (depending on the list function e.g.
+    BatchV1Api.list_namespaced_job or CoreV1Api.list_namespaced_pod)
+    for timeout_seconds and yields scan ID, job name, and status
+    tuples for terminal states
+    """
+    if watch is None:
+        watch = kubernetes.watch.Watch()
+    for event in watch.stream(
+        list_fn,
+        namespace,
+        label_selector=SCAN_ID_LABEL,
+        timeout_seconds=timeout_seconds,
+    ):
+        obj = event["object"]
+        labels = obj.metadata.labels or {}
+        if obj.kind == "Pod":
+            # k8s adds job-name to Job pods
+            job_name, job_status = labels.get("job-name", None), get_pod_status(obj)
+        else:
+            job_name, job_status = obj.metadata.name, get_job_status(obj)
+        if job_name is None or job_status is None:
+            continue
+        try:
+            scan_id = int(labels[SCAN_ID_LABEL])
+        except (KeyError, ValueError):
+            log.warning(f"skipping job {job_name} with invalid scan id label {labels}")
+            continue
+        yield scan_id, job_name, job_status
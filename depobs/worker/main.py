@@ -1,13 +1,16 @@
 import asyncio
+import functools
 import logging
 import time
-from typing import Any, Callable, Coroutine, Dict, List
+from typing import Any, Callable, Coroutine, Dict, List, Optional
 
 import click
 from flask import Flask
 from flask.cli import AppGroup, with_appcontext
 
-from depobs.database import models
+from depobs.clients import github, rate_limit
+from depobs.database import async_models, models
+from depobs.util import metrics_util
 from depobs.website.do import create_app
 from depobs.worker.background_task_runner import run_background_tasks
 from depobs.worker.tasks.start_scan import (
@@ -18,23 +21,40 @@ from depobs.worker.tasks.finish_scan import (
     finish_scan,
     finish_next_scan,
 )
+from depobs.worker.tasks.fetch_npm_package_data import backfill_missing_npm_data
 from depobs.worker.tasks.get_github_advisories import (
-    get_github_advisories,
-    get_github_advisories_for_package,
+    fetch_and_save_github_advisories,
+    fetch_and_save_graph_github_advisories,
+    fetch_and_save_package_github_advisories,
+    sync_github_advisories,
 )
-from depobs.worker.tasks.get_maintainer_hibp_breaches import get_maintainer_breaches
+from depobs.worker.tasks.get_maintainer_hibp_breaches import (
+    fetch_and_score_graph_maintainer_breaches,
+    get_maintainer_breaches,
+)
+from depobs.worker.tasks.refresh_npm_package_data import refresh_npm_package_data
+from depobs.worker.tasks.save_graph_stats import save_next_graph_stats
 from depobs.worker.tasks.save_pubsub_messages import save_pubsub
+from depobs.worker.tasks.watch_scan_jobs import watch_scan_jobs
 
 
 log = logging.getLogger(__name__)
 
 app = create_app()
 npm_cli = AppGroup("npm")
+github_cli = AppGroup("github")
 
-TASKS: Dict[str, Callable[[Flask, int], Coroutine[Any, Any, None]]] = {
+# background tasks by name; tasks may return e.g. the number of rows
+# they processed (which the runner ignores)
+TASKS: Dict[str, Callable[[Flask, int], Coroutine[Any, Any, Optional[int]]]] = {
     "save_pubsub": save_pubsub,
     "start_next_scan": start_next_scan,
     "finish_next_scan": finish_next_scan,
+    "save_next_graph_stats": save_next_graph_stats,
+    "watch_scan_jobs": watch_scan_jobs,
+    "backfill_missing_npm_data": backfill_missing_npm_data,
+    "refresh_npm_package_data": refresh_npm_package_data,
+    "sync_github_advisories": sync_github_advisories,
 }
 
 
@@ -42,7 +62,7 @@ TASKS: Dict[str, Callable[[Flask, int], Coroutine[Any, Any, None]]] = {
 @click.option(
     "--task-name",
     required=True,
-    type=click.Choice(TASKS.keys()),
+    type=click.Choice(list(TASKS.keys())),
     multiple=True,
 )
 @with_appcontext
@@ -51,6 +71,13 @@ def listen_and_run(task_name: List[str]) -> None:
     Run one or more background tasks
     """
     log.info(f"starting background tasks: {task_name}")
+    if app.config["RATE_LIMIT_ADVISORY_LOCKS"]:
+        log.info("coordinating upstream API rate limits with advisory locks")
+        rate_limit.set_coordinator(
+            functools.partial(async_models.hold_rate_limit_advisory_lock, app)
+        )
+    if app.config["WORKER_METRICS_PORT"]:
+        metrics_util.start_http_server(app.config["WORKER_METRICS_PORT"])
     asyncio.run(run_background_tasks(app, [TASKS[name] for name in task_name]))
 
 
@@ -82,16 +109,31 @@ def get_package_advisories(package_name: str) -> None:
     """
     Get GitHub Advisories for a specific package
     """
-    get_github_advisories_for_package(package_name)
+    asyncio.run(fetch_and_save_package_github_advisories([package_name]))
+
+
+@npm_cli.command("graph-advisories")
+@click.argument("graph_id", type=int, envvar="GRAPH_ID")
+@with_appcontext
+def get_graph_advisories(graph_id: int) -> None:
+    """
+    Get GitHub Advisories for the packages in a package graph
+    """
+    asyncio.run(fetch_and_save_graph_github_advisories(graph_id))
 
 
 @npm_cli.command("advisories")
+@click.option(
+    "--full",
+    is_flag=True,
+    help="Refetch all advisories instead of ones updated since the last sync",
+)
 @with_appcontext
-def get_ecosystem_advisories() -> None:
+def get_ecosystem_advisories(full: bool) -> None:
     """
-    Get GitHub Advisories for the NPM ecosystem
+    Get GitHub Advisories for the NPM ecosystem updated since the last sync
     """
-    get_github_advisories()
+    asyncio.run(fetch_and_save_github_advisories(full))
 
 
 @npm_cli.command("breaches")
@@ -107,8 +149,29 @@ def get_maintainer_hibp_breaches(
     get_maintainer_breaches(package_name, package_version)
 
 
+@npm_cli.command("graph-breaches")
+@click.argument("graph_id", type=int, envvar="GRAPH_ID")
+@with_appcontext
+def get_graph_maintainer_hibp_breaches(graph_id: int) -> None:
+    """
+    Get HaveIBeenPwned breaches for the maintainers of the packages in
+    a package graph and rescore the graph with them
+    """
+    asyncio.run(fetch_and_score_graph_maintainer_breaches(graph_id))
+
+
+@github_cli.command("refresh-schema")
+@with_appcontext
+def refresh_github_schema() -> None:
+    """
+    Refetch the GitHub GraphQL schema and replace the cached schema
+    """
+    asyncio.run(github.refresh_schema(app.config["GITHUB_CLIENT"]))
+
+
 def main():
     app.cli.add_command(npm_cli)
+    app.cli.add_command(github_cli)
     app.cli.main()
 
 
@@ -0,0 +1,382 @@
+"""
+Resolves npm package version dependency graphs from npm registry
+entry dependency constraints without installing them
+
+Picks the highest registry version satisfying each production
+dependency (dependencies and optionalDependencies) range, so a
+(package name, version range) choice doesn't depend on where it is in
+the graph and can be cached. npm also prefers the latest dist-tag
+version and hoists and dedupes packages in node_modules, so a
+resolved graph can differ from the installed one (RESOLVER_CROSS_CHECK
+logs the differences for package scans).
+"""
+from collections import OrderedDict
+import functools
+import logging
+import time
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from flask import current_app
+
+import depobs.database.async_models as async_models
+import depobs.database.models as models
+from depobs.models.nodejs import NPMPackage, NPMPackageID
+from depobs.util.semver_util import max_satisfying
+import depobs.worker.serializers as serializers
+from depobs.worker.tasks.fetch_npm_package_data import fetch_and_save_registry_entries
+
+
+log = logging.getLogger(__name__)
+
+# registry entry constraint type prefixes npm installs for a dependency
+PRODUCTION_TYPE_PREFIXES = {"", "optional"}
+
+# package name to version to (tarball, constraints)
+RegistryEntries = Dict[str, Dict[str, Tuple[str, List[Dict[str, str]]]]]
+
+
+class ResolvedVersionCache:
+    """
+    LRU cache of (package name, version range) to resolved version
+    choices that expire after ttl_seconds (publishing a new version
+    can change a choice)
+
+    >>> cache = ResolvedVersionCache(max_size=1, ttl_seconds=60, clock=lambda: 0)
+    >>> cache.set(("a", "^1.0.0"), "1.2.0")
+    >>> cache.get(("a", "^1.0.0"))
+    '1.2.0'
+    >>> cache.set(("b", "~2.0.0"), "2.0.3")
+    >>> cache.get(("a", "^1.0.0")) is None
+    True
+    >>> (cache.hits, cache.misses)
+    (1, 1)
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: Tuple[str, str]) -> Optional[str]:
+        entry = self._entries.get(key, None)
+        if entry is None or entry[0] <= self.clock():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Tuple[str, str], version: str) -> None:
+        self._entries[key] = (self.clock() + self.ttl_seconds, version)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+@functools.lru_cache(maxsize=None)
+def get_resolved_version_cache(max_size: int, ttl_seconds: int) -> ResolvedVersionCache:
+    "Returns a resolved version cache shared by resolves in the worker process"
+    return ResolvedVersionCache(max_size, ttl_seconds)
+
+
+def choose_version(
+    cache: ResolvedVersionCache,
+    package_name: str,
+    version_range: str,
+    versions: Collection[str],
+) -> Optional[str]:
+    """
+    Returns the highest version satisfying the range or None for
+    unsatisfiable or non-semver (e.g. git, URL, alias, or tag
+    other than latest) ranges
+
+    Re-resolves cached choices that aren't in versions (e.g. from a
+    registry entry that was removed or not loaded for this resolve).
+
+    >>> cache = ResolvedVersionCache(max_size=10, ttl_seconds=60)
+    >>> choose_version(cache, "a", "latest", ["1.0.0", "2.0.0-beta.1"])
+    '1.0.0'
+    >>> choose_version(cache, "a", "github:org/a", ["1.0.0"]) is None
+    True
+    >>> cache.set(("a", "^1.0.0"), "1.2.0")
+    >>> choose_version(cache, "a", "^1.0.0", ["1.0.0", "1.1.0"])
+    '1.1.0'
+    """
+    key = (package_name, version_range)
+    version = cache.get(key)
+    if version is not None and version in versions:
+        return version
+    try:
+        version = max_satisfying(
+            versions, "*" if version_range == "latest" else version_range
+        )
+    except ValueError:
+        return None
+    if version is not None:
+        cache.set(key, version)
+    return version
+
+
+def _get_registry_entries(package_names: List[str]) -> RegistryEntries:
+    entries: RegistryEntries = {}
+    for (
+        package_name,
+        package_version,
+        tarball,
+        constraints,
+    ) in models.get_npm_registry_entry_constraints_query(package_names):
+        # keep the most recently inserted entry for each version
+        entries.setdefault(package_name, {}).setdefault(
+            package_version, (tarball, constraints or [])
+        )
+    return entries
+
+
+async def load_registry_entries(package_names: Iterable[str]) -> RegistryEntries:
+    """
+    Returns stored registry entries for the package names and fetches
+    and saves registry entries for names without any in one batch
+    """
+    package_names = sorted(set(package_names))
+    entries = await async_models.run_in_db_thread(_get_registry_entries, package_names)
+    missing_names = [name for name in package_names if name not in entries]
+    if missing_names:
+        log.info(f"fetching {len(missing_names)} missing registry entries to resolve")
+        await fetch_and_save_registry_entries(missing_names)
+        entries.update(
+            await async_models.run_in_db_thread(_get_registry_entries, missing_names)
+        )
+    return entries
+
+
+def get_production_constraints(
+    constraints: Iterable[Dict[str, str]]
+) -> Dict[str, Tuple[str, bool]]:
+    """
+    Returns production dependency names to their version range and
+    whether they're optional (which npm prefers over dependencies)
+
+    >>> get_production_constraints([
+    ...     dict(name="a", version_range="^1.0.0", type_prefix=""),
+    ...     dict(name="a", version_range="^1.1.0", type_prefix="optional"),
+    ...     dict(name="b", version_range="^2.0.0", type_prefix="dev"),
+    ... ])
+    {'a': ('^1.1.0', True)}
+    """
+    production_constraints: Dict[str, Tuple[str, bool]] = {}
+    for constraint in constraints:
+        if constraint["type_prefix"] not in PRODUCTION_TYPE_PREFIXES:
+            continue
+        production_constraints[constraint["name"]] = (
+            constraint["version_range"],
+            constraint["type_prefix"] == "optional",
+        )
+    return production_constraints
+
+
+async def resolve_package_version(
+    package_name: str,
+    package_version: str,
+    cache: Optional[ResolvedVersionCache] = None,
+) -> Tuple[List[NPMPackage], NPMPackage]:
+    """
+    Resolves the production dependency graph of a package version
+    one dependency level at a time, loading (and fetching missing)
+    registry entries for each level's package names in bulk.
+
+    Returns the resolved NPMPackages and the root NPMPackage. Raises a
+    ValueError when the package version isn't in the registry.
+
+    Requires depobs flask app context.
+    """
+    if cache is None:
+        cache = get_resolved_version_cache(
+            current_app.config["RESOLVER_CACHE_SIZE"],
+            current_app.config["RESOLVER_CACHE_TTL_SECONDS"],
+        )
+    entries = await load_registry_entries([package_name])
+    if package_version not in entries.get(package_name, {}):
+        raise ValueError(
+            f"registry entry not found for {package_name}@{package_version}"
+        )
+
+    pkgs: Dict[NPMPackageID, NPMPackage] = {}
+    root_id = f"{package_name}@{package_version}"
+    # names we loaded or tried to fetch registry entries for
+    loaded_names: Set[str] = {package_name}
+    frontier: Set[Tuple[str, str]] = {(package_name, package_version)}
+    while frontier:
+        level_names = {
+            name
+            for pkg_name, pkg_version in frontier
+            for name in get_production_constraints(entries[pkg_name][pkg_version][1])
+        } - loaded_names
+        if level_names:
+            entries.update(await load_registry_entries(level_names))
+            loaded_names |= level_names
+        next_frontier: Set[Tuple[str, str]] = set()
+        for pkg_name, pkg_version in sorted(frontier):
+            tarball, constraints = entries[pkg_name][pkg_version]
+            pkg = NPMPackage(name=pkg_name, version=pkg_version, resolved=tarball)
+            pkgs[pkg.package_id] = pkg
+            for dep_name, (version_range, optional) in sorted(
+                get_production_constraints(constraints).items()
+            ):
+                dep_version = choose_version(
+                    cache, dep_name, version_range, entries.get(dep_name, {}).keys()
+                )
+                if dep_version is None:
+                    (log.debug if optional else log.warn)(
+                        f"{pkg.package_id} skipping unresolved dependency {dep_name}@{version_range!r}"
+                    )
+                    continue
+                dep_id = f"{dep_name}@{dep_version}"
+                pkg.dependencies.append(dep_id)
+                if dep_id not in pkgs:
+                    next_frontier.add((dep_name, dep_version))
+        frontier = {
+            (name, version)
+            for name, version in next_frontier
+            if f"{name}@{version}" not in pkgs
+        }
+    return list(pkgs.values()), pkgs[root_id]
+
+
+def deserialize_resolved_graph(
+    pkgs: Iterable[NPMPackage], root: NPMPackage
+) -> Generator[Any, None, None]:
+    "Deserializes resolved NPMPackages into PackageVersions and a PackageGraph"
+    return serializers.deserialize_npm_dependency_graph(
+        [vars(pkg) for pkg in pkgs], vars(root), "npm"
+    )
+
+
+async def resolve_and_save_package_version_graph(
+    package_name: str, package_version: str, graph_stats: bool = False
+) -> models.PackageGraph:
+    """
+    Resolves and saves the dependency graph of a package version and
+    returns the saved PackageGraph
+    """
+    pkgs, root = await resolve_package_version(package_name, package_version)
+    log.info(
+        f"resolved {len(pkgs)} package versions for {package_name}@{package_version}"
+    )
+    db_graph: Optional[models.PackageGraph] = None
+    for deserialized in deserialize_resolved_graph(pkgs, root):
+        await async_models.save_deserialized(deserialized, graph_stats)
+        if isinstance(deserialized, tuple) and isinstance(
+            deserialized[0], models.PackageGraph
+        ):
+            db_graph = deserialized[0]
+    assert db_graph is not None and db_graph.id
+    return db_graph
+
+
+GraphLink = Tuple[NPMPackageID, NPMPackageID]
+
+
+def get_resolved_links(pkgs: Iterable[NPMPackage]) -> Set[GraphLink]:
+    "Returns (parent id, child id) links for resolved NPMPackages"
+    return {(pkg.package_id, dep_id) for pkg in pkgs for dep_id in pkg.dependencies}
+
+
+def get_deserialized_links(
+    links: Iterable[Tuple[models.PackageVersion, models.PackageVersion]]
+) -> Set[GraphLink]:
+    "Returns (parent id, child id) links for deserialized PackageGraph links"
+    return {
+        (f"{parent.name}@{parent.version}", f"{child.name}@{child.version}")
+        for parent, child in links
+    }
+
+
+def compare_graph_links(
+    resolved_links: Set[GraphLink], installed_links: Set[GraphLink]
+) -> Dict[str, List[GraphLink]]:
+    """
+    Compares resolved and installed graph links and returns:
+
+    * mismatched: installed links the resolver picked another version of the child for
+    * missing: other installed links the resolved graph doesn't include
+    * extra: other resolved links the installed graph doesn't include
+
+    >>> compare_graph_links(
+    ...     {("a@1.0.0", "b@1.1.0"), ("a@1.0.0", "c@2.0.0")},
+    ...     {("a@1.0.0", "b@1.0.1"), ("a@1.0.0", "d@1.0.0")},
+    ... )
+    {'mismatched': [('a@1.0.0', 'b@1.0.1')], 'missing': [('a@1.0.0', 'd@1.0.0')], 'extra': [('a@1.0.0', 'c@2.0.0')]}
+    """
+
+    def parent_and_child_name(link: GraphLink) -> Tuple[NPMPackageID, str]:
+        return link[0], link[1].rsplit("@", 1)[0]
+
+    only_resolved = resolved_links - installed_links
+    only_installed = installed_links - resolved_links
+    resolved_child_names = {parent_and_child_name(link) for link in only_resolved}
+    installed_child_names = {parent_and_child_name(link) for link in only_installed}
+    return dict(
+        mismatched=sorted(
+            link
+            for link in only_installed
+            if parent_and_child_name(link) in resolved_child_names
+        ),
+        missing=sorted(
+            link
+            for link in only_installed
+            if parent_and_child_name(link) not in resolved_child_names
+        ),
+        extra=sorted(
+            link
+            for link in only_resolved
+            if parent_and_child_name(link) not in installed_child_names
+        ),
+    )
+
+
+async def cross_check_package_version_graph(
+    package_name: str,
+    package_version: str,
+    installed_links: Iterable[Tuple[models.PackageVersion, models.PackageVersion]],
+) -> Dict[str, List[GraphLink]]:
+    """
+    Resolves a package version graph without saving it and logs
+    differences from the links of the graph a scan job installed
+    """
+    pkgs, _ = await resolve_package_version(package_name, package_version)
+    differences = compare_graph_links(
+        get_resolved_links(pkgs), get_deserialized_links(installed_links)
+    )
+    if any(differences.values()):
+        log.warn(
+            f"resolved graph for {package_name}@{package_version} differs from installed graph: "
+            + ", ".join(f"{len(links)} {kind}" for kind, links in differences.items())
+        )
+        log.debug(
+            f"resolved graph for {package_name}@{package_version} differences: {differences}"
+        )
+    else:
+        log.info(
+            f"resolved graph for {package_name}@{package_version} matches installed graph"
+        )
+    return differences
@@ -1,5 +1,5 @@
 import logging
-from typing import AsyncGenerator, Callable
+from typing import AsyncGenerator, Callable, List
 
 from depobs.database import models
 from depobs.worker import k8s
@@ -14,8 +14,19 @@ class ScanConfig:
     """
 
     job_configs: Callable[[models.Scan], AsyncGenerator[k8s.KubeJobConfig, None]]
-    score_packages: Callable[[models.Scan], AsyncGenerator[models.PackageReport, None]]
+    # yields the package report records for one scored graph at a time
+    score_packages: Callable[
+        [models.Scan], AsyncGenerator[List[models.PackageReportRecord], None]
+    ]
 
     @staticmethod
     async def save_results(scan: models.Scan) -> None:
         raise NotImplementedError()
+
+    @staticmethod
+    async def save_worker_results(scan: models.Scan) -> bool:
+        """
+        Saves scan results without running k8s jobs when the scan can
+        run in the worker. Returns whether it saved results.
+        """
+        return False
@@ -1,27 +1,145 @@
+import asyncio
 import json
 import logging
 from random import randrange
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Dict, Iterable, List
+from urllib.parse import urlsplit
 
+import aiohttp
 from flask import current_app
 
+import depobs.database.async_models as async_models
 import depobs.database.models as models
-import depobs.worker.scoring as scoring
 import depobs.worker.serializers as serializers
 
+from depobs.clients.aiohttp_client import aiohttp_session
 from depobs.worker import k8s
 from depobs.worker.tasks.fetch_npm_package_data import (
-    fetch_missing_npm_data,
+    fetch_missing_graph_npm_data,
 )
 from depobs.worker.scan_config import ScanConfig
+from depobs.worker.scoring_executor import score_package_graphs
 
 
 log = logging.getLogger(__name__)
 
 
+class DepFileFetchError(Exception):
+    "a dep file URL the worker doesn't fetch or a dep file that's too large"
+
+
+def check_dep_file_url(
+    url: str, allowed_schemes: Iterable[str], allowed_hosts: Iterable[str]
+) -> None:
+    """
+    Raises DepFileFetchError unless a dep file URL has an allowed
+    scheme and host
+
+    >>> check_dep_file_url("https://raw.githubusercontent.com/o/r/HEAD/package.json", ["https"], ["raw.githubusercontent.com"])
+    >>> check_dep_file_url("https://raw.githubusercontent.com@10.0.0.1/package.json", ["https"], ["raw.githubusercontent.com"])
+    Traceback (most recent call last):
+    ...
+    depobs.worker.scans.npm_dep_files.DepFileFetchError: dep file URL https://raw.githubusercontent.com@10.0.0.1/package.json host 10.0.0.1 isn't allowed
+    >>> check_dep_file_url("http://raw.githubusercontent.com/package.json", ["https"], ["raw.githubusercontent.com"])
+    Traceback (most recent call last):
+    ...
+    depobs.worker.scans.npm_dep_files.DepFileFetchError: dep file URL http://raw.githubusercontent.com/package.json scheme http isn't allowed
+    """
+    parsed = urlsplit(url)
+    if parsed.scheme not in allowed_schemes:
+        raise DepFileFetchError(
+            f"dep file URL {url} scheme {parsed.scheme} isn't allowed"
+        )
+    if parsed.hostname not in allowed_hosts or parsed.port is not None:
+        raise DepFileFetchError(
+            f"dep file URL {url} host {parsed.netloc.rsplit('@', 1)[-1]} isn't allowed"
+        )
+
+
+async def read_text(response: aiohttp.ClientResponse, max_bytes: int) -> str:
+    """
+    Reads a response body as text in chunks and raises
+    DepFileFetchError when it's larger than max_bytes
+    """
+    if response.content_length is not None and response.content_length > max_bytes:
+        raise DepFileFetchError(
+            f"dep file {response.url} is {response.content_length} bytes"
+            f" (max {max_bytes})"
+        )
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            raise DepFileFetchError(
+                f"dep file {response.url} is over {max_bytes} bytes"
+            )
+    return body.decode(response.charset or "utf-8")
+
+
+async def fetch_dep_files(
+    dep_file_urls: Iterable[models.ScanFileURL],
+) -> Dict[str, str]:
+    """
+    Fetches scan dependency files and returns their contents by filename
+
+    Only fetches URLs with DEP_FILES_ALLOWED_URL_SCHEMES and
+    DEP_FILES_ALLOWED_URL_HOSTS without following redirects and reads
+    at most DEP_FILES_MAX_BYTES of each, since the URLs are user
+    provided and the worker can reach internal services.
+    """
+    dep_file_urls = list(dep_file_urls)
+    for dep_file in dep_file_urls:
+        check_dep_file_url(
+            dep_file["url"],
+            current_app.config["DEP_FILES_ALLOWED_URL_SCHEMES"],
+            current_app.config["DEP_FILES_ALLOWED_URL_HOSTS"],
+        )
+    max_bytes = current_app.config["DEP_FILES_MAX_BYTES"]
+    async with aiohttp_session(current_app.config["DEP_FILES_CLIENT"]) as s:
+
+        async def fetch_text(url: str) -> str:
+            async with s.get(url, allow_redirects=False) as response:
+                # includes redirects, which could point at internal hosts
+                if response.status != 200:
+                    raise DepFileFetchError(
+                        f"dep file {url} returned status {response.status}"
+                    )
+                return await read_text(response, max_bytes)
+
+        contents = await asyncio.gather(
+            *[fetch_text(dep_file["url"]) for dep_file in dep_file_urls]
+        )
+    return {
+        dep_file["filename"]: content
+        for dep_file, content in zip(dep_file_urls, contents)
+    }
+
+
+async def save_deserialized_graph(
+    scan: models.Scan,
+    deserialized_models: Iterable[Any],
+    graph_stats: bool,
+) -> None:
+    """
+    Saves deserialized scan models and updates the scan graph_ids
+    """
+    for deserialized in deserialized_models:
+        await async_models.save_deserialized(deserialized, graph_stats)
+        if isinstance(deserialized, tuple) and isinstance(
+            deserialized[0], models.PackageGraph
+        ):
+            log.info(f"scan: {scan.id} saving results for {list(scan.dep_file_urls())}")
+            db_graph: models.PackageGraph = deserialized[0]
+            assert db_graph.id
+            models.save_scan_with_graph_ids(scan, [db_graph.id])
+
+
 class NPMDepFilesScan(ScanConfig):
     """
     Scan and score dependencies from a manifest file and one or more optional lockfiles
+
+    Reads the dependency graph from the lockfile in the worker instead
+    of installing it in a k8s job when SCAN_DEP_FILES_IN_WORKER is set
     """
 
     @staticmethod
@@ -49,6 +167,7 @@ class NPMDepFilesScan(ScanConfig):
             "secrets": config["secrets"],
             "service_account_name": config["service_account_name"],
             "volume_mounts": config["volume_mounts"],
+            "labels": {**config["labels"], k8s.SCAN_ID_LABEL: str(scan.id)},
         }
 
     @staticmethod
@@ -57,33 +176,66 @@ class NPMDepFilesScan(ScanConfig):
         Take scan pubsub results, deserializes and saves them, and updates the scan graph_ids.
         """
         log.info(f"scan: {scan.id} saving job results")
-        for deserialized in serializers.deserialize_scan_job_results(
-            models.get_scan_results_by_id(scan.id)
+        graph_stats = current_app.config["GRAPH_STATS_ON_INGEST"]
+        await save_deserialized_graph(
+            scan,
+            serializers.deserialize_scan_job_results(
+                models.get_scan_results_by_id(scan.id), graph_stats
+            ),
+            graph_stats,
+        )
+
+    @staticmethod
+    async def save_worker_results(scan: models.Scan) -> bool:
+        """
+        Fetches the scan lockfile and manifest, deserializes and saves
+        their dependency graph, and updates the scan graph_ids.
+
+        Returns False without saving results for scans without a
+        lockfile or when fetching or parsing the dep files fails, so
+        the scan falls back to installing them in a k8s job.
+        """
+        dep_file_urls = list(scan.dep_file_urls())
+        if not (
+            current_app.config["SCAN_DEP_FILES_IN_WORKER"]
+            and serializers.get_lockfile_name(
+                dep_file["filename"] for dep_file in dep_file_urls
+            )
         ):
-            models.save_deserialized(deserialized)
-            if isinstance(deserialized, tuple) and isinstance(
-                deserialized[0], models.PackageGraph
-            ):
-                log.info(
-                    f"scan: {scan.id} saving job results for {list(scan.dep_file_urls())}"
-                )
-                db_graph: models.PackageGraph = deserialized[0]
-                assert db_graph.id
-                models.save_scan_with_graph_ids(scan, [db_graph.id])
+            return False
+
+        log.info(f"scan: {scan.id} reading lockfile results in worker")
+        try:
+            # deserialize before saving so a bad lockfile doesn't save
+            # a partial graph
+            deserialized_models = list(
+                serializers.deserialize_dep_files(await fetch_dep_files(dep_file_urls))
+            )
+        except Exception as err:
+            log.warning(
+                f"scan: {scan.id} error reading dep files in worker falling back to a k8s job: {err}"
+            )
+            return False
+        await save_deserialized_graph(
+            scan,
+            deserialized_models,
+            current_app.config["GRAPH_STATS_ON_INGEST"],
+        )
+        return True
 
     @staticmethod
     async def score_packages(
         scan: models.Scan,
-    ) -> AsyncGenerator[models.PackageReport, None]:
+    ) -> AsyncGenerator[List[models.PackageReportRecord], None]:
         log.info(
             f"scan: {scan.id} fetching missing npms.io scores and npm registry entries for scoring"
         )
-        await fetch_missing_npm_data()
+        db_graphs = list(scan.generate_package_graphs())
+        await fetch_missing_graph_npm_data(db_graphs)
 
         # TODO: handle non-lib package; list all top level packages and score them on the graph?
         # TODO: handle a library package score as usual (make sure we don't pollute the package version entry)
         # TODO: score the graph without a root package_version
         log.info(f"scan: {scan.id} scoring packages from scan graph {scan.graph_id}")
-        for graph in scan.generate_package_graphs():
-            for package_report in scoring.score_package_graph(graph).values():
-                yield package_report
+        async for package_report_records in score_package_graphs(db_graphs):
+            yield package_report_records
@@ -1,24 +1,32 @@
 import asyncio
+import json
 import logging
 from random import randrange
 from typing import (
     AsyncGenerator,
+    Dict,
     Generator,
     List,
     Optional,
+    Tuple,
 )
 
 from flask import current_app
 
+import depobs.database.async_models as async_models
 import depobs.database.models as models
-import depobs.worker.scoring as scoring
 import depobs.worker.serializers as serializers
 import depobs.worker.validators as validators
 from depobs.worker import k8s
+from depobs.worker.npm_resolver import (
+    cross_check_package_version_graph,
+    resolve_and_save_package_version_graph,
+)
 from depobs.worker.tasks.fetch_npm_package_data import (
-    fetch_missing_npm_data,
+    fetch_missing_graph_npm_data,
 )
 from depobs.worker.scan_config import ScanConfig
+from depobs.worker.scoring_executor import score_package_graphs
 from depobs.worker.tasks.fetch_npm_package_data import (
     fetch_and_save_npmsio_scores,
     fetch_and_save_registry_entries,
@@ -61,11 +69,11 @@ async def package_release_versions(
             break
 
 
-def score_package_version(
+def get_package_version_graph(
     scan: models.Scan, package_name: str, package_version: str
-) -> Generator[models.PackageReport, None, None]:
+) -> Optional[models.PackageGraph]:
     log.info(
-        f"scan: {scan.id} scoring package version {package_name}@{package_version}"
+        f"scan: {scan.id} finding graph to score for package version {package_name}@{package_version}"
     )
     package: Optional[
         models.PackageVersion
@@ -76,7 +84,7 @@ def score_package_version(
         log.error(
             f"scan: {scan.id} PackageVersion not found for {package_name} {package_version}. Skipping scoring."
         )
-        return
+        return None
 
     db_graph: Optional[
         models.PackageGraph
@@ -85,25 +93,76 @@ def score_package_version(
         log.info(f"scan: {scan.id} {package.name} {package.version} has no children")
         db_graph = models.PackageGraph(id=None, link_ids=[])
         db_graph.distinct_package_ids = set([package.id])
+    return db_graph
+
+
+def get_job_package_version_results(
+    job_name: str,
+) -> Generator[Tuple[str, str, models.JSONResult], None, None]:
+    """
+    Yields package name, version, and the pubsub result for each
+    package version a job published results for. Batched jobs publish
+    one result per package version and a trailing task_complete
+    result without task results (which is skipped).
 
-    for package_report in scoring.score_package_graph(db_graph).values():
-        yield package_report
+    Yields only the latest result for each package version, since a
+    retried job republishes the versions it already published.
+    """
+    latest_results: Dict[Tuple[str, str], models.JSONResult] = {}
+    for result in models.get_scan_results_by_job_name(job_name):
+        envvar_args = next(
+            (
+                line["envvar_args"]
+                for line in result.data["data"]
+                if isinstance(line, dict) and line.get("type", None) == "task_result"
+            ),
+            None,
+        )
+        if envvar_args is None:
+            continue
+        latest_results[
+            envvar_args["PACKAGE_NAME"], envvar_args["PACKAGE_VERSION"]
+        ] = result
+    for (package_name, package_version), result in latest_results.items():
+        yield package_name, package_version, result
 
 
 class NPMPackageScan(ScanConfig):
     """
     Scan and score one or more release versions of a package from a registry
+
+    Scans up to SCAN_JOB_PACKAGE_BATCH_SIZE versions in each job or
+    resolves their graphs from registry entries in the worker when
+    SCAN_PACKAGES_WITH_RESOLVER is set
     """
 
     @staticmethod
     async def job_configs(scan: models.Scan) -> AsyncGenerator[k8s.KubeJobConfig, None]:
-        async for entry in package_release_versions(scan):
-            # we need a source_url and git_head or a tarball url to install
+        batch_size = current_app.config["SCAN_JOB_PACKAGE_BATCH_SIZE"]
+        # we need a source_url and git_head or a tarball url to install
+        package_versions = [
+            entry.package_version or "unknown-package-version"
+            async for entry in package_release_versions(scan)
+        ]
+        for batch_start in range(0, len(package_versions), batch_size):
+            batch = package_versions[batch_start : batch_start + batch_size]
             job_name = f"scan-{scan.id}-pkg-{hex(randrange(1 << 32))[2:]}"
             config = dict(
                 **current_app.config["SCAN_JOB_CONFIGS"][scan.name],
                 name=job_name,
             )
+            if batch_size > 1:
+                # the job scans each PACKAGE_NAME@VERSION target in turn
+                package_env = {
+                    "PACKAGE_TARGETS_JSON": json.dumps(
+                        [
+                            f"{scan.package_name}@{package_version}"
+                            for package_version in batch
+                        ]
+                    ),
+                }
+            else:
+                package_env = {"PACKAGE_VERSION": batch[0]}
             yield {
                 "backoff_limit": config["backoff_limit"],
                 "context_name": config["context_name"],
@@ -114,31 +173,34 @@ class NPMPackageScan(ScanConfig):
                 "env": {
                     **config["env"],
                     "PACKAGE_NAME": scan.package_name,
-                    "PACKAGE_VERSION": entry.package_version
-                    or "unknown-package-version",
+                    **package_env,
                     "JOB_NAME": config["name"],
                     "SCAN_ID": str(scan.id),
                 },
                 "secrets": config["secrets"],
                 "service_account_name": config["service_account_name"],
                 "volume_mounts": config["volume_mounts"],
+                "labels": {**config["labels"], k8s.SCAN_ID_LABEL: str(scan.id)},
             }
 
     @staticmethod
     async def save_results(scan: models.Scan) -> None:
         log.info(f"scan: {scan.id} saving job results")
         db_graph_ids: List[int] = []
+        graph_stats = current_app.config["GRAPH_STATS_ON_INGEST"]
         for job_name in scan.job_names:
-            for result in models.get_scan_results_by_job_name(job_name):
-                package_name = result.data["data"][0]["envvar_args"]["PACKAGE_NAME"]
-                package_version = result.data["data"][0]["envvar_args"][
-                    "PACKAGE_VERSION"
-                ]
+            for (
+                package_name,
+                package_version,
+                result,
+            ) in get_job_package_version_results(job_name):
                 log.info(
                     f"scan: {scan.id} saving job {job_name} results for {package_name}@{package_version}"
                 )
-                for deserialized in serializers.deserialize_scan_job_results([result]):
-                    models.save_deserialized(deserialized)
+                for deserialized in serializers.deserialize_scan_job_results(
+                    [result], graph_stats
+                ):
+                    await async_models.save_deserialized(deserialized, graph_stats)
                     if isinstance(deserialized, tuple) and isinstance(
                         deserialized[0], models.PackageGraph
                     ):
@@ -148,28 +210,79 @@ class NPMPackageScan(ScanConfig):
                             f"scan: {scan.id} adding job {job_name} graph {db_graph.id}"
                         )
                         db_graph_ids.append(db_graph.id)
+                        if current_app.config["RESOLVER_CROSS_CHECK"]:
+                            try:
+                                await cross_check_package_version_graph(
+                                    package_name,
+                                    package_version,
+                                    deserialized[2],  # type: ignore
+                                )
+                            except Exception as err:
+                                log.error(
+                                    f"scan: {scan.id} error cross checking resolved graph for {package_name}@{package_version}: {err}"
+                                )
         models.save_scan_with_graph_ids(scan, db_graph_ids)
 
+    @staticmethod
+    async def save_worker_results(scan: models.Scan) -> bool:
+        """
+        Resolves and saves the dependency graph of each package
+        release version from registry entries and updates the scan
+        graph_ids when SCAN_PACKAGES_WITH_RESOLVER is set.
+        """
+        if not current_app.config["SCAN_PACKAGES_WITH_RESOLVER"]:
+            return False
+
+        log.info(f"scan: {scan.id} resolving package graphs in worker")
+        graph_stats = current_app.config["GRAPH_STATS_ON_INGEST"]
+        db_graph_ids: List[int] = []
+        async for entry in package_release_versions(scan):
+            db_graph = await resolve_and_save_package_version_graph(
+                scan.package_name, entry.package_version, graph_stats
+            )
+            log.info(
+                f"scan: {scan.id} adding resolved graph {db_graph.id} for {scan.package_name}@{entry.package_version}"
+            )
+            db_graph_ids.append(db_graph.id)
+        if not db_graph_ids:
+            raise Exception(
+                f"scan: {scan.id} found no release versions of {scan.package_name} to resolve"
+            )
+        models.save_scan_with_graph_ids(scan, db_graph_ids)
+        return True
+
     @staticmethod
     async def score_packages(
         scan: models.Scan,
-    ) -> AsyncGenerator[models.PackageReport, None]:
+    ) -> AsyncGenerator[List[models.PackageReportRecord], None]:
+        if scan.job_names == []:
+            log.info(f"scan: {scan.id} scoring resolved graphs {scan.graph_ids}")
+            db_graphs = list(scan.generate_package_graphs())
+        else:
+            package_versions = set(
+                [
+                    package_version
+                    for job_name in scan.job_names
+                    for _, package_version, _ in get_job_package_version_results(
+                        job_name
+                    )
+                ]
+            )
+            log.info(
+                f"scan: {scan.id} scoring {len(package_versions)} package versions"
+            )
+            db_graphs = [
+                db_graph
+                for db_graph in (
+                    get_package_version_graph(scan, scan.package_name, package_version)
+                    for package_version in package_versions
+                )
+                if db_graph is not None
+            ]
+
         log.info(
             f"scan: {scan.id} fetching missing npms.io scores and npm registry entries for scoring"
         )
-        await fetch_missing_npm_data()
-
-        package_versions = set(
-            [
-                result.data["data"][0]["envvar_args"]["PACKAGE_VERSION"]
-                for job_name in scan.job_names
-                for result in models.get_scan_results_by_job_name(job_name)
-            ]
-        )
-
-        log.info(f"scan: {scan.id} scoring {len(package_versions)} package versions")
-        for package_version in package_versions:
-            for package_report in score_package_version(
-                scan, scan.package_name, package_version
-            ):
-                yield package_report
+        await fetch_missing_graph_npm_data(db_graphs)
+        async for package_report_records in score_package_graphs(db_graphs):
+            yield package_report_records
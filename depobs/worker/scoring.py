@@ -4,7 +4,20 @@ from datetime import datetime
 import enum
 import logging
 from os.path import commonprefix
-from typing import Any, Dict, List, Optional, Set, Type, Tuple, Union, Iterable
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 import networkx as nx
 
@@ -13,13 +26,29 @@ from depobs.database.models import (
     PackageVersionID,
     PackageGraph,
     PackageReport,
+    PackageReportRecord,
 )
+from depobs.util.compact_graph import CompactCondensation, CompactGraph
 from depobs.util.graph_traversal import node_dep_ids_iter
 from depobs.util import graph_util
 
 
 log = logging.getLogger(__name__)
 
+# graph types score components read node data from with g.nodes[node_id]
+ScoringGraph = Union[nx.DiGraph, CompactGraph]
+
+
+class ScoringPackageVersion(NamedTuple):
+    "the PackageVersion fields PackageVersionScoreComponent reads"
+    name: str
+    version: str
+
+
+class ScoringAdvisory(NamedTuple):
+    "the Advisory fields AdvisoryScoreComponent reads"
+    severity: Optional[str]
+
 
 class AdvisorySeverity(enum.Enum):
     CRITICAL = "critical"
@@ -41,7 +70,9 @@ def zeroed_severity_counter() -> Counter:
     return counter
 
 
-def count_advisories_by_severity(advisories: List[Advisory]) -> Counter:
+def count_advisories_by_severity(
+    advisories: Sequence[Union[Advisory, ScoringAdvisory]]
+) -> Counter:
     """Given a list of advisories returns a collections.Counter with
     counts for non-zero severities.
 
@@ -66,7 +97,7 @@ class ScoreComponent:
 
     # aggregates over nodes in graph mapped to types (e.g. score, total LOC, total vulns, unique
     # vulnerabilities w/ counts by severity, etc.)
-    # get_node_aggregates
+    # get_graph_aggregates computes and adds as node attrs
     aggregate_fields: Dict[str, Any] = dict()
 
     @staticmethod
@@ -79,10 +110,19 @@ class ScoreComponent:
         """
         raise NotImplementedError()
 
+    @staticmethod
+    def to_picklable_data(data: Any) -> Any:
+        """
+        Returns node data from data_by_package_version_id with only
+        the fields get_package_report_updates reads to pickle cheaply
+        for scoring in another process.
+        """
+        return data
+
     @staticmethod
     def get_package_report_updates(
         component: Type["ScoreComponent"],
-        g: nx.DiGraph,
+        g: ScoringGraph,
         node_id: int,
         direct_dep_ids: Set[int],
         indirect_dep_ids: Set[int],
@@ -90,13 +130,22 @@ class ScoreComponent:
         """Computes fields from node with data, direct_deps, indirect_deps"""
         raise NotImplementedError()
 
-    def get_node_aggregates(self, node: Dict) -> Dict[str, Any]:
+    @staticmethod
+    def get_graph_aggregates(
+        component: Type["ScoreComponent"],
+        g: CompactGraph,
+        c: CompactCondensation,
+    ) -> Dict[str, Dict[int, Any]]:
         """
-        TODO: Given a node returns values for aggregation? Computes
-        fields from the node package report from data, direct_deps,
-        indirect_deps, and additional data
+        Returns values by node ID for each aggregate field computed
+        once per graph over each node and its dependencies (e.g. by
+        merging sets bottom up with c.closure_unions) rather than
+        rescanning the dependencies of each node.
+
+        score_graph_records adds them as node attrs for
+        get_package_report_updates to read.
         """
-        raise NotImplementedError()
+        return dict()
 
 
 class PackageVersionScoreComponent(ScoreComponent):
@@ -113,10 +162,18 @@ class PackageVersionScoreComponent(ScoreComponent):
     ) -> Dict[PackageVersionID, Any]:
         return db_graph.distinct_package_versions_by_id
 
+    @staticmethod
+    def to_picklable_data(data: Any) -> Any:
+        return (
+            ScoringPackageVersion(name=data.name, version=data.version)
+            if data
+            else data
+        )
+
     @staticmethod
     def get_package_report_updates(
         component: Type["ScoreComponent"],
-        g: nx.DiGraph,
+        g: ScoringGraph,
         node_id: int,
         direct_dep_ids: Set[int],
         indirect_dep_ids: Set[int],
@@ -147,7 +204,7 @@ class NPMSIOScoreComponent(ScoreComponent):
     @staticmethod
     def get_package_report_updates(
         component: Type["ScoreComponent"],
-        g: nx.DiGraph,
+        g: ScoringGraph,
         node_id: int,
         direct_dep_ids: Set[int],
         indirect_dep_ids: Set[int],
@@ -201,6 +258,8 @@ class NPMRegistryScoreComponent(ScoreComponent):
 
     package_report_fields = {
         "release_date": Optional[datetime],
+        # number of distinct parsed maintainers and contributors (see
+        # NPMRegistryEntry.maintainers_count)
         "authors": Optional[int],
         "contributors": Optional[int],
     }
@@ -214,21 +273,19 @@ class NPMRegistryScoreComponent(ScoreComponent):
     @staticmethod
     def get_package_report_updates(
         component: Type["ScoreComponent"],
-        g: nx.DiGraph,
+        g: ScoringGraph,
         node_id: int,
         direct_dep_ids: Set[int],
         indirect_dep_ids: Set[int],
     ) -> Dict[str, Union[None, int, datetime]]:
         node_data = g.nodes[node_id].get(component.graph_node_attr_name, None)
-        published_at, maintainers, contributors = None, None, None
+        published_at, maintainers_count, contributors_count = None, None, None
         if node_data:
-            published_at, maintainers, contributors = node_data
+            published_at, maintainers_count, contributors_count = node_data
 
         return dict(
-            authors=(len(maintainers) if maintainers is not None else maintainers),
-            contributors=(
-                len(contributors) if contributors is not None else contributors
-            ),
+            authors=maintainers_count,
+            contributors=contributors_count,
             release_date=published_at,
         )
 
@@ -258,10 +315,18 @@ class AdvisoryScoreComponent(ScoreComponent):
     ) -> Dict[PackageVersionID, Any]:
         return db_graph.get_advisories_by_package_version_id()
 
+    @staticmethod
+    def to_picklable_data(data: Any) -> Any:
+        return (
+            [ScoringAdvisory(severity=advisory.severity) for advisory in data]
+            if data
+            else data
+        )
+
     @staticmethod
     def get_package_report_updates(
         component: Type["ScoreComponent"],
-        g: nx.DiGraph,
+        g: ScoringGraph,
         node_id: int,
         direct_dep_ids: Set[int],
         indirect_dep_ids: Set[int],
@@ -314,7 +379,7 @@ class DependencyCountScoreComponent(ScoreComponent):
     @staticmethod
     def get_package_report_updates(
         component: Type["ScoreComponent"],
-        g: nx.DiGraph,
+        g: ScoringGraph,
         node_id: int,
         direct_dep_ids: Set[int],
         indirect_dep_ids: Set[int],
@@ -325,13 +390,103 @@ class DependencyCountScoreComponent(ScoreComponent):
         )
 
 
-all_score_components = [
+class MaintainerBreachScoreComponent(ScoreComponent):
+    graph_node_attr_name = "maintainer_breaches"
+
+    package_report_fields = {
+        # number of HIBP breaches of the package version's maintainer
+        # emails and of its maintainer emails in at least one breach
+        # (None until HIBP data is fetched for its maintainers)
+        "maintainer_breaches": Optional[int],
+        "breached_maintainers": Optional[int],
+        # number of HIBP breaches of the distinct breached maintainer
+        # emails of the package version and its direct and transitive
+        # dependencies and of those emails
+        # (None until HIBP data is fetched for one of their maintainers)
+        "all_maintainer_breaches": Optional[int],
+        "all_breached_maintainers": Optional[int],
+    }
+
+    aggregate_fields = {
+        # (email, breach count) pairs of maintainers with fetched HIBP
+        # data of the node and its dependencies
+        "all_maintainer_breach_counts": FrozenSet[Tuple[str, int]],
+    }
+
+    @staticmethod
+    def data_by_package_version_id(
+        db_graph: PackageGraph,
+    ) -> Dict[PackageVersionID, Any]:
+        return db_graph.get_maintainer_breaches_by_package_version_id()
+
+    @staticmethod
+    def get_graph_aggregates(
+        component: Type["ScoreComponent"],
+        g: CompactGraph,
+        c: CompactCondensation,
+    ) -> Dict[str, Dict[int, Any]]:
+        breach_counts_by_index: List[FrozenSet[Tuple[str, int]]] = [
+            frozenset(
+                (
+                    g.nodes[node_id].get(component.graph_node_attr_name, None) or {}
+                ).items()
+            )
+            for node_id in g.node_ids
+        ]
+        return dict(
+            all_maintainer_breach_counts=dict(
+                zip(g.node_ids, c.closure_unions(breach_counts_by_index))
+            )
+        )
+
+    @staticmethod
+    def get_package_report_updates(
+        component: Type["ScoreComponent"],
+        g: ScoringGraph,
+        node_id: int,
+        direct_dep_ids: Set[int],
+        indirect_dep_ids: Set[int],
+    ) -> Dict[str, Optional[int]]:
+        breach_counts: Optional[Dict[str, int]] = g.nodes[node_id].get(
+            component.graph_node_attr_name, None
+        )
+        all_breach_counts: FrozenSet[Tuple[str, int]] = (
+            g.nodes[node_id].get("all_maintainer_breach_counts", None) or frozenset()
+        )
+        return dict(
+            maintainer_breaches=(
+                sum(breach_counts.values()) if breach_counts is not None else None
+            ),
+            breached_maintainers=(
+                sum(1 for count in breach_counts.values() if count > 0)
+                if breach_counts is not None
+                else None
+            ),
+            all_maintainer_breaches=(
+                sum(breach_count for _, breach_count in all_breach_counts)
+                if all_breach_counts
+                else None
+            ),
+            all_breached_maintainers=(
+                sum(1 for _, breach_count in all_breach_counts if breach_count > 0)
+                if all_breach_counts
+                else None
+            ),
+        )
+
+
+# components scans score with (plus MaintainerBreachScoreComponent
+# with SCORE_MAINTAINER_BREACHES)
+default_score_components = [
     PackageVersionScoreComponent,
     NPMSIOScoreComponent,
     NPMRegistryScoreComponent,
     AdvisoryScoreComponent,
     DependencyCountScoreComponent,
 ]
+all_score_components = default_score_components + [
+    MaintainerBreachScoreComponent,
+]
 all_score_component_fields = [
     field
     for component in all_score_components
@@ -339,16 +494,16 @@ all_score_component_fields = [
 ]
 
 
-def score_package(
-    g: nx.DiGraph,
+def score_package_report_kwargs(
+    g: ScoringGraph,
     node_id: int,
     direct_dep_ids: Set[int],
     indirect_dep_ids: Set[int],
     score_components: Iterable[Type[ScoreComponent]],
-) -> PackageReport:
-    """Scores a package node on a PackageGraph using the provided components"""
+) -> Dict[str, Any]:
+    """Returns package report fields for a package node on a PackageGraph from the provided components"""
     # get package report fields for each component
-    report_kwargs = dict(scoring_date=datetime.now())
+    report_kwargs: Dict[str, Any] = dict(scoring_date=datetime.now())
     for component in score_components:
         updates = component.get_package_report_updates(
             component,
@@ -359,15 +514,30 @@ def score_package(
         )
 
         report_kwargs.update(updates)
-    return PackageReport(**report_kwargs)
+    return report_kwargs
+
+
+def score_package(
+    g: ScoringGraph,
+    node_id: int,
+    direct_dep_ids: Set[int],
+    indirect_dep_ids: Set[int],
+    score_components: Iterable[Type[ScoreComponent]],
+) -> PackageReport:
+    """Scores a package node on a PackageGraph using the provided components"""
+    return PackageReport(
+        **score_package_report_kwargs(
+            g, node_id, direct_dep_ids, indirect_dep_ids, score_components
+        )
+    )
 
 
 def add_scoring_component_data_to_node_attrs(
     db_graph: PackageGraph,
-    g: nx.DiGraph,
+    g: ScoringGraph,
     score_components: Iterable[Type[ScoreComponent]],
-) -> nx.DiGraph:
-    """Adds node attribute data for the provided scoring components to the networkx package DiGraph in-place"""
+) -> ScoringGraph:
+    """Adds node attribute data for the provided scoring components to the networkx package DiGraph or CompactGraph in-place"""
     graph_util.update_node_attrs(
         g,
         **{
@@ -388,13 +558,17 @@ def add_scoring_component_data_to_node_attrs(
     return g
 
 
-def score_package_graph(
+def score_package_graph_records(
     db_graph: PackageGraph,
     score_components: Optional[Iterable[Type[ScoreComponent]]] = None,
-    nx_graph: Optional[nx.DiGraph] = None,
-) -> Dict[PackageVersionID, PackageReport]:
+    graph: Optional[ScoringGraph] = None,
+) -> Dict[PackageVersionID, PackageReportRecord]:
     """
-    Scores a database PackageGraph model with the provided components.
+    Scores a database PackageGraph model with the provided components
+    and returns PackageReportRecords for models.save_package_report_records.
+
+    Scores a CompactGraph of the PackageGraph unless a networkx
+    DiGraph or CompactGraph is provided.
     """
     # default to using all components if none are provided
     graph_score_components: Iterable[Type[ScoreComponent]] = []
@@ -404,33 +578,89 @@ def score_package_graph(
         graph_score_components = score_components
     assert graph_score_components is not None
 
-    g: nx.DiGraph = add_scoring_component_data_to_node_attrs(
+    c: Optional[CompactCondensation] = None
+    if graph is None:
+        graph = graph_util.package_graph_to_compact_graph(db_graph)
+        c = graph_util.package_graph_to_compact_condensation(db_graph, graph)
+
+    g: ScoringGraph = add_scoring_component_data_to_node_attrs(
         db_graph,
-        nx_graph or graph_util.package_graph_to_networkx_graph(db_graph),
+        graph,
         graph_score_components,
     )
+    return score_graph_records(db_graph.id, g, c, graph_score_components)
+
+
+def score_graph_records(
+    graph_id: Optional[int],
+    g: ScoringGraph,
+    c: Optional[CompactCondensation],
+    score_components: Iterable[Type[ScoreComponent]],
+) -> Dict[PackageVersionID, PackageReportRecord]:
+    """
+    Scores a graph with node attr data for the provided components
+    already loaded and returns PackageReportRecords for the graph ID.
+
+    Doesn't query the DB, so it can run in another process.
+    """
+    score_components = list(score_components)
     log.info(
-        f"scoring graph id={db_graph.id} ({len(g.edges)} edges, {len(g.nodes)} nodes) with components {graph_score_components}"
+        f"scoring graph id={graph_id} ({g.number_of_edges()} edges, {g.number_of_nodes()} nodes) with components {score_components}"
     )
-    direct_dep_ids_by_package_version_id: Dict[
-        PackageVersionID, Set[PackageVersionID]
-    ] = dict()
-    reports_by_package_version_id: Dict[PackageVersionID, PackageReport] = dict()
-    for node_id, direct_dep_ids, indirect_dep_ids in node_dep_ids_iter(g):
-        direct_dep_ids_by_package_version_id[node_id] = direct_dep_ids
-        reports_by_package_version_id[node_id] = score_package(
-            g, node_id, direct_dep_ids, indirect_dep_ids, graph_score_components
+    aggregate_components = [
+        component for component in score_components if component.aggregate_fields
+    ]
+    if aggregate_components:
+        if isinstance(g, CompactGraph):
+            if not isinstance(c, CompactCondensation):
+                c = g.condensation()
+            compact_g, compact_c = g, c
+        else:
+            compact_g = CompactGraph.from_networkx(g)
+            compact_c = compact_g.condensation()
+        for component in aggregate_components:
+            graph_util.update_node_attrs(
+                g, **component.get_graph_aggregates(component, compact_g, compact_c)
+            )
+
+    records_by_package_version_id: Dict[PackageVersionID, PackageReportRecord] = dict()
+    for node_id, direct_dep_ids, indirect_dep_ids in node_dep_ids_iter(g, c):
+        report_kwargs = score_package_report_kwargs(
+            g, node_id, direct_dep_ids, indirect_dep_ids, score_components
+        )
+        report_kwargs["graph_id"] = graph_id
+        records_by_package_version_id[node_id] = PackageReportRecord(
+            node_id, direct_dep_ids, **report_kwargs
         )
+    return records_by_package_version_id
+
+
+def score_package_graph(
+    db_graph: PackageGraph,
+    score_components: Optional[Iterable[Type[ScoreComponent]]] = None,
+    graph: Optional[ScoringGraph] = None,
+) -> Dict[PackageVersionID, PackageReport]:
+    """
+    Scores a database PackageGraph model with the provided components
+    and returns PackageReports with their dependencies.
+
+    Scores a CompactGraph of the PackageGraph unless a networkx
+    DiGraph or CompactGraph is provided.
+    """
+    records_by_package_version_id = score_package_graph_records(
+        db_graph, score_components, graph
+    )
+    reports_by_package_version_id: Dict[PackageVersionID, PackageReport] = {
+        node_id: record.to_package_report()
+        for node_id, record in records_by_package_version_id.items()
+    }
 
     # update report .dependencies relationship
-    for node_id, direct_dep_ids in direct_dep_ids_by_package_version_id.items():
+    for node_id, record in records_by_package_version_id.items():
         reports_by_package_version_id[node_id].dependencies.extend(
-            reports_by_package_version_id[dep_node_id] for dep_node_id in direct_dep_ids
+            reports_by_package_version_id[dep_node_id]
+            for dep_node_id in record.dependency_package_version_ids
         )
-
-    for report in reports_by_package_version_id.values():
-        report.graph_id = db_graph.id
-
     return reports_by_package_version_id
 
 
@@ -0,0 +1,192 @@
+"""
+Scores package graphs in a process pool so CPU-bound scoring doesn't
+block the worker event loop.
+
+Graph links and component data are loaded from the DB in the worker
+process, packed into picklable CompactGraph node attr columns, and
+scored in pool processes without DB access.
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import logging
+import multiprocessing
+from typing import (
+    AsyncGenerator,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Type,
+)
+
+from flask import current_app
+import prometheus_client
+
+from depobs.database.models import PackageGraph, PackageReportRecord
+from depobs.util import graph_util
+from depobs.util.compact_graph import CompactCondensation, CompactGraph
+from depobs.worker import scoring
+
+
+log = logging.getLogger(__name__)
+
+GRAPH_SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10_000, 50_000)
+
+SCORED_GRAPH_NODES = prometheus_client.Histogram(
+    "depobs_scored_graph_nodes",
+    "Package versions in package graphs loaded for scoring.",
+    buckets=GRAPH_SIZE_BUCKETS,
+)
+SCORED_GRAPH_EDGES = prometheus_client.Histogram(
+    "depobs_scored_graph_edges",
+    "Dependency links in package graphs loaded for scoring.",
+    buckets=GRAPH_SIZE_BUCKETS,
+)
+
+
+class ScoringTask(NamedTuple):
+    "a PackageGraph with component data loaded to score in another process"
+    graph_id: Optional[int]
+    g: CompactGraph
+    # saved SCC indices by node index (if any)
+    scc_ids: Optional[List[int]]
+
+
+@functools.lru_cache(maxsize=None)
+def get_scoring_pool(processes: int) -> Optional[ProcessPoolExecutor]:
+    """
+    Returns a shared process pool with the given number of processes
+    or None for zero processes (i.e. use the default thread executor)
+    """
+    if processes < 1:
+        return None
+    log.info(f"starting scoring process pool with {processes} processes")
+    # spawn so pool processes don't inherit worker DB connections
+    return ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def get_default_score_components() -> List[Type[scoring.ScoreComponent]]:
+    """
+    Returns the score components to score scanned graphs with
+
+    Requires depobs flask app context.
+    """
+    if current_app.config["SCORE_MAINTAINER_BREACHES"]:
+        return scoring.all_score_components
+    return scoring.default_score_components
+
+
+def to_scoring_task(
+    db_graph: PackageGraph,
+    score_components: Iterable[Type[scoring.ScoreComponent]],
+) -> ScoringTask:
+    """
+    Loads the links, saved SCCs, and component data of a PackageGraph
+
+    Requires depobs flask app context.
+    """
+    g = graph_util.package_graph_to_compact_graph(db_graph)
+    # observe sizes here since pool processes have their own registries
+    SCORED_GRAPH_NODES.observe(g.number_of_nodes())
+    SCORED_GRAPH_EDGES.observe(g.number_of_edges())
+    for component in score_components:
+        if not component.graph_node_attr_name:
+            continue
+        g.set_node_attr_column(
+            component.graph_node_attr_name,
+            {
+                package_version_id: component.to_picklable_data(data)
+                for package_version_id, data in component.data_by_package_version_id(
+                    db_graph
+                ).items()
+            },
+        )
+    saved = db_graph.condensation
+    return ScoringTask(
+        graph_id=db_graph.id,
+        g=g,
+        scc_ids=saved.get_scc_ids(g) if saved is not None else None,
+    )
+
+
+def batch_scoring_tasks(
+    tasks: Iterable[ScoringTask], max_nodes: int
+) -> Iterator[List[ScoringTask]]:
+    """
+    Groups tasks into batches with at most max_nodes total nodes
+    unless a task has more nodes on its own
+
+    >>> tasks = [ScoringTask(i, CompactGraph(range(n), []), None) for i, n in enumerate([2, 2, 5, 1])]
+    >>> [[task.graph_id for task in batch] for batch in batch_scoring_tasks(tasks, 4)]
+    [[0, 1], [2], [3]]
+    """
+    batch: List[ScoringTask] = []
+    batch_nodes = 0
+    for task in tasks:
+        task_nodes = task.g.number_of_nodes()
+        if batch and batch_nodes + task_nodes > max_nodes:
+            yield batch
+            batch, batch_nodes = [], 0
+        batch.append(task)
+        batch_nodes += task_nodes
+    if batch:
+        yield batch
+
+
+def score_scoring_tasks(
+    tasks: List[ScoringTask],
+    score_components: List[Type[scoring.ScoreComponent]],
+) -> List[List[PackageReportRecord]]:
+    """
+    Returns package report records for each task. Runs in a scoring
+    pool process.
+    """
+    return [
+        list(
+            scoring.score_graph_records(
+                task.graph_id,
+                task.g,
+                CompactCondensation(task.g, scc_by_index=task.scc_ids)
+                if task.scc_ids is not None
+                else None,
+                score_components,
+            ).values()
+        )
+        for task in tasks
+    ]
+
+
+async def score_package_graphs(
+    db_graphs: Iterable[PackageGraph],
+    score_components: Optional[Iterable[Type[scoring.ScoreComponent]]] = None,
+) -> AsyncGenerator[List[PackageReportRecord], None]:
+    """
+    Scores PackageGraphs in parallel on the scoring process pool and
+    yields the package report records for one graph at a time as
+    scoring finishes.
+
+    Defaults to the default score components and the maintainer
+    breach component when SCORE_MAINTAINER_BREACHES is set.
+
+    Requires depobs flask app context.
+    """
+    components = list(
+        get_default_score_components() if score_components is None else score_components
+    )
+    pool = get_scoring_pool(current_app.config["SCORING_PROCESSES"])
+    loop = asyncio.get_running_loop()
+    futures = [
+        loop.run_in_executor(pool, score_scoring_tasks, batch, components)
+        for batch in batch_scoring_tasks(
+            (to_scoring_task(db_graph, components) for db_graph in db_graphs),
+            current_app.config["SCORING_TASK_MAX_NODES"],
+        )
+    ]
+    log.info(f"scoring {len(futures)} batches of graphs")
+    for future in asyncio.as_completed(futures):
+        for records in await future:
+            yield records
@@ -1,4 +1,5 @@
 from dataclasses import asdict
+import json
 import logging
 from typing import (
     AbstractSet,
@@ -17,17 +18,24 @@ from typing import (
 from depobs.database.models import (
     Advisory,
     JSONResult,
+    NPM_REGISTRY_ENTRY_PEOPLE_ROLES,
     NPMRegistryEntry,
     NPMSIOScore,
     PackageGraph,
     PackageVersion,
 )
 from depobs.util.graph_util import npm_packages_to_networkx_digraph, get_graph_stats
-from depobs.models.nodejs import NPMPackage, flatten_deps
+from depobs.models.nodejs import (
+    NPMPackage,
+    flatten_deps,
+    flatten_package_lock,
+    flatten_yarn_lock,
+)
 from depobs.util.serialize_util import (
     extract_fields,
     extract_nested_fields,
     get_in,
+    parse_npm_humans,
     parse_stdout_as_json,
     parse_stdout_as_jsonlines,
 )
@@ -35,7 +43,12 @@ from depobs.util.serialize_util import (
 log = logging.getLogger(__name__)
 
 
-def parse_npm_list(parsed_stdout: Dict) -> Dict:
+def parse_npm_list(parsed_stdout: Dict, graph_stats: bool = False) -> Dict:
+    """
+    Parses npm list JSON output. Only builds a networkx graph to compute
+    graph_stats when graph_stats is True since stats for saved graphs are
+    computed later by the save_next_graph_stats task.
+    """
     deps = [dep for dep in flatten_deps(parsed_stdout)]
     updates = {"problems": get_in(parsed_stdout, ["problems"], [])}
     updates["dependencies"] = [asdict(dep) for dep in deps]
@@ -47,7 +60,9 @@ def parse_npm_list(parsed_stdout: Dict) -> Dict:
         len(deps[-1].dependencies) if len(deps) else None
     )
     updates["graph_stats"] = (
-        get_graph_stats(npm_packages_to_networkx_digraph(deps)) if deps else dict()
+        get_graph_stats(npm_packages_to_networkx_digraph(deps))
+        if deps and graph_stats
+        else dict()
     )
     return updates
 
@@ -153,7 +168,9 @@ def parse_yarn_audit(parsed_stdout: Sequence[Dict]) -> Optional[Dict]:
     return updates
 
 
-def parse_npm_task(task_name: str, task_result: Dict) -> Optional[Dict]:
+def parse_npm_task(
+    task_name: str, task_result: Dict, graph_stats: bool = False
+) -> Optional[Dict]:
     # TODO: reuse cached results for each set of dep files w/ hashes and task name
     parsed_stdout = parse_stdout_as_json(get_in(task_result, ["stdout"], None))
     if parsed_stdout is None:
@@ -161,7 +178,7 @@ def parse_npm_task(task_name: str, task_result: Dict) -> Optional[Dict]:
         return None
 
     if task_name == "list_metadata":
-        return parse_npm_list(parsed_stdout)
+        return parse_npm_list(parsed_stdout, graph_stats)
     elif task_name == "audit":
         return parse_npm_audit(parsed_stdout)
     elif task_name == "install":
@@ -242,10 +259,12 @@ def parse_cargo_task(task_name: str, task_result: Dict) -> Optional[Dict]:
         raise NotImplementedError()
 
 
-def parse_command(task_name: str, task_command: str, task_data: Dict) -> Optional[Dict]:
+def parse_command(
+    task_name: str, task_command: str, task_data: Dict, graph_stats: bool = False
+) -> Optional[Dict]:
     package_manager_name = get_in(task_data, ["envvar_args", "PACKAGE_MANAGER"])
     if package_manager_name == "npm":
-        return parse_npm_task(task_name, task_data)
+        return parse_npm_task(task_name, task_data, graph_stats)
     elif package_manager_name == "yarn":
         return parse_yarn_task(task_name, task_data)
     elif package_manager_name == "cargo":
@@ -257,6 +276,7 @@ def parse_command(task_name: str, task_command: str, task_data: Dict) -> Optiona
 def serialize_repo_task(
     task_data: Dict[str, Any],
     task_names_to_process: AbstractSet[str],
+    graph_stats: bool = False,
 ) -> Optional[Dict[str, Any]]:
     # filter for node list_metadata output to parse and flatten deps
     task_name = get_in(task_data, ["name"], None)
@@ -275,7 +295,7 @@ def serialize_repo_task(
         ],
     )
 
-    updates = parse_command(task_name, task_command, task_data)
+    updates = parse_command(task_name, task_command, task_data, graph_stats)
     if updates:
         if task_name == "list_metadata":
             log.info(
@@ -352,6 +372,13 @@ def serialize_npm_registry_entries(
                     "scripts": ["scripts"],
                 },
             )
+            # people rows and links are saved with the entry
+            for field in NPM_REGISTRY_ENTRY_PEOPLE_ROLES:
+                fields[f"{field}_count"] = (
+                    len(parse_npm_humans(fields[field]))
+                    if fields[field] is not None
+                    else None
+                )
             fields["constraints"] = serialize_npm_registry_constraints(version_data)
             log.debug(
                 f"serialized npm registry constraints for {fields['package_name']}@{fields['package_version']} : {fields['constraints']}"
@@ -515,8 +542,121 @@ def deserialize_npm_package_version(package: Dict[str, str]) -> PackageVersion:
     )
 
 
+def deserialize_npm_dependency_graph(
+    dependencies: Iterable[Dict[str, Any]],
+    root: Optional[Dict[str, Any]],
+    package_manager: str,
+) -> Generator[
+    Union[
+        PackageVersion,
+        Tuple[
+            PackageGraph,
+            Optional[PackageVersion],
+            List[Tuple[PackageVersion, PackageVersion]],
+        ],
+    ],
+    None,
+    None,
+]:
+    """
+    Takes dicts of NPMPackages with resolved deps and an optional root
+    NPMPackage dict and yields a PackageVersion for each package and
+    dep then a PackageGraph with its root package version and links
+    """
+    links: List[Tuple[PackageVersion, PackageVersion]] = []
+    for task_dep in dependencies:
+        parent: PackageVersion = deserialize_npm_package_version(task_dep)
+        yield parent
+        for dep in task_dep.get("dependencies", []):
+            # is fully qualified semver for npm (or file: or github: url), semver for yarn
+            name, version = dep.rsplit("@", 1)
+            child: PackageVersion = deserialize_npm_package_version(
+                dict(
+                    name=name,
+                    version=version,
+                )
+            )
+            yield child
+            links.append((parent, child))
+    root_package_version = deserialize_npm_package_version(root) if root else None
+    # NB: caller must convert links to link_ids, root_package_version to root_package_version_id
+    yield PackageGraph(
+        root_package_version_id=None,
+        link_ids=[],
+        package_manager=package_manager,
+        package_manager_version=None,  # TODO: find and set
+    ), root_package_version, links
+
+
+# lockfiles in the order npm (and then yarn) prefers them
+LOCKFILE_NAMES = ("npm-shrinkwrap.json", "package-lock.json", "yarn.lock")
+
+
+def get_lockfile_name(filenames: Iterable[str]) -> Optional[str]:
+    """
+    Returns the lockfile name a package manager would install from
+
+    >>> get_lockfile_name(["package.json", "package-lock.json", "npm-shrinkwrap.json"])
+    'npm-shrinkwrap.json'
+    >>> get_lockfile_name(["package.json"]) is None
+    True
+    """
+    filenames = set(filenames)
+    for lockfile_name in LOCKFILE_NAMES:
+        if lockfile_name in filenames:
+            return lockfile_name
+    return None
+
+
+def deserialize_dep_files(
+    dep_files: Dict[str, str],
+) -> Generator[
+    Union[
+        PackageVersion,
+        Tuple[
+            PackageGraph,
+            Optional[PackageVersion],
+            List[Tuple[PackageVersion, PackageVersion]],
+        ],
+    ],
+    None,
+    None,
+]:
+    """
+    Takes dependency file contents by filename with a lockfile and an
+    optional package.json manifest and yields the same PackageVersion
+    and PackageGraph models as deserialize_scan_job_results does for
+    npm list output from installing them.
+
+    Does not yield advisories (scoring uses saved advisories).
+    """
+    lockfile_name = get_lockfile_name(dep_files.keys())
+    if lockfile_name is None:
+        raise ValueError(f"no lockfile found in dep files {list(dep_files.keys())}")
+
+    manifest = (
+        json.loads(dep_files["package.json"]) if "package.json" in dep_files else None
+    )
+    if lockfile_name == "yarn.lock":
+        package_manager = "yarn"
+        pkgs, root = flatten_yarn_lock(dep_files[lockfile_name], manifest)
+    else:
+        package_manager = "npm"
+        pkgs, root = flatten_package_lock(
+            json.loads(dep_files[lockfile_name]), manifest
+        )
+
+    dependencies = [asdict(pkg) for pkg in pkgs]
+    if root is not None:
+        dependencies.append(asdict(root))
+    yield from deserialize_npm_dependency_graph(
+        dependencies, asdict(root) if root else None, package_manager
+    )
+
+
 def deserialize_scan_job_results(
     messages: Iterable[JSONResult],
+    graph_stats: bool = False,
 ) -> Generator[
     Union[
         PackageVersion,
@@ -540,6 +680,8 @@ def deserialize_scan_job_results(
 
     The models will not have IDs and should be upserted to avoid
     violating index constraints and creating duplicate rows.
+
+    Only computes npm list graph stats when graph_stats is True.
     """
     for json_result in messages:
         if json_result.data is None:
@@ -564,41 +706,18 @@ def deserialize_scan_job_results(
                 continue
 
             task_data: Optional[Dict[str, Any]] = serialize_repo_task(
-                line, {"list_metadata", "audit"}
+                line, {"list_metadata", "audit"}, graph_stats
             )
             if not task_data:
                 continue
 
             task_name = line["name"]
             if task_name == "list_metadata":
-                links: List[Tuple[PackageVersion, PackageVersion]] = []
-                for task_dep in task_data.get("dependencies", []):
-                    parent: PackageVersion = deserialize_npm_package_version(task_dep)
-                    yield parent
-                    for dep in task_dep.get("dependencies", []):
-                        # is fully qualified semver for npm (or file: or github: url), semver for yarn
-                        name, version = dep.rsplit("@", 1)
-                        child: PackageVersion = deserialize_npm_package_version(
-                            dict(
-                                name=name,
-                                version=version,
-                            )
-                        )
-                        yield child
-                        links.append((parent, child))
-                package_manager = "yarn" if "yarn" in task_data["command"] else "npm"
-                root_package_version = (
-                    deserialize_npm_package_version(task_data["root"])
-                    if task_data["root"]
-                    else None
+                yield from deserialize_npm_dependency_graph(
+                    task_data.get("dependencies", []),
+                    task_data["root"],
+                    "yarn" if "yarn" in task_data["command"] else "npm",
                 )
-                # NB: caller must convert links to link_ids, root_package_version to root_package_version_id
-                yield PackageGraph(
-                    root_package_version_id=None,
-                    link_ids=[],
-                    package_manager=package_manager,
-                    package_manager_version=None,  # TODO: find and set
-                ), root_package_version, links
             elif task_name == "audit":
                 for (
                     advisory_fields,
@@ -1,4 +1,5 @@
 import asyncio
+import datetime
 import logging
 from typing import (
     AsyncGenerator,
@@ -7,14 +8,21 @@ from typing import (
     Iterable,
     List,
     Optional,
+    Tuple,
 )
 
+import flask
 from flask import current_app
 
 from depobs.clients.aiohttp_client import AIOHTTPClientConfig, is_not_found_exception
-from depobs.clients.npmsio import fetch_npmsio_scores
-from depobs.clients.npm_registry import fetch_npm_registry_metadata
+from depobs.clients.npmsio import NPMSIOBatchError, fetch_npmsio_scores
+from depobs.clients.npm_registry import (
+    NPMRegistryFetchError,
+    fetch_npm_registry_metadata,
+)
+import depobs.database.async_models as async_models
 import depobs.database.models as models
+from depobs.util.serialize_util import get_in
 from depobs.util.type_util import Result
 import depobs.worker.serializers as serializers
 
@@ -29,24 +37,56 @@ async def fetch_package_data(
     ],
     config: AIOHTTPClientConfig,
     package_names: List[str],
-) -> List[Dict]:
+) -> Tuple[List[Dict], List[str]]:
+    """
+    Returns fetched package data and the package names in batches
+    that failed (to retry later). Skips not found errors and raises
+    other errors.
+    """
     package_results = []
+    failed_package_names: List[str] = []
     # TODO: figure this type error out later
     async for package_result in fetcher(config, package_names, len(package_names)):  # type: ignore
         if isinstance(package_result, Exception):
             if is_not_found_exception(package_result):
                 continue
+            if isinstance(package_result, (NPMSIOBatchError, NPMRegistryFetchError)):
+                failed_package_names.extend(package_result.package_names)
+                continue
             raise package_result
         package_results.append(package_result)
 
-    return package_results
+    return package_results, failed_package_names
+
+
+async def save_package_fetch_results(
+    source: str,
+    package_names: Iterable[str],
+    fetched_names: Iterable[Optional[str]],
+    failed_names: Iterable[str] = (),
+) -> None:
+    """
+    Records fetching requested package names from source and the
+    names source didn't return data for. Doesn't record names that
+    failed to fetch.
+    """
+    package_names = set(package_names) - set(failed_names)
+    not_found_names = package_names - set(fetched_names)
+    if not_found_names:
+        log.info(f"saving {len(not_found_names)} package names not found in {source}")
+        await async_models.run_in_db_thread(
+            models.save_not_found_package_names, source, not_found_names
+        )
+    await async_models.run_in_db_thread(
+        models.save_package_fetches, source, dict.fromkeys(package_names)
+    )
 
 
 async def fetch_and_save_npmsio_scores(package_names: Iterable[str]) -> List[Dict]:
     package_names = list(package_names)
     log.info(f"fetching npmsio scores for {len(package_names)} package names")
     log.debug(f"fetching npmsio scores for package names: {list(package_names)}")
-    npmsio_scores: List[Dict] = await asyncio.create_task(
+    npmsio_scores, failed_names = await asyncio.create_task(
         fetch_package_data(
             fetch_npmsio_scores,
             current_app.config["NPMSIO_CLIENT"],
@@ -54,6 +94,10 @@ async def fetch_and_save_npmsio_scores(package_names: Iterable[str]) -> List[Dic
         ),
         name=f"fetch_npmsio_scores",
     )
+    if failed_names:
+        log.error(
+            f"failed to fetch npmsio scores for {len(failed_names)} package names"
+        )
     if len(npmsio_scores) != len(package_names):
         log.warn(
             f"only fetched {len(npmsio_scores)} scores for {len(package_names)} package names"
@@ -62,10 +106,20 @@ async def fetch_and_save_npmsio_scores(package_names: Iterable[str]) -> List[Dic
         log.info(
             f"fetched {len(npmsio_scores)} scores for {len(package_names)} package names"
         )
+    await save_package_fetch_results(
+        "npmsio",
+        package_names,
+        (
+            get_in(score, ["collected", "metadata", "name"])
+            for score in npmsio_scores
+            if score is not None
+        ),
+        failed_names,
+    )
     if current_app.config["NPMSIO_CLIENT"].get("save_to_db", False):
-        models.save_json_results(npmsio_scores)
+        await async_models.save_json_results(npmsio_scores)
 
-    models.insert_npmsio_scores(
+    await async_models.insert_npmsio_scores(
         serializers.serialize_npmsio_scores(
             score for score in npmsio_scores if score is not None
         )
@@ -77,7 +131,7 @@ async def fetch_and_save_registry_entries(package_names: Iterable[str]) -> List[
     package_names = list(package_names)
     log.info(f"fetching registry entries for {len(package_names)} package names")
     log.debug(f"fetching registry entries for package names: {list(package_names)}")
-    npm_registry_entries = await asyncio.create_task(
+    npm_registry_entries, failed_names = await asyncio.create_task(
         fetch_package_data(
             fetch_npm_registry_metadata,
             current_app.config["NPM_CLIENT"],
@@ -85,6 +139,10 @@ async def fetch_and_save_registry_entries(package_names: Iterable[str]) -> List[
         ),
         name=f"fetch_and_save_registry_entries",
     )
+    if failed_names:
+        log.error(
+            f"failed to fetch npm registry entries for {len(failed_names)} package names"
+        )
     if len(npm_registry_entries) != len(package_names):
         log.warn(
             f"only fetched {len(npm_registry_entries)} registry entries for {len(package_names)} package names"
@@ -93,11 +151,21 @@ async def fetch_and_save_registry_entries(package_names: Iterable[str]) -> List[
         log.info(
             f"fetched {len(npm_registry_entries)} registry entries for {len(package_names)} package names"
         )
+    await save_package_fetch_results(
+        "npm_registry",
+        package_names,
+        (
+            entry.get("name", None)
+            for entry in npm_registry_entries
+            if entry is not None
+        ),
+        failed_names,
+    )
     if current_app.config["NPM_CLIENT"].get("save_to_db", False):
-        models.save_json_results(npm_registry_entries)
+        await async_models.save_json_results(npm_registry_entries)
 
     # inserts new entries for new versions (but doesn't update old ones)
-    models.insert_npm_registry_entries(
+    await async_models.insert_npm_registry_entries(
         serializers.serialize_npm_registry_entries(
             registry_entry
             for registry_entry in npm_registry_entries
@@ -107,16 +175,233 @@ async def fetch_and_save_registry_entries(package_names: Iterable[str]) -> List[
     return npm_registry_entries
 
 
-async def fetch_missing_npm_data():
-    await asyncio.gather(
-        fetch_and_save_npmsio_scores(
-            row[0]
-            for row in models.get_package_names_with_missing_npmsio_scores()
-            if row is not None
+async def fetch_and_save_npm_data(
+    npmsio_package_names: List[str], registry_package_names: List[str]
+) -> None:
+    "Fetches and saves npms.io scores and npm registry entries concurrently"
+    fetches = []
+    if npmsio_package_names:
+        fetches.append(fetch_and_save_npmsio_scores(npmsio_package_names))
+    if registry_package_names:
+        fetches.append(fetch_and_save_registry_entries(registry_package_names))
+    await asyncio.gather(*fetches)
+
+
+def get_not_found_ttl() -> datetime.timedelta:
+    return datetime.timedelta(seconds=current_app.config["NPM_NOT_FOUND_TTL_SECONDS"])
+
+
+def get_package_names_missing_npm_data(
+    source: str, package_names: List[str], not_found_ttl: datetime.timedelta
+) -> List[str]:
+    """
+    Returns the package names without data from source excluding
+    names source returned no data for within not_found_ttl
+    """
+    fetched_names = {
+        row[0]
+        for row in models.get_package_names_with_npm_data_query(source, package_names)
+    }
+    not_found_names = {
+        row[0]
+        for row in models.get_not_found_package_names_query(
+            source, package_names, not_found_ttl
+        )
+    }
+    return sorted(set(package_names) - fetched_names - not_found_names)
+
+
+async def fetch_missing_npm_data(package_names: Iterable[str]) -> None:
+    """
+    Fetches and saves npms.io scores and npm registry entries for the
+    package names without them (e.g. from a scan graph)
+    """
+    package_names = sorted(set(package_names))
+    not_found_ttl = get_not_found_ttl()
+    missing_npmsio_names, missing_registry_names = await asyncio.gather(
+        async_models.run_in_db_thread(
+            get_package_names_missing_npm_data, "npmsio", package_names, not_found_ttl
         ),
-        fetch_and_save_registry_entries(
-            row[0]
-            for row in models.get_package_names_with_missing_npm_entries()
-            if row is not None
+        async_models.run_in_db_thread(
+            get_package_names_missing_npm_data,
+            "npm_registry",
+            package_names,
+            not_found_ttl,
         ),
     )
+    log.info(
+        f"{len(missing_npmsio_names)} of {len(package_names)} package names missing npms.io scores"
+        f" and {len(missing_registry_names)} missing npm registry entries"
+    )
+    await fetch_and_save_npm_data(missing_npmsio_names, missing_registry_names)
+
+
+async def fetch_missing_graph_npm_data(
+    db_graphs: Iterable[models.PackageGraph],
+) -> None:
+    """
+    Fetches and saves npms.io scores and npm registry entries for the
+    package names in the graphs without them
+    """
+    await fetch_missing_npm_data(
+        package_version.name
+        for db_graph in db_graphs
+        for package_version in db_graph.distinct_package_versions_by_id.values()
+    )
+
+
+# task checkpoint name for package names backfill_missing_npm_data
+# failed to fetch by source
+BACKFILL_FAILURES_CHECKPOINT_NAME = "backfill_missing_npm_data_failures"
+
+
+def get_skipped_package_names(
+    failures: Dict[str, Dict], now: datetime.datetime, max_attempts: int
+) -> List[str]:
+    """
+    Returns package names that failed to fetch max_attempts times or
+    are waiting to retry
+
+    >>> now = datetime.datetime(2020, 1, 1)
+    >>> get_skipped_package_names({
+    ...     "a": {"attempts": 3, "retry_after": "2019-01-01T00:00:00"},
+    ...     "b": {"attempts": 1, "retry_after": "2020-01-01T01:00:00"},
+    ...     "c": {"attempts": 1, "retry_after": "2019-12-31T23:00:00"},
+    ... }, now, 3)
+    ['a', 'b']
+    """
+    return sorted(
+        package_name
+        for package_name, failure in failures.items()
+        if failure["attempts"] >= max_attempts
+        or datetime.datetime.fromisoformat(failure["retry_after"]) > now
+    )
+
+
+def update_backfill_failures(
+    failures: Dict[str, Dict],
+    package_names: Iterable[str],
+    errors: Dict[str, str],
+    now: datetime.datetime,
+) -> None:
+    """
+    Records a failed attempt with a retry time backing off
+    exponentially for each package name in errors and clears past
+    failures of the other fetched package names
+    """
+    retry_seconds = current_app.config["NPM_DATA_BACKFILL_RETRY_SECONDS"]
+    for package_name in package_names:
+        if package_name not in errors:
+            failures.pop(package_name, None)
+            continue
+        attempts = failures.get(package_name, {}).get("attempts", 0) + 1
+        failures[package_name] = {
+            "attempts": attempts,
+            "error": errors[package_name],
+            "retry_after": (
+                now + datetime.timedelta(seconds=retry_seconds * 2 ** (attempts - 1))
+            ).isoformat(),
+        }
+
+
+async def backfill_missing_source_data(
+    source: str, failures: Dict[str, Dict], now: datetime.datetime
+) -> int:
+    """
+    Fetches and saves up to NPM_DATA_BACKFILL_BATCH_SIZE package
+    names missing data from source (npmsio or npm_registry) skipping
+    names in failures waiting to retry. Updates failures for the
+    names it fetched and returns the number of names.
+    """
+    missing_names_query, fetch_and_save = {
+        "npmsio": (
+            models.get_package_names_with_missing_npmsio_scores,
+            fetch_and_save_npmsio_scores,
+        ),
+        "npm_registry": (
+            models.get_package_names_with_missing_npm_entries,
+            fetch_and_save_registry_entries,
+        ),
+    }[source]
+    not_found_ttl = get_not_found_ttl()
+    skipped_names = get_skipped_package_names(
+        failures, now, current_app.config["NPM_DATA_BACKFILL_MAX_ATTEMPTS"]
+    )
+    package_names = [
+        row[0]
+        for row in missing_names_query(not_found_ttl, skipped_names).limit(
+            current_app.config["NPM_DATA_BACKFILL_BATCH_SIZE"]
+        )
+    ]
+    # don't hold a connection while fetching
+    models.db.session.remove()
+    if not package_names:
+        return 0
+
+    log.info(f"backfilling {source} data for {len(package_names)} package names")
+    try:
+        await fetch_and_save(package_names)
+        # names still missing data failed to fetch or save
+        errors = dict.fromkeys(
+            await async_models.run_in_db_thread(
+                get_package_names_missing_npm_data,
+                source,
+                package_names,
+                not_found_ttl,
+            ),
+            "no data saved",
+        )
+    except Exception as err:
+        models.db.session.rollback()
+        log.error(f"error backfilling missing {source} data: {err}")
+        errors = dict.fromkeys(package_names, str(err))
+    if errors:
+        log.error(
+            f"failed to backfill {source} data for {len(errors)} package names: {sorted(errors)}"
+        )
+    update_backfill_failures(failures, package_names, errors, now)
+    return len(package_names)
+
+
+async def backfill_missing_npm_data(
+    _: flask.Flask, backoff_seconds: int = 5
+) -> Optional[int]:
+    """
+    Async task that fetches npms.io scores and npm registry entries
+    for up to NPM_DATA_BACKFILL_BATCH_SIZE package names from all
+    package versions missing each then sleeps for
+    NPM_DATA_BACKFILL_INTERVAL_SECONDS to limit upstream request rates.
+
+    Skips package names upstream returned no data for within
+    NPM_NOT_FOUND_TTL_SECONDS. Records names that failed to fetch in a
+    task checkpoint and skips them until their retry time or after
+    NPM_DATA_BACKFILL_MAX_ATTEMPTS failures, so the next batch moves
+    past them.
+
+    Returns the number of package names fetched or None on error.
+
+    Requires depobs flask app context.
+    """
+    now = datetime.datetime.utcnow()
+    try:
+        failures: Dict[str, Dict[str, Dict]] = (
+            models.get_task_checkpoint(BACKFILL_FAILURES_CHECKPOINT_NAME) or {}
+        )
+        sources = ["npmsio", "npm_registry"]
+        for source in sources:
+            failures.setdefault(source, {})
+        fetched_counts = await asyncio.gather(
+            *[
+                backfill_missing_source_data(source, failures[source], now)
+                for source in sources
+            ]
+        )
+        models.save_task_checkpoint(BACKFILL_FAILURES_CHECKPOINT_NAME, failures)
+    except Exception as err:
+        models.db.session.rollback()
+        log.error(f"error backfilling missing npm data: {err}")
+        await asyncio.sleep(backoff_seconds)
+        return None
+
+    await asyncio.sleep(current_app.config["NPM_DATA_BACKFILL_INTERVAL_SECONDS"])
+    return sum(fetched_counts)
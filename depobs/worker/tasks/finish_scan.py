@@ -1,8 +1,11 @@
 import asyncio
-from datetime import timedelta
+from datetime import datetime, timedelta
 import logging
 
+from flask import current_app
+import prometheus_client
 
+import depobs.database.async_models as async_models
 from depobs.database.enums import ScanStatusEnum
 import depobs.database.models as models
 
@@ -11,6 +14,13 @@ from depobs.worker.scans import *
 
 log = logging.getLogger(__name__)
 
+SCAN_STAGE_SECONDS = prometheus_client.Histogram(
+    "depobs_scan_stage_duration_seconds",
+    "Seconds scans spent queued, started (until finished), and scoring.",
+    ["stage"],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 4 * 3600, 86400),
+)
+
 
 async def finish_next_scan(_, backoff_seconds: int = 3) -> None:
     """
@@ -24,7 +34,7 @@ async def finish_next_scan(_, backoff_seconds: int = 3) -> None:
 
     Requires depobs flask app context.
     """
-    scan = models.get_next_scan_with_status_query(ScanStatusEnum["started"]).first()
+    scan = await async_models.get_next_scan_with_status(ScanStatusEnum["started"])
     if not scan:
         log.debug(f"no scan found to finish sleeping for {backoff_seconds}")
         await asyncio.sleep(backoff_seconds)
@@ -49,24 +59,47 @@ async def finish_scan(
     Async task that:
     * takes a started scan job
     * checks if the scan data was saved
+    * fails the scan when a k8s job failed (e.g. exhausted its
+      backoff limit) and its results didn't arrive
     * updates the scan status from 'started' to 'succeeded' or 'failed'
 
     Returns the updated scan.
     """
+    # when the scan started (saving results can update it)
+    started_at = scan.updated_at
     try:
-        if not scan.job_names:
+        # scans with results saved in the worker have no jobs
+        saved_in_worker = scan.job_names == [] and bool(scan.graph_ids)
+        if not (scan.job_names or saved_in_worker):
             raise Exception(f"scan {scan.id} has a falsy jobs_names")
 
-        completed_jobs_count = models.get_scan_completed_jobs_query(scan.id).count()
+        completed_jobs_count = await async_models.get_scan_completed_jobs_count(scan.id)
         log.info(f"scan {scan.id} count {completed_jobs_count} completed jobs")
-        if completed_jobs_count and completed_jobs_count == len(scan.job_names):
+        failed_job_statuses = scan.get_failed_job_statuses(
+            timedelta(seconds=current_app.config["SCAN_JOB_FAILURE_GRACE_SECONDS"])
+        )
+        if saved_in_worker or (
+            completed_jobs_count and completed_jobs_count == len(scan.job_names)
+        ):
             scan_config = scan_type_to_config(scan.name)
-            await scan_config.save_results(scan)
-            async for package_report in scan_config.score_packages(scan):
-                log.info(
-                    f"scan {scan.id} saving package report {package_report.id} {package_report.package}@{package_report.version}"
+            if not saved_in_worker:
+                await scan_config.save_results(scan)
+            with SCAN_STAGE_SECONDS.labels(stage="scoring").time():
+                async for package_report_records in scan_config.score_packages(scan):
+                    log.info(
+                        f"scan {scan.id} saving {len(package_report_records)} package reports"
+                    )
+                    await async_models.save_package_report_records(
+                        package_report_records
+                    )
+        elif failed_job_statuses:
+            raise Exception(
+                f"scan {scan.id} k8s jobs failed: "
+                + ", ".join(
+                    f"{job_name} {job_status['reason']}: {job_status['message']}"
+                    for job_name, job_status in failed_job_statuses.items()
                 )
-                models.store_package_reports([package_report])
+            )
         elif scan.get_time_since_updated() > timedelta(minutes=15):
             raise Exception(
                 f"scan {scan.id} timed out ({completed_jobs_count} jobs completed of {scan.k8s_jobs_count})"
@@ -81,7 +114,11 @@ async def finish_scan(
         log.error(f"{scan.id} error scanning and scoring: {err}\n{exc_to_str()}")
         new_scan_status = ScanStatusEnum["failed"]
 
-    finished_scan = models.save_scan_with_status(scan, new_scan_status)
+    if started_at is not None:
+        SCAN_STAGE_SECONDS.labels(stage="started").observe(
+            (datetime.utcnow() - started_at).total_seconds()
+        )
+    finished_scan = await async_models.save_scan_with_status(scan, new_scan_status)
     assert finished_scan.status in {
         ScanStatusEnum["succeeded"],
         ScanStatusEnum["failed"],
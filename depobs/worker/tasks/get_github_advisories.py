@@ -1,134 +1,213 @@
+import asyncio
 import logging
+from typing import Dict, Iterable, List, Optional, Set
 
+import flask
 from flask import current_app
-import requests
+from sqlalchemy.orm.exc import NoResultFound
 
-from depobs.database.models import save_json_results
+from depobs.clients.github import (
+    fetch_npm_security_vulnerabilities,
+    fetch_package_security_vulnerabilities,
+)
+import depobs.database.async_models as async_models
+import depobs.database.models as models
 
 
 log = logging.getLogger(__name__)
 
 
-def get_github_advisories_for_package(package_name: str) -> None:
+def get_graph_package_names(graph_id: int) -> List[str]:
+    """
+    returns the sorted distinct package names in a package graph or
+    raises when the graph doesn't exist
+    """
+    try:
+        db_graph = models.get_graph_by_id(graph_id)
+    except NoResultFound as err:
+        raise Exception(f"package graph {graph_id} not found") from err
+    return sorted(
+        {
+            package_version.name
+            for package_version in db_graph.distinct_package_versions_by_id.values()
+        }
+    )
+
+
+async def save_advisories(
+    advisories: List[Dict], withdrawn_at_by_id: Dict[str, str]
+) -> None:
+    """
+    Saves new advisories and marks saved advisories withdrawn
+
+    Requires depobs flask app context.
+    """
+    if advisories:
+        await async_models.save_json_results(advisories)
+    if withdrawn_at_by_id:
+        withdrawn_count = await async_models.run_in_db_thread(
+            models.mark_github_advisories_withdrawn, withdrawn_at_by_id
+        )
+        log.info(f"marked {withdrawn_count} saved GitHub advisories withdrawn")
+
+
+async def fetch_and_save_package_github_advisories(package_names: Iterable[str]) -> int:
+    """
+    Fetches all GitHub advisories for NPM package names in aliased
+    batches and saves the advisories that aren't withdrawn with their
+    package name (and marks saved ones that are withdrawn) as batches
+    of packages complete.
+
+    Returns the number of advisories saved.
 
+    Requires depobs flask app context.
+    """
     github_client = current_app.config["GITHUB_CLIENT"]
-    base_url = github_client["base_url"]
-    github_auth_token = github_client["github_auth_token"]
-
-    headers = {"Authorization": "token " + github_auth_token}
-
-    query = f"""
-    {{
-        securityVulnerabilities(ecosystem: NPM, first: 100, package: \"{package_name}\", orderBy: {{field: UPDATED_AT, direction: DESC}}) {{
-            nodes {{
-                advisory {{
-                    id, description, permalink, publishedAt, severity, summary, updatedAt, withdrawnAt
-                }}
-                package {{
-                    name
-                }}
-            }}
-            pageInfo {{
-                endCursor, hasNextPage, hasPreviousPage, startCursor
-            }}
-            totalCount
-        }}
-    }}
-    """
-
-    response = requests.post(base_url, json={"query": query}, headers=headers)
-    response.raise_for_status()
-    nodes = response.json()["data"]["securityVulnerabilities"]["nodes"]
-
-    advisories = list()
-    ids = list()
-    for node in nodes:
-        if (
-            node["advisory"]["id"] not in ids
-            and node["advisory"]["withdrawnAt"] == None
-        ):
-            advisory = node["advisory"]
+    advisories: List[Dict] = []
+    withdrawn_at_by_id: Dict[str, str] = {}
+    package_count, saved_count, failed_batch_count = 0, 0, 0
+    async for result in fetch_package_security_vulnerabilities(
+        github_client, package_names
+    ):
+        if isinstance(result, Exception):
+            failed_batch_count += 1
+            continue
+        package_name, nodes = result
+        for advisory in get_new_advisories(nodes, set()):
             advisory["package"] = package_name
             advisories.append(advisory)
-            ids.append(node["advisory"]["id"])
+        withdrawn_at_by_id.update(get_withdrawn_advisories(nodes))
+        package_count += 1
+        if package_count % github_client["github_advisory_package_batch_size"] == 0:
+            await save_advisories(advisories, withdrawn_at_by_id)
+            saved_count += len(advisories)
+            advisories, withdrawn_at_by_id = [], {}
+    await save_advisories(advisories, withdrawn_at_by_id)
+    saved_count += len(advisories)
+    log.info(
+        f"saved {saved_count} GitHub advisories for {package_count} NPM packages"
+        f" ({failed_batch_count} batches failed)"
+    )
+    return saved_count
+
+
+async def fetch_and_save_graph_github_advisories(graph_id: int) -> int:
+    """
+    Fetches and saves GitHub advisories for the distinct package names
+    in a package graph.
+
+    Returns the number of advisories saved.
 
-    save_json_results(advisories)
+    Requires depobs flask app context.
+    """
+    package_names = await async_models.run_in_db_thread(
+        get_graph_package_names, graph_id
+    )
+    log.info(
+        f"fetching GitHub advisories for {len(package_names)} packages in graph {graph_id}"
+    )
+    return await fetch_and_save_package_github_advisories(package_names)
 
 
-def get_github_advisories() -> None:
+# task checkpoint name for the latest synced NPM security vulnerability updatedAt
+GITHUB_ADVISORIES_CHECKPOINT = "github_npm_advisories"
 
-    github_client = current_app.config["GITHUB_CLIENT"]
-    base_url = github_client["base_url"]
-    github_auth_token = github_client["github_auth_token"]
-
-    headers = {"Authorization": "token " + github_auth_token}
-
-    perPage = 100
-
-    query = f"""
-    {{
-        securityVulnerabilities(ecosystem: NPM, first: {perPage}, orderBy: {{field: UPDATED_AT, direction: DESC}}) {{
-            nodes {{
-                advisory {{
-                    id, description, permalink, publishedAt, severity, summary, updatedAt, withdrawnAt
-                }}
-                package {{
-                    name
-                }}
-            }}
-            pageInfo {{
-                endCursor, hasNextPage, hasPreviousPage, startCursor
-            }}
-            totalCount
-        }}
-    }}
-    """
-
-    response = requests.post(base_url, json={"query": query}, headers=headers)
-    response.raise_for_status()
-    response_json = response.json()["data"]["securityVulnerabilities"]
-
-    nodes = response_json["nodes"]
-    hasNextPage = response_json["pageInfo"]["hasNextPage"]
-    endCursor = response_json["pageInfo"]["endCursor"]
-
-    while hasNextPage:
-        query = f"""
-        {{
-            securityVulnerabilities(ecosystem: NPM, first: {perPage}, after: \"{endCursor}\", orderBy: {{field: UPDATED_AT, direction: DESC}}) {{
-                nodes {{
-                    advisory {{
-                        id, description, permalink, publishedAt, severity, summary, updatedAt, withdrawnAt
-                    }}
-                    package {{
-                        name
-                    }}
-                }}
-                pageInfo {{
-                    endCursor, hasNextPage, hasPreviousPage, startCursor
-                }}
-                totalCount
-            }}
-        }}
-        """
-
-        response = requests.post(base_url, json={"query": query}, headers=headers)
-        response.raise_for_status()
-        response_json = response.json()["data"]["securityVulnerabilities"]
-
-        nodes += response_json["nodes"]
-        hasNextPage = response_json["pageInfo"]["hasNextPage"]
-        endCursor = response_json["pageInfo"]["endCursor"]
-
-    advisories = list()
-    ids = list()
+
+def get_new_advisories(nodes: List[Dict], seen_ids: Set[str]) -> List[Dict]:
+    """
+    Returns advisories from securityVulnerabilities nodes that aren't
+    withdrawn or in seen_ids and adds their IDs to seen_ids
+    """
+    advisories = []
     for node in nodes:
-        if (
-            node["advisory"]["id"] not in ids
-            and node["advisory"]["withdrawnAt"] == None
-        ):
-            advisory = node["advisory"]
-            advisories.append(advisory)
-            ids.append(node["advisory"]["id"])
+        advisory = node["advisory"]
+        if advisory["id"] in seen_ids or advisory["withdrawnAt"] is not None:
+            continue
+        seen_ids.add(advisory["id"])
+        advisories.append(advisory)
+    return advisories
+
+
+def get_withdrawn_advisories(nodes: List[Dict]) -> Dict[str, str]:
+    """
+    Returns withdrawnAt by advisory ID for withdrawn advisories from
+    securityVulnerabilities nodes
+    """
+    return {
+        node["advisory"]["id"]: node["advisory"]["withdrawnAt"]
+        for node in nodes
+        if node["advisory"]["withdrawnAt"] is not None
+    }
+
+
+async def fetch_and_save_github_advisories(full: bool = False) -> int:
+    """
+    Fetches NPM GitHub advisories for security vulnerabilities
+    updated since the last sync (or all of them when full is True)
+    and saves each page of them as it arrives. Marks saved advisories
+    that were withdrawn since they were saved.
+
+    Saves the latest vulnerability updatedAt as the checkpoint for the
+    next sync only after reaching the previous one, since pages arrive
+    most recently updated first.
+
+    Returns the number of advisories saved.
+
+    Requires depobs flask app context.
+    """
+    checkpoint = await async_models.run_in_db_thread(
+        models.get_task_checkpoint, GITHUB_ADVISORIES_CHECKPOINT
+    )
+    updated_after: Optional[str] = (
+        None if full or checkpoint is None else checkpoint["updated_at"]
+    )
+    log.info(f"syncing GitHub NPM advisories updated after {updated_after}")
+
+    latest_updated_at = updated_after
+    seen_ids: Set[str] = set()
+    saved_count = 0
+    async for nodes in fetch_npm_security_vulnerabilities(
+        current_app.config["GITHUB_CLIENT"], updated_after
+    ):
+        latest_updated_at = max(
+            [node["updatedAt"] for node in nodes]
+            + ([latest_updated_at] if latest_updated_at else [])
+        )
+        advisories = get_new_advisories(nodes, seen_ids)
+        await save_advisories(advisories, get_withdrawn_advisories(nodes))
+        saved_count += len(advisories)
+        log.debug(f"saved {saved_count} GitHub NPM advisories")
+
+    if latest_updated_at is not None and latest_updated_at != updated_after:
+        await async_models.run_in_db_thread(
+            models.save_task_checkpoint,
+            GITHUB_ADVISORIES_CHECKPOINT,
+            dict(updated_at=latest_updated_at),
+        )
+    log.info(
+        f"saved {saved_count} GitHub NPM advisories updated after {updated_after}"
+        f" through {latest_updated_at}"
+    )
+    return saved_count
+
+
+async def sync_github_advisories(
+    _: flask.Flask, backoff_seconds: int = 5
+) -> Optional[int]:
+    """
+    Async task that syncs GitHub NPM advisories updated since the last
+    sync then sleeps for GITHUB_ADVISORIES_SYNC_INTERVAL_SECONDS.
 
-    save_json_results(advisories)
+    Returns the number of advisories saved or None on error.
+
+    Requires depobs flask app context.
+    """
+    try:
+        saved_count = await fetch_and_save_github_advisories()
+    except Exception as err:
+        log.error(f"error syncing GitHub advisories: {err}")
+        await asyncio.sleep(backoff_seconds)
+        return None
+
+    await asyncio.sleep(current_app.config["GITHUB_ADVISORIES_SYNC_INTERVAL_SECONDS"])
+    return saved_count
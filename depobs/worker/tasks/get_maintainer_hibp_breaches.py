@@ -1,8 +1,9 @@
 import asyncio
+import datetime
+import itertools
 import logging
 from typing import (
-    AsyncGenerator,
-    Callable,
+    AbstractSet,
     Dict,
     Iterable,
     List,
@@ -10,22 +11,27 @@ from typing import (
 
 from flask import current_app
 
-from depobs.clients.aiohttp_client import AIOHTTPClientConfig
-from depobs.clients.hibp import fetch_hibp_breach_data
-from depobs.database.models import (
-    get_NPMRegistryEntry,
-    save_json_results,
+from depobs.clients.hibp import (
+    fetch_hibp_account_breach_names,
+    fetch_hibp_breaches,
 )
-from depobs.util.type_util import Result
+import depobs.database.async_models as async_models
+import depobs.database.models as models
+from depobs.worker import scoring
+from depobs.worker.scoring_executor import score_package_graphs
 import depobs.worker.validators as validators
 
 
 log = logging.getLogger(__name__)
 
+# when a catalog fetch last confirmed a breach name from an HIBP account
+# response missing from the breach catalog (the catalog can omit them)
+_missing_breach_names: Dict[str, datetime.datetime] = {}
+
 
 def get_maintainer_breaches(package_name: str, package_version: str = None) -> None:
 
-    registry_entries = get_NPMRegistryEntry(package_name).all()
+    registry_entries = models.get_NPMRegistryEntry(package_name).all()
 
     if not registry_entries:
         return
@@ -46,17 +52,17 @@ def get_maintainer_breaches(package_name: str, package_version: str = None) -> N
                 break
 
     maintainers = registry_entry.maintainers
-    emails = [maintainer["email"] for maintainer in maintainers]
+    emails = models.get_maintainer_emails(maintainers)
 
     breach_results = dict()
     total_breaches = 0
 
     if maintainers:
 
-        breaches = fetch_breaches(emails)
-
-        for email, breach_list in zip(emails, breaches):
+        breaches_by_email = asyncio.run(get_account_breaches(emails), debug=False)
 
+        for email in emails:
+            breach_list = breaches_by_email[email]
             breach_results[email] = {
                 "breach_num": len(breach_list),
                 "breaches": breach_list,
@@ -73,37 +79,147 @@ def get_maintainer_breaches(package_name: str, package_version: str = None) -> N
         "average_breaches": average_breaches,
     }
 
-    save_json_results([result])
+    models.save_json_results([result])
+
+
+def _ttl_cutoff(ttl_seconds: int) -> datetime.datetime:
+    return datetime.datetime.utcnow() - datetime.timedelta(seconds=ttl_seconds)
+
+
+async def get_breach_catalog(breach_names: AbstractSet[str]) -> Dict[str, Dict]:
+    """
+    Returns HIBP breach models by name for breach names from the local
+    breach catalog.
 
+    Refetches the catalog from the all breaches endpoint when it's
+    empty, older than HIBP_BREACH_CATALOG_TTL_SECONDS, or missing a
+    breach name (i.e. HIBP added a breach since the last fetch) that a
+    fetch hasn't confirmed missing within the TTL.
 
-def fetch_breaches(emails: List[str]) -> List[Dict[str, str]]:
-    breaches = asyncio.run(
-        fetch_breach_data(
-            fetch_hibp_breach_data,
-            current_app.config["HIBP_CLIENT"],
-            emails,
-        ),
-        debug=False,
+    Requires depobs flask app context.
+    """
+    fetched_at = await async_models.run_in_db_thread(
+        models.get_hibp_breach_catalog_fetched_at
     )
+    cutoff = _ttl_cutoff(current_app.config["HIBP_BREACH_CATALOG_TTL_SECONDS"])
+    is_stale = fetched_at is None or fetched_at < cutoff
+    breaches: Dict[str, Dict] = {}
+    unknown_names: AbstractSet[str] = set()
+    if not is_stale:
+        breaches = await async_models.run_in_db_thread(
+            models.get_hibp_breaches, breach_names
+        )
+        unknown_names = {
+            name
+            for name in breach_names - breaches.keys()
+            if _missing_breach_names.get(name, cutoff) <= cutoff
+        }
+    if is_stale or unknown_names:
+        log.info(f"refetching HIBP breach catalog last fetched at {fetched_at}")
+        catalog = await fetch_hibp_breaches(current_app.config["HIBP_CLIENT"])
+        await async_models.run_in_db_thread(models.save_hibp_breaches, catalog)
+        breaches = {
+            breach["Name"]: breach
+            for breach in catalog
+            if breach["Name"] in breach_names
+        }
+        missing_at = datetime.datetime.utcnow()
+        for name in breach_names - breaches.keys():
+            log.info(f"HIBP breach catalog is missing breach {name}")
+            _missing_breach_names[name] = missing_at
     return breaches
 
 
-async def fetch_breach_data(
-    fetcher: Callable[
-        [
-            AIOHTTPClientConfig,
-            Iterable[str],
-        ],
-        AsyncGenerator[Result[Dict[str, Dict]], None],
-    ],
-    config: AIOHTTPClientConfig,
-    emails: List[str],
-) -> List[Dict]:
-    breach_results = []
-
-    async for breach_result in fetcher(config, emails):
-        if isinstance(breach_result, Exception):
-            raise breach_result
-        breach_results.append(breach_result)
-
-    return breach_results
+async def get_account_breaches(emails: Iterable[str]) -> Dict[str, List[Dict]]:
+    """
+    Returns HIBP breaches with their Name and Date (the HIBP
+    BreachDate) for each distinct email.
+
+    Uses breach names cached within HIBP_ACCOUNT_CACHE_TTL_SECONDS and
+    fetches and caches them for the remaining emails (one request per
+    email). Looks up breach dates in the local breach catalog.
+
+    Raises the first account fetch error after caching the fetched
+    accounts.
+
+    Requires depobs flask app context.
+    """
+    distinct_emails = set(emails)
+    breach_names_by_email: Dict[str, List[str]] = await async_models.run_in_db_thread(
+        models.get_cached_hibp_account_breach_names,
+        distinct_emails,
+        _ttl_cutoff(current_app.config["HIBP_ACCOUNT_CACHE_TTL_SECONDS"]),
+    )
+    log.info(
+        f"using cached HIBP breaches for {len(breach_names_by_email)} of {len(distinct_emails)} accounts"
+    )
+
+    fetched_breach_names_by_email: Dict[str, List[str]] = {}
+    errors: List[Exception] = []
+    uncached_emails = distinct_emails - breach_names_by_email.keys()
+    if uncached_emails:
+        async for result in fetch_hibp_account_breach_names(
+            current_app.config["HIBP_CLIENT"], uncached_emails
+        ):
+            if isinstance(result, Exception):
+                errors.append(result)
+                continue
+            email, breach_names = result
+            fetched_breach_names_by_email[email] = breach_names
+        await async_models.run_in_db_thread(
+            models.save_hibp_account_breach_names, fetched_breach_names_by_email
+        )
+    if errors:
+        raise errors[0]
+    breach_names_by_email.update(fetched_breach_names_by_email)
+
+    breaches = await get_breach_catalog(
+        set(itertools.chain.from_iterable(breach_names_by_email.values()))
+    )
+    return {
+        email: [
+            dict(Name=name, Date=breaches.get(name, {}).get("BreachDate"))
+            for name in breach_names
+        ]
+        for email, breach_names in breach_names_by_email.items()
+    }
+
+
+def get_graph_maintainer_emails(graph_id: int) -> List[str]:
+    """
+    returns the sorted distinct maintainer emails of the npm registry
+    entries for the package versions in a package graph
+    """
+    return sorted(
+        {
+            email
+            for emails in models.get_graph_by_id(graph_id)
+            .get_maintainer_emails_by_package_version_id()
+            .values()
+            for email in emails
+        }
+    )
+
+
+async def fetch_and_score_graph_maintainer_breaches(graph_id: int) -> int:
+    """
+    Fetches HIBP breaches for each distinct maintainer email across
+    the nodes of a package graph (one request per email not in the
+    HIBP account cache), then rescores the graph with them and saves
+    its package reports.
+
+    Returns the number of distinct maintainer emails.
+
+    Requires depobs flask app context.
+    """
+    emails = await async_models.run_in_db_thread(get_graph_maintainer_emails, graph_id)
+    log.info(f"fetching HIBP breaches for {len(emails)} graph {graph_id} maintainers")
+    await get_account_breaches(emails)
+
+    db_graph = models.get_graph_by_id(graph_id)
+    async for package_report_records in score_package_graphs(
+        [db_graph], scoring.all_score_components
+    ):
+        await async_models.save_package_report_records(package_report_records)
+    log.info(f"saved graph {graph_id} reports scored with maintainer breaches")
+    return len(emails)
@@ -0,0 +1,182 @@
+import asyncio
+import datetime
+import logging
+from typing import Dict, List, Optional, Set
+
+import flask
+from flask import current_app
+
+from depobs.clients.npm_registry import fetch_npm_registry_metadata_if_modified
+from depobs.clients.npmsio import fetch_npmsio_scores
+import depobs.database.async_models as async_models
+import depobs.database.models as models
+from depobs.util.serialize_util import get_in
+from depobs.worker.tasks.fetch_npm_package_data import (
+    fetch_package_data,
+    save_package_fetch_results,
+)
+import depobs.worker.serializers as serializers
+
+
+log = logging.getLogger(__name__)
+
+
+def get_stale_package_names(
+    source: str, ttl_seconds: int, recent_scan_count: int, limit: int
+) -> List[str]:
+    """
+    Returns up to limit package names not fetched from source within
+    ttl_seconds. Returns names in the most recent scan graphs first then
+    the least recently fetched names.
+    """
+    fetched_before = datetime.datetime.utcnow() - datetime.timedelta(
+        seconds=ttl_seconds
+    )
+    package_names: List[str] = [
+        row[0]
+        for row in models.get_recent_scan_stale_package_names_query(
+            source, fetched_before, recent_scan_count
+        ).limit(limit)
+    ]
+    if len(package_names) < limit:
+        selected_names = set(package_names)
+        package_names.extend(
+            name
+            for (name,) in models.get_stale_package_names_query(
+                source, fetched_before
+            ).limit(limit)
+            if name not in selected_names
+        )
+    return package_names[:limit]
+
+
+async def refresh_npm_registry_entries(package_names: List[str]) -> int:
+    """
+    Refetches npm registry entries for package names with conditional
+    requests using the ETags from their last fetches, then upserts
+    changed entries and records the fetches in batches.
+
+    Returns the number of modified packages.
+    """
+    etags_by_package_name: Dict[str, Optional[str]] = {
+        name: None for name in package_names
+    }
+    etags_by_package_name.update(
+        await async_models.run_in_db_thread(
+            models.get_package_fetch_etags, "npm_registry", package_names
+        )
+    )
+
+    modified_entries: List[Dict] = []
+    fetched_etags: Dict[str, Optional[str]] = {}
+    not_found_names: Set[str] = set()
+    async for result in fetch_npm_registry_metadata_if_modified(
+        current_app.config["NPM_CLIENT"], etags_by_package_name
+    ):
+        if isinstance(result, Exception):
+            # retry on the next refresh
+            continue
+        package_name, etag, metadata = result
+        if metadata is not None:
+            modified_entries.append(metadata)
+        elif etag is None:
+            not_found_names.add(package_name)
+        fetched_etags[package_name] = etag
+
+    log.info(
+        f"refreshed {len(fetched_etags)} of {len(package_names)} npm registry package names:"
+        f" {len(modified_entries)} modified and {len(not_found_names)} not found"
+    )
+    await async_models.run_in_db_thread(
+        models.upsert_npm_registry_entries,
+        list(serializers.serialize_npm_registry_entries(modified_entries)),
+    )
+    if not_found_names:
+        await async_models.run_in_db_thread(
+            models.save_not_found_package_names, "npm_registry", not_found_names
+        )
+    await async_models.run_in_db_thread(
+        models.save_package_fetches, "npm_registry", fetched_etags
+    )
+    return len(modified_entries)
+
+
+async def refresh_npmsio_scores(package_names: List[str]) -> int:
+    """
+    Refetches npms.io scores for package names, then inserts scores
+    with a new analyzed_at time and records the fetches in batches.
+
+    Returns the number of scores fetched.
+    """
+    npmsio_scores, failed_names = await fetch_package_data(
+        fetch_npmsio_scores, current_app.config["NPMSIO_CLIENT"], package_names
+    )
+    log.info(
+        f"refreshed npms.io scores for {len(npmsio_scores)} of {len(package_names)} package names"
+        f" ({len(failed_names)} failed)"
+    )
+    await async_models.insert_npmsio_scores(
+        serializers.serialize_npmsio_scores(npmsio_scores)
+    )
+    await save_package_fetch_results(
+        "npmsio",
+        package_names,
+        (get_in(score, ["collected", "metadata", "name"]) for score in npmsio_scores),
+        failed_names,
+    )
+    return len(npmsio_scores)
+
+
+async def refresh_npm_package_data(
+    _: flask.Flask, backoff_seconds: int = 5
+) -> Optional[int]:
+    """
+    Async task that refetches npm registry entries and npms.io scores
+    for package names not fetched within their NPM_REFRESH_TTL_SECONDS,
+    prioritizing names in the most graphs of recent scans, then sleeps
+    for NPM_REFRESH_INTERVAL_SECONDS.
+
+    Makes at most NPM_REFRESH_REQUEST_BUDGETS requests to each upstream
+    per run (npms.io fetches package_batch_size names per request and
+    the registry one name per request).
+
+    Returns the number of package names refreshed or None on error.
+
+    Requires depobs flask app context.
+    """
+    ttls = current_app.config["NPM_REFRESH_TTL_SECONDS"]
+    budgets = current_app.config["NPM_REFRESH_REQUEST_BUDGETS"]
+    recent_scan_count = current_app.config["NPM_REFRESH_RECENT_SCAN_COUNT"]
+    try:
+        registry_names = get_stale_package_names(
+            "npm_registry",
+            ttls["npm_registry"],
+            recent_scan_count,
+            budgets["npm_registry"],
+        )
+        npmsio_names = get_stale_package_names(
+            "npmsio",
+            ttls["npmsio"],
+            recent_scan_count,
+            budgets["npmsio"]
+            * current_app.config["NPMSIO_CLIENT"]["package_batch_size"],
+        )
+        models.db.session.remove()
+        log.info(
+            f"refreshing {len(registry_names)} npm registry package names"
+            f" and {len(npmsio_names)} npms.io package names"
+        )
+        refreshes = []
+        if registry_names:
+            refreshes.append(refresh_npm_registry_entries(registry_names))
+        if npmsio_names:
+            refreshes.append(refresh_npmsio_scores(npmsio_names))
+        await asyncio.gather(*refreshes)
+    except Exception as err:
+        models.db.session.rollback()
+        log.error(f"error refreshing npm package data: {err}")
+        await asyncio.sleep(backoff_seconds)
+        return None
+
+    await asyncio.sleep(current_app.config["NPM_REFRESH_INTERVAL_SECONDS"])
+    return len(registry_names) + len(npmsio_names)
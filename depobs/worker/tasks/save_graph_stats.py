@@ -0,0 +1,153 @@
+import asyncio
+import datetime
+import logging
+from typing import Dict, List, Optional
+
+import flask
+from flask import current_app
+
+import depobs.database.async_models as async_models
+import depobs.database.models as models
+from depobs.util.compact_graph import get_graph_stats
+from depobs.util.graph_util import package_graph_to_compact_graph
+
+
+log = logging.getLogger(__name__)
+
+# task checkpoint name for graphs that failed to save stats
+FAILURES_CHECKPOINT_NAME = "save_next_graph_stats_failures"
+
+
+def save_graph_stats(graph_id: int) -> models.PackageGraphCondensation:
+    """
+    Computes and saves the stats for a PackageGraph to its
+    condensation. Saves the condensation too for graphs saved
+    before condensations were.
+
+    Requires depobs flask app context.
+    """
+    max_work = current_app.config["GRAPH_STATS_MAX_WORK"]
+    db_graph = models.get_graph_by_id(graph_id)
+    g = package_graph_to_compact_graph(db_graph)
+
+    condensation = models.get_graph_condensation(graph_id)
+    if condensation is None:
+        condensation = models.save_graph_condensation(
+            graph_id, g, with_stats=True, max_work=max_work
+        )
+    else:
+        # rebuilding the condensation from the saved SCC ids merges
+        # descendant sets, so run the bounded search instead
+        condensation.stats = get_graph_stats(g, max_work=max_work)
+    models.db.session.commit()
+    log.info(f"saved graph {graph_id} stats {condensation.stats}")
+    return condensation
+
+
+def get_skipped_graph_ids(
+    failures: Dict[str, Dict], now: datetime.datetime, max_attempts: int
+) -> List[int]:
+    """
+    Returns IDs of graphs that failed max_attempts times or are
+    waiting to retry
+
+    >>> now = datetime.datetime(2020, 1, 1)
+    >>> get_skipped_graph_ids({
+    ...     "1": {"attempts": 3, "retry_after": "2019-01-01T00:00:00"},
+    ...     "2": {"attempts": 1, "retry_after": "2020-01-01T01:00:00"},
+    ...     "3": {"attempts": 1, "retry_after": "2019-12-31T23:00:00"},
+    ... }, now, 3)
+    [1, 2]
+    """
+    return [
+        int(graph_id)
+        for graph_id, failure in failures.items()
+        if failure["attempts"] >= max_attempts
+        or datetime.datetime.fromisoformat(failure["retry_after"]) > now
+    ]
+
+
+def record_graph_stats_failure(
+    failures: Dict[str, Dict], graph_id: int, err: Exception, now: datetime.datetime
+) -> Dict:
+    """
+    Saves a failed attempt to save stats for a graph with a retry
+    time backing off exponentially and returns the failure
+    """
+    attempts = failures.get(str(graph_id), {}).get("attempts", 0) + 1
+    failure = {
+        "attempts": attempts,
+        "error": str(err),
+        "retry_after": (
+            now
+            + datetime.timedelta(
+                seconds=current_app.config["GRAPH_STATS_RETRY_SECONDS"]
+                * 2 ** (attempts - 1)
+            )
+        ).isoformat(),
+    }
+    models.save_task_checkpoint(
+        FAILURES_CHECKPOINT_NAME, {**failures, str(graph_id): failure}
+    )
+    return failure
+
+
+def get_next_graph_id_missing_stats(skipped_graph_ids: List[int]) -> Optional[int]:
+    "returns the most recently inserted graph ID without stats not in skipped_graph_ids"
+    return models.get_graph_ids_missing_stats_query(skipped_graph_ids).limit(1).scalar()
+
+
+async def save_next_graph_stats(
+    _: flask.Flask, backoff_seconds: int = 5
+) -> Optional[int]:
+    """
+    Async task that computes and saves stats for the most recently
+    inserted graph without them.
+
+    Records failed graphs in a task checkpoint and skips them until
+    their retry time or after GRAPH_STATS_MAX_ATTEMPTS failures, so
+    one bad graph doesn't block the others.
+
+    Runs the queries and stats computation in a DB pool thread, so a
+    large graph doesn't stall other tasks on the event loop.
+
+    Returns the graph ID or None (when all graphs have stats).
+
+    Requires depobs flask app context.
+    """
+    now = datetime.datetime.utcnow()
+    failures: Dict[str, Dict] = (
+        await async_models.run_in_db_thread(
+            models.get_task_checkpoint, FAILURES_CHECKPOINT_NAME
+        )
+        or {}
+    )
+    graph_id = await async_models.run_in_db_thread(
+        get_next_graph_id_missing_stats,
+        get_skipped_graph_ids(
+            failures, now, current_app.config["GRAPH_STATS_MAX_ATTEMPTS"]
+        ),
+    )
+    if graph_id is None:
+        log.debug(f"no graph found missing stats sleeping for {backoff_seconds}")
+        await asyncio.sleep(backoff_seconds)
+        return None
+
+    try:
+        await async_models.run_in_db_thread(save_graph_stats, graph_id)
+    except Exception as err:
+        failure = await async_models.run_in_db_thread(
+            record_graph_stats_failure, failures, graph_id, err, now
+        )
+        log.error(
+            f"error saving graph {graph_id} stats (attempt {failure['attempts']}, retrying after {failure['retry_after']}): {err}"
+        )
+        await asyncio.sleep(backoff_seconds)
+        return graph_id
+
+    if str(graph_id) in failures:
+        del failures[str(graph_id)]
+        await async_models.run_in_db_thread(
+            models.save_task_checkpoint, FAILURES_CHECKPOINT_NAME, failures
+        )
+    return graph_id
@@ -5,6 +5,7 @@ import logging
 
 import flask
 from flask import current_app
+import prometheus_client
 
 from depobs.database.models import (
     save_json_results,
@@ -14,6 +15,16 @@ from depobs.worker import gcp
 
 log = logging.getLogger(__name__)
 
+PUBSUB_MESSAGES = prometheus_client.Counter(
+    "depobs_pubsub_messages_total",
+    "Scan job pubsub messages received by whether they were saved.",
+    ["saved"],
+)
+PUBSUB_MESSAGE_BYTES = prometheus_client.Counter(
+    "depobs_pubsub_message_bytes_total",
+    "Bytes of scan job pubsub messages saved as JSONResults.",
+)
+
 
 def save_pubsub_message(
     app: flask.Flask, message: gcp.pubsub_v1.types.PubsubMessage
@@ -48,8 +59,11 @@ def save_pubsub_message(
                 ]
             )
             message.ack()
+            PUBSUB_MESSAGES.labels(saved="true").inc()
+            PUBSUB_MESSAGE_BYTES.inc(message.size)
         except Exception as err:
             message.nack()
+            PUBSUB_MESSAGES.labels(saved="false").inc()
             log.error(
                 f"error saving pubsub message {message} to json results table: {err}"
             )
@@ -1,14 +1,18 @@
 import asyncio
+from datetime import datetime
 import logging
 from typing import Dict
 
+from flask import current_app
 
+import depobs.database.async_models as async_models
 from depobs.database.enums import ScanStatusEnum
 import depobs.database.models as models
 
 from depobs.util.traceback_util import exc_to_str
 from depobs.worker import k8s
 from depobs.worker.scans import *
+from depobs.worker.tasks.finish_scan import SCAN_STAGE_SECONDS, finish_scan
 
 
 log = logging.getLogger(__name__)
@@ -24,7 +28,7 @@ async def start_next_scan(_, backoff_seconds: int = 5) -> None:
 
     Requires depobs flask app context.
     """
-    scan = models.get_next_scan_with_status_query(ScanStatusEnum["queued"]).first()
+    scan = await async_models.get_next_scan_with_status(ScanStatusEnum["queued"])
     if not scan:
         await asyncio.sleep(backoff_seconds)
         return None
@@ -43,8 +47,15 @@ async def start_scan(
 
     and returns the updated scan.
 
+    Scans that save their results in the worker (e.g. dep files scans
+    with a lockfile) don't start k8s jobs and are finished right away.
+
     Run in a flask app context.
     """
+    if scan.inserted_at is not None:
+        SCAN_STAGE_SECONDS.labels(stage="queued").observe(
+            (datetime.utcnow() - scan.inserted_at).total_seconds()
+        )
     try:
         if not (
             isinstance(scan.params, dict)
@@ -53,6 +64,13 @@ async def start_scan(
             raise Exception(f"queued scan {scan.id} has invalid params {scan.params}")
 
         scan_config = scan_type_to_config(scan.name)
+        if await scan_config.save_worker_results(scan):
+            log.info(f"scan {scan.id} saved results in worker finishing scan")
+            models.save_scan_with_job_names(scan, [])
+            return await finish_scan(
+                models.save_scan_with_status(scan, ScanStatusEnum["started"])
+            )
+
         log.info(
             f"starting k8s jobs for {scan.name} scan {scan.id} with params {scan.params}"
         )
@@ -61,13 +79,30 @@ async def start_scan(
         async for job_config in scan_config.job_configs(scan):
             job_configs[job_config["name"]] = job_config
 
-        models.save_scan_with_job_names(scan, list(job_configs.keys()))
         for job_name, job_config in job_configs.items():
             log.info(
                 f"scan {scan.id} starting k8s job {job_name} with config {job_config}"
             )
-            k8s.create_job(job_config)
-            log.info(f"scan {scan.id} started k8s job {job_name}")
+        job_results = await k8s.create_jobs(
+            job_configs.values(),
+            current_app.config["K8S_MAX_CONCURRENT_JOB_CREATES"],
+        )
+        started_job_names = []
+        for job_name, job_result in job_results.items():
+            if isinstance(job_result, Exception):
+                log.error(
+                    f"scan {scan.id} error starting k8s job {job_name}: {job_result}"
+                )
+            else:
+                log.info(f"scan {scan.id} started k8s job {job_name}")
+                started_job_names.append(job_name)
+        if not started_job_names:
+            raise Exception(
+                f"scan {scan.id} failed to start any of {len(job_configs)} k8s jobs"
+            )
+
+        # only wait on results from started jobs
+        models.save_scan_with_job_names(scan, started_job_names)
         new_scan_status = ScanStatusEnum["started"]
     except Exception as err:
         log.error(f"{scan.id} error starting k8s jobs: {err}\n{exc_to_str()}")
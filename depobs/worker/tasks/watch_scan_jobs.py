@@ -0,0 +1,113 @@
+import asyncio
+import functools
+import logging
+from typing import Any, Callable, Optional, Set, Tuple
+
+import flask
+from flask import current_app
+import kubernetes
+
+import depobs.database.models as models
+from depobs.worker import k8s
+
+
+log = logging.getLogger(__name__)
+
+
+def save_scan_job_statuses(
+    app: flask.Flask,
+    list_fn: Callable[..., Any],
+    namespace: str,
+    timeout_seconds: int,
+    watch: Optional[kubernetes.watch.Watch] = None,
+) -> int:
+    """
+    Watches scan Jobs or pods in a namespace for timeout_seconds and
+    saves terminal job states to their scans.
+
+    Returns the number of job statuses saved.
+    """
+    saved_count = 0
+    with app.app_context():
+        for scan_id, job_name, job_status in k8s.watch_scan_job_statuses(
+            list_fn, namespace, timeout_seconds, watch
+        ):
+            try:
+                saved = models.save_scan_job_status(scan_id, job_name, job_status)
+            except Exception as err:
+                models.db.session.rollback()
+                log.error(f"scan {scan_id} error saving job {job_name} status: {err}")
+                continue
+            if saved:
+                saved_count += 1
+                log.info(f"scan {scan_id} job {job_name} status {job_status}")
+        models.db.session.remove()
+    return saved_count
+
+
+# (context name, namespace) pairs with a failing pod watch, so the
+# failure is logged once until a pod watch succeeds again
+_failing_pod_watches: Set[Tuple[Optional[str], str]] = set()
+
+
+async def watch_scan_jobs(app: flask.Flask, backoff_seconds: int = 5) -> int:
+    """
+    Async task that watches the k8s Jobs and pods for scan jobs in
+    each context and namespace scans run in and records failed and
+    succeeded jobs on their scans (for finish_scan to fail scans
+    without waiting for the scan timeout).
+
+    Runs each watch on a thread in the default loop executor and
+    returns the number of job statuses saved.
+
+    Pod watches only catch pod failures Jobs don't report (e.g. image
+    pull errors), so a failing pod watch (e.g. a Role without pods
+    access) is logged once and doesn't back off the Job watches.
+
+    Requires depobs flask app context.
+    """
+    timeout_seconds = current_app.config["SCAN_JOB_WATCH_TIMEOUT_SECONDS"]
+    contexts_and_namespaces: Set[Tuple[Optional[str], str]] = {
+        (job_config["context_name"], job_config["namespace"])
+        for job_config in current_app.config["SCAN_JOB_CONFIGS"].values()
+    }
+    watches = [
+        (is_pod_watch, context_name, namespace, list_fn)
+        for context_name, namespace in contexts_and_namespaces
+        for is_pod_watch, list_fn in [
+            (False, k8s.get_batch_api(context_name).list_namespaced_job),
+            (True, k8s.get_core_api(context_name).list_namespaced_pod),
+        ]
+    ]
+
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        *[
+            loop.run_in_executor(
+                None,
+                functools.partial(
+                    save_scan_job_statuses, app, list_fn, namespace, timeout_seconds
+                ),
+            )
+            for _, _, namespace, list_fn in watches
+        ],
+        return_exceptions=True,
+    )
+    job_watch_failed = False
+    for (is_pod_watch, context_name, namespace, _), result in zip(watches, results):
+        if not is_pod_watch:
+            if isinstance(result, Exception):
+                job_watch_failed = True
+                log.error(f"error watching scan jobs: {result}")
+        elif isinstance(result, Exception):
+            if (context_name, namespace) not in _failing_pod_watches:
+                _failing_pod_watches.add((context_name, namespace))
+                log.error(
+                    f"error watching scan job pods in context {context_name} "
+                    f"namespace {namespace} (only Job failures will be saved): {result}"
+                )
+        else:
+            _failing_pod_watches.discard((context_name, namespace))
+    if job_watch_failed:
+        await asyncio.sleep(backoff_seconds)
+    return sum(result for result in results if isinstance(result, int))
@@ -10,6 +10,11 @@ Requires env vars:
 LANGUAGE 'nodejs, or 'rust'
 PACKAGE_MANAGER 'cargo', 'npm', or 'yarn'
 
+When PACKAGE_TARGETS_JSON is a JSON array of PACKAGE_NAME@VERSION
+strings runs the tasks for each target in a new working directory
+and publishes results for each target followed by a task_complete
+message.
+
 Usage: $0 [repo_task]+
 "
 if [ $# -lt 1 ]; then
@@ -34,6 +39,7 @@ GCP_PUBSUB_TOPIC=${GCP_PUBSUB_TOPIC:-""}
 GCP_PROJECT_ID=${GCP_PROJECT_ID:-""}
 REPO_URL=${REPO_URL:-""}
 DEP_FILE_URLS_JSON=${DEP_FILE_URLS_JSON:-""}
+PACKAGE_TARGETS_JSON=${PACKAGE_TARGETS_JSON:-""}
 
 echo "starting job ${JOB_NAME}"
 
@@ -61,7 +67,7 @@ function publish_message () {
        --arg SCAN_ID "$SCAN_ID" \
        --rawfile data "$data_temp" \
        '{"messages": [{"attributes": {$JOB_NAME, $SCAN_ID}, $data}]}' \
-	| curl -X POST --data-binary @- -H "Content-Type: application/json" -H "Authorization: Bearer $(gcloud auth application-default print-access-token)" "https://pubsub.googleapis.com/v1/projects/${GCP_PROJECT_ID}/topics/${GCP_PUBSUB_TOPIC}:publish"
+	| curl --fail --retry 3 -X POST --data-binary @- -H "Content-Type: application/json" -H "Authorization: Bearer $(gcloud auth application-default print-access-token)" "https://pubsub.googleapis.com/v1/projects/${GCP_PROJECT_ID}/topics/${GCP_PUBSUB_TOPIC}:publish"
 }
 
 message_temp=$(mktemp)
@@ -106,117 +112,153 @@ VERSIONS=$(jq -cnM \
        --arg "$PACKAGE_MANAGER" "$PACKAGE_MANAGER_VERSION" \
        "{\$git, \$jq, \$rg, \$$LANGUAGE, \$$PACKAGE_MANAGER}")
 
-ENVVAR_ARGS=$(jq -cnM \
-                 --arg "LANGUAGE" "$LANGUAGE" \
-                 --arg "PACKAGE_MANAGER" "$PACKAGE_MANAGER" \
-                 --arg "BUILD_TARGET" "$BUILD_TARGET" \
-                 --arg "INSTALL_TARGET" "$INSTALL_TARGET" \
-                 --arg "PACKAGE_NAME" "$PACKAGE_NAME" \
-                 --arg "PACKAGE_VERSION" "$PACKAGE_VERSION" \
-                 '{$LANGUAGE, $PACKAGE_MANAGER, $BUILD_TARGET, $INSTALL_TARGET, $PACKAGE_NAME, $PACKAGE_VERSION}')
+# run input task names one at a time for the current PACKAGE_NAME and
+# PACKAGE_VERSION and append their results to the message file
+function run_tasks () {
+    ENVVAR_ARGS=$(jq -cnM \
+                     --arg "LANGUAGE" "$LANGUAGE" \
+                     --arg "PACKAGE_MANAGER" "$PACKAGE_MANAGER" \
+                     --arg "BUILD_TARGET" "$BUILD_TARGET" \
+                     --arg "INSTALL_TARGET" "$INSTALL_TARGET" \
+                     --arg "PACKAGE_NAME" "$PACKAGE_NAME" \
+                     --arg "PACKAGE_VERSION" "$PACKAGE_VERSION" \
+                     '{$LANGUAGE, $PACKAGE_MANAGER, $BUILD_TARGET, $INSTALL_TARGET, $PACKAGE_NAME, $PACKAGE_VERSION}')
+
+    while (( $# )); do
+        TASK_NAME=$1
+        case "${LANGUAGE}-${PACKAGE_MANAGER}-${TASK_NAME}" in
+            rust-cargo-audit)
+                # cargo audit --version
+                # NB: requires Cargo.lock
+                TASK_COMMAND="cargo audit --json"
+                ;;
+            rust-cargo-build)
+                # NB: requires Cargo.toml
+                # creates target/package/<package name>-<pkg version>.crate
+                TASK_COMMAND="cargo build -p \"$BUILD_TARGET\""
+                ;;
+            rust-cargo-install)
+                # NB: requires a Cargo.toml file and uses the Cargo.lock when present
+                TASK_COMMAND="cargo install --all-features --locked \"$INSTALL_TARGET\""
+                ;;
+            rust-cargo-list_metadata)
+                # NB: requires Cargo.toml
+                TASK_COMMAND="cargo metadata --format-version 2 --locked"
+                ;;
 
-# process input task names one at a time
-while (( $# )); do
-    TASK_NAME=$1
-    case "${LANGUAGE}-${PACKAGE_MANAGER}-${TASK_NAME}" in
-        rust-cargo-audit)
-            # cargo audit --version
-            # NB: requires Cargo.lock
-            TASK_COMMAND="cargo audit --json"
-            ;;
-        rust-cargo-build)
-            # NB: requires Cargo.toml
-            # creates target/package/<package name>-<pkg version>.crate
-            TASK_COMMAND="cargo build -p \"$BUILD_TARGET\""
-            ;;
-        rust-cargo-install)
-            # NB: requires a Cargo.toml file and uses the Cargo.lock when present
-            TASK_COMMAND="cargo install --all-features --locked \"$INSTALL_TARGET\""
-            ;;
-        rust-cargo-list_metadata)
-            # NB: requires Cargo.toml
-            TASK_COMMAND="cargo metadata --format-version 2 --locked"
-            ;;
+            nodejs-npm-audit)
+                # NB: requires a package.json manifest and an npm lockfile (package-lock.json or npm-shrinkwrap.json)
+                TASK_COMMAND="npm audit --json"
+                ;;
+            nodejs-npm-build)
+                # NB: requires package.json and doesn't take a package name
+                TASK_COMMAND="npm pack ."
+                ;;
+            nodejs-npm-ci)
+                # NB: requires a package.json manifest and an npm lockfile (package-lock.json or npm-shrinkwrap.json)
+                # NB: errors for missing package-lock.json or npm-shrinkwrap.json and does not update the files
+                TASK_COMMAND="npm ci"
+                ;;
+            nodejs-npm-install)
+                # NB: creates or update package-lock.json or npm-shrinkwrap.json
+                # NB: requires a package.json
+                TASK_COMMAND="npm install --save=true $INSTALL_TARGET"
+                ;;
+            nodejs-npm-list_metadata)
+                # NB: requires a package.json file and "npm ci" or "npm install" to not just show a bunch of missing warnings/errors
+                TASK_COMMAND="npm list --json"  # or "npm list --json --long"
+                ;;
+            nodejs-npm-write_manifest)
+                # write a package.json file to so npm audit doesn't error out
+                TASK_COMMAND="jq -cnM --arg name \"$PACKAGE_NAME\" --arg version \"$PACKAGE_VERSION\" '{dependencies: {}} | .dependencies[\$name] = \$version' | tee -a package.json"
+                ;;
+            nodejs-npm-write_dep_files)
+                # write manifest and other files
+                TASK_COMMAND=$(echo "$DEP_FILE_URLS_JSON" | jq -rc '.[] |  ("curl -s \"" + .url + "\" | tee \"" + .filename + "\"")' | tr '\n' ';')
+                ;;
 
-        nodejs-npm-audit)
-            # NB: requires a package.json manifest and an npm lockfile (package-lock.json or npm-shrinkwrap.json)
-            TASK_COMMAND="npm audit --json"
-            ;;
-        nodejs-npm-build)
-            # NB: requires package.json and doesn't take a package name
-            TASK_COMMAND="npm pack ."
-            ;;
-        nodejs-npm-ci)
-            # NB: requires a package.json manifest and an npm lockfile (package-lock.json or npm-shrinkwrap.json)
-            # NB: errors for missing package-lock.json or npm-shrinkwrap.json and does not update the files
-            TASK_COMMAND="npm ci"
-            ;;
-        nodejs-npm-install)
-            # NB: creates or update package-lock.json or npm-shrinkwrap.json
-            # NB: requires a package.json
-            TASK_COMMAND="npm install --save=true $INSTALL_TARGET"
-            ;;
-        nodejs-npm-list_metadata)
-            # NB: requires a package.json file and "npm ci" or "npm install" to not just show a bunch of missing warnings/errors
-            TASK_COMMAND="npm list --json"  # or "npm list --json --long"
-            ;;
-        nodejs-npm-write_manifest)
-            # write a package.json file to so npm audit doesn't error out
-            TASK_COMMAND="jq -cnM --arg name \"$PACKAGE_NAME\" --arg version \"$PACKAGE_VERSION\" '{dependencies: {}} | .dependencies[\$name] = \$version' | tee -a package.json"
-            ;;
-        nodejs-npm-write_dep_files)
-            # write manifest and other files
-            TASK_COMMAND=$(echo "$DEP_FILE_URLS_JSON" | jq -rc '.[] |  ("curl -s \"" + .url + "\" | tee \"" + .filename + "\"")' | tr '\n' ';')
-            ;;
+            nodejs-yarn-audit)
+                # NB: requires a package.json manifest and a yarn.lock
+                TASK_COMMAND="yarn audit --json --frozen-lockfile"
+                ;;
+            nodejs-yarn-build)
+                # NB: requires package.json and doesn't take a package name
+                TASK_COMMAND="yarn pack --non-interactive ."
+                ;;
+            nodejs-yarn-install)
+                # NB: requires package.json and yarn.lock
+                TASK_COMMAND="yarn install --frozen-lockfile \"$INSTALL_TARGET\""
+                ;;
+            nodejs-yarn-list_metadata)
+                # NB: requires a package.json and yarn.lock
+                TASK_COMMAND="yarn list --json --frozen-lockfile"
+                ;;
+    	*-git_clone)
+    	    # TODO: look into partial clones and sparse checkouts
+    	    # https://github.com/git/git/blob/master/Documentation/technical/partial-clone.txt
+    	    # https://github.blog/2020-01-13-highlights-from-git-2-25/#sparse-checkouts
+    	    TASK_COMMAND="git clone --depth=1 --origin origin \"${REPO_URL}\" repo"
+    	    ;;
+            *)
+                jq -cnM --arg invalid_value "${LANGUAGE}-${PACKAGE_MANAGER}-${TASK_NAME}" "{type: \"not_implemented_error\", message: \"do not know how to ${TASK_NAME} for language and package manager\", \$invalid_value}" | tee -a "$message_temp"
+                shift
+                continue
+                ;;
+        esac
 
-        nodejs-yarn-audit)
-            # NB: requires a package.json manifest and a yarn.lock
-            TASK_COMMAND="yarn audit --json --frozen-lockfile"
-            ;;
-        nodejs-yarn-build)
-            # NB: requires package.json and doesn't take a package name
-            TASK_COMMAND="yarn pack --non-interactive ."
-            ;;
-        nodejs-yarn-install)
-            # NB: requires package.json and yarn.lock
-            TASK_COMMAND="yarn install --frozen-lockfile \"$INSTALL_TARGET\""
-            ;;
-        nodejs-yarn-list_metadata)
-            # NB: requires a package.json and yarn.lock
-            TASK_COMMAND="yarn list --json --frozen-lockfile"
-            ;;
-	*-git_clone)
-	    # TODO: look into partial clones and sparse checkouts
-	    # https://github.com/git/git/blob/master/Documentation/technical/partial-clone.txt
-	    # https://github.blog/2020-01-13-highlights-from-git-2-25/#sparse-checkouts
-	    TASK_COMMAND="git clone --depth=1 --origin origin \"${REPO_URL}\" repo"
-	    ;;
-        *)
-            jq -cnM --arg invalid_value "${LANGUAGE}-${PACKAGE_MANAGER}-${TASK_NAME}" "{type: \"not_implemented_error\", message: \"do not know how to ${TASK_NAME} for language and package manager\", \$invalid_value}" | tee -a "$message_temp"
-            shift
-            continue
-            ;;
-    esac
+        # https://mywiki.wooledge.org/BashFAQ/002
 
-    # https://mywiki.wooledge.org/BashFAQ/002
+        stdout_temp=$(mktemp)
+        set +e # don't stop if the command fails
+        stderr=$(eval "$TASK_COMMAND" 2>&1 >"$stdout_temp")
+        status=$?
+        set -e
+        jq -cnM \
+           --arg name "$TASK_NAME" \
+           --arg command "$TASK_COMMAND" \
+           --arg working_dir "$(pwd)" \
+           --argjson exit_code "$status" \
+           --rawfile stdout "$stdout_temp" \
+           --arg stderr "$stderr" \
+           --argjson versions "$VERSIONS" \
+           --argjson envvar_args "$ENVVAR_ARGS" \
+           '{type: "task_result", $name, $command, $working_dir, $exit_code, $stdout, $stderr, $versions, $envvar_args}' | tee -a "$message_temp"
+        shift
+    done
+}
 
-    stdout_temp=$(mktemp)
-    set +e # don't stop if the command fails
-    stderr=$(eval "$TASK_COMMAND" 2>&1 >"$stdout_temp")
-    status=$?
-    set -e
-    jq -cnM \
-       --arg name "$TASK_NAME" \
-       --arg command "$TASK_COMMAND" \
-       --arg working_dir "$(pwd)" \
-       --argjson exit_code "$status" \
-       --rawfile stdout "$stdout_temp" \
-       --arg stderr "$stderr" \
-       --argjson versions "$VERSIONS" \
-       --argjson envvar_args "$ENVVAR_ARGS" \
-       '{type: "task_result", $name, $command, $working_dir, $exit_code, $stdout, $stderr, $versions, $envvar_args}' | tee -a "$message_temp"
-    shift
-done
+if [ -z "$PACKAGE_TARGETS_JSON" ]; then
+    run_tasks "$@"
+else
+    # publish each target separately to stay under the pubsub message
+    # size limit and share the package manager cache between targets
+    JOB_DIR=$(pwd)
+    FAILED_PUBLISH_TARGETS=""
+    # read targets from fd 3 so tasks can't consume them from stdin
+    while read -r -u 3 PACKAGE_TARGET; do
+        PACKAGE_NAME="${PACKAGE_TARGET%@*}"
+        PACKAGE_VERSION="${PACKAGE_TARGET##*@}"
+        echo "running tasks for ${PACKAGE_NAME}@${PACKAGE_VERSION}"
+        cd "$(mktemp -d)"
+        run_tasks "$@"
+        jq -cnM --arg target "$PACKAGE_TARGET" '{type: "target_complete", $target}' | tee -a "$message_temp"
+        ls -lh "$message_temp"
+        # finish the other targets before failing the job on a failed
+        # publish (saving results keeps the latest result per target
+        # when the job retry republishes them)
+        if ! publish_message "$(jq -s '.' "$message_temp")"; then
+            echo "failed to publish results for ${PACKAGE_TARGET}"
+            FAILED_PUBLISH_TARGETS="${FAILED_PUBLISH_TARGETS} ${PACKAGE_TARGET}"
+        fi
+        : > "$message_temp"
+    done 3< <(echo "$PACKAGE_TARGETS_JSON" | jq -rc '.[]')
+    cd "$JOB_DIR"
+    # don't publish task_complete so the scan doesn't finish without them
+    if [ -n "$FAILED_PUBLISH_TARGETS" ]; then
+        echo "failed to publish results for targets:${FAILED_PUBLISH_TARGETS}"
+        exit 1
+    fi
+fi
 jq -cnM '{type: "task_complete"}' | tee -a "$message_temp"
 ls -lh "$message_temp"
 publish_message "$(jq -s '.' "$message_temp")"
@@ -0,0 +1,439 @@
+import asyncio
+import json
+
+import pytest
+
+import depobs.clients.github as m
+
+
+def github_config(**kwargs):
+    config = dict(
+        base_url="https://api.github.com/graphql",
+        user_agent="test",
+        total_timeout=10,
+        max_connections=2,
+        delay=0,
+        github_auth_token="test-token",
+        github_accept_headers=[],
+        github_max_retries=2,
+        github_checkpoint_path=None,
+        github_checkpoint_seconds=60,
+        github_repo_freshness_seconds=3600,
+    )
+    config.update(kwargs)
+    return config
+
+
+def vulnerabilities_page(updated_ats, end_cursor, has_next_page):
+    return dict(
+        securityVulnerabilities=dict(
+            nodes=[
+                dict(updatedAt=updated_at, advisory=dict(id=f"GHSA-{updated_at}"))
+                for updated_at in updated_ats
+            ],
+            pageInfo=dict(endCursor=end_cursor, hasNextPage=has_next_page),
+        )
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_npm_security_vulnerabilities_stops_at_updated_after(mocker):
+    pages = {
+        None: vulnerabilities_page(["2020-03-03", "2020-03-02"], "c1", True),
+        "c1": vulnerabilities_page(["2020-02-02", "2020-01-01"], "c2", True),
+        "c2": vulnerabilities_page(["2019-12-12"], "c3", False),
+    }
+    requested_cursors = []
+
+    async def fake_post_graphql(config, session, query, variables):
+        requested_cursors.append(variables["after"])
+        return pages[variables["after"]]
+
+    mocker.patch.object(m, "post_graphql", fake_post_graphql)
+
+    pages_of_nodes = [
+        [node["updatedAt"] for node in nodes]
+        async for nodes in m.fetch_npm_security_vulnerabilities(
+            github_config(), updated_after="2020-01-15"
+        )
+    ]
+
+    assert pages_of_nodes == [["2020-03-03", "2020-03-02"], ["2020-02-02"]]
+    assert requested_cursors == [None, "c1"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_npm_security_vulnerabilities_retries_graphql_errors(mocker):
+    attempts = 0
+
+    async def fake_post_graphql(config, session, query, variables):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise m.GraphQLError([dict(message="Something went wrong")])
+        return vulnerabilities_page(["2020-01-01"], "c1", False)
+
+    mocker.patch.object(m, "post_graphql", fake_post_graphql)
+    mocker.patch("asyncio.sleep", mocker.AsyncMock())
+
+    pages_of_nodes = [
+        nodes async for nodes in m.fetch_npm_security_vulnerabilities(github_config())
+    ]
+
+    assert len(pages_of_nodes) == 1
+    assert attempts == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_package_security_vulnerabilities_paginates_per_alias(mocker):
+    # package name to pages of advisory IDs
+    pages = {
+        "one-page": [["GHSA-1"]],
+        "two-pages": [["GHSA-2", "GHSA-3"], ["GHSA-4"]],
+        "no-vulns": [[]],
+        "other-batch": [["GHSA-5"]],
+    }
+    requests = []
+
+    async def fake_post_graphql(config, session, query, variables):
+        names = [variables[f"p{i}"] for i in range(len(variables) // 2)]
+        requests.append(names)
+        assert f"p{len(names) - 1}: securityVulnerabilities" in query
+        data = {}
+        for i, name in enumerate(names):
+            page = int(variables[f"a{i}"] or 0)
+            data[f"p{i}"] = dict(
+                nodes=[
+                    dict(advisory=dict(id=advisory_id))
+                    for advisory_id in pages[name][page]
+                ],
+                pageInfo=dict(
+                    endCursor=str(page + 1), hasNextPage=page + 1 < len(pages[name])
+                ),
+            )
+        return data
+
+    mocker.patch.object(m, "post_graphql", fake_post_graphql)
+
+    results = [
+        result
+        async for result in m.fetch_package_security_vulnerabilities(
+            github_config(github_workers=2, github_advisory_package_batch_size=3),
+            ["one-page", "two-pages", "no-vulns", "other-batch"],
+        )
+    ]
+
+    assert {
+        name: [node["advisory"]["id"] for node in nodes] for name, nodes in results
+    } == {
+        "one-page": ["GHSA-1"],
+        "two-pages": ["GHSA-2", "GHSA-3", "GHSA-4"],
+        "no-vulns": [],
+        "other-batch": ["GHSA-5"],
+    }
+    assert sorted(requests) == [
+        ["one-page", "two-pages", "no-vulns"],
+        ["other-batch"],
+        ["two-pages"],
+    ]
+
+
+@pytest.fixture(scope="module")
+def github_schema():
+    with open("tests/fixtures/graphql/github_schema.json") as fin:
+        return m.quiz.Schema.from_raw(json.load(fin), scalars=(), module=None)
+
+
+def load_json_fixture(name):
+    with open(f"tests/fixtures/{name}.json") as fin:
+        return json.load(fin)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_run_pipeline_runs_next_pages_and_stops_when_done(mocker, github_schema):
+    in_flight_repos, max_in_flight_repos = set(), 0
+
+    async def fake_quiz_executor_and_schema(config, session):
+        return None, github_schema
+
+    async def fake_run_graphql(executor, worker_name, gql_query):
+        nonlocal max_in_flight_repos
+        repo = "repo-a" if "repo-a" in gql_query else "repo-b"
+        in_flight_repos.add(repo)
+        max_in_flight_repos = max(max_in_flight_repos, len(in_flight_repos))
+        await asyncio.sleep(0)
+        if "after" not in gql_query:
+            return load_json_fixture("REPO_LANGS_first_page_response_next_page")
+        in_flight_repos.remove(repo)
+        return load_json_fixture("REPO_LANGS_first_page_response_no_next_page")
+
+    mocker.patch.object(m, "quiz_executor_and_schema", fake_quiz_executor_and_schema)
+    mocker.patch.object(m, "run_graphql", fake_run_graphql)
+
+    config = github_config(
+        github_workers=2,
+        github_max_workers=4,
+        github_max_repos_in_flight=1,
+        github_write_queue_size=1,
+        github_poll_seconds=60,
+        github_query_type=["REPO_LANGS"],
+        github_repo_langs_page_size=2,
+    )
+    results = [
+        result
+        async for result in m.run_pipeline(
+            (
+                dict(repo_url=f"https://github.com/mozilla/{repo}")
+                for repo in ["repo-a", "repo-b"]
+            ),
+            config,
+        )
+    ]
+
+    assert len(results) == 4
+    assert all("repository" in result for result in results)
+    assert max_in_flight_repos == 1
+
+
+@pytest.mark.unit
+def test_pipeline_metrics_summary():
+    now = 0.0
+    metrics = m.PipelineMetrics(clock=lambda: now)
+    metrics.record(m.ResourceKind.REPO_LANGS, 0.5, error=False)
+    metrics.record(m.ResourceKind.REPO_LANGS, 1.5, error=True)
+    metrics.record(m.ResourceKind.REPO, 0.25, error=False)
+    now = 2.0
+
+    assert metrics.throughput() == {"REPO_LANGS": 1.0, "REPO": 0.5}
+    assert metrics.summary() == (
+        "REPO: 1 requests (0.50/s) 0 errors 0.250s avg; "
+        "REPO_LANGS: 2 requests (1.00/s) 1 errors 1.000s avg"
+    )
+
+
+@pytest.fixture
+def raw_github_schema():
+    with open("tests/fixtures/graphql/github_schema.json") as fin:
+        return json.load(fin)
+
+
+@pytest.fixture
+def schema_cache_config(tmp_path):
+    m._schemas.clear()
+    yield github_config(
+        github_accept_headers=["application/vnd.github.hawkgirl-preview+json"],
+        github_schema_cache_path=str(tmp_path / "cache" / "github_schema.json"),
+        github_schema_cache_ttl_seconds=60,
+    )
+    m._schemas.clear()
+
+
+@pytest.mark.unit
+def test_schema_cache_round_trip_and_invalidation(
+    mocker, schema_cache_config, raw_github_schema
+):
+    assert m.load_cached_raw_schema(schema_cache_config) is None
+
+    m.save_cached_raw_schema(schema_cache_config, raw_github_schema)
+    assert m.load_cached_raw_schema(schema_cache_config) == raw_github_schema
+
+    assert (
+        m.load_cached_raw_schema(
+            {**schema_cache_config, "base_url": "https://github.example.com/graphql"}
+        )
+        is None
+    )
+    mocker.patch.object(m, "SCHEMA_CACHE_VERSION", m.SCHEMA_CACHE_VERSION + 1)
+    assert m.load_cached_raw_schema(schema_cache_config) is None
+
+
+@pytest.mark.unit
+def test_schema_cache_expires(mocker, schema_cache_config, raw_github_schema):
+    m.save_cached_raw_schema(schema_cache_config, raw_github_schema)
+    mocker.patch.object(m.time, "time", return_value=m.time.time() + 61)
+
+    assert m.load_cached_raw_schema(schema_cache_config) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_get_schema_loads_cache_lazily_once(
+    mocker, schema_cache_config, raw_github_schema
+):
+    executor = mocker.AsyncMock(return_value={"__schema": raw_github_schema})
+
+    schema = await m.get_schema(schema_cache_config, executor)
+    # fetches and caches the schema when there's no cache
+    assert executor.await_count == 1
+    assert m.load_cached_raw_schema(schema_cache_config) == raw_github_schema
+
+    # reuses the parsed schema in the process
+    assert await m.get_schema(schema_cache_config, executor) is schema
+    # loads the on-disk cache in a new process
+    m._schemas.clear()
+    assert isinstance(await m.get_schema(schema_cache_config, executor), m.quiz.Schema)
+    assert executor.await_count == 1
+
+    # refetches on refresh
+    await m.get_schema(schema_cache_config, executor, refresh=True)
+    assert executor.await_count == 2
+
+
+def repo_langs_request(repo):
+    context = m.ChainMap(
+        dict(
+            owner="mozilla",
+            name=repo,
+            github_query_type=["REPO_LANGS"],
+            github_repo_langs_page_size=2,
+        )
+    )
+    return next(m.get_next_requests(m.log, context, last_exchange=None))
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_repo_request_tracker_checkpoints_pending_and_fresh_repos():
+    now = 100.0
+    tracker = m.RepoRequestTracker(max_repos=2, clock=lambda: now)
+    done_request, pending_request = repo_langs_request("a"), repo_langs_request("b")
+    next_request = repo_langs_request("b")
+    await tracker.start("a", [done_request])
+    await tracker.start("b", [pending_request])
+    tracker.add(pending_request, [next_request])
+    tracker.done(done_request)
+    tracker.done(pending_request)
+    now = 200.0
+
+    checkpoint = json.loads(json.dumps(tracker.to_checkpoint(freshness_seconds=150)))
+    assert checkpoint["finished_at"] == {"a": 100.0}
+    assert tracker.to_checkpoint(freshness_seconds=50)["finished_at"] == {}
+
+    resumed_tracker = m.RepoRequestTracker(max_repos=2, clock=lambda: now)
+    assert resumed_tracker.load_checkpoint(checkpoint) == {"b": [next_request]}
+    assert resumed_tracker.is_fresh("a", 150)
+    assert not resumed_tracker.is_fresh("b", 150)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_run_pipeline_resumes_from_checkpoint(mocker, github_schema, tmp_path):
+    run_repos = []
+
+    async def fake_quiz_executor_and_schema(config, session):
+        return None, github_schema
+
+    async def fake_run_graphql(executor, worker_name, gql_query):
+        run_repos.append("repo-a" if "repo-a" in gql_query else "repo-b")
+        if "after" not in gql_query:
+            return load_json_fixture("REPO_LANGS_first_page_response_next_page")
+        return load_json_fixture("REPO_LANGS_first_page_response_no_next_page")
+
+    mocker.patch.object(m, "quiz_executor_and_schema", fake_quiz_executor_and_schema)
+    mocker.patch.object(m, "run_graphql", fake_run_graphql)
+
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    config = github_config(
+        github_workers=1,
+        github_max_workers=1,
+        github_max_repos_in_flight=1,
+        github_write_queue_size=1,
+        github_poll_seconds=60,
+        github_query_type=["REPO_LANGS"],
+        github_repo_langs_page_size=2,
+        github_checkpoint_path=checkpoint_path,
+    )
+
+    def source():
+        return (
+            dict(repo_url=f"https://github.com/mozilla/{repo}")
+            for repo in ["repo-a", "repo-b"]
+        )
+
+    # stop after the first page
+    pipeline = m.run_pipeline(source(), config)
+    await pipeline.__anext__()
+    await pipeline.aclose()
+    checkpoint = m.load_checkpoint(checkpoint_path)
+    assert list(checkpoint["pending"].keys()) == ["https://github.com/mozilla/repo-a"]
+    assert checkpoint["finished_at"] == {}
+
+    run_repos.clear()
+    results = [result async for result in m.run_pipeline(source(), config)]
+    assert len(results) >= 3
+    # repo-b's two pages
+    assert run_repos.count("repo-b") == 2
+    checkpoint = m.load_checkpoint(checkpoint_path)
+    assert checkpoint["pending"] == {}
+    assert set(checkpoint["finished_at"].keys()) == {
+        "https://github.com/mozilla/repo-a",
+        "https://github.com/mozilla/repo-b",
+    }
+
+    # skips fresh repos
+    run_repos.clear()
+    assert [result async for result in m.run_pipeline(source(), config)] == []
+    assert run_repos == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_repo_request_tracker_reuses_slot_for_pending_repo():
+    tracker = m.RepoRequestTracker(max_repos=1)
+    first_request, duplicate_request = repo_langs_request("a"), repo_langs_request("a")
+    await tracker.start("a", [first_request])
+    # doesn't wait for a second slot
+    await asyncio.wait_for(tracker.start("a", [duplicate_request]), timeout=1)
+    tracker.done(first_request)
+    tracker.done(duplicate_request)
+
+    assert tracker.pending == {}
+    await asyncio.wait_for(tracker.start("b", [repo_langs_request("b")]), timeout=1)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_worker_stops_ahead_of_queued_requests_when_scaled_down(
+    mocker, github_schema
+):
+    to_run: asyncio.Queue = asyncio.Queue()
+    requests = [repo_langs_request("a"), repo_langs_request("b")]
+    for request in requests:
+        to_run.put_nowait(request)
+    scale = m.WorkerScale(target=1)
+    scale.running = 1
+
+    async def fake_run_graphql(executor, worker_name, gql_query):
+        # scale down while running the first request
+        scale.target = 0
+        return load_json_fixture("REPO_LANGS_first_page_response_no_next_page")
+
+    tracker = m.RepoRequestTracker(max_repos=2)
+    await tracker.start("a", requests[:1])
+    await tracker.start("b", requests[1:])
+    to_write: asyncio.Queue = asyncio.Queue()
+    await asyncio.wait_for(
+        m.worker(
+            "worker-0",
+            to_run,
+            to_write,
+            github_schema,
+            None,
+            fake_run_graphql,
+            m.ChainMap(
+                dict(github_query_type=["REPO_LANGS"], github_repo_langs_page_size=2)
+            ),
+            tracker,
+            m.PipelineMetrics(),
+            scale,
+        ),
+        timeout=1,
+    )
+
+    assert to_write.qsize() == 1
+    assert to_run.qsize() == 1
+    assert scale.running == 0
@@ -0,0 +1,65 @@
+import aiohttp
+import pytest
+
+import depobs.clients.hibp as m
+
+
+def hibp_config(**kwargs):
+    return dict(
+        base_url="https://haveibeenpwned.com/api/v3/",
+        delay=0,
+        max_connections=1,
+        max_retries=2,
+        package_batch_size=1,
+        total_timeout=10,
+        user_agent="test",
+        bearer_auth_token=None,
+        additional_headers=None,
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_hibp_account_breach_names_requests_each_email_once(mocker):
+    requested_urls = []
+
+    async def fake_request_json(session, method, url):
+        requested_urls.append(url)
+        if url.endswith("not-found@example.com"):
+            return aiohttp.ClientResponseError(None, (), status=404)
+        if url.endswith("fails@example.com"):
+            raise aiohttp.ClientError("server error")
+        return [dict(Name="Adobe"), dict(Name="LinkedIn")]
+
+    mocker.patch.object(m, "request_json", fake_request_json)
+
+    results = [
+        result
+        async for result in m.fetch_hibp_account_breach_names(
+            hibp_config(),
+            [
+                "a@example.com",
+                "not-found@example.com",
+                "a@example.com",
+                "fails@example.com",
+            ],
+        )
+    ]
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    assert len(errors) == 1
+    assert isinstance(errors[0], m.HIBPAccountError)
+    assert errors[0].email == "fails@example.com"
+    assert sorted(
+        result for result in results if not isinstance(result, Exception)
+    ) == [
+        ("a@example.com", ["Adobe", "LinkedIn"]),
+        ("not-found@example.com", []),
+    ]
+    assert sorted(url.rsplit("/", 1)[-1] for url in requested_urls) == [
+        "a@example.com",
+        "fails@example.com",
+        "fails@example.com",
+        "not-found@example.com",
+    ]
@@ -0,0 +1,50 @@
+import aiohttp
+import pytest
+
+import depobs.clients.npm_registry as m
+
+
+def npm_registry_config(**kwargs):
+    return dict(
+        base_url="https://registry.npmjs.com/",
+        delay=0,
+        max_connections=2,
+        max_retries=2,
+        package_batch_size=3,
+        total_timeout=10,
+        user_agent="test",
+        bearer_auth_token=None,
+        additional_headers=None,
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_npm_registry_metadata_reports_failed_names(mocker):
+    async def fake_request_json(session, method, url):
+        name = url.rsplit("/", 1)[-1]
+        if name == "fails":
+            raise aiohttp.ClientError("server error")
+        if name == "not-found":
+            raise aiohttp.ClientResponseError(None, (), status=404)
+        return {"name": name}
+
+    mocker.patch.object(m, "request_json", fake_request_json)
+
+    results = [
+        result
+        async for result in m.fetch_npm_registry_metadata(
+            npm_registry_config(), ["a", "fails", "not-found", "b"]
+        )
+    ]
+
+    # the other names in the failed name's group still return data
+    assert [
+        result["name"] for result in results if not isinstance(result, Exception)
+    ] == ["a", "b"]
+    errors = [result for result in results if isinstance(result, Exception)]
+    assert len(errors) == 2
+    assert isinstance(errors[0], m.NPMRegistryFetchError)
+    assert errors[0].package_names == ["fails"]
+    assert m.is_not_found_exception(errors[1])
@@ -0,0 +1,60 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+import depobs.clients.npmsio as m
+
+
+def npmsio_config(**kwargs):
+    return dict(
+        base_url="https://api.npms.io/v2/",
+        delay=0,
+        max_connections=2,
+        max_retries=2,
+        package_batch_size=2,
+        total_timeout=10,
+        user_agent="test",
+        bearer_auth_token=None,
+        additional_headers=None,
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_npmsio_scores_reports_failed_batches(mocker):
+    in_flight, max_in_flight, attempts = 0, 0, {}
+
+    async def fake_request_json(session, method, url, json):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(in_flight, max_in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        attempts[tuple(json)] = attempts.get(tuple(json), 0) + 1
+        if "fails" in json:
+            raise aiohttp.ClientError("server error")
+        return {name: {"collected": {"metadata": {"name": name}}} for name in json}
+
+    mocker.patch.object(m, "request_json", fake_request_json)
+
+    results = [
+        result
+        async for result in m.fetch_npmsio_scores(
+            npmsio_config(), ["a", "b", "c", "fails", "d", "e", "f"]
+        )
+    ]
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    assert len(errors) == 1
+    assert isinstance(errors[0], m.NPMSIOBatchError)
+    assert errors[0].package_names == ["c", "fails"]
+    assert sorted(
+        result["collected"]["metadata"]["name"]
+        for result in results
+        if not isinstance(result, Exception)
+    ) == ["a", "b", "d", "e", "f"]
+    # retries the failed batch
+    assert attempts[("c", "fails")] == 2
+    assert max_in_flight <= 2
@@ -0,0 +1,152 @@
+import time
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import pytest
+
+from depobs.clients.aiohttp_client import aiohttp_session
+import depobs.clients.rate_limit as m
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def rate_limiters():
+    m._rate_limiters.clear()
+    yield m._rate_limiters
+    m._rate_limiters.clear()
+    m.set_coordinator(None)
+
+
+@pytest.mark.unit
+def test_rate_limiter_reserves_burst_then_paces_requests():
+    clock = FakeClock()
+    limiter = m.RateLimiter("example.com", rate=2.0, burst=2, clock=clock)
+
+    assert [limiter.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+
+    clock.now += 2.0
+    assert limiter.reserve() == 0.0
+
+
+@pytest.mark.unit
+def test_rate_limiter_pauses_for_retry_after():
+    clock = FakeClock()
+    limiter = m.RateLimiter("example.com", rate=2.0, burst=2, clock=clock)
+
+    limiter.update_from_response(429, {"Retry-After": "3"})
+
+    assert limiter.reserve() == pytest.approx(3.0)
+    assert limiter.reserve() == pytest.approx(3.5)
+
+
+@pytest.mark.unit
+def test_rate_limiter_adapts_to_rate_limit_headers():
+    clock = FakeClock()
+    limiter = m.RateLimiter("api.github.com", rate=2.0, burst=1, clock=clock)
+
+    limiter.update_from_response(
+        200,
+        {"X-RateLimit-Remaining": "100", "X-RateLimit-Reset": str(time.time() + 200)},
+    )
+    assert limiter.rate == pytest.approx(0.5, rel=0.05)
+
+    limiter.update_from_response(
+        403,
+        {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(time.time() + 60)},
+    )
+    assert limiter.reserve() == pytest.approx(60, abs=1)
+
+
+@pytest.mark.unit
+def test_rate_limiter_slows_down_on_429_and_recovers():
+    limiter = m.RateLimiter("example.com", rate=2.0, burst=1, clock=FakeClock())
+
+    limiter.update_from_response(429, {})
+    limiter.update_from_response(429, {})
+    assert limiter.rate == 0.5
+
+    for _ in range(20):
+        limiter.update_from_response(200, {})
+    assert limiter.rate == 2.0
+
+
+@pytest.mark.unit
+def test_get_rate_limiter_shares_limiters_by_host(rate_limiters):
+    limiter = m.get_rate_limiter("registry.npmjs.com", 0.5, 10)
+
+    assert limiter.rate == 2.0
+    assert m.get_rate_limiter("registry.npmjs.com", 0, 1) is limiter
+    assert m.get_rate_limiter("api.npms.io", 0, 1).rate == float("inf")
+
+
+@pytest.mark.unit
+def test_get_rate_limiter_respects_the_strictest_settings(rate_limiters):
+    limiter = m.get_rate_limiter("registry.npmjs.com", 0.5, 10)
+
+    # a looser rate keeps the limit and a lower burst applies
+    assert m.get_rate_limiter("registry.npmjs.com", 0, 2) is limiter
+    assert (limiter.base_rate, limiter.rate, limiter.burst) == (2.0, 2.0, 2)
+    assert limiter.tokens == 2.0
+
+    # a slower rate applies
+    m.get_rate_limiter("registry.npmjs.com", 2, 10)
+    assert (limiter.base_rate, limiter.rate, limiter.burst) == (0.5, 0.5, 2)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_aiohttp_session_updates_host_rate_limiter(rate_limiters):
+    async def handler(request):
+        if request.path == "/limited":
+            return web.Response(status=429, headers={"Retry-After": "30"})
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_get("/{path}", handler)
+    coordinated_hosts = []
+
+    async def coordinator(host, seconds):
+        coordinated_hosts.append(host)
+
+    m.set_coordinator(coordinator)
+    config = dict(
+        delay=0.01,
+        max_connections=2,
+        total_timeout=10,
+        user_agent="test",
+        bearer_auth_token=None,
+        additional_headers=None,
+    )
+    async with TestServer(app) as server:
+        async with aiohttp_session(config) as session:
+            async with session.get(server.make_url("/ok")) as response:
+                assert response.status == 200
+            with pytest.raises(aiohttp.ClientResponseError):
+                await session.get(server.make_url("/limited"))
+
+    assert coordinated_hosts == [server.host, server.host]
+    limiter = rate_limiters[server.host]
+    assert limiter.reserve() > 25
+
+
+@pytest.mark.unit
+def test_rate_limiter_headroom():
+    clock = FakeClock()
+    limiter = m.RateLimiter("api.github.com", rate=2.0, burst=1, clock=clock)
+    assert limiter.headroom() == 1.0
+
+    limiter.rate = 0.5
+    assert limiter.headroom() == 0.25
+
+    limiter.pause(10)
+    assert limiter.headroom() == 0.0
+    clock.now += 11
+    assert limiter.headroom() == 0.25
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+from flask import current_app
+import pytest
+
+import depobs.database.async_models as m
+
+
+@pytest.fixture
+def app(app):
+    # pool threads open sessions (but don't query in these tests)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "postgresql://localhost/depobs_test"
+    yield app
+
+
+def current_thread_and_app_name():
+    return threading.current_thread().name, current_app.name
+
+
+def raise_value_error():
+    raise ValueError("test error")
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_run_in_db_thread_runs_in_pool_thread_with_app_context(app):
+    with app.app_context():
+        thread_name, app_name = await m.run_in_db_thread(current_thread_and_app_name)
+        assert thread_name.startswith("depobs-db")
+        assert app_name == app.name
+
+        with pytest.raises(ValueError):
+            await m.run_in_db_thread(raise_value_error)
+
+
+def blocking_query(seconds: float) -> None:
+    "simulates a blocking DB query"
+    time.sleep(seconds)
+
+
+async def fetch(seconds: float) -> None:
+    "simulates an HTTP fetch"
+    await asyncio.sleep(seconds)
+
+
+async def sync_db_scan(seconds: float) -> None:
+    await fetch(seconds)
+    blocking_query(seconds)
+    await fetch(seconds)
+    blocking_query(seconds)
+
+
+async def async_db_scan(seconds: float) -> None:
+    await fetch(seconds)
+    await m.run_in_db_thread(blocking_query, seconds)
+    await fetch(seconds)
+    await m.run_in_db_thread(blocking_query, seconds)
+
+
+@pytest.mark.asyncio
+@pytest.mark.benchmark
+async def test_benchmark_concurrent_scans_with_async_db(app):
+    scan_count, seconds = 8, 0.05
+    app.config["DB_THREADS"] = 4
+    with app.app_context():
+        start = time.perf_counter()
+        await asyncio.gather(*(sync_db_scan(seconds) for _ in range(scan_count)))
+        sync_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await asyncio.gather(*(async_db_scan(seconds) for _ in range(scan_count)))
+        async_elapsed = time.perf_counter() - start
+
+    # blocking queries serialize all scans on the event loop
+    assert sync_elapsed >= scan_count * 2 * seconds
+    assert async_elapsed < sync_elapsed / 2
+
+
+@pytest.mark.unit
+def test_get_rate_limit_lock_executor_is_per_host(app):
+    npm_executor = m.get_rate_limit_lock_executor(app, "registry.npmjs.com")
+
+    assert m.get_rate_limit_lock_executor(app, "registry.npmjs.com") is npm_executor
+    assert m.get_rate_limit_lock_executor(app, "haveibeenpwned.com") is not npm_executor
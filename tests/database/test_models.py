@@ -0,0 +1,341 @@
+import datetime
+
+import pytest
+
+import depobs.database.models as m
+
+
+# these tests hit the database so they aren't unit tests
+
+
+@pytest.fixture
+def app(app):
+    app.config["SQLALCHEMY_DATABASE_URI"] = "postgresql://localhost/depobs_test"
+    yield app
+
+
+@pytest.fixture
+def db_session(app):
+    "yields the session and rolls back uncommitted test rows"
+    with app.app_context():
+        yield m.db.session
+        m.db.session.rollback()
+
+
+def add_links(db_session, parent_child_ids):
+    links = [
+        m.PackageLink(parent_package_id=parent_id, child_package_id=child_id)
+        for parent_id, child_id in parent_child_ids
+    ]
+    db_session.add_all(links)
+    db_session.flush()
+    return links
+
+
+def test_package_links_by_id_for_saved_and_unsaved_graphs(db_session):
+    links = add_links(db_session, [(-1, -2), (-2, -3)])
+    expected = {
+        link.id: (link.parent_package_id, link.child_package_id) for link in links
+    }
+
+    unsaved_graph = m.PackageGraph(link_ids=[link.id for link in links])
+    assert unsaved_graph.package_links_by_id == expected
+
+    saved_graph = m.PackageGraph(link_ids=[link.id for link in links])
+    db_session.add(saved_graph)
+    db_session.flush()
+    assert saved_graph.id is not None
+    assert saved_graph.package_links_by_id == expected
+
+
+@pytest.fixture
+def saved_test_reports(db_session):
+    "deletes committed test reports and their dependencies"
+    yield
+    report_ids = db_session.query(m.PackageReport.id).filter(
+        m.PackageReport.package.like("depobs-test-%")
+    )
+    db_session.query(m.Dependency).filter(
+        m.Dependency.depends_on_id.in_(report_ids.subquery())
+        | m.Dependency.used_by_id.in_(report_ids.subquery())
+    ).delete(synchronize_session=False)
+    db_session.query(m.PackageReport).filter(
+        m.PackageReport.package.like("depobs-test-%")
+    ).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def report_records():
+    # depobs-test-a@1.0.0 depends on b and c, and b depends on c
+    return [
+        m.PackageReportRecord(
+            package_version_id=-1,
+            dependency_package_version_ids=[-2, -3],
+            package="depobs-test-a",
+            version="1.0.0",
+            all_deps=2,
+        ),
+        m.PackageReportRecord(
+            package_version_id=-2,
+            dependency_package_version_ids=[-3],
+            package="depobs-test-b",
+            version="1.0.0",
+            all_deps=1,
+        ),
+        m.PackageReportRecord(
+            package_version_id=-3, package="depobs-test-c", version="1.0.0", all_deps=0
+        ),
+    ]
+
+
+def saved_dependencies(db_session, report_ids):
+    return set(
+        db_session.query(m.Dependency.depends_on_id, m.Dependency.used_by_id).filter(
+            m.Dependency.depends_on_id.in_(report_ids)
+        )
+    )
+
+
+def test_save_package_report_records_inserts_reports_and_dependencies(
+    db_session, saved_test_reports
+):
+    report_ids = m.save_package_report_records(report_records(), batch_size=2)
+    assert set(report_ids) == {-1, -2, -3}
+
+    reports = {
+        report.id: report
+        for report in db_session.query(m.PackageReport).filter(
+            m.PackageReport.id.in_(report_ids.values())
+        )
+    }
+    assert [
+        (reports[report_ids[i]].package, reports[report_ids[i]].all_deps)
+        for i in [-1, -2, -3]
+    ] == [("depobs-test-a", 2), ("depobs-test-b", 1), ("depobs-test-c", 0)]
+    assert saved_dependencies(db_session, list(report_ids.values())) == {
+        (report_ids[-1], report_ids[-2]),
+        (report_ids[-1], report_ids[-3]),
+        (report_ids[-2], report_ids[-3]),
+    }
+    assert sorted(dep.package for dep in reports[report_ids[-1]].dependencies) == [
+        "depobs-test-b",
+        "depobs-test-c",
+    ]
+
+
+def test_save_package_report_records_keeps_existing_reports_when_rescoring(
+    db_session, saved_test_reports
+):
+    first_report_ids = m.save_package_report_records(report_records())
+    second_report_ids = m.save_package_report_records(report_records())
+
+    # rescoring adds new reports instead of updating the saved ones
+    assert set(first_report_ids.values()).isdisjoint(second_report_ids.values())
+    assert (
+        db_session.query(m.PackageReport)
+        .filter(m.PackageReport.package == "depobs-test-a")
+        .count()
+        == 2
+    )
+    assert saved_dependencies(db_session, list(first_report_ids.values())) == {
+        (first_report_ids[-1], first_report_ids[-2]),
+        (first_report_ids[-1], first_report_ids[-3]),
+        (first_report_ids[-2], first_report_ids[-3]),
+    }
+    assert saved_dependencies(db_session, list(second_report_ids.values())) == {
+        (second_report_ids[-1], second_report_ids[-2]),
+        (second_report_ids[-1], second_report_ids[-3]),
+        (second_report_ids[-2], second_report_ids[-3]),
+    }
+
+
+def test_save_package_report_records_rolls_back_on_conflict(
+    db_session, saved_test_reports
+):
+    records = report_records()
+    # a repeated dependency conflicts with the package_dependencies key
+    records[1].dependency_package_version_ids = [-3, -3]
+
+    with pytest.raises(Exception):
+        m.save_package_report_records(records, batch_size=2)
+
+    assert (
+        db_session.query(m.PackageReport)
+        .filter(m.PackageReport.package.like("depobs-test-%"))
+        .count()
+        == 0
+    )
+
+
+@pytest.mark.asyncio
+async def test_async_save_package_report_records(db_session, saved_test_reports):
+    import depobs.database.async_models as async_models
+
+    report_ids = await async_models.save_package_report_records(report_records())
+    assert saved_dependencies(db_session, list(report_ids.values())) == {
+        (report_ids[-1], report_ids[-2]),
+        (report_ids[-1], report_ids[-3]),
+        (report_ids[-2], report_ids[-3]),
+    }
+
+
+def test_get_stale_package_names_query_includes_names_without_fetches(db_session):
+    now = datetime.datetime.utcnow()
+    db_session.add_all(
+        [
+            m.NPMSIOScore(
+                package_name=package_name,
+                package_version="1.0.0",
+                analyzed_at=now,
+                source_url=f"https://api.npms.io/v2/package/{package_name}",
+            )
+            for package_name in ["depobs-test-fetched", "depobs-test-unfetched"]
+        ]
+        + [
+            m.NPMPackageFetch(
+                package_name="depobs-test-fetched",
+                source="npmsio",
+                fetched_at=now - datetime.timedelta(days=2),
+            ),
+            m.NPMPackageFetch(
+                package_name="depobs-test-fresh",
+                source="npmsio",
+                fetched_at=now,
+            ),
+        ]
+    )
+    db_session.flush()
+
+    stale_names = [
+        name
+        for (name,) in m.get_stale_package_names_query(
+            "npmsio", now - datetime.timedelta(days=1)
+        )
+        if name.startswith("depobs-test-")
+    ]
+    assert stale_names == ["depobs-test-unfetched", "depobs-test-fetched"]
+
+
+def test_get_hibp_breach_catalog_fetched_at_ignores_breaches_removed_upstream(
+    db_session,
+):
+    now = datetime.datetime.utcnow()
+    db_session.add_all(
+        [
+            # removed from HIBP so not updated by the last catalog fetch
+            m.HIBPBreach(
+                name="DepobsTestRemoved",
+                data={},
+                fetched_at=now - datetime.timedelta(days=30),
+            ),
+            m.HIBPBreach(name="DepobsTestCurrent", data={}, fetched_at=now),
+        ]
+    )
+    db_session.flush()
+
+    assert m.get_hibp_breach_catalog_fetched_at() == now
+
+
+def entry_people(db_session, entry_ids):
+    return sorted(
+        db_session.query(
+            m.NPMRegistryEntryPerson.entry_id,
+            m.NPMRegistryEntryPerson.role,
+            m.NPMPerson.key,
+            m.NPMPerson.name,
+        )
+        .join(m.NPMPerson, m.NPMPerson.id == m.NPMRegistryEntryPerson.person_id)
+        .filter(m.NPMRegistryEntryPerson.entry_id.in_(entry_ids))
+    )
+
+
+def test_save_npm_registry_entry_people_saves_distinct_people_and_replaces_links(
+    db_session,
+):
+    entries_by_id = {
+        -1: m.NPMRegistryEntry(
+            maintainers=[
+                {"name": "Test A", "email": "Depobs-Test-A@example.com"},
+                "Test A <depobs-test-a@example.com>",
+            ],
+            contributors=["depobs-test-b"],
+        ),
+        -2: m.NPMRegistryEntry(
+            maintainers=[{"email": "depobs-test-a@example.com"}], contributors=None
+        ),
+    }
+    m.save_npm_registry_entry_people(entries_by_id)
+    db_session.flush()
+
+    assert entry_people(db_session, [-1, -2]) == [
+        (-2, "maintainer", "depobs-test-a@example.com", "Test A"),
+        (-1, "contributor", "depobs-test-b", "depobs-test-b"),
+        (-1, "maintainer", "depobs-test-a@example.com", "Test A"),
+    ]
+
+    # replaces links for updated entries and reuses saved people
+    m.save_npm_registry_entry_people(
+        {-1: m.NPMRegistryEntry(maintainers=["depobs-test-b"], contributors=[])}
+    )
+    db_session.flush()
+
+    assert entry_people(db_session, [-1, -2]) == [
+        (-2, "maintainer", "depobs-test-a@example.com", "Test A"),
+        (-1, "maintainer", "depobs-test-b", "depobs-test-b"),
+    ]
+    assert (
+        db_session.query(m.NPMPerson)
+        .filter(m.NPMPerson.key.like("depobs-test-%"))
+        .count()
+        == 2
+    )
+
+
+@pytest.fixture
+def saved_test_json_results(db_session):
+    "deletes committed test JSON results"
+    yield
+    db_session.rollback()
+    db_session.query(m.JSONResult).filter(
+        m.JSONResult.data["id"].as_string().like("DEPOBS-TEST-%")
+    ).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def test_mark_github_advisories_withdrawn(db_session, saved_test_json_results):
+    results = [
+        m.JSONResult(data=dict(id="DEPOBS-TEST-1", withdrawnAt=None)),
+        m.JSONResult(data=dict(id="DEPOBS-TEST-1", withdrawnAt=None, package="pkg")),
+        m.JSONResult(data=dict(id="DEPOBS-TEST-2", withdrawnAt=None)),
+        m.JSONResult(data=dict(id="DEPOBS-TEST-3", withdrawnAt=None)),
+        # not a GitHub advisory
+        m.JSONResult(data=dict(id="DEPOBS-TEST-1")),
+    ]
+    db_session.add_all(results)
+    db_session.flush()
+
+    assert (
+        m.mark_github_advisories_withdrawn(
+            {
+                "DEPOBS-TEST-1": "2020-01-01T00:00:00Z",
+                "DEPOBS-TEST-2": "2020-01-02T00:00:00Z",
+            }
+        )
+        == 3
+    )
+    for result in results:
+        db_session.refresh(result)
+    assert [result.data.get("withdrawnAt", "missing") for result in results] == [
+        "2020-01-01T00:00:00Z",
+        "2020-01-01T00:00:00Z",
+        "2020-01-02T00:00:00Z",
+        None,
+        "missing",
+    ]
+    assert results[1].data["package"] == "pkg"
+
+    # doesn't update already withdrawn advisories
+    assert (
+        m.mark_github_advisories_withdrawn({"DEPOBS-TEST-1": "2020-02-01T00:00:00Z"})
+        == 0
+    )
@@ -610,3 +610,16 @@ def test_response_fetching_results(resource):
 def test_resouce_parent_link():
     assert m.RepoVulnAlertVulns.parent == m.RepoVulnAlerts
     assert m.RepoManifestDeps.parent == m.RepoManifests
+
+
+@pytest.mark.unit
+def test_serialize_request_round_trips(logger, github_args_dict, owner_repo_dict):
+    context = m.ChainMap(
+        github_args_dict, owner_repo_dict, {"github_query_type": all_resource_kinds}
+    )
+    for request in m.get_next_requests(logger, context, None):
+        serialized = json.loads(json.dumps(m.serialize_request(request)))
+        deserialized = m.deserialize_request(serialized)
+
+        assert deserialized == request
+        assert str(deserialized.graphql) == str(request.graphql)
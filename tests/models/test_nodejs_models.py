@@ -134,3 +134,184 @@ def test_flatten_deps_from_fixtures(
             flattened_dep == expected_dep
         ), f"unexpected dep at index {i} got {flattened_dep} expected {expected_dep}"
     assert flattened == expected
+
+
+lockfile_manifest = {
+    "name": "app",
+    "version": "1.0.0",
+    "dependencies": {"a": "^1.0.0"},
+    "devDependencies": {"b": "^2.0.0"},
+}
+
+package_lock_v1 = {
+    "name": "app",
+    "version": "1.0.0",
+    "lockfileVersion": 1,
+    "requires": True,
+    "dependencies": {
+        "a": {
+            "version": "1.0.0",
+            "resolved": "https://registry.npmjs.org/a/-/a-1.0.0.tgz",
+            "requires": {"b": "^1.0.0"},
+            "dependencies": {
+                "b": {
+                    "version": "1.0.0",
+                    "resolved": "https://registry.npmjs.org/b/-/b-1.0.0.tgz",
+                }
+            },
+        },
+        "b": {
+            "version": "2.0.0",
+            "resolved": "https://registry.npmjs.org/b/-/b-2.0.0.tgz",
+            "dev": True,
+            "requires": {"@s/c": "^3.0.0"},
+        },
+        "@s/c": {
+            "version": "3.0.0",
+            "resolved": "https://registry.npmjs.org/@s/c/-/c-3.0.0.tgz",
+            "dev": True,
+        },
+    },
+}
+
+package_lock_v3 = {
+    "name": "app",
+    "version": "1.0.0",
+    "lockfileVersion": 3,
+    "requires": True,
+    "packages": {
+        "": {
+            "name": "app",
+            "version": "1.0.0",
+            "dependencies": {"a": "^1.0.0"},
+            "devDependencies": {"b": "^2.0.0"},
+        },
+        "node_modules/a": {
+            "version": "1.0.0",
+            "resolved": "https://registry.npmjs.org/a/-/a-1.0.0.tgz",
+            "dependencies": {"b": "^1.0.0"},
+        },
+        "node_modules/a/node_modules/b": {
+            "version": "1.0.0",
+            "resolved": "https://registry.npmjs.org/b/-/b-1.0.0.tgz",
+        },
+        "node_modules/b": {
+            "version": "2.0.0",
+            "resolved": "https://registry.npmjs.org/b/-/b-2.0.0.tgz",
+            "dev": True,
+            "dependencies": {"@s/c": "^3.0.0"},
+            "optionalDependencies": {"fsevents": "^2.0.0"},
+        },
+        "node_modules/@s/c": {
+            "version": "3.0.0",
+            "resolved": "https://registry.npmjs.org/@s/c/-/c-3.0.0.tgz",
+            "dev": True,
+        },
+    },
+}
+
+# v2 includes the v1 dependencies tree for older npm versions
+package_lock_v2 = {
+    **package_lock_v3,
+    "lockfileVersion": 2,
+    "dependencies": package_lock_v1["dependencies"],
+}
+
+yarn_lock = """# THIS IS AN AUTOGENERATED FILE. DO NOT EDIT THIS FILE DIRECTLY.
+# yarn lockfile v1
+
+
+"@s/c@^3.0.0":
+  version "3.0.0"
+  resolved "https://registry.yarnpkg.com/@s/c/-/c-3.0.0.tgz#abc"
+
+a@^1.0.0:
+  version "1.0.0"
+  resolved "https://registry.yarnpkg.com/a/-/a-1.0.0.tgz#abc"
+  dependencies:
+    b "^1.0.0"
+
+b@^1.0.0:
+  version "1.0.0"
+  resolved "https://registry.yarnpkg.com/b/-/b-1.0.0.tgz#abc"
+
+b@^2.0.0:
+  version "2.0.0"
+  resolved "https://registry.yarnpkg.com/b/-/b-2.0.0.tgz#abc"
+  dependencies:
+    "@s/c" "^3.0.0"
+  optionalDependencies:
+    fsevents "^2.0.0"
+"""
+
+lockfile_testcases = {
+    "package_lock_v1": lambda: m.flatten_package_lock(
+        package_lock_v1, lockfile_manifest
+    ),
+    "package_lock_v1_without_manifest": lambda: m.flatten_package_lock(package_lock_v1),
+    "package_lock_v2": lambda: m.flatten_package_lock(
+        package_lock_v2, lockfile_manifest
+    ),
+    "package_lock_v3": lambda: m.flatten_package_lock(package_lock_v3),
+    "yarn_lock": lambda: m.flatten_yarn_lock(yarn_lock, lockfile_manifest),
+}
+
+
+@pytest.mark.parametrize(
+    "flatten_lockfile",
+    lockfile_testcases.values(),
+    ids=lockfile_testcases.keys(),
+)
+@pytest.mark.unit
+def test_flatten_lockfiles_resolve_the_same_graph(flatten_lockfile):
+    pkgs, root = flatten_lockfile()
+
+    assert root is not None
+    assert (root.package_id, root.dependencies) == ("app@1.0.0", ["a@1.0.0", "b@2.0.0"])
+    assert sorted((pkg.package_id, pkg.dependencies) for pkg in pkgs) == [
+        ("@s/c@3.0.0", []),
+        ("a@1.0.0", ["b@1.0.0"]),
+        ("b@1.0.0", []),
+        ("b@2.0.0", ["@s/c@3.0.0"]),
+    ]
+    assert all(pkg.resolved for pkg in pkgs)
+
+
+@pytest.mark.unit
+def test_flatten_package_lock_v3_follows_workspace_links():
+    lockfile = {
+        "lockfileVersion": 3,
+        "packages": {
+            "": {"name": "monorepo", "workspaces": ["packages/*"]},
+            "node_modules/lib": {"resolved": "packages/lib", "link": True},
+            "packages/lib": {
+                "name": "lib",
+                "version": "0.1.0",
+                "devDependencies": {"a": "^1.0.0"},
+            },
+            "node_modules/a": {
+                "version": "1.0.0",
+                "resolved": "https://registry.npmjs.org/a/-/a-1.0.0.tgz",
+            },
+            "packages/app": {
+                "name": "app",
+                "version": "0.1.0",
+                "dependencies": {"lib": "^0.1.0"},
+            },
+        },
+    }
+
+    pkgs, root = m.flatten_package_lock(lockfile)
+
+    assert root is not None and root.name == "monorepo"
+    assert sorted((pkg.package_id, pkg.dependencies) for pkg in pkgs) == [
+        ("a@1.0.0", []),
+        ("app@0.1.0", ["lib@0.1.0"]),
+        ("lib@0.1.0", ["a@1.0.0"]),
+    ]
+
+
+@pytest.mark.unit
+def test_flatten_package_lock_rejects_unsupported_lockfile_version():
+    with pytest.raises(ValueError, match="unsupported lockfileVersion 4"):
+        m.flatten_package_lock({"lockfileVersion": 4})
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+
+import pickle
+import random
+import time
+import tracemalloc
+from typing import Any, Callable, Tuple
+
+import pytest
+
+import depobs.util.compact_graph as m
+from depobs.util import graph_traversal, graph_util
+
+from tests.util.test_graph_traversal import node_dep_ids_iter_testcases
+
+
+@pytest.mark.parametrize(
+    "graph, expected_values",
+    node_dep_ids_iter_testcases.values(),
+    ids=node_dep_ids_iter_testcases.keys(),
+)
+@pytest.mark.unit
+def test_compact_node_dep_ids_iter_matches_networkx(graph, expected_values):
+    compact = m.CompactGraph.from_networkx(graph)
+    assert list(compact.node_dep_ids_iter()) == expected_values
+    assert list(graph_traversal.node_dep_ids_iter(compact)) == expected_values
+
+
+@pytest.mark.unit
+def test_compact_node_dep_ids_iter_counts_sibling_scc_descendants_like_networkx():
+    # 3 and 0 are on the same level but do not share deps
+    g = m.nx.DiGraph([(0, 1), (2, 3), (3, 4), (5, 3)])
+    compact = m.CompactGraph.from_networkx(g)
+    assert list(compact.node_dep_ids_iter()) == [
+        (4, set(), set()),
+        (1, set(), set()),
+        (3, {4}, {1}),
+        (0, {1}, {4}),
+        (5, {3}, {4}),
+        (2, {3}, {4}),
+    ]
+    assert list(compact.node_dep_ids_iter()) == list(
+        graph_traversal.node_dep_ids_iter(g)
+    )
+
+
+condensation_testcases = {
+    "one_node_no_edges": (m.nx.trivial_graph(create_using=m.nx.DiGraph), [0], [0]),
+    "five_node_path_graph": (
+        m.nx.path_graph(5, create_using=m.nx.DiGraph),
+        [4, 3, 2, 1, 0],
+        [4, 3, 2, 1, 0],
+    ),
+    "small_tree": (
+        m.nx.DiGraph([(0, 1), (1, 2), (1, 3), (1, 4), (2, 4)]),
+        [3, 2, 1, 0, 0],
+        [4, 3, 1, 0, 0],
+    ),
+    "path_to_three_node_loop": (
+        m.nx.DiGraph([(4, 3), (3, 2), (0, 1), (1, 2), (2, 0)]),
+        [0, 0, 0, 1, 2],
+        [2, 2, 2, 3, 4],
+    ),
+}
+
+
+@pytest.mark.parametrize(
+    "graph, expected_levels, expected_closure_sizes",
+    condensation_testcases.values(),
+    ids=condensation_testcases.keys(),
+)
+@pytest.mark.unit
+def test_compact_condensation(graph, expected_levels, expected_closure_sizes):
+    compact = m.CompactGraph.from_networkx(graph)
+    c = compact.condensation()
+
+    assert c.scc_count == m.nx.number_strongly_connected_components(graph)
+    assert [
+        c.levels[c.scc_by_index[index]] for index in range(len(compact.node_ids))
+    ] == expected_levels
+    assert list(c.closure_sizes()) == expected_closure_sizes
+
+
+@pytest.mark.parametrize(
+    "graph",
+    [graph for graph, _, _ in condensation_testcases.values()],
+    ids=condensation_testcases.keys(),
+)
+@pytest.mark.unit
+def test_compact_condensation_closure_unions_match_descendants(graph):
+    compact = m.CompactGraph.from_networkx(graph)
+
+    unions = compact.condensation().closure_unions(
+        [{node_id % 3} for node_id in compact.node_ids]
+    )
+
+    assert unions == [
+        frozenset(
+            node_id % 3 for node_id in m.nx.descendants(graph, node_id) | {node_id}
+        )
+        for node_id in compact.node_ids
+    ]
+
+
+@pytest.mark.parametrize(
+    "graph, expected_values",
+    node_dep_ids_iter_testcases.values(),
+    ids=node_dep_ids_iter_testcases.keys(),
+)
+@pytest.mark.unit
+def test_compact_condensation_from_saved_scc_ids(graph, expected_values):
+    compact = m.CompactGraph.from_networkx(graph)
+    saved_scc_ids = list(compact.condensation().scc_by_index)
+
+    c = m.CompactCondensation(compact, scc_by_index=saved_scc_ids)
+    assert list(compact.node_dep_ids_iter(c)) == expected_values
+    assert list(graph_traversal.node_dep_ids_iter(compact, c)) == expected_values
+
+
+@pytest.mark.unit
+def test_compact_condensation_rejects_bad_saved_scc_ids():
+    compact = m.CompactGraph([], [(0, 1), (1, 2)])
+    with pytest.raises(ValueError):
+        m.CompactCondensation(compact, scc_by_index=[0, 1])
+    with pytest.raises(ValueError):
+        # not in reverse topological order
+        m.CompactCondensation(compact, scc_by_index=[0, 1, 2])
+
+
+@pytest.mark.parametrize(
+    "graph",
+    [graph for graph, _ in node_dep_ids_iter_testcases.values()],
+    ids=node_dep_ids_iter_testcases.keys(),
+)
+@pytest.mark.unit
+def test_compact_condensation_matches_networkx(graph):
+    compact = m.CompactGraph.from_networkx(graph)
+    c = compact.condensation()
+    nx_c = graph_traversal.condensation(graph)
+
+    assert sorted(
+        sorted(members) for _, members in c.to_networkx(compact).nodes(data="members")
+    ) == sorted(sorted(members) for _, members in nx_c.nodes(data="members"))
+    assert c.depth() == len(list(graph_traversal.outer_in_dag_iter(nx_c)))
+
+    nx_stats = graph_util.get_graph_stats(graph)
+    for key, value in c.get_stats(compact).items():
+        if key in nx_stats:
+            assert value == pytest.approx(nx_stats[key]), key
+
+
+@pytest.mark.parametrize(
+    "graph",
+    [graph for graph, _ in node_dep_ids_iter_testcases.values()],
+    ids=node_dep_ids_iter_testcases.keys(),
+)
+@pytest.mark.parametrize("with_condensation", [False, True])
+@pytest.mark.unit
+def test_get_graph_stats_matches_networkx(graph, with_condensation):
+    compact = m.CompactGraph.from_networkx(graph)
+    c = compact.condensation() if with_condensation else None
+    stats = m.get_graph_stats(compact, c)
+    nx_stats = graph_util.get_graph_stats(graph)
+
+    assert stats["approximate"] is False
+    for key in [
+        "node_count",
+        "edge_count",
+        "density",
+        "degree_histograph",
+        "is_dag",
+        "average_in_degree",
+        "average_out_degree",
+    ]:
+        assert stats[key] == pytest.approx(nx_stats[key]), key
+    if nx_stats["is_dag"]:
+        assert stats["longest_path_length"] == nx_stats["longest_path_length"]
+
+
+@pytest.mark.unit
+def test_get_graph_stats_bounds_work():
+    g = random_dependency_graph(n_nodes=200, max_deps=3)
+    compact = m.CompactGraph.from_networkx(g)
+    exact = m.get_graph_stats(compact)
+    assert exact["approximate"] is False
+
+    bounded = m.get_graph_stats(compact, max_work=50)
+    assert bounded["approximate"] is True
+    assert bounded["node_count"] == exact["node_count"]
+    assert bounded["edge_count"] == exact["edge_count"]
+    assert sum(bounded["degree_histograph"]) >= exact["node_count"]
+    assert bounded["is_dag"] in (None, exact["is_dag"])
+    if "longest_path_length" in bounded and "longest_path_length" in exact:
+        assert bounded["longest_path_length"] <= exact["longest_path_length"]
+
+
+@pytest.mark.unit
+def test_compact_graph_networkx_round_trip():
+    g = m.nx.DiGraph([(0, 1), (1, 2), (2, 0), (5, 1)], id=3)
+    g.add_node(7)
+    m.nx.set_node_attributes(g, {0: "zero", 7: "seven"}, "label")
+
+    compact = m.CompactGraph.from_networkx(g)
+    assert compact.graph_id == 3
+    assert compact.nodes[0]["label"] == "zero"
+    with pytest.raises(KeyError):
+        compact.nodes[1]["label"]
+
+    round_tripped = compact.to_networkx()
+    assert round_tripped.graph == g.graph
+    assert dict(round_tripped.nodes(data=True)) == dict(g.nodes(data=True))
+    assert set(round_tripped.edges) == set(g.edges)
+
+
+@pytest.mark.unit
+def test_compact_graph_pickles():
+    compact = m.CompactGraph([9], [(0, 1), (1, 0)], graph_id=2)
+    compact.set_node_attr_column("label", {0: "zero"})
+
+    unpickled = pickle.loads(pickle.dumps(compact))
+    assert unpickled.graph_id == 2
+    assert list(unpickled.edges()) == list(compact.edges())
+    assert unpickled.node_index == compact.node_index
+    assert unpickled.nodes[0]["label"] == "zero"
+    assert unpickled.nodes[9].get("label") is None
+    with pytest.raises(KeyError):
+        unpickled.nodes[9]["label"]
+    assert list(unpickled.node_dep_ids_iter()) == list(compact.node_dep_ids_iter())
+
+
+def random_dependency_graph(n_nodes: int, max_deps: int, seed: int = 0) -> m.nx.DiGraph:
+    "returns a random DAG with a few back edges like npm dependency graphs"
+    rng = random.Random(seed)
+    g = m.nx.DiGraph()
+    g.add_nodes_from(range(n_nodes))
+    for node_id in range(n_nodes - 1):
+        for _ in range(rng.randint(0, max_deps)):
+            g.add_edge(node_id, rng.randint(node_id + 1, n_nodes - 1))
+    for _ in range(n_nodes // 100):
+        src = rng.randint(1, n_nodes - 1)
+        g.add_edge(src, rng.randint(0, src - 1))
+    return g
+
+
+def measure(fn: Callable[[], Any]) -> Tuple[Any, float, int]:
+    "returns fn's return value, run time in seconds, and peak bytes allocated"
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+@pytest.mark.benchmark
+def test_benchmark_compact_graph_vs_networkx():
+    g = random_dependency_graph(n_nodes=1000, max_deps=4)
+    edges = list(g.edges)
+    labels = {node_id: f"pkg-{node_id}@1.0.0" for node_id in g.nodes}
+
+    def build_nx():
+        nx_g = m.nx.DiGraph(edges)
+        nx_g.add_nodes_from(g.nodes)
+        m.nx.set_node_attributes(nx_g, labels, "label")
+        return nx_g
+
+    def build_compact():
+        compact = m.CompactGraph(g.nodes, edges)
+        compact.set_node_attr_column("label", labels)
+        return compact
+
+    nx_g, _, nx_build_bytes = measure(build_nx)
+    compact, _, compact_build_bytes = measure(build_compact)
+
+    nx_deps, nx_iter_seconds, _ = measure(
+        lambda: [
+            (node_id, len(direct), len(indirect))
+            for node_id, direct, indirect in graph_traversal.node_dep_ids_iter(nx_g)
+        ]
+    )
+    compact_deps, compact_iter_seconds, _ = measure(
+        lambda: [
+            (node_id, len(direct), len(indirect))
+            for node_id, direct, indirect in compact.node_dep_ids_iter()
+        ]
+    )
+
+    assert {node_id for node_id, _, _ in nx_deps} == {
+        node_id for node_id, _, _ in compact_deps
+    }
+    assert compact_build_bytes < nx_build_bytes
+    assert compact_iter_seconds < nx_iter_seconds
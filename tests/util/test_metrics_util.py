@@ -0,0 +1,48 @@
+import socket
+import urllib.request
+
+import prometheus_client
+from prometheus_client import multiprocess
+import pytest
+
+import depobs.util.metrics_util as m
+
+
+@pytest.mark.unit
+def test_get_registry_defaults_to_process_registry(monkeypatch):
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    assert m.get_registry() is prometheus_client.REGISTRY
+
+
+@pytest.mark.unit
+def test_get_registry_collects_multiprocess_dir(monkeypatch, tmp_path, mocker):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    collector = mocker.spy(multiprocess, "MultiProcessCollector")
+
+    registry = m.get_registry()
+
+    assert registry is not prometheus_client.REGISTRY
+    collector.assert_called_once_with(registry)
+    body, content_type = m.render()
+    assert body == b""
+    assert content_type.startswith("text/plain; version=")
+
+
+def unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.unit
+def test_start_http_server_serves_metrics_and_skips_port_in_use(monkeypatch):
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    port = unused_port()
+
+    m.start_http_server(port, host="127.0.0.1")
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}{m.METRICS_PATH}") as response:
+        assert response.headers["Content-Type"].startswith("text/plain; version=")
+        assert b"# TYPE python_info gauge" in response.read()
+
+    # doesn't raise
+    m.start_http_server(port, host="127.0.0.1")
@@ -0,0 +1,162 @@
+import pytest
+
+import depobs.util.semver_util as m
+
+
+# cases from node-semver test/fixtures/range-include.js and range-exclude.js
+range_include_test_cases = [
+    ("1.0.0 - 2.0.0", "1.2.3"),
+    ("^1.2.3+build", "1.3.0"),
+    ("1.2.3-pre+asdf - 2.4.3-pre+asdf", "1.2.3"),
+    ("1.2.3-pre+asdf - 2.4.3-pre+asdf", "2.4.3-alpha"),
+    ("1.0.0", "1.0.0"),
+    (">=*", "0.2.4"),
+    ("", "1.0.0"),
+    ("*", "1.2.3"),
+    (">=1.0.0", "1.1.0"),
+    (">1.0.0", "1.0.1"),
+    ("<=2.0.0", "2.0.0"),
+    ("<2.0.0", "1.9999.9999"),
+    (">= 1.0.0", "1.0.0"),
+    ("<=  2.0.0", "1.9999.9999"),
+    ("0.1.20 || 1.2.4", "1.2.4"),
+    (">=0.2.3 || <0.0.1", "0.0.0"),
+    ("2.x.x", "2.1.3"),
+    ("1.2.x", "1.2.3"),
+    ("1.2.x || 2.x", "2.1.3"),
+    ("x", "1.2.3"),
+    ("2.*.*", "2.1.3"),
+    ("2", "2.1.2"),
+    ("2.3", "2.3.1"),
+    ("~0.0.1", "0.0.1"),
+    ("~2.4", "2.4.5"),
+    ("~>3.2.1", "3.2.2"),
+    ("~1", "1.2.3"),
+    ("~> 1", "1.2.3"),
+    ("~1.0", "1.0.2"),
+    (">=1", "1.0.0"),
+    ("<1.2", "1.1.1"),
+    ("~v0.5.4-pre", "0.5.5"),
+    ("~v0.5.4-pre", "0.5.4"),
+    ("=0.7.x", "0.7.2"),
+    ("<=0.7.x", "0.7.2"),
+    (">=0.7.x", "0.7.2"),
+    ("<=0.7.x", "0.6.2"),
+    ("~1.2.1 >=1.2.3", "1.2.3"),
+    (">=1.2.1 1.2.3", "1.2.3"),
+    ("^1.2.3", "1.8.1"),
+    ("^0.1.2", "0.1.2"),
+    ("^0.1", "0.1.2"),
+    ("^0.0.1", "0.0.1"),
+    ("^1.2", "1.4.2"),
+    ("^1.2 ^1", "1.4.2"),
+    ("^1.2.3-alpha", "1.2.3-pre"),
+    ("^1.2.0-alpha", "1.2.0-pre"),
+    ("^0.0.1-alpha", "0.0.1-beta"),
+    ("^0.1.1-alpha", "0.1.1-beta"),
+    ("^x", "1.2.3"),
+    ("x - 1.0.0", "0.9.7"),
+    ("x - 1.x", "0.9.7"),
+    ("1.0.0 - x", "1.9.7"),
+    ("1.x - x", "1.9.7"),
+    ("<=7.x", "7.9.9"),
+]
+
+range_exclude_test_cases = [
+    ("1.0.0 - 2.0.0", "2.2.3"),
+    ("1.2.3+asdf - 2.4.3+asdf", "1.2.3-pre.2"),
+    ("1.2.3+asdf - 2.4.3+asdf", "2.4.3-alpha"),
+    ("^1.2.3+build", "2.0.0"),
+    ("^1.2.3+build", "1.2.0"),
+    ("^1.2.3", "1.2.3-pre"),
+    ("^1.2", "1.2.0-pre"),
+    (">1.2", "1.3.0-beta"),
+    ("<=1.2.3", "1.2.3-beta"),
+    ("^1.2.3", "1.2.3-beta"),
+    ("=0.7.x", "0.7.0-asdf"),
+    (">=0.7.x", "0.7.0-asdf"),
+    ("1.0.0", "1.0.1"),
+    (">=1.0.0", "0.0.0"),
+    (">=1.0.0", "0.0.1"),
+    (">=1.0.0", "0.1.0"),
+    (">1.0.0", "0.0.1"),
+    (">1.0.0", "0.1.0"),
+    ("<=2.0.0", "3.0.0"),
+    ("<=2.0.0", "2.9999.9999"),
+    ("<=2.0.0", "2.2.9"),
+    ("<2.0.0", "2.9999.9999"),
+    ("<2.0.0", "2.2.9"),
+    (">=0.1.97", "0.1.93"),
+    ("0.1.20 || 1.2.4", "1.2.3"),
+    (">=0.2.3 || <0.0.1", "0.0.3"),
+    (">=0.2.3 || <0.0.1", "0.2.2"),
+    ("2.x.x", "1.1.3"),
+    ("2.x.x", "3.1.3"),
+    ("1.2.x", "1.3.3"),
+    ("1.2.x || 2.x", "3.1.3"),
+    ("1.2.x || 2.x", "1.1.3"),
+    ("2.*.*", "1.1.3"),
+    ("2.*.*", "3.1.3"),
+    ("1.2.*", "1.3.3"),
+    ("2", "1.1.2"),
+    ("2.3", "2.4.1"),
+    ("~0.0.1", "0.1.0-alpha"),
+    ("~0.0.1", "0.1.0"),
+    ("~2.4", "2.5.0"),
+    ("~2.4", "2.3.9"),
+    ("~>3.2.1", "3.3.2"),
+    ("~>3.2.1", "3.2.0"),
+    ("~1", "0.2.3"),
+    ("~>1", "2.2.3"),
+    ("~1.0", "1.1.0"),
+    ("<1", "1.0.0"),
+    (">=1.2", "1.1.1"),
+    ("~v0.5.4-beta", "0.5.4-alpha"),
+    ("=0.7.x", "0.8.2"),
+    (">=0.7.x", "0.6.2"),
+    ("<0.7.x", "0.7.2"),
+    ("<1.2.3", "1.2.3-beta"),
+    ("=1.2.3", "1.2.3-beta"),
+    (">1.2", "1.2.8"),
+    ("^0.0.1", "0.0.2-alpha"),
+    ("^0.0.1", "0.0.2"),
+    ("^1.2.3", "2.0.0-alpha"),
+    ("^1.2.3", "1.2.2"),
+    ("^1.2", "1.1.9"),
+    ("*", "1.2.3-foo"),
+    ("^1.0.0", "2.0.0-rc1"),
+    ("1 - 2", "2.0.0-pre"),
+    ("1 - 2", "1.0.0-pre"),
+    ("1.1.x", "1.0.0-a"),
+    ("1.1.x", "1.1.0-a"),
+    ("1.1.x", "1.2.0-a"),
+    ("1.x", "1.0.0-a"),
+    ("1.x", "1.1.0-a"),
+    ("1.x", "1.2.0-a"),
+    (">=1.0.0 <1.1.0", "1.1.0"),
+    (">=1.0.0 <1.1.0", "1.1.0-pre"),
+    (">=1.0.0 <1.1.0-pre", "1.1.0-pre"),
+    ("<=7.x", "8.0.0"),
+]
+
+
+@pytest.mark.parametrize("version_range, version", range_include_test_cases)
+@pytest.mark.unit
+def test_satisfies_range_include(version_range, version):
+    assert m.satisfies(version, version_range)
+
+
+@pytest.mark.parametrize("version_range, version", range_exclude_test_cases)
+@pytest.mark.unit
+def test_satisfies_range_exclude(version_range, version):
+    assert not m.satisfies(version, version_range)
+
+
+@pytest.mark.parametrize(
+    "version_range",
+    ["latest", "file:../lib", "github:user/repo#semver:^1.0.0", "npm:other@^1.0.0"],
+)
+@pytest.mark.unit
+def test_parse_range_rejects_non_semver_specs(version_range):
+    with pytest.raises(ValueError):
+        m.parse_range(version_range)
@@ -1,3 +1,6 @@
+from typing import Dict, Tuple
+
+from prometheus_client.parser import text_string_to_metric_families
 import pytest
 
 
@@ -17,3 +20,42 @@ def test_heartbeat(client):
 def test_version_json(client):
     response = client.get("/__version__")
     assert response.status == "200 OK"
+
+
+def get_metric_samples(client) -> Dict[Tuple[str, Tuple], float]:
+    response = client.get("/__metrics__")
+    assert response.status == "200 OK"
+    assert response.content_type.startswith("text/plain; version=")
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.get_data(as_text=True))
+        for sample in family.samples
+    }
+
+
+@pytest.mark.unit
+def test_metrics(client, mocker):
+    mocker.patch("depobs.database.models.get_scan_counts_by_status", return_value={})
+    client.get("/__lbheartbeat__")
+    samples = get_metric_samples(client)
+
+    assert (
+        "depobs_http_responses_total",
+        (("method", "GET"), ("route", "/__lbheartbeat__"), ("status", "200")),
+    ) in samples
+    assert (
+        "depobs_http_request_duration_seconds_count",
+        (("method", "GET"), ("route", "/__lbheartbeat__")),
+    ) in samples
+
+
+@pytest.mark.unit
+def test_metrics_counts_scans_by_status(client, mocker):
+    mocker.patch(
+        "depobs.database.models.get_scan_counts_by_status",
+        return_value={"queued": 2, "started": 1, "failed": 0},
+    )
+    samples = get_metric_samples(client)
+    assert samples[("depobs_scans", (("status", "queued"),))] == 2
+    assert samples[("depobs_scans", (("status", "started"),))] == 1
+    assert samples[("depobs_scans", (("status", "failed"),))] == 0
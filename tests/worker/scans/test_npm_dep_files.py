@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+import depobs.worker.scans.npm_dep_files as m
+
+
+def dep_files_scan():
+    return m.models.Scan(
+        id=1,
+        params={
+            "name": "scan_score_npm_dep_files",
+            "args": [],
+            "kwargs": {
+                "dep_file_urls": [
+                    {
+                        "filename": "package-lock.json",
+                        "url": "https://example.com/package-lock.json",
+                    }
+                ]
+            },
+        },
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "fetch_dep_files_kwargs",
+    [
+        dict(side_effect=Exception("connection reset")),
+        dict(return_value={"package-lock.json": json.dumps({"lockfileVersion": 4})}),
+        dict(return_value={"package-lock.json": "not json"}),
+    ],
+    ids=["fetch_error", "unsupported_lockfile_version", "invalid_json"],
+)
+async def test_save_worker_results_falls_back_to_k8s_job(
+    app, mocker, fetch_dep_files_kwargs
+):
+    mocker.patch.object(m, "fetch_dep_files", **fetch_dep_files_kwargs)
+    save_deserialized_graph = mocker.patch.object(m, "save_deserialized_graph")
+    app.config["SCAN_DEP_FILES_IN_WORKER"] = True
+
+    with app.app_context():
+        assert await m.NPMDepFilesScan.save_worker_results(dep_files_scan()) is False
+
+    save_deserialized_graph.assert_not_called()
+
+
+class FakeContent:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def iter_chunked(self, size):
+        for chunk in self.chunks:
+            yield chunk
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "content_length, chunks, expected",
+    [
+        (None, [b'{"a":', b" 1}"], '{"a": 1}'),
+        (100, [], m.DepFileFetchError),
+        (None, [b"x" * 6, b"x" * 6], m.DepFileFetchError),
+    ],
+    ids=["under_max", "content_length_over_max", "streamed_over_max"],
+)
+async def test_read_text_caps_bytes(mocker, content_length, chunks, expected):
+    response = mocker.Mock(
+        content_length=content_length, content=FakeContent(chunks), charset=None
+    )
+
+    if expected is m.DepFileFetchError:
+        with pytest.raises(m.DepFileFetchError):
+            await m.read_text(response, 10)
+    else:
+        assert await m.read_text(response, 10) == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_dep_files_rejects_urls_before_fetching(app, mocker):
+    aiohttp_session = mocker.patch.object(m, "aiohttp_session")
+
+    with app.app_context():
+        with pytest.raises(m.DepFileFetchError, match="host 169.254.169.254"):
+            await m.fetch_dep_files(
+                [
+                    {
+                        "filename": "package.json",
+                        "url": "https://raw.githubusercontent.com/o/r/HEAD/package.json",
+                    },
+                    {
+                        "filename": "package-lock.json",
+                        "url": "https://169.254.169.254/package-lock.json",
+                    },
+                ]
+            )
+
+    aiohttp_session.assert_not_called()
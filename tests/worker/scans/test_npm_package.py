@@ -0,0 +1,149 @@
+import json
+
+import pytest
+
+import depobs.worker.scans.npm_package as m
+
+
+def package_version_result(job_name, package_version):
+    return m.models.JSONResult(
+        data={
+            "type": "google.cloud.pubsub_v1.types.PubsubMessage",
+            "attributes": {"JOB_NAME": job_name, "SCAN_ID": "1"},
+            "data": [
+                {
+                    "type": "task_result",
+                    "name": "list_metadata",
+                    "envvar_args": {
+                        "PACKAGE_NAME": "@hapi/bounce",
+                        "PACKAGE_VERSION": package_version,
+                    },
+                },
+                {
+                    "type": "target_complete",
+                    "target": f"@hapi/bounce@{package_version}",
+                },
+            ],
+        }
+    )
+
+
+batch_size_test_cases = {
+    "one_version_per_job": (1, [["1.0.0"], ["1.1.0"], ["2.0.0"]]),
+    "two_versions_per_job": (2, [["1.0.0", "1.1.0"], ["2.0.0"]]),
+    "all_versions_in_one_job": (30, [["1.0.0", "1.1.0", "2.0.0"]]),
+}
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "batch_size, expected_job_versions",
+    batch_size_test_cases.values(),
+    ids=batch_size_test_cases.keys(),
+)
+async def test_job_configs_batches_package_versions(
+    app, mocker, batch_size, expected_job_versions
+):
+    async def fake_package_release_versions(scan):
+        for package_version in ["1.0.0", "1.1.0", "2.0.0"]:
+            yield m.models.NPMRegistryEntry(
+                package_name="@hapi/bounce", package_version=package_version
+            )
+
+    mocker.patch(
+        "depobs.worker.scans.npm_package.package_release_versions",
+        fake_package_release_versions,
+    )
+    app.config["SCAN_JOB_PACKAGE_BATCH_SIZE"] = batch_size
+    scan = m.models.Scan(
+        id=1,
+        params={"name": "scan_score_npm_package", "args": ["@hapi/bounce"]},
+    )
+    with app.app_context():
+        job_configs = [
+            job_config async for job_config in m.NPMPackageScan.job_configs(scan)
+        ]
+
+    job_versions = []
+    for job_config in job_configs:
+        assert job_config["env"]["PACKAGE_NAME"] == "@hapi/bounce"
+        if batch_size == 1:
+            job_versions.append([job_config["env"]["PACKAGE_VERSION"]])
+        else:
+            assert "PACKAGE_VERSION" not in job_config["env"]
+            job_versions.append(
+                [
+                    target.rsplit("@", 1)[1]
+                    for target in json.loads(job_config["env"]["PACKAGE_TARGETS_JSON"])
+                ]
+            )
+    assert job_versions == expected_job_versions
+
+
+@pytest.mark.unit
+def test_get_job_package_version_results_skips_job_complete_result(mocker):
+    results = [
+        package_version_result("scan-1-pkg-a", "1.0.0"),
+        package_version_result("scan-1-pkg-a", "1.1.0"),
+        m.models.JSONResult(
+            data={
+                "type": "google.cloud.pubsub_v1.types.PubsubMessage",
+                "attributes": {"JOB_NAME": "scan-1-pkg-a", "SCAN_ID": "1"},
+                "data": [{"type": "task_complete"}],
+            }
+        ),
+    ]
+    mocker.patch(
+        "depobs.worker.scans.npm_package.models.get_scan_results_by_job_name",
+        return_value=results,
+    )
+
+    assert list(m.get_job_package_version_results("scan-1-pkg-a")) == [
+        ("@hapi/bounce", "1.0.0", results[0]),
+        ("@hapi/bounce", "1.1.0", results[1]),
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_save_worker_results_fails_for_package_without_releases(app, mocker):
+    async def fake_package_release_versions(scan):
+        return
+        yield
+
+    mocker.patch(
+        "depobs.worker.scans.npm_package.package_release_versions",
+        fake_package_release_versions,
+    )
+    save_scan_with_graph_ids = mocker.patch.object(m.models, "save_scan_with_graph_ids")
+    app.config["SCAN_PACKAGES_WITH_RESOLVER"] = True
+    scan = m.models.Scan(
+        id=1,
+        params={"name": "scan_score_npm_package", "args": ["@hapi/bounce"]},
+    )
+    with app.app_context():
+        with pytest.raises(Exception, match="found no release versions"):
+            await m.NPMPackageScan.save_worker_results(scan)
+
+    save_scan_with_graph_ids.assert_not_called()
+
+
+@pytest.mark.unit
+def test_get_job_package_version_results_uses_latest_result_of_retried_jobs(mocker):
+    results = [
+        package_version_result("scan-1-pkg-a", "1.0.0"),
+        package_version_result("scan-1-pkg-a", "1.1.0"),
+        # the job retried and republished both versions
+        package_version_result("scan-1-pkg-a", "1.0.0"),
+        package_version_result("scan-1-pkg-a", "1.1.0"),
+    ]
+    mocker.patch(
+        "depobs.worker.scans.npm_package.models.get_scan_results_by_job_name",
+        return_value=results,
+    )
+
+    assert list(m.get_job_package_version_results("scan-1-pkg-a")) == [
+        ("@hapi/bounce", "1.0.0", results[2]),
+        ("@hapi/bounce", "1.1.0", results[3]),
+    ]
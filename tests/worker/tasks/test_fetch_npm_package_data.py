@@ -0,0 +1,126 @@
+import pytest
+
+import depobs.worker.tasks.fetch_npm_package_data as m
+
+
+async def fake_run_in_db_thread(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_missing_npm_data_scoped_to_package_names(app, mocker):
+    saved_names = {"npmsio": {"has-data"}, "npm_registry": {"has-data"}}
+    not_found_names = {"npmsio": {"not-found"}, "npm_registry": set()}
+
+    mocker.patch.object(m.async_models, "run_in_db_thread", fake_run_in_db_thread)
+    mocker.patch.object(
+        m,
+        "get_package_names_missing_npm_data",
+        lambda source, package_names, not_found_ttl: sorted(
+            set(package_names) - saved_names[source] - not_found_names[source]
+        ),
+    )
+    fetch_npmsio = mocker.patch.object(m, "fetch_and_save_npmsio_scores")
+    fetch_registry = mocker.patch.object(m, "fetch_and_save_registry_entries")
+
+    with app.app_context():
+        await m.fetch_missing_npm_data(["has-data", "missing", "not-found", "missing"])
+
+    fetch_npmsio.assert_called_once_with(["missing"])
+    fetch_registry.assert_called_once_with(["missing", "not-found"])
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_and_save_registry_entries_saves_not_found_names(app, mocker):
+    async def fake_fetch_package_data(fetcher, config, package_names):
+        return [dict(name="found", versions={})], []
+
+    mocker.patch.object(m, "fetch_package_data", fake_fetch_package_data)
+    mocker.patch.object(m.async_models, "insert_npm_registry_entries")
+    run_in_db_thread = mocker.patch.object(m.async_models, "run_in_db_thread")
+
+    with app.app_context():
+        await m.fetch_and_save_registry_entries(["found", "not-found"])
+
+    run_in_db_thread.assert_any_call(
+        m.models.save_not_found_package_names, "npm_registry", {"not-found"}
+    )
+
+
+class FakeMissingNamesQuery:
+    def __init__(self, package_names, exclude_names):
+        self.package_names = [
+            name for name in package_names if name not in set(exclude_names)
+        ]
+
+    def limit(self, limit):
+        return [(name,) for name in self.package_names[:limit]]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_backfill_missing_npm_data_skips_failed_names(app, mocker):
+    missing_names = {"npmsio": ["a", "b", "c"], "npm_registry": ["a", "b", "c"]}
+    checkpoints = {}
+
+    async def fake_fetch_and_save_npmsio_scores(package_names):
+        raise Exception("npms.io error")
+
+    async def fake_fetch_and_save_registry_entries(package_names):
+        # "a" fails to fetch (so it stays missing)
+        for name in package_names:
+            if name != "a":
+                missing_names["npm_registry"].remove(name)
+
+    mocker.patch.object(m.async_models, "run_in_db_thread", fake_run_in_db_thread)
+    mocker.patch.object(
+        m.models,
+        "get_package_names_with_missing_npmsio_scores",
+        lambda not_found_ttl, exclude_names: FakeMissingNamesQuery(
+            missing_names["npmsio"], exclude_names
+        ),
+    )
+    mocker.patch.object(
+        m.models,
+        "get_package_names_with_missing_npm_entries",
+        lambda not_found_ttl, exclude_names: FakeMissingNamesQuery(
+            missing_names["npm_registry"], exclude_names
+        ),
+    )
+    mocker.patch.object(
+        m,
+        "get_package_names_missing_npm_data",
+        lambda source, package_names, not_found_ttl: sorted(
+            set(package_names) & set(missing_names[source])
+        ),
+    )
+    mocker.patch.object(
+        m, "fetch_and_save_npmsio_scores", fake_fetch_and_save_npmsio_scores
+    )
+    mocker.patch.object(
+        m, "fetch_and_save_registry_entries", fake_fetch_and_save_registry_entries
+    )
+    mocker.patch.object(m.models, "get_task_checkpoint", checkpoints.get)
+    mocker.patch.object(m.models, "save_task_checkpoint", checkpoints.__setitem__)
+    mocker.patch.object(m.models.db.session, "remove")
+    mocker.patch.object(m.models.db.session, "rollback")
+
+    with app.app_context():
+        app.config["NPM_DATA_BACKFILL_BATCH_SIZE"] = 2
+        app.config["NPM_DATA_BACKFILL_INTERVAL_SECONDS"] = 0
+        assert await m.backfill_missing_npm_data(app) == 4
+        failures = checkpoints[m.BACKFILL_FAILURES_CHECKPOINT_NAME]
+        assert {
+            source: {name: failure["attempts"] for name, failure in names.items()}
+            for source, names in failures.items()
+        } == {"npmsio": {"a": 1, "b": 1}, "npm_registry": {"a": 1}}
+        assert failures["npmsio"]["a"]["error"] == "npms.io error"
+
+        # the next run moves past the names waiting to retry to "c"
+        assert await m.backfill_missing_npm_data(app) == 2
+        failures = checkpoints[m.BACKFILL_FAILURES_CHECKPOINT_NAME]
+        assert set(failures["npmsio"]) == {"a", "b", "c"}
+        assert set(failures["npm_registry"]) == {"a"}
+        assert missing_names["npm_registry"] == ["a"]
@@ -1,6 +1,8 @@
+from datetime import datetime
+
 import pytest
 
-import depobs.worker.tasks.start_scan as m
+import depobs.worker.tasks.finish_scan as m
 
 
 invalid_scan_test_cases = {
@@ -46,3 +48,39 @@ invalid_scan_test_cases = {
 # async def test_finish_scan(app, models, scan_kwargs):
 #     scan = await m.finish_scan(models.Scan(**scan_kwargs))
 #     assert scan.status == new_scan_status
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_finish_scan_waits_for_jobs_without_blocking_queries(mocker, models):
+    count_completed_jobs = mocker.patch.object(
+        m.async_models, "get_scan_completed_jobs_count", return_value=0
+    )
+    save_scan = mocker.patch.object(m.async_models, "save_scan_with_status")
+    scan = models.Scan(
+        id=1,
+        status=m.ScanStatusEnum["started"],
+        job_names=["job-1"],
+        updated_at=datetime.utcnow(),
+    )
+
+    assert await m.finish_scan(scan) is scan
+    count_completed_jobs.assert_awaited_once_with(1)
+    save_scan.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_finish_scan_saves_failed_status_without_blocking_queries(mocker, models):
+    count_completed_jobs = mocker.patch.object(
+        m.async_models, "get_scan_completed_jobs_count"
+    )
+    save_scan = mocker.patch.object(m.async_models, "save_scan_with_status")
+    save_scan.return_value = failed_scan = models.Scan(
+        id=1, status=m.ScanStatusEnum["failed"]
+    )
+    scan = models.Scan(id=1, status=m.ScanStatusEnum["started"], job_names=None)
+
+    assert await m.finish_scan(scan) is failed_scan
+    count_completed_jobs.assert_not_called()
+    save_scan.assert_awaited_once_with(scan, m.ScanStatusEnum["failed"])
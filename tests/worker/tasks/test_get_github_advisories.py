@@ -0,0 +1,157 @@
+import pytest
+
+import depobs.worker.tasks.get_github_advisories as m
+
+
+def vulnerability_node(advisory_id, updated_at, withdrawn_at=None):
+    return dict(
+        updatedAt=updated_at,
+        advisory=dict(id=advisory_id, updatedAt=updated_at, withdrawnAt=withdrawn_at),
+        package=dict(name="pkg"),
+    )
+
+
+@pytest.mark.unit
+def test_get_new_advisories_skips_seen_and_withdrawn_advisories():
+    seen_ids = {"GHSA-1"}
+
+    advisories = m.get_new_advisories(
+        [
+            vulnerability_node("GHSA-1", "2020-01-03"),
+            vulnerability_node("GHSA-2", "2020-01-02"),
+            vulnerability_node("GHSA-2", "2020-01-02"),
+            vulnerability_node("GHSA-3", "2020-01-01", withdrawn_at="2020-01-01"),
+        ],
+        seen_ids,
+    )
+
+    assert [advisory["id"] for advisory in advisories] == ["GHSA-2"]
+    assert seen_ids == {"GHSA-1", "GHSA-2"}
+
+
+@pytest.mark.unit
+def test_get_withdrawn_advisories():
+    assert m.get_withdrawn_advisories(
+        [
+            vulnerability_node("GHSA-1", "2020-01-03"),
+            vulnerability_node("GHSA-2", "2020-01-02", withdrawn_at="2020-01-02"),
+        ]
+    ) == {"GHSA-2": "2020-01-02"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "full, checkpoint, expected_updated_after",
+    [
+        (False, None, None),
+        (False, dict(updated_at="2020-01-01T00:00:00Z"), "2020-01-01T00:00:00Z"),
+        (True, dict(updated_at="2020-01-01T00:00:00Z"), None),
+    ],
+)
+async def test_fetch_and_save_github_advisories_saves_pages_and_checkpoint(
+    app, mocker, full, checkpoint, expected_updated_after
+):
+    db_calls = []
+
+    async def fake_run_in_db_thread(fn, *args):
+        db_calls.append((fn, *args))
+        if fn is m.models.get_task_checkpoint:
+            return checkpoint
+        return None
+
+    async def fake_fetch_npm_security_vulnerabilities(config, updated_after):
+        assert updated_after == expected_updated_after
+        yield [
+            vulnerability_node("GHSA-2", "2020-03-01T00:00:00Z"),
+            vulnerability_node("GHSA-1", "2020-02-01T00:00:00Z"),
+        ]
+        yield [
+            vulnerability_node("GHSA-1", "2020-01-15T00:00:00Z"),
+            vulnerability_node(
+                "GHSA-0",
+                "2020-01-10T00:00:00Z",
+                withdrawn_at="2020-01-10T00:00:00Z",
+            ),
+        ]
+
+    mocker.patch.object(m.async_models, "run_in_db_thread", fake_run_in_db_thread)
+    mocker.patch.object(
+        m,
+        "fetch_npm_security_vulnerabilities",
+        fake_fetch_npm_security_vulnerabilities,
+    )
+
+    with app.app_context():
+        saved_count = await m.fetch_and_save_github_advisories(full)
+
+    assert saved_count == 2
+    saved_pages = [
+        args[0] for (fn, *args) in db_calls if fn is m.models.save_json_results
+    ]
+    assert [[advisory["id"] for advisory in page] for page in saved_pages] == [
+        ["GHSA-2", "GHSA-1"]
+    ]
+    assert (
+        m.models.mark_github_advisories_withdrawn,
+        {"GHSA-0": "2020-01-10T00:00:00Z"},
+    ) in db_calls
+    assert (
+        m.models.save_task_checkpoint,
+        m.GITHUB_ADVISORIES_CHECKPOINT,
+        dict(updated_at="2020-03-01T00:00:00Z"),
+    ) in db_calls
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_and_save_graph_github_advisories(app, mocker):
+    db_calls = []
+
+    async def fake_run_in_db_thread(fn, *args):
+        db_calls.append((fn, *args))
+        if fn is m.get_graph_package_names:
+            return ["pkg-a", "pkg-b", "pkg-c"]
+        return None
+
+    async def fake_fetch_package_security_vulnerabilities(config, package_names):
+        assert package_names == ["pkg-a", "pkg-b", "pkg-c"]
+        yield "pkg-a", [vulnerability_node("GHSA-1", "2020-01-01")]
+        yield Exception("batch failed")
+        yield "pkg-c", [
+            vulnerability_node("GHSA-2", "2020-01-01"),
+            vulnerability_node("GHSA-2", "2020-01-01"),
+        ]
+
+    mocker.patch.object(m.async_models, "run_in_db_thread", fake_run_in_db_thread)
+    mocker.patch.object(
+        m,
+        "fetch_package_security_vulnerabilities",
+        fake_fetch_package_security_vulnerabilities,
+    )
+
+    with app.app_context():
+        saved_count = await m.fetch_and_save_graph_github_advisories(5)
+
+    assert saved_count == 2
+    assert db_calls[0] == (m.get_graph_package_names, 5)
+    saved_advisories = [
+        advisory
+        for (fn, *args) in db_calls
+        if fn is m.models.save_json_results
+        for advisory in args[0]
+    ]
+    assert [(advisory["id"], advisory["package"]) for advisory in saved_advisories] == [
+        ("GHSA-1", "pkg-a"),
+        ("GHSA-2", "pkg-c"),
+    ]
+
+
+@pytest.mark.unit
+def test_get_graph_package_names_raises_for_missing_graph(mocker):
+    mocker.patch.object(
+        m.models, "get_graph_by_id", side_effect=m.NoResultFound("No row was found")
+    )
+
+    with pytest.raises(Exception, match="package graph 5 not found"):
+        m.get_graph_package_names(5)
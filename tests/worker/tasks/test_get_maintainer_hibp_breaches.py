@@ -0,0 +1,175 @@
+import datetime
+
+import pytest
+
+import depobs.worker.tasks.get_maintainer_hibp_breaches as m
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "catalog_age_seconds, expected_catalog_fetches",
+    [
+        (None, 1),
+        (60, 0),
+        (2 * 86400, 1),
+    ],
+)
+async def test_get_account_breaches_fetches_uncached_accounts_once(
+    app, mocker, catalog_age_seconds, expected_catalog_fetches
+):
+    db_calls = []
+    catalog = [
+        dict(Name="Adobe", BreachDate="2013-10-04"),
+        dict(Name="LinkedIn", BreachDate="2012-05-05"),
+    ]
+
+    async def fake_run_in_db_thread(fn, *args):
+        db_calls.append((fn, *args))
+        if fn is m.models.get_cached_hibp_account_breach_names:
+            return {"cached@example.com": ["LinkedIn"]}
+        if fn is m.models.get_hibp_breach_catalog_fetched_at:
+            if catalog_age_seconds is None:
+                return None
+            return datetime.datetime.utcnow() - datetime.timedelta(
+                seconds=catalog_age_seconds
+            )
+        if fn is m.models.get_hibp_breaches:
+            return {
+                breach["Name"]: breach
+                for breach in catalog
+                if breach["Name"] in args[0]
+            }
+        return None
+
+    fetched_emails = []
+
+    async def fake_fetch_hibp_account_breach_names(config, emails):
+        fetched_emails.extend(sorted(emails))
+        for email in sorted(emails):
+            yield email, ["Adobe", "LinkedIn"] if email == "a@example.com" else []
+
+    fake_fetch_hibp_breaches = mocker.AsyncMock(return_value=catalog)
+    mocker.patch.object(m.async_models, "run_in_db_thread", fake_run_in_db_thread)
+    mocker.patch.object(
+        m, "fetch_hibp_account_breach_names", fake_fetch_hibp_account_breach_names
+    )
+    mocker.patch.object(m, "fetch_hibp_breaches", fake_fetch_hibp_breaches)
+    mocker.patch.dict(m._missing_breach_names, clear=True)
+
+    with app.app_context():
+        breaches = await m.get_account_breaches(
+            [
+                "a@example.com",
+                "b@example.com",
+                "a@example.com",
+                "cached@example.com",
+            ]
+        )
+
+    assert fetched_emails == ["a@example.com", "b@example.com"]
+    assert (
+        m.models.save_hibp_account_breach_names,
+        {"a@example.com": ["Adobe", "LinkedIn"], "b@example.com": []},
+    ) in db_calls
+    assert fake_fetch_hibp_breaches.await_count == expected_catalog_fetches
+    assert breaches == {
+        "a@example.com": [
+            dict(Name="Adobe", Date="2013-10-04"),
+            dict(Name="LinkedIn", Date="2012-05-05"),
+        ],
+        "b@example.com": [],
+        "cached@example.com": [dict(Name="LinkedIn", Date="2012-05-05")],
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_get_breach_catalog_refetches_for_new_breach_names(app, mocker):
+    async def fake_run_in_db_thread(fn, *args):
+        if fn is m.models.get_hibp_breach_catalog_fetched_at:
+            return datetime.datetime.utcnow()
+        if fn is m.models.get_hibp_breaches:
+            return {"Adobe": dict(Name="Adobe", BreachDate="2013-10-04")}
+        return None
+
+    fake_fetch_hibp_breaches = mocker.AsyncMock(
+        return_value=[
+            dict(Name="Adobe", BreachDate="2013-10-04"),
+            dict(Name="New", BreachDate="2020-01-01"),
+            dict(Name="Other", BreachDate="2019-01-01"),
+        ]
+    )
+    mocker.patch.object(m.async_models, "run_in_db_thread", fake_run_in_db_thread)
+    mocker.patch.object(m, "fetch_hibp_breaches", fake_fetch_hibp_breaches)
+    mocker.patch.dict(m._missing_breach_names, clear=True)
+
+    with app.app_context():
+        breaches = await m.get_breach_catalog({"Adobe", "New"})
+
+    assert fake_fetch_hibp_breaches.await_count == 1
+    assert sorted(breaches) == ["Adobe", "New"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_get_breach_catalog_refetches_for_missing_names_once_per_ttl(app, mocker):
+    async def fake_run_in_db_thread(fn, *args):
+        if fn is m.models.get_hibp_breach_catalog_fetched_at:
+            return datetime.datetime.utcnow()
+        if fn is m.models.get_hibp_breaches:
+            return {"Adobe": dict(Name="Adobe", BreachDate="2013-10-04")}
+        return None
+
+    fake_fetch_hibp_breaches = mocker.AsyncMock(
+        return_value=[dict(Name="Adobe", BreachDate="2013-10-04")]
+    )
+    mocker.patch.object(m.async_models, "run_in_db_thread", fake_run_in_db_thread)
+    mocker.patch.object(m, "fetch_hibp_breaches", fake_fetch_hibp_breaches)
+    mocker.patch.dict(m._missing_breach_names, clear=True)
+
+    with app.app_context():
+        for _ in range(3):
+            breaches = await m.get_breach_catalog({"Adobe", "Unlisted"})
+            assert sorted(breaches) == ["Adobe"]
+        assert fake_fetch_hibp_breaches.await_count == 1
+
+        # refetches once the TTL passes
+        m._missing_breach_names["Unlisted"] -= datetime.timedelta(
+            seconds=app.config["HIBP_BREACH_CATALOG_TTL_SECONDS"] + 1
+        )
+        await m.get_breach_catalog({"Adobe", "Unlisted"})
+        assert fake_fetch_hibp_breaches.await_count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_and_score_graph_maintainer_breaches(app, mocker):
+    async def fake_run_in_db_thread(fn, *args):
+        assert (fn, *args) == (m.get_graph_maintainer_emails, 5)
+        return ["a@example.com", "b@example.com"]
+
+    async def fake_score_package_graphs(db_graphs, score_components):
+        assert db_graphs == [db_graph]
+        # scores maintainer breaches without SCORE_MAINTAINER_BREACHES
+        assert m.scoring.MaintainerBreachScoreComponent in score_components
+        yield ["record"]
+
+    db_graph = mocker.Mock()
+    fake_get_account_breaches = mocker.AsyncMock(return_value={})
+    fake_save_package_report_records = mocker.AsyncMock()
+    mocker.patch.object(m.async_models, "run_in_db_thread", fake_run_in_db_thread)
+    mocker.patch.object(m, "get_account_breaches", fake_get_account_breaches)
+    mocker.patch.object(m.models, "get_graph_by_id", return_value=db_graph)
+    mocker.patch.object(m, "score_package_graphs", fake_score_package_graphs)
+    mocker.patch.object(
+        m.async_models, "save_package_report_records", fake_save_package_report_records
+    )
+
+    with app.app_context():
+        assert await m.fetch_and_score_graph_maintainer_breaches(5) == 2
+
+    fake_get_account_breaches.assert_awaited_once_with(
+        ["a@example.com", "b@example.com"]
+    )
+    fake_save_package_report_records.assert_awaited_once_with(["record"])
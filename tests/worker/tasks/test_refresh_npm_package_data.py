@@ -0,0 +1,48 @@
+import pytest
+
+import depobs.worker.tasks.refresh_npm_package_data as m
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_refresh_npm_registry_entries(app, mocker):
+    db_calls = []
+
+    async def fake_run_in_db_thread(fn, *args):
+        db_calls.append((fn, *args))
+        if fn is m.models.get_package_fetch_etags:
+            return {"not-modified": '"etag-1"', "modified": '"etag-2"'}
+        return None
+
+    async def fake_fetch_if_modified(config, etags_by_package_name):
+        assert etags_by_package_name == {
+            "modified": '"etag-2"',
+            "not-modified": '"etag-1"',
+            "not-found": None,
+            "error": None,
+        }
+        yield "modified", '"etag-3"', dict(name="modified", versions={})
+        yield "not-modified", '"etag-1"', None
+        yield "not-found", None, None
+        yield Exception("500 Internal Server Error")
+
+    mocker.patch.object(m.async_models, "run_in_db_thread", fake_run_in_db_thread)
+    mocker.patch.object(
+        m, "fetch_npm_registry_metadata_if_modified", fake_fetch_if_modified
+    )
+
+    with app.app_context():
+        modified_count = await m.refresh_npm_registry_entries(
+            ["modified", "not-modified", "not-found", "error"]
+        )
+
+    assert modified_count == 1
+    assert (m.models.save_not_found_package_names, "npm_registry", {"not-found"}) in (
+        db_calls
+    )
+    # doesn't record the failed fetch so it's retried next refresh
+    assert (
+        m.models.save_package_fetches,
+        "npm_registry",
+        {"modified": '"etag-3"', "not-modified": '"etag-1"', "not-found": None},
+    ) in db_calls
@@ -0,0 +1,65 @@
+import datetime
+
+import pytest
+
+import depobs.worker.tasks.save_graph_stats as m
+
+
+async def fake_run_in_db_thread(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_save_next_graph_stats_records_failures_and_skips_failed_graphs(
+    app, mocker
+):
+    retry_after = (datetime.datetime.utcnow() + datetime.timedelta(hours=1)).isoformat()
+    failures = {
+        "1": {"attempts": 3, "error": "boom", "retry_after": "2020-01-01T00:00:00"},
+        "2": {"attempts": 1, "error": "boom", "retry_after": retry_after},
+        "3": {"attempts": 1, "error": "boom", "retry_after": "2020-01-01T00:00:00"},
+    }
+    mocker.patch.object(m.async_models, "run_in_db_thread", fake_run_in_db_thread)
+    mocker.patch.object(m.models, "get_task_checkpoint", return_value=failures)
+    missing_stats_query = mocker.patch.object(
+        m.models, "get_graph_ids_missing_stats_query"
+    )
+    missing_stats_query.return_value.limit.return_value.scalar.return_value = 3
+    mocker.patch.object(m, "save_graph_stats", side_effect=Exception("still boom"))
+    save_task_checkpoint = mocker.patch.object(m.models, "save_task_checkpoint")
+
+    with app.app_context():
+        assert await m.save_next_graph_stats(app, backoff_seconds=0) == 3
+
+    missing_stats_query.assert_called_once_with([1, 2])
+    name, saved_failures = save_task_checkpoint.call_args.args
+    assert name == m.FAILURES_CHECKPOINT_NAME
+    assert saved_failures["1"] == failures["1"]
+    assert saved_failures["3"]["attempts"] == 2
+    assert saved_failures["3"]["error"] == "still boom"
+    assert saved_failures["3"]["retry_after"] > retry_after
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_save_next_graph_stats_clears_failure_on_success(app, mocker):
+    mocker.patch.object(m.async_models, "run_in_db_thread", fake_run_in_db_thread)
+    mocker.patch.object(
+        m.models,
+        "get_task_checkpoint",
+        return_value={
+            "3": {"attempts": 1, "error": "boom", "retry_after": "2020-01-01T00:00:00"}
+        },
+    )
+    missing_stats_query = mocker.patch.object(
+        m.models, "get_graph_ids_missing_stats_query"
+    )
+    missing_stats_query.return_value.limit.return_value.scalar.return_value = 3
+    mocker.patch.object(m, "save_graph_stats")
+    save_task_checkpoint = mocker.patch.object(m.models, "save_task_checkpoint")
+
+    with app.app_context():
+        assert await m.save_next_graph_stats(app, backoff_seconds=0) == 3
+
+    save_task_checkpoint.assert_called_once_with(m.FAILURES_CHECKPOINT_NAME, {})
@@ -0,0 +1,37 @@
+import logging
+
+import pytest
+
+import depobs.worker.tasks.watch_scan_jobs as m
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_watch_scan_jobs_logs_pod_watch_failures_once(app, mocker, caplog):
+    batch_api, core_api = mocker.Mock(), mocker.Mock()
+    mocker.patch.object(m.k8s, "get_batch_api", return_value=batch_api)
+    mocker.patch.object(m.k8s, "get_core_api", return_value=core_api)
+    mocker.patch.object(m, "_failing_pod_watches", set())
+    sleep = mocker.patch.object(m.asyncio, "sleep", mocker.AsyncMock())
+
+    def fake_save_scan_job_statuses(app, list_fn, namespace, timeout_seconds):
+        if list_fn is core_api.list_namespaced_pod:
+            raise Exception("Forbidden")
+        return 2
+
+    mocker.patch.object(m, "save_scan_job_statuses", fake_save_scan_job_statuses)
+    app.config["SCAN_JOB_CONFIGS"] = {
+        "scan_score_npm_package": dict(context_name=None, namespace="default")
+    }
+
+    with app.app_context(), caplog.at_level(logging.ERROR):
+        assert await m.watch_scan_jobs(app) == 2
+        assert await m.watch_scan_jobs(app) == 2
+
+    assert [
+        record.message for record in caplog.records if "pods" in record.message
+    ] == [
+        "error watching scan job pods in context None namespace default"
+        " (only Job failures will be saved): Forbidden"
+    ]
+    sleep.assert_not_called()
@@ -0,0 +1,211 @@
+import pytest
+
+import depobs.worker.k8s as m
+
+
+def job_config(name: str, context_name: str = "test-context") -> m.KubeJobConfig:
+    return m.KubeJobConfig(
+        context_name=context_name,
+        namespace="default",
+        name=name,
+        backoff_limit=1,
+        image_name="mozilla/dependency-observatory:node-12",
+        args=["install"],
+        env={"JOB_NAME": name},
+        service_account_name="",
+        volume_mounts=[],
+        secrets=[],
+        labels={m.SCAN_ID_LABEL: "1"},
+    )
+
+
+class FakeWatch:
+    def __init__(self, objects):
+        self.objects = objects
+        self.stream_kwargs = None
+
+    def stream(self, list_fn, namespace, **kwargs):
+        self.stream_kwargs = kwargs
+        for obj in self.objects:
+            yield {"type": "MODIFIED", "object": obj}
+
+
+def fake_job(name, labels, conditions=None):
+    return m.kubernetes.client.V1Job(
+        kind="Job",
+        metadata=m.kubernetes.client.V1ObjectMeta(name=name, labels=labels),
+        status=m.kubernetes.client.V1JobStatus(conditions=conditions),
+    )
+
+
+def fake_pod(job_name, scan_id, waiting_reason=None, age_seconds=0):
+    return m.kubernetes.client.V1Pod(
+        kind="Pod",
+        metadata=m.kubernetes.client.V1ObjectMeta(
+            name=f"{job_name}-abcde",
+            labels={"job-name": job_name, m.SCAN_ID_LABEL: scan_id},
+            creation_timestamp=m.datetime.datetime.now(m.datetime.timezone.utc)
+            - m.datetime.timedelta(seconds=age_seconds),
+        ),
+        status=m.kubernetes.client.V1PodStatus(
+            container_statuses=[
+                m.kubernetes.client.V1ContainerStatus(
+                    name="job",
+                    image="mozilla/dependency-observatory:node-12",
+                    image_id="",
+                    ready=False,
+                    restart_count=0,
+                    state=m.kubernetes.client.V1ContainerState(
+                        waiting=m.kubernetes.client.V1ContainerStateWaiting(
+                            reason=waiting_reason, message="pull failed"
+                        )
+                    ),
+                )
+            ]
+        ),
+    )
+
+
+class FakeBatchV1Api:
+    def __init__(self, failing_job_names=frozenset()):
+        self.failing_job_names = failing_job_names
+        self.created = []
+
+    def create_namespaced_job(self, namespace, body):
+        if body.metadata.name in self.failing_job_names:
+            raise m.kubernetes.client.rest.ApiException(status=409, reason="Conflict")
+        self.created.append((namespace, body.metadata.name))
+        return body
+
+
+@pytest.mark.unit
+def test_get_api_client_loads_config_once_per_context(mocker):
+    m.get_api_client.cache_clear()
+    m.get_batch_api.cache_clear()
+    load_kube_config = mocker.patch(
+        "depobs.worker.k8s.kubernetes.config.load_kube_config"
+    )
+
+    assert m.get_batch_api("ctx-a") is m.get_batch_api("ctx-a")
+    assert m.get_api_client("ctx-a") is not m.get_api_client("ctx-b")
+    assert [call.kwargs["context"] for call in load_kube_config.call_args_list] == [
+        "ctx-a",
+        "ctx-b",
+    ]
+    m.get_api_client.cache_clear()
+    m.get_batch_api.cache_clear()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_create_jobs_reports_failures_per_job(mocker):
+    fake_api = FakeBatchV1Api(failing_job_names={"job-1"})
+    mocker.patch("depobs.worker.k8s.get_batch_api", return_value=fake_api)
+
+    results = await m.create_jobs(
+        [job_config(f"job-{i}") for i in range(4)], max_concurrent=2
+    )
+
+    assert list(results.keys()) == ["job-0", "job-1", "job-2", "job-3"]
+    assert isinstance(results["job-1"], m.kubernetes.client.rest.ApiException)
+    assert sorted(name for _, name in fake_api.created) == ["job-0", "job-2", "job-3"]
+    assert all(
+        results[name].metadata.name == name for name in ["job-0", "job-2", "job-3"]
+    )
+
+
+@pytest.mark.unit
+def test_create_job_labels_job_and_pods(mocker):
+    mocker.patch("depobs.worker.k8s.get_batch_api", return_value=FakeBatchV1Api())
+    job = m.create_job(job_config("job-0"))
+    assert job.metadata.labels == {m.SCAN_ID_LABEL: "1"}
+    assert job.spec.template.metadata.labels == {m.SCAN_ID_LABEL: "1"}
+
+
+@pytest.mark.unit
+def test_watch_scan_job_statuses_yields_terminal_states():
+    watch = FakeWatch(
+        [
+            # still running
+            fake_job("scan-1-pkg-a", {m.SCAN_ID_LABEL: "1"}),
+            fake_pod("scan-1-pkg-a", "1", waiting_reason="ContainerCreating"),
+            fake_job(
+                "scan-1-pkg-b",
+                {m.SCAN_ID_LABEL: "1"},
+                conditions=[
+                    m.kubernetes.client.V1JobCondition(
+                        type="Failed",
+                        status="True",
+                        reason="BackoffLimitExceeded",
+                        message="Job has reached the specified backoff limit",
+                    )
+                ],
+            ),
+            fake_job(
+                "scan-2-pkg-c",
+                {m.SCAN_ID_LABEL: "2"},
+                conditions=[
+                    m.kubernetes.client.V1JobCondition(type="Complete", status="True")
+                ],
+            ),
+            # retrying image pulls
+            fake_pod("scan-3-pkg-d", "3", waiting_reason="ImagePullBackOff"),
+            fake_pod(
+                "scan-3-pkg-d", "3", waiting_reason="ImagePullBackOff", age_seconds=600
+            ),
+            # bad scan ID label
+            fake_pod("scan-4-pkg-e", "not-an-id", waiting_reason="InvalidImageName"),
+        ]
+    )
+
+    assert list(
+        m.watch_scan_job_statuses(lambda: None, "default", 60, watch=watch)
+    ) == [
+        (
+            1,
+            "scan-1-pkg-b",
+            {
+                "status": "failed",
+                "reason": "BackoffLimitExceeded",
+                "message": "Job has reached the specified backoff limit",
+            },
+        ),
+        (
+            2,
+            "scan-2-pkg-c",
+            {"status": "succeeded", "reason": "Complete", "message": ""},
+        ),
+        (
+            3,
+            "scan-3-pkg-d",
+            {
+                "status": "failed",
+                "reason": "ImagePullBackOff",
+                "message": "pull failed",
+            },
+        ),
+    ]
+    assert watch.stream_kwargs == {
+        "label_selector": m.SCAN_ID_LABEL,
+        "timeout_seconds": 60,
+    }
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "waiting_reason, age_seconds, expected_reason",
+    [
+        ("ErrImagePull", 0, None),
+        ("ImagePullBackOff", 60, None),
+        ("ImagePullBackOff", 600, "ImagePullBackOff"),
+        ("InvalidImageName", 0, "InvalidImageName"),
+        ("ContainerCreating", 600, None),
+    ],
+)
+def test_get_pod_status_waits_out_image_pull_retries(
+    waiting_reason, age_seconds, expected_reason
+):
+    status = m.get_pod_status(
+        fake_pod("scan-1-pkg-a", "1", waiting_reason, age_seconds=age_seconds)
+    )
+    assert (status["reason"] if status else None) == expected_reason
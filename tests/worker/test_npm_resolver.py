@@ -0,0 +1,139 @@
+import pytest
+
+import depobs.worker.npm_resolver as m
+
+
+def constraint(name, version_range, type_prefix=""):
+    return dict(name=name, version_range=version_range, type_prefix=type_prefix)
+
+
+def registry_entry(name, version, constraints):
+    return (f"https://registry.npmjs.org/{name}/-/{name}-{version}.tgz", constraints)
+
+
+async def fake_run_in_db_thread(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+registry = {
+    "root": {
+        "1.0.0": registry_entry(
+            "root",
+            "1.0.0",
+            [
+                constraint("a", "^1.0.0"),
+                constraint("b", "~2.1.0", "optional"),
+                constraint("dev-only", "^1.0.0", "dev"),
+                constraint("peer-only", "^1.0.0", "peer"),
+                constraint("git-dep", "github:org/git-dep"),
+            ],
+        ),
+    },
+    "a": {
+        "1.0.0": registry_entry("a", "1.0.0", []),
+        "1.2.0": registry_entry("a", "1.2.0", [constraint("b", "^2.0.0")]),
+        "2.0.0": registry_entry("a", "2.0.0", []),
+    },
+    "b": {
+        "2.1.3": registry_entry("b", "2.1.3", [constraint("a", "^1.0.0")]),
+        "2.2.0": registry_entry("b", "2.2.0", []),
+        "2.3.0-beta.1": registry_entry("b", "2.3.0-beta.1", []),
+    },
+    "dev-only": {"1.0.0": registry_entry("dev-only", "1.0.0", [])},
+}
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_resolve_package_version(app, mocker):
+    stored_names = {"root", "a"}
+
+    def fake_get_registry_entries(package_names):
+        return {
+            name: registry[name]
+            for name in package_names
+            if name in registry and name in stored_names
+        }
+
+    async def fake_fetch_and_save_registry_entries(package_names):
+        stored_names.update(package_names)
+        return []
+
+    mocker.patch.object(m.async_models, "run_in_db_thread", fake_run_in_db_thread)
+    mocker.patch.object(m, "_get_registry_entries", fake_get_registry_entries)
+    fetch = mocker.patch.object(
+        m,
+        "fetch_and_save_registry_entries",
+        side_effect=fake_fetch_and_save_registry_entries,
+    )
+
+    with app.app_context():
+        cache = m.ResolvedVersionCache(max_size=10, ttl_seconds=60)
+        pkgs, root = await m.resolve_package_version("root", "1.0.0", cache)
+
+    assert root.package_id == "root@1.0.0"
+    assert {pkg.package_id: pkg.dependencies for pkg in pkgs} == {
+        "root@1.0.0": ["a@1.2.0", "b@2.1.3"],
+        "a@1.2.0": ["b@2.2.0"],
+        "b@2.1.3": ["a@1.2.0"],
+        "b@2.2.0": [],
+    }
+    assert {pkg.package_id: pkg.resolved for pkg in pkgs}[
+        "a@1.2.0"
+    ] == "https://registry.npmjs.org/a/-/a-1.2.0.tgz"
+    # fetches missing production dependency entries once in one batch
+    fetch.assert_called_once_with(["b", "git-dep"])
+    assert cache.hits == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_resolve_package_version_not_found(app, mocker):
+    mocker.patch.object(m.async_models, "run_in_db_thread", fake_run_in_db_thread)
+    mocker.patch.object(m, "_get_registry_entries", lambda package_names: {})
+    mocker.patch.object(m, "fetch_and_save_registry_entries", return_value=[])
+
+    with app.app_context():
+        with pytest.raises(ValueError):
+            await m.resolve_package_version("root", "1.0.0")
+
+
+@pytest.mark.unit
+def test_resolved_graph_matches_deserialized_graph_links():
+    pkgs = [
+        m.NPMPackage(name="root", version="1.0.0", dependencies=["a@1.2.0"]),
+        m.NPMPackage(name="a", version="1.2.0", dependencies=[]),
+    ]
+    *package_versions, (graph, root, links) = m.deserialize_resolved_graph(
+        pkgs, pkgs[0]
+    )
+    assert root.name == "root"
+    assert graph.package_manager == "npm"
+    assert m.compare_graph_links(
+        m.get_resolved_links(pkgs), m.get_deserialized_links(links)
+    ) == dict(mismatched=[], missing=[], extra=[])
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_resolve_package_version_re_resolves_cached_versions_not_in_entries(
+    app, mocker
+):
+    mocker.patch.object(m.async_models, "run_in_db_thread", fake_run_in_db_thread)
+    mocker.patch.object(
+        m,
+        "_get_registry_entries",
+        lambda package_names: {
+            name: registry[name] for name in package_names if name in registry
+        },
+    )
+    mocker.patch.object(m, "fetch_and_save_registry_entries", return_value=[])
+
+    with app.app_context():
+        cache = m.ResolvedVersionCache(max_size=10, ttl_seconds=60)
+        # e.g. cached from a registry entry that's no longer stored
+        cache.set(("a", "^1.0.0"), "1.9.9")
+        pkgs, root = await m.resolve_package_version("root", "1.0.0", cache)
+
+    assert root.dependencies == ["a@1.2.0", "b@2.1.3"]
+    assert cache.get(("a", "^1.0.0")) == "1.2.0"
@@ -5,7 +5,7 @@ from typing import Any, Dict, Iterator, Iterable, List, Optional, Tuple
 
 import pytest
 
-from depobs.database.models import PackageVersion
+from depobs.database.models import PackageGraphCondensation, PackageVersion
 import depobs.worker.scoring as m
 
 
@@ -192,7 +192,7 @@ score_package_component_testcases = {
     ],
     "npm_reg_null_published_at": [
         create_single_node_digraph_with_attrs(
-            # published_at, maintainers, contributors as returned by models.get_npm_registry_data
+            # published_at, maintainers_count, contributors_count as returned by models.get_npm_registry_data
             {"registry_entry": (None, None, None)}
         ),
         0,
@@ -203,7 +203,7 @@ score_package_component_testcases = {
     ],
     "npm_reg_published_at": [
         create_single_node_digraph_with_attrs(
-            # published_at, maintainers, contributors as returned by models.get_npm_registry_data
+            # published_at, maintainers_count, contributors_count as returned by models.get_npm_registry_data
             {"registry_entry": (m.datetime(year=2030, month=1, day=1), None, None)}
         ),
         0,
@@ -214,7 +214,7 @@ score_package_component_testcases = {
     ],
     "npm_reg_null_contributors": [
         create_single_node_digraph_with_attrs(
-            # published_at, maintainers, contributors as returned by models.get_npm_registry_data
+            # published_at, maintainers_count, contributors_count as returned by models.get_npm_registry_data
             {"registry_entry": (None, None, None)}
         ),
         0,
@@ -224,8 +224,8 @@ score_package_component_testcases = {
         },
     ],
     "npm_reg_empty_contributors": [
-        # published_at, maintainers, contributors as returned by models.get_npm_registry_data
-        create_single_node_digraph_with_attrs({"registry_entry": (None, None, [])}),
+        # published_at, maintainers_count, contributors_count as returned by models.get_npm_registry_data
+        create_single_node_digraph_with_attrs({"registry_entry": (None, None, 0)}),
         0,
         [m.NPMRegistryScoreComponent],
         {
@@ -233,19 +233,8 @@ score_package_component_testcases = {
         },
     ],
     "npm_reg_two_contributors": [
-        # published_at, maintainers, contributors as returned by models.get_npm_registry_data
-        create_single_node_digraph_with_attrs(
-            {
-                "registry_entry": (
-                    None,
-                    None,
-                    [
-                        "contributor1@example.com",
-                        "contributor2@example.com",
-                    ],
-                )
-            }
-        ),
+        # published_at, maintainers_count, contributors_count as returned by models.get_npm_registry_data
+        create_single_node_digraph_with_attrs({"registry_entry": (None, None, 2)}),
         0,
         [m.NPMRegistryScoreComponent],
         {
@@ -253,7 +242,7 @@ score_package_component_testcases = {
         },
     ],
     "npm_reg_null_maintainers": [
-        # published_at, maintainers, contributors as returned by models.get_npm_registry_data
+        # published_at, maintainers_count, contributors_count as returned by models.get_npm_registry_data
         create_single_node_digraph_with_attrs({"registry_entry": (None, None, None)}),
         0,
         [m.NPMRegistryScoreComponent],
@@ -262,8 +251,8 @@ score_package_component_testcases = {
         },
     ],
     "npm_reg_empty_maintainers": [
-        # published_at, maintainers, contributors as returned by models.get_npm_registry_data
-        create_single_node_digraph_with_attrs({"registry_entry": (None, [], None)}),
+        # published_at, maintainers_count, contributors_count as returned by models.get_npm_registry_data
+        create_single_node_digraph_with_attrs({"registry_entry": (None, 0, None)}),
         0,
         [m.NPMRegistryScoreComponent],
         {
@@ -271,19 +260,8 @@ score_package_component_testcases = {
         },
     ],
     "npm_reg_two_maintainers": [
-        # published_at, maintainers, contributors as returned by models.get_npm_registry_data
-        create_single_node_digraph_with_attrs(
-            {
-                "registry_entry": (
-                    None,
-                    [
-                        "contributor1@example.com",
-                        "contributor2@example.com",
-                    ],
-                    None,
-                )
-            }
-        ),
+        # published_at, maintainers_count, contributors_count as returned by models.get_npm_registry_data
+        create_single_node_digraph_with_attrs({"registry_entry": (None, 2, None)}),
         0,
         [m.NPMRegistryScoreComponent],
         {
@@ -468,6 +446,7 @@ score_package_graph_testcases = {
             },
             get_npm_registry_data_by_package_version_id=lambda: {0: None},
             get_advisories_by_package_version_id=lambda: {0: []},
+            get_maintainer_breaches_by_package_version_id=lambda: {},
         ),
         [
             m.PackageReport(
@@ -510,6 +489,7 @@ score_package_graph_testcases = {
                 2: None,
             },
             get_advisories_by_package_version_id=lambda: {0: [], 1: [], 2: []},
+            get_maintainer_breaches_by_package_version_id=lambda: {},
         ),
         [
             m.PackageReport(
@@ -595,6 +575,7 @@ score_package_graph_testcases = {
                 0: [],
                 1: [],
             },
+            get_maintainer_breaches_by_package_version_id=lambda: {},
         ),
         [
             m.PackageReport(
@@ -691,6 +672,165 @@ def test_score_package_graph(
             assert dep.report_json == expected_dep.report_json
 
 
+@pytest.mark.unit
+def test_score_package_graph_uses_saved_condensation(mocker):
+    db_graph = m.PackageGraph(
+        id=-1,
+        package_links_by_id={0: (0, 1), 1: (1, 2)},
+        distinct_package_versions_by_id={
+            0: PackageVersion(id=0, name="test-root-pkg", version="0.1.0"),
+            1: PackageVersion(id=1, name="test-child-pkg", version="0.0.3"),
+            2: PackageVersion(id=2, name="test-grandchild-pkg", version="2.1.0"),
+        },
+    )
+    db_graph.condensation = PackageGraphCondensation.from_compact_graph(
+        -1, m.graph_util.package_graph_to_compact_graph(db_graph)
+    )
+    condensation_spy = mocker.spy(m.CompactGraph, "condensation")
+
+    reports = m.score_package_graph(db_graph, [m.DependencyCountScoreComponent])
+
+    condensation_spy.assert_not_called()
+    assert [
+        (node_id, report.immediate_deps, report.all_deps)
+        for node_id, report in reports.items()
+    ] == [(2, 0, 0), (1, 1, 1), (0, 1, 2)]
+
+
+sibling_sccs_db_graph = m.PackageGraph(
+    id=-1,
+    # 0 and 3 are on the same level and only 3 has indirect deps
+    package_links_by_id={0: (0, 1), 1: (2, 3), 2: (3, 4), 3: (5, 3)},
+    distinct_package_versions_by_id={
+        node_id: PackageVersion(id=node_id, name=f"pkg-{node_id}", version="1.0.0")
+        for node_id in range(6)
+    },
+)
+
+
+@pytest.mark.parametrize(
+    "db_graph, score_components",
+    [
+        *[(db_graph, None) for db_graph, _ in score_package_graph_testcases.values()],
+        (sibling_sccs_db_graph, [m.DependencyCountScoreComponent]),
+    ],
+    ids=[*score_package_graph_testcases.keys(), "sibling_sccs"],
+)
+@pytest.mark.unit
+def test_score_package_graph_records_match_for_compact_and_networkx_graphs(
+    db_graph: m.PackageGraph, score_components, mocker
+):
+    mocker.patch("depobs.worker.scoring.datetime")
+    compact = m.graph_util.package_graph_to_compact_graph(db_graph)
+
+    compact_records = m.score_package_graph_records(db_graph, score_components, compact)
+    nx_records = m.score_package_graph_records(
+        db_graph, score_components, compact.to_networkx()
+    )
+
+    assert compact_records.keys() == nx_records.keys()
+    for node_id, record in compact_records.items():
+        assert record.to_row() == nx_records[node_id].to_row()
+        assert sorted(record.dependency_package_version_ids) == sorted(
+            nx_records[node_id].dependency_package_version_ids
+        )
+
+
+@pytest.mark.parametrize("to_networkx", [False, True])
+@pytest.mark.unit
+def test_score_package_graph_maintainer_breaches(to_networkx):
+    # 0 -> 1 <-> 2 -> 3 with a shared breached maintainer
+    db_graph = m.PackageGraph(
+        id=-1,
+        package_links_by_id={0: (0, 1), 1: (1, 2), 2: (2, 1), 3: (2, 3)},
+        distinct_package_versions_by_id={
+            node_id: PackageVersion(id=node_id, name=f"pkg-{node_id}", version="1.0.0")
+            for node_id in range(4)
+        },
+        get_maintainer_breaches_by_package_version_id=lambda: {
+            1: {"a@example.com": 2, "b@example.com": 0},
+            2: {"c@example.com": 1},
+            3: {"a@example.com": 2, "d@example.com": 5},
+        },
+    )
+    graph = m.graph_util.package_graph_to_compact_graph(db_graph)
+    if to_networkx:
+        graph = graph.to_networkx()
+
+    reports = m.score_package_graph(db_graph, [m.MaintainerBreachScoreComponent], graph)
+
+    assert {
+        node_id: (
+            report.maintainer_breaches,
+            report.breached_maintainers,
+            report.all_maintainer_breaches,
+            report.all_breached_maintainers,
+        )
+        for node_id, report in reports.items()
+    } == {
+        0: (None, None, 8, 3),
+        1: (2, 1, 8, 3),
+        2: (1, 1, 8, 3),
+        3: (7, 2, 7, 2),
+    }
+
+
+@pytest.mark.unit
+def test_score_package_graph_maintainer_breaches_are_none_until_fetched():
+    # 0 -> 1 -> 2 with HIBP data fetched for 1's maintainers only
+    db_graph = m.PackageGraph(
+        id=-1,
+        package_links_by_id={0: (0, 1), 1: (1, 2)},
+        distinct_package_versions_by_id={
+            node_id: PackageVersion(id=node_id, name=f"pkg-{node_id}", version="1.0.0")
+            for node_id in range(3)
+        },
+        get_maintainer_breaches_by_package_version_id=lambda: {
+            1: {"a@example.com": 0},
+        },
+    )
+
+    reports = m.score_package_graph(db_graph, [m.MaintainerBreachScoreComponent])
+
+    assert {
+        node_id: (
+            report.maintainer_breaches,
+            report.breached_maintainers,
+            report.all_maintainer_breaches,
+            report.all_breached_maintainers,
+        )
+        for node_id, report in reports.items()
+    } == {
+        0: (None, None, 0, 0),
+        1: (0, 0, 0, 0),
+        2: (None, None, None, None),
+    }
+
+
+@pytest.mark.parametrize(
+    "db_graph, expected_package_reports",
+    score_package_graph_testcases.values(),
+    ids=score_package_graph_testcases.keys(),
+)
+@pytest.mark.unit
+def test_score_package_graph_records_match_reports(
+    db_graph: m.PackageGraph,
+    expected_package_reports: List[m.PackageReport],
+    mocker,
+):
+    mocker.patch("depobs.worker.scoring.datetime")
+    reports = m.score_package_graph(db_graph)
+    records = m.score_package_graph_records(db_graph)
+
+    assert list(records.keys()) == list(reports.keys())
+    for node_id, record in records.items():
+        assert record.package_version_id == node_id
+        assert record.to_package_report().report_json == reports[node_id].report_json
+        assert [
+            records[dep_id].package for dep_id in record.dependency_package_version_ids
+        ] == [dep.package for dep in reports[node_id].dependencies]
+
+
 compare_package_graph_testcases = {
     "same_one_node_graph": (
         m.PackageGraph(
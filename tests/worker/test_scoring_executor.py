@@ -0,0 +1,70 @@
+import pickle
+
+import pytest
+
+import depobs.worker.scoring_executor as m
+
+from tests.worker.test_scoring import score_package_graph_testcases
+
+
+db_graphs = [db_graph for db_graph, _ in score_package_graph_testcases.values()]
+
+
+def report_rows(records):
+    return [
+        (
+            record.package_version_id,
+            record.dependency_package_version_ids,
+            {
+                key: value
+                for key, value in record.to_row().items()
+                if key != "scoring_date"
+            },
+        )
+        for record in records
+    ]
+
+
+@pytest.mark.parametrize(
+    "db_graph",
+    db_graphs,
+    ids=score_package_graph_testcases.keys(),
+)
+@pytest.mark.unit
+def test_scoring_task_scores_like_score_package_graph_records(db_graph):
+    task = pickle.loads(
+        pickle.dumps(m.to_scoring_task(db_graph, m.scoring.all_score_components))
+    )
+    [records] = pickle.loads(
+        pickle.dumps(m.score_scoring_tasks([task], m.scoring.all_score_components))
+    )
+    assert report_rows(records) == report_rows(
+        m.scoring.score_package_graph_records(db_graph).values()
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("processes", [0, 2])
+@pytest.mark.unit
+async def test_score_package_graphs(app, processes):
+    app.config["SCORING_PROCESSES"] = processes
+    app.config["SCORING_TASK_MAX_NODES"] = 3
+    with app.app_context():
+        results = [records async for records in m.score_package_graphs(db_graphs)]
+
+    assert sorted(len(records) for records in results) == sorted(
+        len(db_graph.distinct_package_ids) for db_graph in db_graphs
+    )
+
+
+@pytest.mark.parametrize("score_maintainer_breaches", [False, True])
+@pytest.mark.unit
+def test_get_default_score_components(app, score_maintainer_breaches):
+    app.config["SCORE_MAINTAINER_BREACHES"] = score_maintainer_breaches
+    with app.app_context():
+        components = m.get_default_score_components()
+
+    assert (
+        m.scoring.MaintainerBreachScoreComponent in components
+    ) == score_maintainer_breaches
+    assert m.scoring.DependencyCountScoreComponent in components
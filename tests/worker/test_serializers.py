@@ -7,6 +7,12 @@ import pytest
 
 import depobs.worker.serializers as m
 
+from tests.models.test_nodejs_models import (
+    lockfile_manifest,
+    package_lock_v3,
+    yarn_lock,
+)
+
 
 def load_json_fixture(path: str) -> Dict[str, Any]:
     with open(path, "r") as fin:
@@ -32,6 +38,32 @@ def test_npm_registry_entries_deserialize(entry_json_path: pathlib.Path):
     assert len(serialized) == len(json_entry["versions"].keys())
 
 
+@pytest.mark.unit
+def test_serialize_npm_registry_entries_counts_distinct_people():
+    [entry] = m.serialize_npm_registry_entries(
+        [
+            {
+                "versions": {
+                    "1.0.0": {
+                        "name": "foo",
+                        "version": "1.0.0",
+                        "dist": {"shasum": "abc", "tarball": "https://example.com/"},
+                        "maintainers": [
+                            {"name": "a", "email": "a@example.com"},
+                            "A <A@example.com> (https://example.com/a)",
+                            "b",
+                        ],
+                    }
+                },
+                "time": {},
+            }
+        ]
+    )
+
+    assert entry.maintainers_count == 2
+    assert entry.contributors_count is None
+
+
 deserialize_pubsub_test_cases = {
     "hapi-bounce-2.0.0-no-vulns": (
         [
@@ -298,3 +330,67 @@ def test_deserializing_pubsub_json_results(
                 assert deserialized[1] == expected[1]
             else:
                 assert deserialized == expected
+
+
+@pytest.mark.unit
+def test_parse_npm_list_only_computes_graph_stats_when_enabled():
+    parsed_stdout = {
+        "name": "root",
+        "version": "1.0.0",
+        "dependencies": {"dep": {"version": "2.0.0", "resolved": "dep-2.0.0.tgz"}},
+    }
+    assert m.parse_npm_list(parsed_stdout)["graph_stats"] == dict()
+    assert m.parse_npm_list(parsed_stdout, graph_stats=True)["graph_stats"]["is_dag"]
+
+
+dep_files_test_cases = {
+    "package_lock": (
+        {
+            "package.json": json.dumps(lockfile_manifest),
+            "package-lock.json": json.dumps(package_lock_v3),
+        },
+        "npm",
+    ),
+    "yarn_lock": (
+        {"package.json": json.dumps(lockfile_manifest), "yarn.lock": yarn_lock},
+        "yarn",
+    ),
+}
+
+
+@pytest.mark.parametrize(
+    "dep_files, expected_package_manager",
+    dep_files_test_cases.values(),
+    ids=dep_files_test_cases.keys(),
+)
+@pytest.mark.unit
+def test_deserialize_dep_files(dep_files, expected_package_manager, app):
+    with app.app_context():
+        *package_versions, (graph, root, links) = m.deserialize_dep_files(dep_files)
+
+    assert all(isinstance(pv, m.PackageVersion) for pv in package_versions)
+    assert {(pv.name, pv.version) for pv in package_versions} == {
+        ("app", "1.0.0"),
+        ("a", "1.0.0"),
+        ("b", "1.0.0"),
+        ("b", "2.0.0"),
+        ("@s/c", "3.0.0"),
+    }
+    assert isinstance(graph, m.PackageGraph)
+    assert graph.package_manager == expected_package_manager
+    assert (root.name, root.version) == ("app", "1.0.0")
+    assert sorted(
+        ((parent.name, parent.version), (child.name, child.version))
+        for parent, child in links
+    ) == [
+        (("a", "1.0.0"), ("b", "1.0.0")),
+        (("app", "1.0.0"), ("a", "1.0.0")),
+        (("app", "1.0.0"), ("b", "2.0.0")),
+        (("b", "2.0.0"), ("@s/c", "3.0.0")),
+    ]
+
+
+@pytest.mark.unit
+def test_deserialize_dep_files_requires_a_lockfile():
+    with pytest.raises(ValueError):
+        list(m.deserialize_dep_files({"package.json": json.dumps(lockfile_manifest)}))